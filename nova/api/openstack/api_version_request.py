@@ -158,6 +158,8 @@ REST_API_VERSION_HISTORY = """REST API Version History:
              /os-server-groups/{group_id} API.
     * 2.65 - Add support for abort live migrations in ``queued`` and
              ``preparing`` status.
+    * 2.66 - Add the ``cache_images`` action to the os-aggregates API to
+             pre-cache images on the compute hosts of an aggregate.
 """
 
 # The minimum and maximum versions of the API supported
@@ -166,7 +168,7 @@ REST_API_VERSION_HISTORY = """REST API Version History:
 # Note(cyeoh): This only applies for the v2.1 API once microversions
 # support is fully merged. It does not affect the V2 API.
 _MIN_API_VERSION = "2.1"
-_MAX_API_VERSION = "2.65"
+_MAX_API_VERSION = "2.66"
 DEFAULT_API_VERSION = _MIN_API_VERSION
 
 # Almost all proxy APIs which are related to network, images and baremetal
@@ -199,6 +199,26 @@ class AggregateController(wsgi.Controller):
 
         return self._marshall_aggregate(req, aggregate)
 
+    @wsgi.Controller.api_version('2.66')
+    @wsgi.response(202)
+    @wsgi.expected_errors((400, 404, 409))
+    @wsgi.action('cache_images')
+    @validation.schema(aggregates.cache_images)
+    def _cache_images(self, req, id, body):
+        """Asks the hosts of an aggregate to pre-cache images."""
+        context = _get_context(req)
+        context.can(aggr_policies.POLICY_ROOT % 'cache_images')
+
+        image_ids = body['cache_images']['image_ids']
+        try:
+            self.api.cache_images(context, id, image_ids)
+        except exception.AggregateNotFound as e:
+            raise exc.HTTPNotFound(explanation=e.format_message())
+        except exception.ImageNotFound as e:
+            raise exc.HTTPBadRequest(explanation=e.format_message())
+        except exception.ImageCacheNotYetAvailable as e:
+            raise exc.HTTPConflict(explanation=e.format_message())
+
     def _marshall_aggregate(self, req, aggregate):
         _aggregate = {}
         for key, value in self._build_aggregate_items(req, aggregate):
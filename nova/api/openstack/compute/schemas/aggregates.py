@@ -129,3 +129,25 @@ set_metadata = {
     'required': ['set_metadata'],
     'additionalProperties': False,
 }
+
+
+cache_images = {
+    'type': 'object',
+    'properties': {
+        'cache_images': {
+            'type': 'object',
+            'properties': {
+                'image_ids': {
+                    'type': 'array',
+                    'items': parameter_types.image_id,
+                    'minItems': 1,
+                    'uniqueItems': True,
+                },
+            },
+            'required': ['image_ids'],
+            'additionalProperties': False,
+        },
+    },
+    'required': ['cache_images'],
+    'additionalProperties': False,
+}
@@ -236,6 +236,10 @@ class ServersController(wsgi.Controller):
 
         expected_attrs = []
         if is_detail:
+            # NOTE: the latest fault of the instances is loaded in bulk from
+            # each cell along with the page of instances, rather than being
+            # lazy-loaded one instance at a time by the view builder.
+            expected_attrs.append('fault')
             if api_version_request.is_supported(req, '2.16'):
                 expected_attrs.append('services')
             if api_version_request.is_supported(req, '2.26'):
@@ -262,8 +266,11 @@ class ServersController(wsgi.Controller):
             instance_list = objects.InstanceList()
 
         if is_detail:
-            instance_list._context = context
-            instance_list.fill_faults()
+            for instance in instance_list:
+                if 'fault' not in instance:
+                    # NOTE: instances still being built from a build request
+                    # are not in a cell yet, so they can not have faults.
+                    instance.fault = None
             response = self._view_builder.detail(req, instance_list)
         else:
             response = self._view_builder.index(req, instance_list)
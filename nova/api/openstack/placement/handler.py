@@ -33,6 +33,7 @@ from nova.api.openstack.placement.handlers import aggregate
 from nova.api.openstack.placement.handlers import allocation
 from nova.api.openstack.placement.handlers import allocation_candidate
 from nova.api.openstack.placement.handlers import inventory
+from nova.api.openstack.placement.handlers import provider_tree
 from nova.api.openstack.placement.handlers import resource_class
 from nova.api.openstack.placement.handlers import resource_provider
 from nova.api.openstack.placement.handlers import root
@@ -96,6 +97,9 @@ ROUTE_DECLARATIONS = {
         'GET': aggregate.get_aggregates,
         'PUT': aggregate.set_aggregates
     },
+    '/resource_providers/{uuid}/tree': {
+        'PUT': provider_tree.set_provider_tree,
+    },
     '/resource_providers/{uuid}/allocations': {
         'GET': allocation.list_for_resource_provider,
     },
@@ -268,6 +268,84 @@ def _transform_allocation_candidates(alloc_cands, requests, want_version):
     }
 
 
+def _transform_allocation_candidates_compact(alloc_cands):
+    """Turn supplied AllocationCandidates object into the compact
+    representation returned for microversion 1.30 and beyond when the
+    ``format=compact`` query parameter is given. As for the full format of
+    those microversions, the provider summaries include all the inventories
+    and traits of the providers as well as their parent and root providers.
+
+    Every resource provider UUID, resource class and trait name is listed
+    once and then referred to by its index in the list:
+
+    {
+        'providers': [RP_UUID_1, RP_UUID_2],
+        'resource_classes': ['VCPU', 'MEMORY_MB', 'DISK_GB'],
+        'traits': ['HW_CPU_X86_SSE'],
+        # [provider index, resource class index, amount, ...]
+        'allocation_requests': [
+            [0, 0, 1, 0, 1, 512, 1, 2, 100],
+        ],
+        # [provider index, [resource class index, capacity, used, ...],
+        #  [trait index, ...], parent provider index, root provider index]
+        'provider_summaries': [
+            [0, [0, 8, 0, 1, 2048, 0], [0], None, 0],
+            [1, [2, 1000, 0], [], None, 1],
+        ],
+    }
+    """
+    providers = []
+    resource_classes = []
+    traits = []
+
+    def _interner(values):
+        index = {}
+
+        def _intern(value):
+            if value is None:
+                return None
+            if value not in index:
+                index[value] = len(values)
+                values.append(value)
+            return index[value]
+        return _intern
+
+    _provider = _interner(providers)
+    _resource_class = _interner(resource_classes)
+    _trait = _interner(traits)
+
+    a_reqs = []
+    for ar in alloc_cands.allocation_requests:
+        a_req = []
+        for rr in ar.resource_requests:
+            a_req.extend((_provider(rr.resource_provider.uuid),
+                          _resource_class(rr.resource_class), rr.amount))
+        a_reqs.append(a_req)
+
+    p_sums = []
+    for ps in alloc_cands.provider_summaries:
+        rp = ps.resource_provider
+        resources = []
+        for psr in ps.resources:
+            resources.extend((_resource_class(psr.resource_class),
+                              psr.capacity, psr.used))
+        p_sums.append([
+            _provider(rp.uuid),
+            resources,
+            [_trait(t.name) for t in ps.traits],
+            _provider(rp.parent_provider_uuid),
+            _provider(rp.root_provider_uuid),
+        ])
+
+    return {
+        'providers': providers,
+        'resource_classes': resource_classes,
+        'traits': traits,
+        'allocation_requests': a_reqs,
+        'provider_summaries': p_sums,
+    }
+
+
 @wsgi_wrapper.PlacementWsgify
 @microversion.version_handler('1.10')
 @util.check_accept('application/json')
@@ -282,7 +360,9 @@ def list_allocation_candidates(req):
     context.can(policies.LIST)
     want_version = req.environ[microversion.MICROVERSION_ENVIRON]
     get_schema = schema.GET_SCHEMA_1_10
-    if want_version.matches((1, 25)):
+    if want_version.matches((1, 30)):
+        get_schema = schema.GET_SCHEMA_1_30
+    elif want_version.matches((1, 25)):
         get_schema = schema.GET_SCHEMA_1_25
     elif want_version.matches((1, 21)):
         get_schema = schema.GET_SCHEMA_1_21
@@ -322,7 +402,13 @@ def list_allocation_candidates(req):
         raise webob.exc.HTTPBadRequest(six.text_type(exc))
 
     response = req.response
-    trx_cands = _transform_allocation_candidates(cands, requests, want_version)
+    # Schema ensures we get either "full" or "compact"
+    resp_format = req.GET.get('format', 'full')
+    if resp_format == 'compact':
+        trx_cands = _transform_allocation_candidates_compact(cands)
+    else:
+        trx_cands = _transform_allocation_candidates(
+            cands, requests, want_version)
     json_data = jsonutils.dumps(trx_cands)
     response.body = encodeutils.to_utf8(json_data)
     response.content_type = 'application/json'
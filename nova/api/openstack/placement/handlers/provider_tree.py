@@ -0,0 +1,162 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Provider tree handlers for Placement API."""
+
+import copy
+
+from oslo_db import exception as db_exc
+from oslo_serialization import jsonutils
+from oslo_utils import encodeutils
+from oslo_utils import timeutils
+import webob
+
+from nova.api.openstack.placement import errors
+from nova.api.openstack.placement import exception
+from nova.api.openstack.placement.handlers import inventory as inv_handler
+from nova.api.openstack.placement import microversion
+from nova.api.openstack.placement.objects import resource_provider as rp_obj
+from nova.api.openstack.placement.policies import provider_tree as policies
+from nova.api.openstack.placement.schemas import provider_tree as schema
+from nova.api.openstack.placement import util
+from nova.api.openstack.placement import wsgi_wrapper
+from nova.i18n import _
+
+
+def _make_inventory_list(want_version, resource_provider, inventories):
+    inv_list = []
+    for res_class, raw_inventory in inventories.items():
+        inventory_data = copy.copy(inv_handler.INVENTORY_DEFAULTS)
+        inventory_data.update(raw_inventory)
+        inv_list.append(inv_handler._make_inventory_object(
+            resource_provider, res_class, **inventory_data))
+    inv_list = rp_obj.InventoryList(objects=inv_list)
+    try:
+        inv_handler._validate_inventory_capacity(want_version, inv_list)
+    except exception.InvalidInventoryCapacity as exc:
+        raise webob.exc.HTTPBadRequest(
+            _('Unable to update inventory for resource provider '
+              '%(rp_uuid)s: %(error)s') % {'rp_uuid': resource_provider.uuid,
+                                          'error': exc})
+    return inv_list
+
+
+def _get_trait_lists(context, trait_names_by_rp):
+    """Returns a dict, keyed by resource provider UUID, of TraitList objects
+    for the supplied dict of lists of trait names, loading all the traits
+    with a single query.
+    """
+    all_names = set()
+    for names in trait_names_by_rp.values():
+        all_names |= set(names)
+    trait_objs = {}
+    if all_names:
+        trait_objs = {trait.name: trait for trait in rp_obj.TraitList.get_all(
+            context, filters={'name_in': list(all_names)})}
+    missing = all_names - set(trait_objs)
+    if missing:
+        raise webob.exc.HTTPBadRequest(
+            _("No such trait(s): %s") % ', '.join(sorted(missing)))
+    return {rp_uuid: rp_obj.TraitList(
+                objects=[trait_objs[name] for name in set(names)])
+            for rp_uuid, names in trait_names_by_rp.items()}
+
+
+@wsgi_wrapper.PlacementWsgify
+@microversion.version_handler('1.31')
+@util.require_content('application/json')
+def set_provider_tree(req):
+    """PUT the desired inventories, traits and/or aggregates of any number of
+    the resource providers of the tree whose root provider is identified by
+    the {uuid} path parameter.
+
+    All the changes are made in a single transaction: either all of them
+    succeed, or none of them are made.
+
+    If any of the resource providers does not exist, return a 404.
+    If any of them is not in the tree, return a 400.
+    If the generation of any of them is out of sync, return a 409.
+    If an inventory to be deleted is in use, return a 409.
+    If any inventory is invalid, or any trait does not exist, return a 400.
+
+    On success return a 200 with an application/json body containing the new
+    generation of each of the resource providers.
+    """
+    context = req.environ['placement.context']
+    context.can(policies.UPDATE)
+    want_version = req.environ[microversion.MICROVERSION_ENVIRON]
+    root_uuid = util.wsgi_path_item(req.environ, 'uuid')
+    data = util.extract_json(req.body, schema.PUT_PROVIDER_TREE_SCHEMA)
+
+    providers = {}
+    for rp_uuid, state in data['resource_providers'].items():
+        rp = rp_obj.ResourceProvider.get_by_uuid(context, rp_uuid)
+        if rp.root_provider_uuid != root_uuid:
+            raise webob.exc.HTTPBadRequest(
+                _("Resource provider %(uuid)s is not in the tree of resource "
+                  "provider %(root)s.") % {'uuid': rp_uuid, 'root': root_uuid})
+        if rp.generation != state['resource_provider_generation']:
+            raise webob.exc.HTTPConflict(
+                _("Resource provider's generation already changed. Please "
+                  "update the generation and try again."),
+                comment=errors.CONCURRENT_UPDATE)
+        providers[rp_uuid] = rp
+
+    trait_lists = _get_trait_lists(
+        context, {rp_uuid: state['traits']
+                  for rp_uuid, state in data['resource_providers'].items()
+                  if 'traits' in state})
+
+    updates = []
+    for rp_uuid, state in data['resource_providers'].items():
+        rp = providers[rp_uuid]
+        inventories = None
+        if 'inventories' in state:
+            inventories = _make_inventory_list(
+                want_version, rp, state['inventories'])
+        updates.append((rp, inventories, trait_lists.get(rp_uuid),
+                        state.get('aggregates')))
+
+    try:
+        rp_obj.set_tree_state(context, updates)
+    except exception.ResourceClassNotFound as exc:
+        raise webob.exc.HTTPBadRequest(
+            _('Unknown resource class in inventory: %(error)s') %
+            {'error': exc})
+    except exception.InventoryWithResourceClassNotFound as exc:
+        raise webob.exc.HTTPConflict(
+            _('Race condition detected when setting inventory: %(error)s') %
+            {'error': exc})
+    except (exception.ConcurrentUpdateDetected,
+            db_exc.DBDuplicateEntry) as exc:
+        raise webob.exc.HTTPConflict(
+            _('update conflict: %(error)s') % {'error': exc},
+            comment=errors.CONCURRENT_UPDATE)
+    except exception.InventoryInUse as exc:
+        raise webob.exc.HTTPConflict(
+            _('update conflict: %(error)s') % {'error': exc},
+            comment=errors.INVENTORY_INUSE)
+    except exception.InvalidInventoryCapacity as exc:
+        raise webob.exc.HTTPBadRequest(
+            _('Unable to update inventory: %(error)s') % {'error': exc})
+
+    response_body = {
+        'resource_providers': {
+            rp_uuid: {'resource_provider_generation': rp.generation}
+            for rp_uuid, rp in providers.items()
+        }
+    }
+    req.response.status = 200
+    req.response.body = encodeutils.to_utf8(jsonutils.dumps(response_body))
+    req.response.content_type = 'application/json'
+    req.response.cache_control = 'no-cache'
+    req.response.last_modified = timeutils.utcnow(with_timezone=True)
+    return req.response
@@ -75,6 +75,10 @@ VERSIONS = [
              # the resource class is not in the requested resources.
     '1.28',  # Add support for consumer generation
     '1.29',  # Support nested providers in GET /allocation_candidates API.
+    '1.30',  # Add 'format' query parameter to GET /allocation_candidates to
+             # request a compact representation of the response.
+    '1.31',  # Add PUT /resource_providers/{uuid}/tree to set inventories,
+             # traits and aggregates of the providers of a tree at once.
 ]
 
 
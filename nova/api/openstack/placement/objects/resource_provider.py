@@ -42,6 +42,7 @@ from nova.api.openstack.placement import exception
 from nova.api.openstack.placement.objects import consumer as consumer_obj
 from nova.api.openstack.placement.objects import project as project_obj
 from nova.api.openstack.placement.objects import user as user_obj
+from nova.api.openstack.placement import provider_cache
 from nova.db.sqlalchemy import api_models as models
 from nova.db.sqlalchemy import resource_class_cache as rc_cache
 from nova.i18n import _
@@ -60,6 +61,9 @@ _PROJECT_TBL = models.Project.__table__
 _USER_TBL = models.User.__table__
 _CONSUMER_TBL = models.Consumer.__table__
 _RC_CACHE = None
+# In-process cache of the tree structure and traits of the providers involved
+# in allocation candidates, see _get_provider_records().
+_PROVIDER_CACHE = provider_cache.ProviderCache()
 _TRAIT_LOCK = 'trait_sync'
 _TRAITS_SYNCED = False
 
@@ -1012,6 +1016,7 @@ class ResourceProvider(base.VersionedObject, base.TimestampedObject):
             raise exception.CannotDeleteParentResourceProvider()
         if not result:
             raise exception.NotFound()
+        _PROVIDER_CACHE.remove(_id)
 
     @db_api.placement_context_manager.writer
     def _update_in_db(self, context, id, updates):
@@ -2613,6 +2618,12 @@ def _get_usages_by_provider_tree(ctx, root_ids):
     # SELECT
     #   rp.id as resource_provider_id
     # , rp.uuid as resource_provider_uuid
+    # , rp.name
+    # , rp.generation
+    # , rp.root_provider_id
+    # , rp.parent_provider_id
+    # , rp.created_at
+    # , rp.updated_at
     # , inv.resource_class_id
     # , inv.total
     # , inv.reserved
@@ -2667,6 +2678,12 @@ def _get_usages_by_provider_tree(ctx, root_ids):
     query = sa.select([
         rpt.c.id.label("resource_provider_id"),
         rpt.c.uuid.label("resource_provider_uuid"),
+        rpt.c.name,
+        rpt.c.generation,
+        rpt.c.root_provider_id,
+        rpt.c.parent_provider_id,
+        rpt.c.created_at,
+        rpt.c.updated_at,
         inv.c.resource_class_id,
         inv.c.total,
         inv.c.reserved,
@@ -2746,7 +2763,7 @@ def _has_provider_trees(ctx):
 
 @db_api.placement_context_manager.reader
 def _get_provider_ids_matching(ctx, resources, required_traits,
-        forbidden_traits, member_of=None):
+        forbidden_traits, member_of=None, limit=None):
     """Returns a list of tuples of (internal provider ID, root provider ID)
     that have available inventory to satisfy all the supplied requests for
     resources.
@@ -2767,6 +2784,10 @@ def _get_provider_ids_matching(ctx, resources, required_traits,
                       the allocation_candidates returned will only be for
                       resource providers that are members of one or more of the
                       supplied aggregates of each aggregate UUID list.
+    :param limit: An optional integer, N, representing the maximum number of
+                  providers to return. If
+                  CONF.placement.randomize_allocation_candidates is True this
+                  will be a random sampling of N of the matching providers.
     """
     trait_rps = None
     forbidden_rp_ids = None
@@ -2873,7 +2894,14 @@ def _get_provider_ids_matching(ctx, resources, required_traits,
     sel = sel.select_from(join_chain)
     sel = sel.where(sa.and_(*where_conds))
 
-    return [(r[0], r[1]) for r in ctx.session.execute(sel)]
+    randomize = CONF.placement.randomize_allocation_candidates
+    if limit and not randomize:
+        sel = sel.limit(limit)
+
+    res = [(r[0], r[1]) for r in ctx.session.execute(sel)]
+    if limit and randomize and len(res) > limit:
+        res = random.sample(res, limit)
+    return res
 
 
 @db_api.placement_context_manager.reader
@@ -3049,9 +3077,28 @@ def _get_trees_with_traits(ctx, rp_ids, required_traits, forbidden_traits):
     return [(rp_id, root_id) for rp_id, root_id in res]
 
 
+def _limit_trees(rp_tuples, limit):
+    """Returns the tuples of the supplied list of tuples whose second element,
+    the root provider ID, is in one of at most ``limit`` provider trees.
+
+    If CONF.placement.randomize_allocation_candidates is True the trees are
+    a random sampling of the supplied ones, otherwise they are the trees with
+    the lowest root provider IDs.
+    """
+    root_ids = sorted(set(p[1] for p in rp_tuples))
+    if len(root_ids) <= limit:
+        return rp_tuples
+    if CONF.placement.randomize_allocation_candidates:
+        root_ids = random.sample(root_ids, limit)
+    else:
+        root_ids = root_ids[:limit]
+    root_ids = set(root_ids)
+    return [p for p in rp_tuples if p[1] in root_ids]
+
+
 @db_api.placement_context_manager.reader
 def _get_trees_matching_all(ctx, resources, required_traits, forbidden_traits,
-                            sharing, member_of):
+                            sharing, member_of, limit=None):
     """Returns a list of two-tuples (provider internal ID, root provider
     internal ID) for providers that satisfy the request for resources.
 
@@ -3093,6 +3140,11 @@ def _get_trees_matching_all(ctx, resources, required_traits, forbidden_traits,
                       provided, the allocation_candidates returned will only be
                       for resource providers that are members of one or more of
                       the supplied aggregates in each aggregate UUID list.
+    :param limit: An optional integer, N, representing the maximum number of
+                  provider trees to return providers for. Since the traits of
+                  the trees are only checked later when sharing providers are
+                  in play, it is ignored in that case if traits are required
+                  or forbidden.
     """
     # We first grab the provider trees that have nodes that meet the request
     # for each resource class.  Once we have this information, we'll then do a
@@ -3165,7 +3217,12 @@ def _get_trees_matching_all(ctx, resources, required_traits, forbidden_traits,
         # environments, so just short-circuit and return. Or if sharing
         # providers are in play, we check the trait constraints later
         # in _alloc_candidates_multiple_providers(), so skip.
-        return list(provs_with_inv)
+        provs_with_inv = list(provs_with_inv)
+        if limit and not required_traits and not forbidden_traits:
+            # Every remaining tree yields at least one allocation request, so
+            # we only need to keep `limit` of them.
+            provs_with_inv = _limit_trees(provs_with_inv, limit)
+        return provs_with_inv
 
     # Return the providers where the providers have the available inventory
     # capacity and that set of providers (grouped by their tree) have all
@@ -3177,13 +3234,120 @@ def _get_trees_matching_all(ctx, resources, required_traits, forbidden_traits,
     ret = [rp_tuple for rp_tuple in provs_with_inv if (
         rp_tuple[0], rp_tuple[1]) in rp_tuples_with_trait]
 
+    if limit:
+        ret = _limit_trees(ret, limit)
     return ret
 
 
-def _build_provider_summaries(context, usages, prov_traits):
+@db_api.placement_context_manager.reader
+def _load_provider_records(ctx, rp_ids):
+    """Returns a list of dicts with the tree structure and the string trait
+    names of the resource providers with the supplied internal IDs.
+
+    :param ctx: nova.context.RequestContext object
+    :param rp_ids: list of resource provider internal IDs
+    """
+    rpt = sa.alias(_RP_TBL, name="rp")
+    parent = sa.alias(_RP_TBL, name="parent")
+    root = sa.alias(_RP_TBL, name="root")
+    # TODO(jaypipes): Change this to an inner join when we are sure all
+    # root_provider_id values are NOT NULL
+    rp_to_root = sa.outerjoin(rpt, root, rpt.c.root_provider_id == root.c.id)
+    rp_to_parent = sa.outerjoin(rp_to_root, parent,
+        rpt.c.parent_provider_id == parent.c.id)
+    cols = [
+        rpt.c.id,
+        rpt.c.uuid,
+        rpt.c.generation,
+        rpt.c.root_provider_id,
+        rpt.c.parent_provider_id,
+        root.c.uuid.label("root_provider_uuid"),
+        parent.c.uuid.label("parent_provider_uuid"),
+    ]
+    sel = sa.select(cols).select_from(rp_to_parent).where(
+        rpt.c.id.in_(rp_ids))
+    records = {}
+    for r in ctx.session.execute(sel):
+        records[r['id']] = dict(r, traits=[])
+
+    rptt = sa.alias(_RP_TRAIT_TBL, name='rptt')
+    tt = sa.alias(_TRAIT_TBL, name='t')
+    j = sa.join(rptt, tt, rptt.c.trait_id == tt.c.id)
+    sel = sa.select([rptt.c.resource_provider_id, tt.c.name]).select_from(j)
+    sel = sel.where(rptt.c.resource_provider_id.in_(rp_ids))
+    for r in ctx.session.execute(sel):
+        records[r[0]]['traits'].append(r[1])
+    return list(records.values())
+
+
+def _get_provider_records(ctx, usages):
+    """Returns a dict, keyed by internal resource provider ID, of dicts with
+    the root and parent provider UUIDs and the string trait names of each
+    provider found in the supplied usage records.
+
+    The records are taken from the in-process provider cache, and only the
+    providers whose generation or position in a tree changed since they were
+    cached are read from the database.
+
+    :param ctx: nova.context.RequestContext object
+    :param usages: A list of usage records, as returned by
+                   _get_usages_by_provider_tree()
+    """
+    records = {}
+    missing = set()
+    for usage in usages:
+        rp_id = usage['resource_provider_id']
+        if rp_id in records or rp_id in missing:
+            continue
+        current = {
+            'uuid': usage['resource_provider_uuid'],
+            'generation': usage['generation'],
+            'root_provider_id': usage['root_provider_id'],
+            'parent_provider_id': usage['parent_provider_id'],
+        }
+        record = _PROVIDER_CACHE.get(rp_id, current)
+        if record is None:
+            missing.add(rp_id)
+        else:
+            records[rp_id] = record
+    if missing:
+        for record in _load_provider_records(ctx, missing):
+            records[record['id']] = record
+            # Providers without a root provider have not been migrated yet,
+            # see ResourceProvider._from_db_object(). Their root provider will
+            # change on the next read, so don't bother caching them.
+            if record['root_provider_id'] is not None:
+                _PROVIDER_CACHE.set(record)
+    return records
+
+
+def _provider_from_usage(ctx, usage, record):
+    """Returns a ResourceProvider object built from a usage record and the
+    provider record of the same provider, without querying the database.
+    """
+    if record['root_provider_uuid'] is None:
+        # Let the object do the online data migration of the root provider.
+        return ResourceProvider.get_by_uuid(ctx,
+                                            usage['resource_provider_uuid'])
+    rp = ResourceProvider(
+        ctx,
+        id=usage['resource_provider_id'],
+        uuid=usage['resource_provider_uuid'],
+        name=usage['name'],
+        generation=usage['generation'],
+        root_provider_uuid=record['root_provider_uuid'],
+        parent_provider_uuid=record['parent_provider_uuid'],
+        created_at=usage['created_at'],
+        updated_at=usage['updated_at'],
+    )
+    rp.obj_reset_changes()
+    return rp
+
+
+def _build_provider_summaries(context, usages, prov_records):
     """Given a list of dicts of usage information and a map of providers to
-    their associated string traits, returns a dict, keyed by resource provider
-    ID, of ProviderSummary objects.
+    their tree structure and string traits, returns a dict, keyed by resource
+    provider ID, of ProviderSummary objects.
 
     :param context: nova.context.RequestContext object
     :param usages: A list of dicts with the following format:
@@ -3191,13 +3355,20 @@ def _build_provider_summaries(context, usages, prov_traits):
         {
             'resource_provider_id': <internal resource provider ID>,
             'resource_provider_uuid': <UUID>,
+            'name': <name of the resource provider>,
+            'generation': integer,
+            'root_provider_id': <internal root resource provider ID>,
+            'parent_provider_id': <internal parent resource provider ID>,
+            'created_at': datetime,
+            'updated_at': datetime,
             'resource_class_id': <internal resource class ID>,
             'total': integer,
             'reserved': integer,
             'allocation_ratio': float,
         }
-    :param prov_traits: A dict, keyed by internal resource provider ID, of
-                        string trait names associated with that provider
+    :param prov_records: A dict, keyed by internal resource provider ID, of
+                         provider records as returned by
+                         _get_provider_records()
     """
     # Build up a dict, keyed by internal resource provider ID, of
     # ProviderSummary objects containing one or more ProviderSummaryResource
@@ -3205,20 +3376,19 @@ def _build_provider_summaries(context, usages, prov_traits):
     summaries = {}
     for usage in usages:
         rp_id = usage['resource_provider_id']
-        rp_uuid = usage['resource_provider_uuid']
         summary = summaries.get(rp_id)
         if not summary:
+            record = prov_records[rp_id]
             summary = ProviderSummary(
                 context,
-                resource_provider=ResourceProvider.get_by_uuid(context,
-                                                               uuid=rp_uuid),
+                resource_provider=_provider_from_usage(context, usage,
+                                                       record),
                 resources=[],
+                traits=[Trait(context, name=tname)
+                        for tname in record['traits']],
             )
             summaries[rp_id] = summary
 
-        traits = prov_traits[rp_id]
-        summary.traits = [Trait(context, name=tname) for tname in traits]
-
         rc_id = usage['resource_class_id']
         if rc_id is None:
             # NOTE(tetsuro): This provider doesn't have any inventory itself.
@@ -3321,8 +3491,9 @@ def _allocation_request_for_provider(ctx, requested_resources, provider):
             anchor_root_provider_uuid=provider.root_provider_uuid)
 
 
-def _check_traits_for_alloc_request(res_requests, summaries, prov_traits,
-                                    required_traits, forbidden_traits):
+def _check_traits_for_alloc_request(res_requests, rp_ids_by_uuid,
+                                    prov_traits, required_traits,
+                                    forbidden_traits):
     """Given a list of AllocationRequestResource objects, check if that
     combination can provide trait constraints. If it can, returns all
     resource provider internal IDs in play, else return an empty list.
@@ -3334,9 +3505,9 @@ def _check_traits_for_alloc_request(res_requests, summaries, prov_traits,
                          resource providers to be checked if they collectively
                          satisfy trait constraints in the required_traits and
                          forbidden_traits parameters.
-    :param summaries: dict, keyed by resource provider ID, of ProviderSummary
-                      objects containing usage and trait information for
-                      resource providers involved in the overall request
+    :param rp_ids_by_uuid: dict, keyed by resource provider UUID, of the
+                           internal ID of the resource providers involved in
+                           the overall request
     :param prov_traits: A dict, keyed by internal resource provider ID, of
                         string trait names associated with that provider
     :param required_traits: A map, keyed by trait string name, of required
@@ -3350,10 +3521,7 @@ def _check_traits_for_alloc_request(res_requests, summaries, prov_traits,
     all_prov_ids = []
     all_traits = set()
     for res_req in res_requests:
-        rp_uuid = res_req.resource_provider.uuid
-        for rp_id, summary in summaries.items():
-            if summary.resource_provider.uuid == rp_uuid:
-                break
+        rp_id = rp_ids_by_uuid[res_req.resource_provider.uuid]
         rp_traits = set(prov_traits.get(rp_id, []))
 
         # Check if there are forbidden_traits
@@ -3408,13 +3576,13 @@ def _alloc_candidates_single_provider(ctx, requested_resources, rp_tuples):
     # Grab usage summaries for each provider
     usages = _get_usages_by_provider_tree(ctx, root_ids)
 
-    # Get a dict, keyed by resource provider internal ID, of trait string names
-    # that provider has associated with it
-    prov_traits = _get_traits_by_provider_tree(ctx, root_ids)
+    # Get a dict, keyed by resource provider internal ID, of the tree
+    # structure and trait string names of that provider
+    prov_records = _get_provider_records(ctx, usages)
 
     # Get a dict, keyed by resource provider internal ID, of ProviderSummary
     # objects for all providers
-    summaries = _build_provider_summaries(ctx, usages, prov_traits)
+    summaries = _build_provider_summaries(ctx, usages, prov_records)
 
     # Next, build up a list of allocation requests. These allocation requests
     # are AllocationRequest objects, containing resource provider UUIDs,
@@ -3479,13 +3647,17 @@ def _alloc_candidates_multiple_providers(ctx, requested_resources,
     # Grab usage summaries for each provider in the trees
     usages = _get_usages_by_provider_tree(ctx, root_ids)
 
-    # Get a dict, keyed by resource provider internal ID, of trait string names
-    # that provider has associated with it
-    prov_traits = _get_traits_by_provider_tree(ctx, root_ids)
+    # Get a dict, keyed by resource provider internal ID, of the tree
+    # structure and trait string names of that provider
+    prov_records = _get_provider_records(ctx, usages)
+    prov_traits = {rp_id: record['traits']
+                   for rp_id, record in prov_records.items()}
 
     # Get a dict, keyed by resource provider internal ID, of ProviderSummary
     # objects for all providers
-    summaries = _build_provider_summaries(ctx, usages, prov_traits)
+    summaries = _build_provider_summaries(ctx, usages, prov_records)
+    rp_ids_by_uuid = {summary.resource_provider.uuid: rp_id
+                      for rp_id, summary in summaries.items()}
 
     # Get a dict, keyed by root provider internal ID, of a dict, keyed by
     # resource class internal ID, of lists of AllocationRequestResource objects
@@ -3493,11 +3665,9 @@ def _alloc_candidates_multiple_providers(ctx, requested_resources,
 
     for rp_id, root_id, rc_id in rp_tuples:
         rp_summary = summaries[rp_id]
-        rp_uuid = rp_summary.resource_provider.uuid
         tree_dict[root_id][rc_id].append(
             AllocationRequestResource(
-                ctx, resource_provider=ResourceProvider.get_by_uuid(ctx,
-                                                                    rp_uuid),
+                ctx, resource_provider=rp_summary.resource_provider,
                 resource_class=_RC_CACHE.string_from_id(rc_id),
                 amount=requested_resources[rc_id]))
 
@@ -3524,7 +3694,8 @@ def _alloc_candidates_multiple_providers(ctx, requested_resources,
         # providers in a tree.
         for res_requests in itertools.product(*request_groups):
             all_prov_ids = _check_traits_for_alloc_request(res_requests,
-                summaries, prov_traits, required_traits, forbidden_traits)
+                rp_ids_by_uuid, prov_traits, required_traits,
+                forbidden_traits)
             if (not all_prov_ids) or (all_prov_ids in alloc_prov_ids):
                 # This combination doesn't satisfy trait constraints,
                 # ...or we already have this permutation, which happens
@@ -3539,34 +3710,6 @@ def _alloc_candidates_multiple_providers(ctx, requested_resources,
     return alloc_requests, list(summaries.values())
 
 
-@db_api.placement_context_manager.reader
-def _get_traits_by_provider_tree(ctx, root_ids):
-    """Returns a dict, keyed by provider IDs for all resource providers
-    in all trees indicated in the ``root_ids``, of string trait names
-    associated with that provider.
-
-    :raises: ValueError when root_ids is empty.
-
-    :param ctx: nova.context.RequestContext object
-    :param root_ids: list of root resource provider IDs
-    """
-    if not root_ids:
-        raise ValueError(_("Expected root_ids to be a list of root resource"
-                           "provider internal IDs, but got an empty list."))
-
-    rpt = sa.alias(_RP_TBL, name='rpt')
-    rptt = sa.alias(_RP_TRAIT_TBL, name='rptt')
-    tt = sa.alias(_TRAIT_TBL, name='t')
-    rpt_rptt = sa.join(rpt, rptt, rpt.c.id == rptt.c.resource_provider_id)
-    j = sa.join(rpt_rptt, tt, rptt.c.trait_id == tt.c.id)
-    sel = sa.select([rptt.c.resource_provider_id, tt.c.name]).select_from(j)
-    sel = sel.where(rpt.c.root_provider_id.in_(root_ids))
-    res = collections.defaultdict(list)
-    for r in ctx.session.execute(sel):
-        res[r[0]].append(r[1])
-    return res
-
-
 @db_api.placement_context_manager.reader
 def _trait_ids_from_names(ctx, names):
     """Given a list of string trait names, returns a dict, keyed by those
@@ -3893,7 +4036,7 @@ class AllocationCandidates(base.VersionedObject):
         )
 
     @staticmethod
-    def _get_by_one_request(context, request):
+    def _get_by_one_request(context, request, limit=None):
         """Get allocation candidates for one RequestGroup.
 
         Must be called from within an placement_context_manager.reader
@@ -3901,6 +4044,11 @@ class AllocationCandidates(base.VersionedObject):
 
         :param context: Nova RequestContext.
         :param request: One nova.api.openstack.placement.util.RequestGroup
+        :param limit: An optional integer, N. When provided, the candidates
+                      are only built for a subset of the matching providers
+                      which is large enough to produce N allocation requests
+                      if there are that many. It is up to the caller to
+                      truncate the result to N.
         :return: A tuple of (allocation_requests, provider_summaries)
                  satisfying `request`.
         """
@@ -3956,7 +4104,7 @@ class AllocationCandidates(base.VersionedObject):
                     return [], []
             rp_tuples = _get_trees_matching_all(context, resources,
                 required_trait_map, forbidden_trait_map,
-                sharing_providers, member_of)
+                sharing_providers, member_of, limit=limit)
             return _alloc_candidates_multiple_providers(context, resources,
                 required_trait_map, forbidden_trait_map, rp_tuples)
 
@@ -3970,7 +4118,8 @@ class AllocationCandidates(base.VersionedObject):
         # IDs.
         rp_ids = _get_provider_ids_matching(context, resources,
                                             required_trait_map,
-                                            forbidden_trait_map, member_of)
+                                            forbidden_trait_map, member_of,
+                                            limit=limit)
         return _alloc_candidates_single_provider(context, resources, rp_ids)
 
     @classmethod
@@ -3981,9 +4130,16 @@ class AllocationCandidates(base.VersionedObject):
     @db_api.placement_context_manager.writer
     def _get_by_requests(cls, context, requests, limit=None,
                          group_policy=None):
+        # When there is a single request group, every provider (tree) it
+        # matches yields at least one allocation request, so the limit can be
+        # applied to the providers before building the candidates. With
+        # several groups, the candidates of each group must all be combined
+        # before knowing which ones survive.
+        one_request_limit = limit if len(requests) == 1 else None
         candidates = {}
         for suffix, request in requests.items():
-            alloc_reqs, summaries = cls._get_by_one_request(context, request)
+            alloc_reqs, summaries = cls._get_by_one_request(
+                context, request, limit=one_request_limit)
             if not alloc_reqs:
                 # Shortcut: If any one request resulted in no candidates, the
                 # whole operation is shot.
@@ -4003,10 +4159,9 @@ class AllocationCandidates(base.VersionedObject):
         alloc_request_objs, summary_objs = _merge_candidates(
                 candidates, group_policy=group_policy)
 
-        # Limit the number of allocation request objects. We do this after
-        # creating all of them so that we can do a random slice without
-        # needing to mess with the complex sql above or add additional
-        # columns to the DB.
+        # Limit the number of allocation request objects. With a single
+        # request group the matching providers were already limited above, but
+        # a provider can still yield more than one allocation request.
         if limit and limit <= len(alloc_request_objs):
             if CONF.placement.randomize_allocation_candidates:
                 alloc_request_objs = random.sample(alloc_request_objs, limit)
@@ -4120,3 +4275,32 @@ def reshape(ctx, inventories, allocations):
         # above loop and just do those and skip the rest, since they're already
         # in their final form.
         new_inv_list[0].resource_provider.set_inventory(new_inv_list)
+
+
+@db_api.placement_context_manager.writer
+def set_tree_state(ctx, updates):
+    """Replaces the inventories, traits and/or aggregates of several resource
+    providers, typically all the providers of a tree, in a single
+    transaction.
+
+    :param ctx: `nova.api.openstack.placement.context.RequestContext` object
+                containing the DB transaction context.
+    :param updates: list of (resource_provider, inventories, traits,
+                    aggregates) tuples, where resource_provider is a
+                    `ResourceProvider` object whose generation is the one the
+                    caller expects, inventories an `InventoryList`, traits a
+                    `TraitList` and aggregates a list of aggregate UUIDs. Any
+                    of inventories, traits and aggregates may be None to leave
+                    the provider's current ones untouched.
+    :raises: `exception.ConcurrentUpdateDetected` when any resource provider
+             generation increment fails due to concurrent changes to the same
+             providers. In that case, none of the changes are applied.
+    """
+    for rp, inventories, traits, aggregates in updates:
+        LOG.debug("Setting the state of resource provider %s", rp.uuid)
+        if inventories is not None:
+            rp.set_inventory(inventories)
+        if traits is not None:
+            rp.set_traits(traits)
+        if aggregates is not None:
+            rp.set_aggregates(aggregates, increment_generation=True)
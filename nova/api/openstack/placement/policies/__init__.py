@@ -17,6 +17,7 @@ from nova.api.openstack.placement.policies import allocation
 from nova.api.openstack.placement.policies import allocation_candidate
 from nova.api.openstack.placement.policies import base
 from nova.api.openstack.placement.policies import inventory
+from nova.api.openstack.placement.policies import provider_tree
 from nova.api.openstack.placement.policies import resource_class
 from nova.api.openstack.placement.policies import resource_provider
 from nova.api.openstack.placement.policies import trait
@@ -30,6 +31,7 @@ def list_rules():
         resource_class.list_rules(),
         inventory.list_rules(),
         aggregate.list_rules(),
+        provider_tree.list_rules(),
         usage.list_rules(),
         trait.list_rules(),
         allocation.list_rules(),
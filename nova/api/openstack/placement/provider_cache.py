@@ -0,0 +1,63 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+class ProviderCache(object):
+    """An in-process cache of the tree structure and traits of resource
+    providers.
+
+    Records are keyed by the internal ID of the provider. A record is only
+    returned if the values of its KEY_FIELDS still match the ones of the
+    provider row read by the caller: the generation of a provider is
+    incremented whenever its traits change, and its root and parent provider
+    IDs change when it is parented. Comparing the UUID protects against
+    internal IDs being reused by the database after a provider is deleted.
+
+    Storing and replacing a record is a single dict operation, so the cache
+    does not need any locking: at worst two requests both read the same
+    record from the database and one of them wins.
+    """
+
+    KEY_FIELDS = ('uuid', 'generation', 'root_provider_id',
+                  'parent_provider_id')
+
+    def __init__(self):
+        self._records = {}
+
+    def clear(self):
+        self._records = {}
+
+    def get(self, rp_id, current):
+        """Returns the cached record of the provider with the supplied
+        internal ID, or None if there is none or if it is stale.
+
+        :param rp_id: Internal ID of the resource provider.
+        :param current: A mapping with the current values of KEY_FIELDS for
+                        the provider, e.g. a row of the resource_providers
+                        table.
+        """
+        record = self._records.get(rp_id)
+        if record is None:
+            return None
+        for field in self.KEY_FIELDS:
+            if record[field] != current[field]:
+                return None
+        return record
+
+    def set(self, record):
+        """Caches a provider record, which is a dict with at least the 'id'
+        key and the KEY_FIELDS keys.
+        """
+        self._records[record['id']] = record
+
+    def remove(self, rp_id):
+        self._records.pop(rp_id, None)
@@ -76,3 +76,10 @@ GET_SCHEMA_1_25["properties"]["group_policy"] = {
     "type": "string",
     "enum": ["none", "isolate"],
 }
+
+# Add format parameter.
+GET_SCHEMA_1_30 = copy.deepcopy(GET_SCHEMA_1_25)
+GET_SCHEMA_1_30["properties"]["format"] = {
+    "type": "string",
+    "enum": ["full", "compact"],
+}
@@ -0,0 +1,70 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Provider tree schemas for Placement API."""
+
+import copy
+
+from nova.api.openstack.placement.schemas import inventory
+from nova.api.openstack.placement.schemas import trait
+
+
+PROVIDER_STATE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "resource_provider_generation": {
+            "type": "integer"
+        },
+        "inventories": {
+            "type": "object",
+            "patternProperties": {
+                inventory.RESOURCE_CLASS_IDENTIFIER: copy.deepcopy(
+                    inventory.PUT_INVENTORY_RECORD_SCHEMA),
+            },
+            "additionalProperties": False
+        },
+        "traits": {
+            "type": "array",
+            "items": trait.TRAIT,
+        },
+        "aggregates": {
+            "type": "array",
+            "items": {
+                "type": "string",
+                "format": "uuid"
+            },
+            "uniqueItems": True
+        },
+    },
+    "required": [
+        "resource_provider_generation"
+    ],
+    "additionalProperties": False
+}
+
+
+PUT_PROVIDER_TREE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "resource_providers": {
+            "type": "object",
+            "minProperties": 1,
+            "patternProperties": {
+                "^[0-9a-fA-F-]{36}$": PROVIDER_STATE_SCHEMA,
+            },
+            "additionalProperties": False
+        },
+    },
+    "required": [
+        "resource_providers"
+    ],
+    "additionalProperties": False
+}
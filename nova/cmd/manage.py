@@ -38,6 +38,7 @@ from oslo_log import log as logging
 import oslo_messaging as messaging
 from oslo_utils import encodeutils
 from oslo_utils import importutils
+from oslo_utils import timeutils
 from oslo_utils import uuidutils
 import prettytable
 import six
@@ -48,6 +49,8 @@ from nova.api.openstack.placement import db_api as placement_db
 from nova.api.openstack.placement.objects import consumer as consumer_obj
 from nova.cmd import common as cmd_common
 from nova.compute import api as compute_api
+from nova.compute import rpcapi as compute_rpcapi
+from nova.compute import utils as compute_utils
 import nova.conf
 from nova import config
 from nova import context
@@ -416,6 +419,8 @@ class DbCommands(object):
         consumer_obj.create_incomplete_consumers,
         # Added in Rocky
         instance_mapping_obj.populate_queued_for_delete,
+        # Added in Stein
+        instance_mapping_obj.populate_user_id,
     )
 
     def __init__(self):
@@ -503,13 +508,17 @@ Error: %s""") % six.text_type(e))
                 'max_rows as a batch size for each iteration.'))
     @args('--purge', action='store_true', dest='purge', default=False,
           help='Purge all data from shadow tables after archive completes')
+    @args('--workers', type=int, metavar='<number>', dest='workers',
+          default=1,
+          help='Number of groups of unrelated tables to archive '
+               'concurrently. Defaults to 1.')
     def archive_deleted_rows(self, max_rows=1000, verbose=False,
-                             until_complete=False, purge=False):
+                             until_complete=False, purge=False, workers=1):
         """Move deleted rows from production tables to shadow tables.
 
         Returns 0 if nothing was archived, 1 if some number of rows were
-        archived, 2 if max_rows is invalid, 3 if no connection could be
-        established to the API DB. If automating, this should be
+        archived, 2 if max_rows or workers is invalid, 3 if no connection
+        could be established to the API DB. If automating, this should be
         run continuously while the result is 1, stopping at 0.
         """
         max_rows = int(max_rows)
@@ -520,6 +529,10 @@ Error: %s""") % six.text_type(e))
             print(_('max rows must be <= %(max_value)d') %
                   {'max_value': db.MAX_INT})
             return 2
+        workers = int(workers)
+        if workers < 1:
+            print(_("Must supply a positive value for workers"))
+            return 2
 
         ctxt = context.get_admin_context()
         try:
@@ -538,9 +551,12 @@ Error: %s""") % six.text_type(e))
         deleted_instance_uuids = []
         if until_complete and verbose:
             sys.stdout.write(_('Archiving') + '..')  # noqa
+        timer = timeutils.StopWatch()
+        timer.start()
         while True:
             try:
-                run, deleted_instance_uuids = db.archive_deleted_rows(max_rows)
+                run, deleted_instance_uuids = db.archive_deleted_rows(
+                    max_rows, workers=workers)
             except KeyboardInterrupt:
                 run = {}
                 if until_complete and verbose:
@@ -566,10 +582,17 @@ Error: %s""") % six.text_type(e))
                 break
             if verbose:
                 sys.stdout.write('.')
+        timer.stop()
         if verbose:
             if table_to_rows_archived:
                 self._print_dict(table_to_rows_archived, _('Table'),
                                  dict_value=_('Number of Rows Archived'))
+                total = sum(table_to_rows_archived.values())
+                elapsed = timer.elapsed()
+                print(_('Archived %(rows)d rows in %(seconds).2f seconds '
+                        '(%(rate).2f rows/second)') %
+                      {'rows': total, 'seconds': elapsed,
+                       'rate': total / elapsed if elapsed else total})
             else:
                 print(_('Nothing was archived.'))
 
@@ -1152,6 +1175,7 @@ class CellV2Commands(object):
                 mapping.instance_uuid = instance.uuid
                 mapping.cell_mapping = cell_mapping
                 mapping.project_id = instance.project_id
+                mapping.user_id = instance.user_id
                 mapping.create()
             except db_exc.DBDuplicateEntry:
                 continue
@@ -2255,12 +2279,79 @@ class PlacementCommands(object):
         return return_code
 
 
+class ImageCacheCommands(object):
+    """Commands for managing the image cache of compute hosts."""
+
+    @staticmethod
+    def _find_aggregate(ctxt, aggregate):
+        for agg in compute_api.AggregateAPI().get_aggregate_list(ctxt):
+            if aggregate in (str(agg.id), agg.uuid, agg.name):
+                return agg
+
+    @args('--aggregate', metavar='<aggregate>',
+          help='Name, ID or UUID of a host aggregate whose hosts should '
+               'cache the images.')
+    @args('--host', metavar='<host>', dest='hosts', action='append',
+          help='A compute host which should cache the images. May be '
+               'specified more than once.')
+    @args('image_ids', metavar='<image_id>', nargs='+',
+          help='The ID of an image to cache.')
+    def precache(self, image_ids, aggregate=None, hosts=None):
+        """Downloads images to the image cache of compute hosts
+
+        The images are cached on the hosts of the supplied aggregate and on
+        the hosts given with --host. Up to
+        [DEFAULT]image_precache_host_concurrency hosts are processed at the
+        same time and each host downloads up to
+        [DEFAULT]image_precache_concurrency images at the same time.
+
+        Return codes:
+
+        * 0: All the images were cached, or were already cached, on all hosts
+        * 1: One or more images could not be cached on one or more hosts
+        * 2: No host was specified or the aggregate was not found
+        """
+        ctxt = context.get_admin_context()
+        hosts = list(hosts or [])
+        if aggregate is not None:
+            agg = self._find_aggregate(ctxt, aggregate)
+            if agg is None:
+                print(_('Aggregate %s not found.') % aggregate)
+                return 2
+            hosts.extend(host for host in agg.hosts if host not in hosts)
+        if not hosts:
+            print(_('At least one host or a non-empty aggregate must be '
+                    'specified.'))
+            return 2
+
+        failed = []
+
+        def host_done(host, results):
+            for image_id in image_ids:
+                status = results.get(image_id,
+                                     compute_utils.IMAGE_CACHE_ERROR)
+                print(_('%(host)s: %(image)s: %(status)s') %
+                      {'host': host, 'image': image_id, 'status': status})
+                if status == compute_utils.IMAGE_CACHE_ERROR:
+                    failed.append(host)
+
+        compute_utils.cache_images_on_hosts(
+            ctxt, compute_rpcapi.ComputeAPI(), hosts, image_ids,
+            host_done=host_done)
+        if failed:
+            print(_('Failed to cache images on: %s') %
+                  ', '.join(sorted(set(failed))))
+            return 1
+        return 0
+
+
 CATEGORIES = {
     'api_db': ApiDbCommands,
     'cell': CellCommands,
     'cell_v2': CellV2Commands,
     'db': DbCommands,
     'floating': FloatingIpCommands,
+    'image_cache': ImageCacheCommands,
     'network': NetworkCommands,
     'placement': PlacementCommands
 }
@@ -107,6 +107,7 @@ CINDER_V3_ATTACH_MIN_COMPUTE_VERSION = 24
 MIN_COMPUTE_MULTIATTACH = 27
 MIN_COMPUTE_TRUSTED_CERTS = 31
 MIN_COMPUTE_ABORT_QUEUED_LIVE_MIGRATION = 34
+MIN_COMPUTE_IMAGE_CACHE = 36
 
 # FIXME(danms): Keep a global cache of the cells we find the
 # first time we look. This needs to be refreshed on a timer or
@@ -945,6 +946,7 @@ class API(base.Base):
                 inst_mapping = objects.InstanceMapping(context=context)
                 inst_mapping.instance_uuid = instance_uuid
                 inst_mapping.project_id = context.project_id
+                inst_mapping.user_id = context.user_id
                 inst_mapping.cell_mapping = None
                 inst_mapping.create()
 
@@ -4762,14 +4764,39 @@ class API(base.Base):
 
     def get_instances_host_statuses(self, instance_list):
         host_status_dict = dict()
+        # NOTE: the liveness of the compute services of all the hosts is
+        # checked with a single servicegroup call rather than one per host.
+        services_to_check = dict()
+        for instance in instance_list:
+            if not instance.host or instance.host in host_status_dict:
+                continue
+            try:
+                service = [service for service in instance.services if
+                           service.binary == 'nova-compute'][0]
+            except IndexError:
+                host_status_dict[instance.host] = fields_obj.HostStatus.NONE
+                continue
+            if service.forced_down:
+                host_status = fields_obj.HostStatus.DOWN
+            elif service.disabled:
+                host_status = fields_obj.HostStatus.MAINTENANCE
+            else:
+                host_status = None
+                services_to_check[instance.host] = service
+            host_status_dict[instance.host] = host_status
+
+        if services_to_check:
+            hosts = list(services_to_check)
+            alive = self.servicegroup_api.services_are_up(
+                [services_to_check[host] for host in hosts])
+            for host, is_up in zip(hosts, alive):
+                host_status_dict[host] = ((is_up and fields_obj.HostStatus.UP)
+                                          or fields_obj.HostStatus.UNKNOWN)
+
         host_statuses = dict()
         for instance in instance_list:
             if instance.host:
-                if instance.host not in host_status_dict:
-                    host_status = self.get_instance_host_status(instance)
-                    host_status_dict[instance.host] = host_status
-                else:
-                    host_status = host_status_dict[instance.host]
+                host_status = host_status_dict[instance.host]
             else:
                 host_status = fields_obj.HostStatus.NONE
             host_statuses[instance.uuid] = host_status
@@ -5144,6 +5171,8 @@ class AggregateAPI(base.Base):
     """Sub-set of the Compute Manager API for managing host aggregates."""
     def __init__(self, **kwargs):
         self.compute_rpcapi = compute_rpcapi.ComputeAPI()
+        self.compute_task_api = conductor.ComputeTaskAPI()
+        self.image_api = image.API()
         self.scheduler_client = scheduler_client.SchedulerClient()
         self.placement_client = self.scheduler_client.reportclient
         super(AggregateAPI, self).__init__(**kwargs)
@@ -5168,6 +5197,28 @@ class AggregateAPI(base.Base):
         """Get all the aggregates."""
         return objects.AggregateList.get_all(context)
 
+    def cache_images(self, context, aggregate_id, image_ids):
+        """Asks the compute hosts of an aggregate to download images into
+        their image cache.
+
+        The images are cached asynchronously by nova-conductor.
+
+        :raises: AggregateNotFound if the aggregate does not exist
+        :raises: ImageNotFound if one of the images does not exist
+        :raises: ImageCacheNotYetAvailable if some compute services are too
+                 old to cache images
+        """
+        aggregate = self.get_aggregate(context, aggregate_id)
+        min_compute_version = objects.service.get_minimum_version_all_cells(
+            context, ['nova-compute'])
+        if min_compute_version < MIN_COMPUTE_IMAGE_CACHE:
+            raise exception.ImageCacheNotYetAvailable()
+        for image_id in image_ids:
+            # Make sure that the image exists before asking the compute hosts
+            # to download it.
+            self.image_api.get(context, image_id)
+        self.compute_task_api.cache_images(context, aggregate, image_ids)
+
     def get_aggregates_by_host(self, context, compute_host):
         """Get all the aggregates where the given host is presented."""
         return objects.AggregateList.get_by_host(context, compute_host)
@@ -47,7 +47,8 @@ class InstanceSortContext(multi_cell_list.RecordSortContext):
 class InstanceLister(multi_cell_list.CrossCellLister):
     def __init__(self, sort_keys, sort_dirs, cells=None):
         super(InstanceLister, self).__init__(
-            InstanceSortContext(sort_keys, sort_dirs), cells=cells)
+            InstanceSortContext(sort_keys, sort_dirs), cells=cells,
+            batch_size=CONF.api.instance_list_cells_batch_size)
 
     @property
     def marker_identifier(self):
@@ -116,11 +117,33 @@ def get_instance_objects_sorted(ctx, filters, limit, marker, expected_attrs,
                                               sort_dirs,
                                               cell_mappings=cell_mappings)
 
+    faults = None
     if 'fault' in expected_attrs:
         # We join fault above, so we need to make sure we don't ask
         # make_instance_list to do it again for us
         expected_attrs = copy.copy(expected_attrs)
         expected_attrs.remove('fault')
-    return instance_obj._make_instance_list(ctx, objects.InstanceList(),
-                                            instance_generator,
-                                            expected_attrs)
+        # NOTE: the latest fault of each instance was loaded from its cell
+        # by the query above, so keep it rather than looking it up again
+        # per instance later on.
+        faults = {}
+        instance_generator = _collect_faults(instance_generator, faults)
+    inst_list = instance_obj._make_instance_list(ctx, objects.InstanceList(),
+                                                 instance_generator,
+                                                 expected_attrs)
+    if faults is not None:
+        for inst in inst_list:
+            db_fault = faults.get(inst.uuid)
+            if db_fault is not None:
+                inst.fault = objects.InstanceFault._from_db_object(
+                    ctx, objects.InstanceFault(), db_fault)
+            else:
+                inst.fault = None
+            inst.obj_reset_changes(['fault'])
+    return inst_list
+
+
+def _collect_faults(db_insts, faults):
+    for db_inst in db_insts:
+        faults[db_inst['uuid']] = db_inst.get('fault')
+        yield db_inst
@@ -104,6 +104,10 @@ CONF = nova.conf.CONF
 
 LOG = logging.getLogger(__name__)
 
+# Maximum number of consecutive runs of _heal_instance_info_cache skipped in
+# bulk mode when no stale network info cache is found
+MAX_HEAL_INFO_CACHE_BACKOFF = 8
+
 get_notifier = functools.partial(rpc.get_notifier, service='compute')
 wrap_exception = functools.partial(exception_wrapper.wrap_exception,
                                    get_notifier=get_notifier,
@@ -490,7 +494,7 @@ class ComputeVirtAPI(virtapi.VirtAPI):
 class ComputeManager(manager.Manager):
     """Manages the running instances from creation to destruction."""
 
-    target = messaging.Target(version='5.0')
+    target = messaging.Target(version='5.1')
 
     def __init__(self, compute_driver=None, *args, **kwargs):
         """Load configuration options and connect to the hypervisor."""
@@ -516,6 +520,10 @@ class ComputeManager(manager.Manager):
         self._sync_power_pool = eventlet.GreenPool(
             size=CONF.sync_power_state_pool_size)
         self._syncs_in_progress = {}
+        # Number of runs of _heal_instance_info_cache to skip, and to skip
+        # after the next run if it finds no stale cache, in bulk mode
+        self._heal_info_cache_skips = 0
+        self._heal_info_cache_backoff = 0
         self.send_instance_updates = (
             CONF.filter_scheduler.track_instance_changes)
         if CONF.max_concurrent_builds != 0:
@@ -523,6 +531,29 @@ class ComputeManager(manager.Manager):
                 CONF.max_concurrent_builds)
         else:
             self._build_semaphore = compute_utils.UnlimitedSemaphore()
+        # The phases of the builds allowed by _build_semaphore can be limited
+        # separately.
+        self._network_semaphore = compute_utils.BuildPhaseSemaphore(
+            'network allocation', CONF.max_concurrent_network_allocations)
+        self._block_device_semaphore = compute_utils.BuildPhaseSemaphore(
+            'block device setup', CONF.max_concurrent_block_device_setups)
+        self._spawn_semaphore = compute_utils.BuildPhaseSemaphore(
+            'spawn', CONF.max_concurrent_spawns)
+        phase_limits = (CONF.max_concurrent_network_allocations +
+                        CONF.max_concurrent_block_device_setups +
+                        CONF.max_concurrent_spawns)
+        if phase_limits and 0 < CONF.max_concurrent_builds < phase_limits:
+            # NOTE: The phases only run within the builds allowed by
+            # max_concurrent_builds, so the phase limits can only make builds
+            # overlap if it allows at least as many builds.
+            LOG.warning('The build phase limits allow up to %(phases)d '
+                        'builds in their phases at the same time, but '
+                        'max_concurrent_builds only allows %(builds)d builds. '
+                        'Raise max_concurrent_builds to at least %(phases)d, '
+                        'or set it to 0, so that builds in different phases '
+                        'can overlap.',
+                        {'phases': phase_limits,
+                         'builds': CONF.max_concurrent_builds})
         if max(CONF.max_concurrent_live_migrations, 0) != 0:
             self._live_migration_executor = futures.ThreadPoolExecutor(
                 max_workers=CONF.max_concurrent_live_migrations)
@@ -1476,12 +1507,13 @@ class ComputeManager(manager.Manager):
         bind_host_id = self.driver.network_binding_host_id(context, instance)
         for attempt in range(1, attempts + 1):
             try:
-                nwinfo = self.network_api.allocate_for_instance(
-                        context, instance, vpn=is_vpn,
-                        requested_networks=requested_networks,
-                        macs=macs,
-                        security_groups=security_groups,
-                        bind_host_id=bind_host_id)
+                with self._network_semaphore:
+                    nwinfo = self.network_api.allocate_for_instance(
+                            context, instance, vpn=is_vpn,
+                            requested_networks=requested_networks,
+                            macs=macs,
+                            security_groups=security_groups,
+                            bind_host_id=bind_host_id)
                 LOG.debug('Instance network_info: |%s|', nwinfo,
                           instance=instance)
                 instance.system_metadata['network_allocated'] = 'True'
@@ -1775,16 +1807,16 @@ class ComputeManager(manager.Manager):
 
         return block_device_info
 
-    def _build_failed(self):
+    def _build_failed(self, node):
         if CONF.compute.consecutive_build_service_disable_threshold:
             rt = self._get_resource_tracker()
             # NOTE(danms): Update our counter, but wait for the next
             # update_available_resource() periodic to flush it to the DB
-            rt.stats.build_failed()
+            rt.build_failed(node)
 
-    def _build_succeeded(self):
+    def _build_succeeded(self, node):
         rt = self._get_resource_tracker()
-        rt.stats.build_succeeded()
+        rt.build_succeeded(node)
 
     @wrap_exception()
     @reverts_task_state
@@ -1832,11 +1864,15 @@ class ComputeManager(manager.Manager):
                         self._delete_allocation_for_instance(context,
                                                              instance.uuid)
 
+                    # NOTE: The build stats are tracked per node, so count
+                    # the result against the node that the build defaulted
+                    # to when the caller did not pass one.
+                    nodename = node or self._get_nodename(instance)
                     if result in (build_results.FAILED,
                                   build_results.RESCHEDULED):
-                        self._build_failed()
+                        self._build_failed(nodename)
                     else:
-                        self._build_succeeded()
+                        self._build_succeeded(nodename)
 
         # NOTE(danms): We spawn here to return the RPC worker thread back to
         # the pool. Since what follows could take a really long time, we don't
@@ -2104,7 +2140,8 @@ class ComputeManager(manager.Manager):
                     allocs = resources['allocations']
                     LOG.debug('Start spawning the instance on the hypervisor.',
                               instance=instance)
-                    with timeutils.StopWatch() as timer:
+                    with self._spawn_semaphore, \
+                            timeutils.StopWatch() as timer:
                         self.driver.spawn(context, instance, image_meta,
                                           injected_files, admin_password,
                                           allocs, network_info=network_info,
@@ -2295,8 +2332,9 @@ class ComputeManager(manager.Manager):
             instance.task_state = task_states.BLOCK_DEVICE_MAPPING
             instance.save()
 
-            block_device_info = self._prep_block_device(context, instance,
-                    block_device_mapping)
+            with self._block_device_semaphore:
+                block_device_info = self._prep_block_device(context, instance,
+                        block_device_mapping)
             resources['block_device_info'] = block_device_info
         except (exception.InstanceNotFound,
                 exception.UnexpectedDeletingTaskStateError):
@@ -4744,6 +4782,40 @@ class ComputeManager(manager.Manager):
         """Returns the result of calling "uptime" on the target host."""
         return self.driver.get_host_uptime()
 
+    @wrap_exception()
+    def cache_images(self, context, image_ids):
+        """Downloads images into the image cache of the virt driver.
+
+        At most CONF.image_precache_concurrency images are downloaded at once.
+
+        :param image_ids: The IDs of the images to cache
+        :returns: A dict, keyed by image ID, of the result of caching each
+                  image, which is one of the compute_utils.IMAGE_CACHE_*
+                  constants.
+        """
+        results = {}
+
+        def _cache_image(image_id):
+            try:
+                if self.driver.cache_image(context, image_id):
+                    results[image_id] = compute_utils.IMAGE_CACHE_DOWNLOADED
+                else:
+                    results[image_id] = compute_utils.IMAGE_CACHE_EXISTING
+            except NotImplementedError:
+                results[image_id] = compute_utils.IMAGE_CACHE_UNSUPPORTED
+            except Exception:
+                LOG.exception('Failed to cache image %(image_id)s',
+                              {'image_id': image_id})
+                results[image_id] = compute_utils.IMAGE_CACHE_ERROR
+
+        pool = eventlet.GreenPool(size=CONF.image_precache_concurrency)
+        for image_id in image_ids:
+            pool.spawn_n(_cache_image, image_id)
+        pool.waitall()
+        LOG.info('Cached %(count)d images: %(results)s',
+                 {'count': len(image_ids), 'results': results})
+        return results
+
     @wrap_exception()
     @wrap_instance_fault
     def get_diagnostics(self, context, instance):
@@ -7009,6 +7081,10 @@ class ComputeManager(manager.Manager):
         if not heal_interval:
             return
 
+        if (CONF.heal_instance_info_cache_bulk and
+                self._heal_instance_info_caches_bulk(context)):
+            return
+
         instance_uuids = getattr(self, '_instance_uuids_to_heal', [])
         instance = None
 
@@ -7091,6 +7167,67 @@ class ComputeManager(manager.Manager):
             LOG.debug("Didn't find any instances for network info cache "
                       "update.")
 
+    def _heal_instance_info_caches_bulk(self, context):
+        """Refresh the network info cache of the instances of this host whose
+        cache does not match their ports anymore.
+
+        The caches of all the instances are compared to their ports at once,
+        and the runs following one which found no stale cache are skipped,
+        doubling the number of skipped runs up to
+        MAX_HEAL_INFO_CACHE_BACKOFF.
+
+        :returns: False if the network API cannot compare the caches in bulk,
+                  in which case a single instance should be healed instead.
+        """
+        if self._heal_info_cache_skips > 0:
+            self._heal_info_cache_skips -= 1
+            return True
+
+        LOG.debug('Starting bulk heal of instance info caches')
+        db_instances = objects.InstanceList.get_by_host(
+            context, self.host,
+            expected_attrs=['system_metadata', 'info_cache', 'flavor'],
+            use_slave=True)
+        # We don't want to refresh the cache for instances which are
+        # building or deleting.
+        instances = [inst for inst in db_instances
+                     if inst.vm_state != vm_states.BUILDING and
+                     inst.task_state != task_states.DELETING]
+        try:
+            stale_instances = self.network_api.get_stale_info_cache_instances(
+                context, instances)
+        except NotImplementedError:
+            return False
+        except Exception:
+            LOG.error('An error occurred while checking the network info '
+                      'caches.', exc_info=True)
+            return True
+
+        for instance in stale_instances:
+            try:
+                self.network_api.get_instance_nw_info(context, instance)
+                LOG.debug('Updated the network info_cache for instance',
+                          instance=instance)
+            except (exception.InstanceNotFound,
+                    exception.InstanceInfoCacheNotFound):
+                LOG.debug('Instance or InstanceInfoCache no longer exists. '
+                          'Unable to refresh', instance=instance)
+            except Exception:
+                LOG.error('An error occurred while refreshing the network '
+                          'cache.', instance=instance, exc_info=True)
+
+        LOG.debug('Refreshed %(stale)d of %(total)d instance network info '
+                  'caches', {'stale': len(stale_instances),
+                             'total': len(instances)})
+        if stale_instances:
+            self._heal_info_cache_backoff = 0
+        else:
+            self._heal_info_cache_backoff = min(
+                max(1, self._heal_info_cache_backoff * 2),
+                MAX_HEAL_INFO_CACHE_BACKOFF)
+        self._heal_info_cache_skips = self._heal_info_cache_backoff
+        return True
+
     @periodic_task.periodic_task
     def _poll_rebooting_instances(self, context):
         if CONF.reboot_timeout > 0:
@@ -7446,12 +7583,24 @@ class ComputeManager(manager.Manager):
         number of virtual machines known by the database, we proceed in a lazy
         loop, one database record at a time, checking if the hypervisor has the
         same power state as is in the database.
+
+        If the driver can read the power state of all the instances at once,
+        it is only asked for the state of an instance when that state differs
+        from the one in the database.
         """
         db_instances = objects.InstanceList.get_by_host(context, self.host,
                                                         expected_attrs=[],
                                                         use_slave=True)
 
-        num_vm_instances = self.driver.get_num_instances()
+        try:
+            vm_power_states = self.driver.get_power_states()
+        except NotImplementedError:
+            vm_power_states = None
+
+        if vm_power_states is not None:
+            num_vm_instances = len(vm_power_states)
+        else:
+            num_vm_instances = self.driver.get_num_instances()
         num_db_instances = len(db_instances)
 
         if num_vm_instances != num_db_instances:
@@ -7468,7 +7617,8 @@ class ComputeManager(manager.Manager):
             #                They are set (in stop_instance) and read, in sync.
             @utils.synchronized(db_instance.uuid)
             def query_driver_power_state_and_sync():
-                self._query_driver_power_state_and_sync(context, db_instance)
+                self._query_driver_power_state_and_sync(
+                    context, db_instance, vm_power_states=vm_power_states)
 
             try:
                 query_driver_power_state_and_sync()
@@ -7490,18 +7640,30 @@ class ComputeManager(manager.Manager):
                 self._syncs_in_progress[uuid] = True
                 self._sync_power_pool.spawn_n(_sync, db_instance)
 
-    def _query_driver_power_state_and_sync(self, context, db_instance):
+    def _query_driver_power_state_and_sync(self, context, db_instance,
+                                           vm_power_states=None):
         if db_instance.task_state is not None:
             LOG.info("During sync_power_state the instance has a "
                      "pending task (%(task)s). Skip.",
                      {'task': db_instance.task_state}, instance=db_instance)
             return
         # No pending tasks. Now try to figure out the real vm_power_state.
-        try:
-            vm_instance = self.driver.get_info(db_instance)
-            vm_power_state = vm_instance.state
-        except exception.InstanceNotFound:
-            vm_power_state = power_state.NOSTATE
+        vm_power_state = None
+        if vm_power_states is not None:
+            vm_power_state = vm_power_states.get(db_instance.uuid,
+                                                 power_state.NOSTATE)
+            if vm_power_state != db_instance.power_state:
+                # NOTE: The power states of all the instances were read
+                # before the lock of this instance was taken, so the state
+                # may have changed since. Ask the driver again before acting
+                # upon a difference with the database.
+                vm_power_state = None
+        if vm_power_state is None:
+            try:
+                vm_instance = self.driver.get_info(db_instance)
+                vm_power_state = vm_instance.state
+            except exception.InstanceNotFound:
+                vm_power_state = power_state.NOSTATE
         # Note(maoy): the above get_info call might take a long time,
         # for example, because of a broken libvirt driver.
         try:
@@ -7735,6 +7897,14 @@ class ComputeManager(manager.Manager):
             LOG.exception("Error updating resources for node %(node)s.",
                           {'node': nodename})
 
+    def _get_build_phase_stats(self):
+        phase_stats = {}
+        for semaphore in (self._network_semaphore,
+                          self._block_device_semaphore,
+                          self._spawn_semaphore):
+            phase_stats.update(semaphore.get_stats())
+        return phase_stats
+
     @periodic_task.periodic_task(spacing=CONF.update_resources_interval)
     def update_available_resource(self, context, startup=False):
         """See driver.get_available_resource()
@@ -7756,8 +7926,40 @@ class ComputeManager(manager.Manager):
             LOG.warning("Virt driver is not ready.")
             return
 
-        for nodename in nodenames:
-            self._update_available_resource_for_node(context, nodename)
+        self._get_resource_tracker().set_build_phase_stats(
+            self._get_build_phase_stats())
+        timer = timeutils.StopWatch()
+        timer.start()
+        concurrency = min(CONF.update_resources_concurrency, len(nodenames))
+        if concurrency > 1:
+            # NOTE: The resource tracker locks each node separately in that
+            # case, and _update_available_resource_for_node() handles the
+            # errors of each node, so they can be updated in parallel.
+            semaphore = eventlet.semaphore.Semaphore(concurrency)
+
+            def _update_node(nodename):
+                with semaphore:
+                    self._update_available_resource_for_node(context,
+                                                             nodename)
+
+            threads = [utils.spawn(_update_node, nodename)
+                       for nodename in nodenames]
+            for thread in threads:
+                thread.wait()
+        else:
+            for nodename in nodenames:
+                self._update_available_resource_for_node(context, nodename)
+        elapsed = timer.elapsed()
+        LOG.debug("Updated the resources of %(count)d node(s) in "
+                  "%(elapsed).2f seconds.",
+                  {'count': len(nodenames), 'elapsed': elapsed})
+        if 0 < CONF.update_resources_interval < elapsed:
+            LOG.warning("Updating the resources of %(count)d node(s) took "
+                        "%(elapsed).2f seconds, longer than the "
+                        "update_resources_interval of %(interval)d seconds. "
+                        "Consider raising update_resources_concurrency.",
+                        {'count': len(nodenames), 'elapsed': elapsed,
+                         'interval': CONF.update_resources_interval})
 
         # Delete orphan compute node not reported by driver but still in db
         for cn in compute_nodes_in_db:
@@ -13,6 +13,7 @@
 import copy
 
 from nova.compute import multi_cell_list
+import nova.conf
 from nova import context
 from nova.db import api as db
 from nova import exception
@@ -20,6 +21,9 @@ from nova import objects
 from nova.objects import base
 
 
+CONF = nova.conf.CONF
+
+
 class MigrationSortContext(multi_cell_list.RecordSortContext):
     def __init__(self, sort_keys, sort_dirs):
         if not sort_keys:
@@ -42,7 +46,8 @@ class MigrationSortContext(multi_cell_list.RecordSortContext):
 class MigrationLister(multi_cell_list.CrossCellLister):
     def __init__(self, sort_keys, sort_dirs):
         super(MigrationLister, self).__init__(
-            MigrationSortContext(sort_keys, sort_dirs))
+            MigrationSortContext(sort_keys, sort_dirs),
+            batch_size=CONF.api.instance_list_cells_batch_size)
 
     @property
     def marker_identifier(self):
@@ -53,8 +58,14 @@ class MigrationLister(multi_cell_list.CrossCellLister):
 
         This returns the marker migration from the cell in which it lives
         """
-        results = context.scatter_gather_skip_cell0(
-            ctx, db.migration_get_by_uuid, marker)
+        # The marker only lives in one cell, so stop waiting for the other
+        # cells once it is found.
+        context.load_cells()
+        cell_mappings = [cell for cell in context.CELLS
+                         if not cell.is_cell0()]
+        results = context.scatter_gather_first_cells(
+            ctx, cell_mappings, context.CELL_TIMEOUT, 1,
+            db.migration_get_by_uuid, marker)
         db_migration = None
         for result in results.values():
             if result not in (context.did_not_respond_sentinel,
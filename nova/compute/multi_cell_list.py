@@ -76,10 +76,15 @@ class CrossCellLister(object):
     method. You should implement this if you need to efficiently list
     your data type from cell databases.
 
+    If a batch_size is provided, the records of each cell are fetched in
+    windows, starting with batch_size records and doubling in size every
+    time the merge needs more records from that cell, instead of fetching
+    the whole limit from every cell up front.
     """
-    def __init__(self, sort_ctx, cells=None):
+    def __init__(self, sort_ctx, cells=None, batch_size=None):
         self.sort_ctx = sort_ctx
         self.cells = cells
+        self.batch_size = batch_size
 
     @property
     @abc.abstractmethod
@@ -142,6 +147,45 @@ class CrossCellLister(object):
         """
         pass
 
+    def _get_windows(self, ctx, filters, limit, marker, window, records,
+                     **kwargs):
+        """Generate the records of a cell, fetching them in windows.
+
+        The next window is only fetched once the records of the previous one
+        have been consumed, which only happens if the records of this cell
+        sort ahead of the ones of the other cells.
+
+        :param ctx: A RequestContext targeted at the cell
+        :param filters: A dict of column=filter items
+        :param limit: The maximum number of records to generate
+        :param marker: The marker identifier used to fetch records
+        :param window: The size of the window records were fetched with
+        :param records: The records of the first window
+        """
+        while True:
+            for record in records:
+                yield record
+            limit -= len(records)
+            if len(records) < window or limit <= 0:
+                # Either the cell has no more records or the merge can not
+                # use any more of them.
+                return
+            marker = records[-1][self.marker_identifier]
+            window = min(window * 2, limit)
+            try:
+                records = list(self.get_by_filters(ctx, filters,
+                                                   limit=window,
+                                                   marker=marker,
+                                                   **kwargs))
+            except Exception:
+                # NOTE: the records generated so far have already been
+                # merged, so treat the cell like one which did not respond
+                # and stop generating its records.
+                LOG.exception('Error fetching more records from a cell after '
+                              'marker %s, skipping its remaining records.',
+                              marker)
+                return
+
     def get_records_sorted(self, ctx, filters, limit, marker, **kwargs):
         """Get a cross-cell list of records matching filters.
 
@@ -159,8 +203,10 @@ class CrossCellLister(object):
 
         NOTE: Since we do these in parallel, a nonzero limit will be passed
         to each database query, although the limit will be enforced in the
-        output of this function. Meaning, we will still query $limit from each
-        database, but only return $limit total results.
+        output of this function. Without a batch_size, we will still query
+        $limit from each database, but only return $limit total results. With
+        a batch_size, only the first window of each cell is queried in
+        parallel and later windows are queried as the merge consumes them.
 
         """
 
@@ -201,9 +247,9 @@ class CrossCellLister(object):
             marker_id = self.marker_identifier
 
             if marker:
-                # FIXME(danms): If we knew which cell we were in here, we could
-                # avoid looking up the marker again. But, we don't currently.
-
+                # NOTE: the local marker is only looked up once per cell,
+                # later windows of the cell are fetched after the last record
+                # of the previous window.
                 local_marker = self.get_marker_by_values(ctx,
                                                          global_marker_values)
                 if local_marker:
@@ -239,10 +285,27 @@ class CrossCellLister(object):
                     # full unpaginated set for our cell.
                     return []
 
-            main_query_result = self.get_by_filters(
-                ctx, filters,
-                limit=limit, marker=local_marker,
-                **kwargs)
+            if not limit or not self.batch_size:
+                main_query_result = self.get_by_filters(
+                    ctx, filters,
+                    limit=limit, marker=local_marker,
+                    **kwargs)
+            else:
+                # The marker prefix counts against the limit of the cell.
+                cell_limit = limit - len(local_marker_prefix)
+                window = min(self.batch_size, cell_limit)
+                records = []
+                if window > 0:
+                    records = list(self.get_by_filters(
+                        ctx, filters,
+                        limit=window, marker=local_marker,
+                        **kwargs))
+                # NOTE: ctx stays targeted at this cell after the
+                # scatter_gather routine returns, so the later windows are
+                # fetched from the same cell by the caller's thread.
+                main_query_result = self._get_windows(
+                    ctx, filters, cell_limit, local_marker, window, records,
+                    **kwargs)
 
             return (RecordWrapper(self.sort_ctx, inst) for inst in
                     itertools.chain(local_marker_prefix, main_query_result))
@@ -266,7 +329,7 @@ class CrossCellLister(object):
                 results.pop(cell_uuid)
 
         # If a limit was provided, it was passed to the per-cell query
-        # routines.  That means we have NUM_CELLS * limit items across
+        # routines.  That means we have up to NUM_CELLS * limit items across
         # results. So, we need to consume from that limit below and
         # stop returning results.
         limit = limit or 0
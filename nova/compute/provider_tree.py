@@ -30,6 +30,8 @@ from nova.i18n import _
 
 LOG = logging.getLogger(__name__)
 _LOCK_NAME = 'provider-tree-lock'
+# The parts of a provider which can be individually flushed to placement.
+_DIRTY_FIELDS = ('inventory', 'traits', 'aggregates')
 
 # Point-in-time representation of a resource provider in the tree.
 # Note that, whereas namedtuple enforces read-only-ness of instances as a
@@ -64,6 +66,10 @@ class _Provider(object):
         self.traits = set()
         # Set of aggregate UUIDs
         self.aggregates = set()
+        # Set of the _DIRTY_FIELDS which changed since the provider was last
+        # marked clean. A new provider has never been flushed to placement,
+        # so everything is dirty.
+        self.dirty = set(_DIRTY_FIELDS)
 
     @classmethod
     def from_dict(cls, pdict):
@@ -95,6 +101,14 @@ class _Provider(object):
             ret.extend(child.get_provider_uuids())
         return ret
 
+    def mark_clean(self):
+        """Clears the dirty state of this provider and all its
+        descendants.
+        """
+        self.dirty.clear()
+        for child in self.children.values():
+            child.mark_clean()
+
     def find(self, search):
         if self.name == search or self.uuid == search:
             return self
@@ -167,6 +181,7 @@ class _Provider(object):
         self._update_generation(generation)
         if self.has_inventory_changed(inventory):
             self.inventory = copy.deepcopy(inventory)
+            self.dirty.add('inventory')
             return True
         return False
 
@@ -182,6 +197,7 @@ class _Provider(object):
         self._update_generation(generation)
         if self.have_traits_changed(new):
             self.traits = set(new)  # create a copy of the new traits
+            self.dirty.add('traits')
             return True
         return False
 
@@ -207,6 +223,7 @@ class _Provider(object):
         self._update_generation(generation)
         if self.have_aggregates_changed(new):
             self.aggregates = set(new)  # create a copy of the new aggregates
+            self.dirty.add('aggregates')
             return True
         return False
 
@@ -397,6 +414,28 @@ class ProviderTree(object):
         with self.lock:
             return self._find_with_lock(name_or_uuid).data()
 
+    def mark_clean(self):
+        """Marks all the providers in the tree as clean, i.e. in sync with
+        placement. From now on, get_dirty_fields() only reports the parts of
+        a provider which are modified after this call.
+        """
+        with self.lock:
+            for root in self.roots:
+                root.mark_clean()
+
+    def get_dirty_fields(self, name_or_uuid):
+        """Returns the set of fields (among 'inventory', 'traits' and
+        'aggregates') of the specified provider which changed since the tree
+        was last marked clean. All the fields of a provider added after that
+        are dirty.
+
+        :param name_or_uuid: Either name or UUID of the resource provider.
+        :raises: ValueError if a provider with name_or_uuid was not found in
+                 the tree.
+        """
+        with self.lock:
+            return set(self._find_with_lock(name_or_uuid).dirty)
+
     def exists(self, name_or_uuid):
         """Given either a name or a UUID, return True if the tree contains the
         provider, False otherwise.
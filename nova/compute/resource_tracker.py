@@ -20,6 +20,9 @@ model.
 """
 import collections
 import copy
+import functools
+import inspect
+
 import retrying
 
 from oslo_log import log as logging
@@ -50,6 +53,45 @@ CONF = nova.conf.CONF
 
 LOG = logging.getLogger(__name__)
 COMPUTE_RESOURCE_SEMAPHORE = "compute_resources"
+# Fields of the instances loaded when auditing the resources of a node.
+_AUDIT_INSTANCE_ATTRS = ['system_metadata', 'numa_topology', 'flavor',
+                         'migration_context']
+
+
+def _synchronized_node(f):
+    """Serializes the calls to a ResourceTracker method which changes the
+    resource usage of a compute node.
+
+    Calls are serialized on COMPUTE_RESOURCE_SEMAPHORE, unless the tracker
+    locks its compute nodes separately, in which case they are serialized on a
+    lock specific to the node passed in the nodename argument of the method,
+    or in the hypervisor_hostname of its resources argument.
+    """
+    @functools.wraps(f)
+    def wrapper(self, *args, **kwargs):
+        lock_name = COMPUTE_RESOURCE_SEMAPHORE
+        if self.lock_per_node:
+            call_args = inspect.getcallargs(f, self, *args, **kwargs)
+            nodename = call_args.get('nodename')
+            if nodename is None:
+                nodename = call_args['resources']['hypervisor_hostname']
+            lock_name = '%s-%s' % (COMPUTE_RESOURCE_SEMAPHORE, nodename)
+        return utils.synchronized(lock_name)(f)(self, *args, **kwargs)
+    return wrapper
+
+
+class _NodeAudit(object):
+    """The state of a compute node read by update_available_resource before
+    locking the node, along with the instances and migrations changed by
+    claims on the node since the read started.
+    """
+
+    def __init__(self):
+        self.instances = []
+        self.migrations = []
+        self.instance_usage = {}
+        self.changed_instances = set()
+        self.migrations_changed = False
 
 
 def _instance_in_resize_state(instance):
@@ -137,9 +179,20 @@ class ResourceTracker(object):
         self.pci_tracker = None
         # Dict of objects.ComputeNode objects, keyed by nodename
         self.compute_nodes = {}
-        self.stats = stats.Stats()
+        # Dict of nova.compute.stats.Stats objects, keyed by nodename
+        self.stats = collections.defaultdict(stats.Stats)
+        # Stats of the phases of the builds of the compute service, reported
+        # with the stats of each of its nodes.
+        self.build_phase_stats = {}
         self.tracked_instances = {}
         self.tracked_migrations = {}
+        # NOTE: When nodes are updated concurrently, the usage of each of them
+        # is changed under its own lock rather than under
+        # COMPUTE_RESOURCE_SEMAPHORE.
+        self.lock_per_node = CONF.update_resources_concurrency > 1
+        # Dict of _NodeAudit objects, keyed by the nodename of the nodes being
+        # audited by update_available_resource.
+        self._audits = {}
         monitor_handler = monitors.MonitorHandler(self)
         self.monitors = monitor_handler.monitors
         self.old_resources = collections.defaultdict(objects.ComputeNode)
@@ -149,13 +202,39 @@ class ResourceTracker(object):
         self.cpu_allocation_ratio = CONF.cpu_allocation_ratio
         self.disk_allocation_ratio = CONF.disk_allocation_ratio
 
+    def build_failed(self, nodename):
+        """Increments the failed_builds stats for the given node."""
+        self.stats[nodename].build_failed()
+
+    def build_succeeded(self, nodename):
+        """Resets the failed_builds stats for the given node."""
+        self.stats[nodename].build_succeeded()
+
+    def set_build_phase_stats(self, phase_stats):
+        """Sets the stats of the phases of the builds, which are reported
+        with the stats of the nodes on their next update.
+        """
+        self.build_phase_stats = phase_stats
+
     def get_node_uuid(self, nodename):
         try:
             return self.compute_nodes[nodename].uuid
         except KeyError:
             raise exception.ComputeHostNotFound(host=nodename)
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    def _record_change(self, nodename, instance_uuid, migrations=False):
+        """Records that the resource usage of an instance is being changed on
+        a node, so that a concurrent audit of the node does not use a stale
+        view of the instance or of the migrations of the node.
+
+        This must be called while holding the lock of the node.
+        """
+        audit = self._audits.get(nodename)
+        if audit is not None:
+            audit.changed_instances.add(instance_uuid)
+            audit.migrations_changed |= migrations
+
+    @_synchronized_node
     def instance_claim(self, context, instance, nodename, limits=None):
         """Indicate that some resources are needed for an upcoming compute
         instance build operation.
@@ -173,6 +252,7 @@ class ResourceTracker(object):
                   be used to revert the resource usage if an error occurs
                   during the instance build.
         """
+        self._record_change(nodename, instance.uuid)
         if self.disabled(nodename):
             # instance_claim() was called before update_available_resource()
             # (which ensures that a compute node exists for nodename). We
@@ -237,7 +317,7 @@ class ResourceTracker(object):
 
         return claim
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    @_synchronized_node
     def rebuild_claim(self, context, instance, nodename, limits=None,
                       image_meta=None, migration=None):
         """Create a claim for a rebuild operation."""
@@ -246,7 +326,7 @@ class ResourceTracker(object):
                                 migration, move_type='evacuation',
                                 limits=limits, image_meta=image_meta)
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    @_synchronized_node
     def resize_claim(self, context, instance, instance_type, nodename,
                      migration, image_meta=None, limits=None):
         """Create a claim for a resize or cold-migration move."""
@@ -276,6 +356,7 @@ class ResourceTracker(object):
         should be turned into finalize  a resource claim or free
         resources after the compute operation is finished.
         """
+        self._record_change(nodename, instance.uuid, migrations=True)
         image_meta = image_meta or {}
         if migration:
             self._claim_existing_migration(migration, nodename)
@@ -415,9 +496,10 @@ class ResourceTracker(object):
         instance.node = None
         instance.save()
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    @_synchronized_node
     def abort_instance_claim(self, context, instance, nodename):
         """Remove usage from the given instance."""
+        self._record_change(nodename, instance.uuid)
         self._update_usage_from_instance(context, instance, nodename,
                                          is_removed=True)
 
@@ -438,11 +520,12 @@ class ResourceTracker(object):
                 dev_pools_obj = self.pci_tracker.stats.to_device_pools_obj()
                 self.compute_nodes[nodename].pci_device_pools = dev_pools_obj
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    @_synchronized_node
     def drop_move_claim(self, context, instance, nodename,
                         instance_type=None, prefix='new_'):
         # Remove usage for an incoming/outgoing migration on the destination
         # node.
+        self._record_change(nodename, instance['uuid'], migrations=True)
         if instance['uuid'] in self.tracked_migrations:
             migration = self.tracked_migrations.pop(instance['uuid'])
 
@@ -473,7 +556,7 @@ class ResourceTracker(object):
             ctxt = context.elevated()
             self._update(ctxt, self.compute_nodes[nodename])
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    @_synchronized_node
     def update_usage(self, context, instance, nodename):
         """Update the resource usage and stats after a change in an
         instance
@@ -482,6 +565,7 @@ class ResourceTracker(object):
             return
 
         uuid = instance['uuid']
+        self._record_change(nodename, uuid)
 
         # don't update usage for this instance unless it submitted a resource
         # claim first:
@@ -609,11 +693,13 @@ class ResourceTracker(object):
         # as that is not part of resources
         # TODO(danms): Stop doing this when we get a column to store this
         # directly
-        prev_failed_builds = self.stats.get('failed_builds', 0)
-        self.stats.clear()
-        self.stats['failed_builds'] = prev_failed_builds
-        self.stats.digest_stats(resources.get('stats'))
-        compute_node.stats = copy.deepcopy(self.stats)
+        node_stats = self.stats[resources['hypervisor_hostname']]
+        prev_failed_builds = node_stats.get('failed_builds', 0)
+        node_stats.clear()
+        node_stats['failed_builds'] = prev_failed_builds
+        node_stats.update(self.build_phase_stats)
+        node_stats.digest_stats(resources.get('stats'))
+        compute_node.stats = copy.deepcopy(node_stats)
 
         # update the allocation ratios for the related ComputeNode object
         compute_node.ram_allocation_ratio = self.ram_allocation_ratio
@@ -686,7 +772,72 @@ class ResourceTracker(object):
 
         self._report_hypervisor_resource_view(resources)
 
-        self._update_available_resource(context, resources)
+        if self.disabled(nodename):
+            # NOTE: The compute node is created by _update_available_resource
+            # the first time the node is audited, read its state there.
+            self._update_available_resource(context, resources)
+            return
+
+        # NOTE: The instances and migrations of the node and the usage
+        # reported by the hypervisor are read without holding the lock of the
+        # node, so that claims are not blocked by these reads. The claims
+        # made in the meantime are recorded in the audit and reconciled by
+        # _update_available_resource.
+        audit = self._start_audit(nodename)
+        try:
+            audit.instances = self._get_node_instances(context, nodename)
+            audit.migrations = self._get_node_migrations(context, nodename)
+            audit.instance_usage = self.driver.get_per_instance_usage()
+            self._update_available_resource(context, resources, audit=audit)
+        finally:
+            self._audits.pop(nodename, None)
+
+    @_synchronized_node
+    def _start_audit(self, nodename):
+        """Starts recording the claims made on a node.
+
+        The audit is registered while holding the lock of the node so that
+        the changes of any claim in progress are either committed to the
+        database before the state of the node is read, or recorded.
+        """
+        audit = _NodeAudit()
+        self._audits[nodename] = audit
+        return audit
+
+    def _get_node_instances(self, context, nodename):
+        return objects.InstanceList.get_by_host_and_node(
+            context, self.host, nodename,
+            expected_attrs=_AUDIT_INSTANCE_ATTRS)
+
+    def _get_node_migrations(self, context, nodename):
+        return objects.MigrationList.get_in_progress_by_host_and_node(
+            context, self.host, nodename)
+
+    def _reconcile_audit(self, context, nodename, audit):
+        """Returns the instances and migrations of a node read before locking
+        it, updated with the changes made by claims on the node since.
+
+        This must be called while holding the lock of the node.
+        """
+        instances = audit.instances
+        if audit.changed_instances:
+            changed = objects.InstanceList.get_by_filters(
+                context, {'uuid': list(audit.changed_instances),
+                          'deleted': False},
+                expected_attrs=_AUDIT_INSTANCE_ATTRS)
+            instances = [inst for inst in instances
+                         if inst.uuid not in audit.changed_instances]
+            instances.extend(inst for inst in changed
+                             if inst.host == self.host and
+                             inst.node == nodename)
+            LOG.debug('Reconciled the audit of node %(node)s with the claims '
+                      'of %(count)d instances made during the audit',
+                      {'node': nodename,
+                       'count': len(audit.changed_instances)})
+        migrations = audit.migrations
+        if audit.migrations_changed:
+            migrations = self._get_node_migrations(context, nodename)
+        return instances, migrations
 
     def _pair_instances_to_migrations(self, migrations, instance_by_uuid):
         for migration in migrations:
@@ -704,8 +855,8 @@ class ResourceTracker(object):
                               'another host\'s instance!',
                           {'uuid': migration.instance_uuid})
 
-    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
-    def _update_available_resource(self, context, resources):
+    @_synchronized_node
+    def _update_available_resource(self, context, resources, audit=None):
 
         # initialize the compute node object, creating it
         # if it does not already exist.
@@ -718,21 +869,21 @@ class ResourceTracker(object):
         if self.disabled(nodename):
             return
 
-        # Grab all instances assigned to this node:
-        instances = objects.InstanceList.get_by_host_and_node(
-            context, self.host, nodename,
-            expected_attrs=['system_metadata',
-                            'numa_topology',
-                            'flavor', 'migration_context'])
+        # Grab all instances assigned to this node and all in-progress
+        # migrations, unless they were read before locking the node:
+        if audit is None:
+            instances = self._get_node_instances(context, nodename)
+            migrations = self._get_node_migrations(context, nodename)
+            instance_usage = None
+        else:
+            instances, migrations = self._reconcile_audit(
+                context, nodename, audit)
+            instance_usage = audit.instance_usage
 
         # Now calculate usage based on instance utilization:
         instance_by_uuid = self._update_usage_from_instances(
             context, instances, nodename)
 
-        # Grab all in-progress migrations:
-        migrations = objects.MigrationList.get_in_progress_by_host_and_node(
-                context, self.host, nodename)
-
         self._pair_instances_to_migrations(migrations, instance_by_uuid)
         self._update_usage_from_migrations(context, migrations, nodename)
 
@@ -742,7 +893,7 @@ class ResourceTracker(object):
 
         # Detect and account for orphaned instances that may exist on the
         # hypervisor, but are not in the DB:
-        orphans = self._find_orphaned_instances()
+        orphans = self._find_orphaned_instances(usage=instance_usage)
         self._update_usage_from_orphans(orphans, nodename)
 
         cn = self.compute_nodes[nodename]
@@ -942,7 +1093,7 @@ class ResourceTracker(object):
         cn.free_ram_mb = cn.memory_mb - cn.memory_mb_used
         cn.free_disk_gb = cn.local_gb - cn.local_gb_used
 
-        cn.running_vms = self.stats.num_instances
+        cn.running_vms = self.stats[nodename].num_instances
 
         # Calculate the numa usage
         free = sign == -1
@@ -1041,7 +1192,14 @@ class ResourceTracker(object):
     def _update_usage_from_migrations(self, context, migrations, nodename):
         filtered = {}
         instances = {}
-        self.tracked_migrations.clear()
+        if self.lock_per_node:
+            # NOTE: Other nodes may be updated concurrently, only forget the
+            # migrations of this one.
+            for uuid, migration in list(self.tracked_migrations.items()):
+                if nodename in (migration.source_node, migration.dest_node):
+                    del self.tracked_migrations[uuid]
+        else:
+            self.tracked_migrations.clear()
 
         # do some defensive filtering against bad migrations records in the
         # database:
@@ -1120,8 +1278,9 @@ class ResourceTracker(object):
             sign = -1
 
         cn = self.compute_nodes[nodename]
-        self.stats.update_stats_for_instance(instance, is_removed_instance)
-        cn.stats = copy.deepcopy(self.stats)
+        node_stats = self.stats[nodename]
+        node_stats.update_stats_for_instance(instance, is_removed_instance)
+        cn.stats = copy.deepcopy(node_stats)
 
         # if it's a new or deleted instance:
         if is_new_instance or is_removed_instance:
@@ -1137,7 +1296,7 @@ class ResourceTracker(object):
             self._update_usage(self._get_usage_dict(instance), nodename,
                                sign=sign)
 
-        cn.current_workload = self.stats.calculate_workload()
+        cn.current_workload = node_stats.calculate_workload()
         if self.pci_tracker:
             obj = self.pci_tracker.stats.to_device_pools_obj()
             cn.pci_device_pools = obj
@@ -1150,7 +1309,14 @@ class ResourceTracker(object):
         instances assigned to the local compute host, even if they are not
         currently powered on.
         """
-        self.tracked_instances.clear()
+        if self.lock_per_node:
+            # NOTE: Other nodes may be updated concurrently, only forget the
+            # instances of this one.
+            for uuid, instance in list(self.tracked_instances.items()):
+                if instance.get('node') == nodename:
+                    del self.tracked_instances[uuid]
+        else:
+            self.tracked_instances.clear()
 
         cn = self.compute_nodes[nodename]
         # set some initial values, reserve room for host/hypervisor:
@@ -1247,8 +1413,10 @@ class ResourceTracker(object):
         # happen according to the normal flow of events where the scheduler
         # always creates allocations for an instance
         known_instances = set(self.tracked_instances.keys())
+        # NOTE: The allocations are cached by the report client, which only
+        # retrieves them from placement again when they changed.
         allocations = self.reportclient.get_allocations_for_resource_provider(
-                context, cn.uuid) or {}
+                context, cn.uuid, use_cache=True) or {}
         read_deleted_context = context.elevated(read_deleted='yes')
         for consumer_uuid, alloc in allocations.items():
             if consumer_uuid in known_instances:
@@ -1378,7 +1546,7 @@ class ResourceTracker(object):
                       {'operation': operation, 'node': cn.uuid},
                       instance=instance)
 
-    def _find_orphaned_instances(self):
+    def _find_orphaned_instances(self, usage=None):
         """Given the set of instances and migrations already account for
         by resource tracker, sanity check the hypervisor to determine
         if there are any "orphaned" instances left hanging around.
@@ -1386,12 +1554,16 @@ class ResourceTracker(object):
         Orphans could be consuming memory and should be accounted for in
         usage calculations to guard against potential out of memory
         errors.
+
+        :param usage: The per instance usage reported by the hypervisor, if
+                      it was already read.
         """
         uuids1 = frozenset(self.tracked_instances.keys())
         uuids2 = frozenset(self.tracked_migrations.keys())
         uuids = uuids1 | uuids2
 
-        usage = self.driver.get_per_instance_usage()
+        if usage is None:
+            usage = self.driver.get_per_instance_usage()
         vuuids = frozenset(usage.keys())
 
         orphan_uuids = vuuids - uuids
@@ -347,6 +347,7 @@ class ComputeAPI(object):
         for Pike compatibility. All new changes should go against 5.x.
 
         * 5.0  - Remove 4.x compatibility
+        * 5.1  - Add cache_images()
     '''
 
     VERSION_ALIASES = {
@@ -882,6 +883,18 @@ class ComputeAPI(object):
                 server=host, version=version)
         return cctxt.call(ctxt, 'get_host_uptime')
 
+    def cache_images(self, ctxt, host, image_ids):
+        version = '5.1'
+        client = self.router.client(ctxt)
+        if not client.can_send_version(version):
+            raise exception.ImageCacheNotYetAvailable()
+        # NOTE: Downloading the images can take a long time, so the call
+        # monitor is used to wait for up to long_rpc_timeout.
+        cctxt = client.prepare(server=host, version=version,
+                               call_monitor_timeout=CONF.rpc_response_timeout,
+                               timeout=CONF.long_rpc_timeout)
+        return cctxt.call(ctxt, 'cache_images', image_ids=image_ids)
+
     def reserve_block_device_name(self, ctxt, instance, device, volume_id,
                                   disk_bus, device_type, tag,
                                   multiattach):
@@ -22,9 +22,11 @@ import math
 import string
 import traceback
 
+import eventlet.semaphore
 import netifaces
 from oslo_log import log
 from oslo_serialization import jsonutils
+from oslo_utils import timeutils
 import six
 
 from nova import block_device
@@ -32,6 +34,7 @@ from nova.compute import power_state
 from nova.compute import task_states
 from nova.compute import vm_states
 import nova.conf
+from nova import context as nova_context
 from nova import exception
 from nova import notifications
 from nova.notifications.objects import aggregate as aggregate_notification
@@ -52,6 +55,12 @@ from nova.virt import driver
 CONF = nova.conf.CONF
 LOG = log.getLogger(__name__)
 
+# Results of caching an image on a compute host
+IMAGE_CACHE_DOWNLOADED = 'downloaded'
+IMAGE_CACHE_EXISTING = 'existing'
+IMAGE_CACHE_UNSUPPORTED = 'unsupported'
+IMAGE_CACHE_ERROR = 'error'
+
 
 def exception_to_dict(fault, message=None):
     """Converts exceptions to a dict for use in notifications."""
@@ -1155,6 +1164,113 @@ class UnlimitedSemaphore(object):
         return 0
 
 
+class BuildPhaseSemaphore(object):
+    """Limits the number of instance builds running one of their phases
+    concurrently, and counts the builds running and waiting to run it.
+
+    :param phase: The name of the phase, used in log messages and, with
+                  underscores instead of spaces, in the name of its stats.
+    :param limit: The maximum number of builds running the phase
+                  concurrently, 0 meaning unlimited.
+    """
+
+    def __init__(self, phase, limit):
+        self.phase = phase
+        self.limit = limit
+        if limit:
+            self._semaphore = eventlet.semaphore.Semaphore(limit)
+        else:
+            self._semaphore = UnlimitedSemaphore()
+        self.running = 0
+        self.waiting = 0
+        # Total number of builds which had to wait for the phase, and total
+        # time they waited, since the service started.
+        self.waited = 0
+        self.wait_time = 0.0
+
+    @property
+    def balance(self):
+        return self._semaphore.balance
+
+    def __enter__(self):
+        if self.limit and self.balance <= 0:
+            self.waiting += 1
+            LOG.debug('Waiting to run the %(phase)s phase of a build: '
+                      '%(running)d builds running it, %(waiting)d waiting.',
+                      {'phase': self.phase, 'running': self.running,
+                       'waiting': self.waiting})
+            try:
+                with timeutils.StopWatch() as timer:
+                    self._semaphore.__enter__()
+            finally:
+                self.waiting -= 1
+            self.waited += 1
+            self.wait_time += timer.elapsed()
+            LOG.debug('Waited %(time)0.2f seconds to run the %(phase)s phase '
+                      'of a build.', {'time': timer.elapsed(),
+                                      'phase': self.phase})
+        else:
+            self._semaphore.__enter__()
+        self.running += 1
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.running -= 1
+        self._semaphore.__exit__(exc_type, exc_val, exc_tb)
+
+    def get_stats(self):
+        """Returns the counts of the phase as compute node stats."""
+        prefix = 'build_%s_' % self.phase.replace(' ', '_')
+        return {prefix + 'running': self.running,
+                prefix + 'waiting': self.waiting,
+                prefix + 'waited': self.waited,
+                prefix + 'wait_time': '%.2f' % self.wait_time}
+
+
+def cache_images_on_hosts(context, compute_rpcapi, hosts, image_ids,
+                          host_done=None):
+    """Asks compute hosts to download images into their image cache.
+
+    At most CONF.image_precache_host_concurrency hosts are asked at once.
+
+    :param context: An admin RequestContext
+    :param compute_rpcapi: A nova.compute.rpcapi.ComputeAPI object
+    :param hosts: The names of the compute hosts
+    :param image_ids: The IDs of the images to cache
+    :param host_done: An optional callable, called with the name of each
+                      host and its results as soon as the host is done, to
+                      report progress.
+    :returns: A dict, keyed by host, of dicts, keyed by image ID, of the
+              result of caching each image on the host. All the results of
+              a host are IMAGE_CACHE_ERROR if it could not be reached.
+    """
+    results = {}
+
+    def _cache_images(host):
+        try:
+            host_mapping = objects.HostMapping.get_by_host(context, host)
+            with nova_context.target_cell(
+                    context, host_mapping.cell_mapping) as cctxt:
+                host_results = compute_rpcapi.cache_images(
+                    cctxt, host, image_ids)
+        except Exception as e:
+            LOG.warning('Unable to cache images on host %(host)s: %(error)s',
+                        {'host': host, 'error': e})
+            host_results = dict.fromkeys(image_ids, IMAGE_CACHE_ERROR)
+        results[host] = host_results
+        LOG.info('Cached images on host %(host)s (%(done)d of %(total)d '
+                 'hosts done): %(results)s',
+                 {'host': host, 'done': len(results), 'total': len(hosts),
+                  'results': host_results})
+        if host_done is not None:
+            host_done(host, host_results)
+
+    pool = eventlet.GreenPool(size=CONF.image_precache_host_concurrency)
+    for host in hosts:
+        pool.spawn_n(_cache_images, host)
+    pool.waitall()
+    return results
+
+
 @contextlib.contextmanager
 def notify_about_instance_delete(notifier, context, instance,
                                  delete_type='delete'):
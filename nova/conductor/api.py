@@ -158,3 +158,7 @@ class ComputeTaskAPI(object):
                 preserve_ephemeral=preserve_ephemeral,
                 host=host,
                 request_spec=request_spec)
+
+    def cache_images(self, context, aggregate, image_ids):
+        self.conductor_compute_rpcapi.cache_images(context, aggregate,
+                                                   image_ids)
@@ -221,7 +221,7 @@ class ComputeTaskManager(base.Base):
     may involve coordinating activities on multiple compute nodes.
     """
 
-    target = messaging.Target(namespace='compute_task', version='1.20')
+    target = messaging.Target(namespace='compute_task', version='1.21')
 
     def __init__(self):
         super(ComputeTaskManager, self).__init__()
@@ -1439,3 +1439,26 @@ class ComputeTaskManager(base.Base):
                         pass
             return False
         return True
+
+    def cache_images(self, context, aggregate, image_ids):
+        """Asks the compute hosts of an aggregate to download images into
+        their image cache.
+
+        :param aggregate: The nova.objects.Aggregate whose hosts cache the
+                          images
+        :param image_ids: The IDs of the images to cache
+        """
+        LOG.info('Caching %(images)d images on the %(hosts)d hosts of '
+                 'aggregate %(aggregate)s',
+                 {'images': len(image_ids), 'hosts': len(aggregate.hosts),
+                  'aggregate': aggregate.uuid})
+        results = compute_utils.cache_images_on_hosts(
+            context, self.compute_rpcapi, aggregate.hosts, image_ids)
+        failed = sorted(
+            host for host, host_results in results.items()
+            if compute_utils.IMAGE_CACHE_ERROR in host_results.values())
+        if failed:
+            LOG.warning('Failed to cache images on hosts %(hosts)s of '
+                        'aggregate %(aggregate)s',
+                        {'hosts': ', '.join(failed),
+                         'aggregate': aggregate.uuid})
@@ -265,6 +265,46 @@ to provide the result. If you have a small number of cells, or tenants
 are likely to have instances in all cells, then this should be
 False. If you have many cells, especially if you confine tenants to a
 small subset of those cells, this should be True.
+"""),
+    cfg.IntOpt("instance_list_cells_batch_size",
+        default=100,
+        min=0,
+        help="""
+The number of records initially fetched from each cell database when
+listing instances or migrations across cells.
+
+Records are merged from all cells in sorted order, and more records are
+only fetched from a cell, in windows which double in size each time, when
+the records of that cell sort ahead of the ones of the other cells. This
+avoids loading the full page of results from every cell database when
+only one page of results is returned to the user.
+
+Possible values:
+
+* 0: Fetch the full page of results from every cell at once.
+* Any positive integer.
+
+Related options:
+
+* ``[api]/max_limit``
+"""),
+    cfg.IntOpt("max_concurrent_calls_per_cell",
+        default=50,
+        min=1,
+        help="""
+The maximum number of concurrent calls made by a service to each cell
+database when querying cells in parallel, for example when listing instances
+or counting quota usage across cells. Calls beyond this limit wait until a
+previous call to the same cell completes.
+
+Possible values:
+
+* Any positive integer.
+
+Related options:
+
+* ``[database]/max_pool_size`` and ``[database]/max_overflow`` of the cells,
+  which bound the number of database connections actually open to a cell.
 """),
 ]
 
@@ -279,6 +279,57 @@ For per-compute-host cached images, set to '_base_$my_ip'
         default=(24 * 3600),
         help="""
 Unused unresized base images younger than this will not be removed.
+"""),
+    cfg.IntOpt('image_precache_concurrency',
+        default=1,
+        min=1,
+        help="""
+Maximum number of images downloaded concurrently into the image cache of this
+compute host when it is asked to pre-cache images.
+
+Images are pre-cached on the hosts of an aggregate with the
+``POST /os-aggregates/{aggregate_id}/action (cache_images)`` API or on a set
+of hosts with the ``nova-manage image_cache precache`` command, so that
+instances can be spawned from them without downloading them first.
+
+Possible values:
+
+* Any positive integer representing the maximum number of concurrent image
+  downloads.
+
+Pre-cached images are not protected from the image cache manager: an image
+that is not used by any instance on the host is removed like any other unused
+base image once it is older than
+``remove_unused_original_minimum_age_seconds``. Pre-caching an image again
+resets its age.
+
+Related options:
+
+* ``image_precache_host_concurrency``
+* ``remove_unused_base_images``
+* ``remove_unused_original_minimum_age_seconds``
+"""),
+    cfg.IntOpt('image_precache_host_concurrency',
+        default=1,
+        min=1,
+        help="""
+Maximum number of compute hosts asked to pre-cache images concurrently.
+
+This is used by the nova-conductor service when images are pre-cached on the
+hosts of an aggregate with the
+``POST /os-aggregates/{aggregate_id}/action (cache_images)`` API, and by the
+``nova-manage image_cache precache`` command. Raising it makes images
+available on many hosts faster, at the cost of a higher load on the image
+service.
+
+Possible values:
+
+* Any positive integer representing the maximum number of hosts caching
+  images concurrently.
+
+Related options:
+
+* ``image_precache_concurrency``
 """),
     cfg.StrOpt('pointer_model',
         default='usbtablet',
@@ -380,6 +431,51 @@ Possible values:
 
 * Any positive integer representing number of physical CPUs to reserve
   for the host.
+"""),
+    cfg.IntOpt('update_resources_concurrency',
+        default=1,
+        min=1,
+        help="""
+Number of compute nodes updated concurrently by the update_available_resource
+periodic task.
+
+By default the nodes reported by the virt driver are updated one after the
+other, under a single resource tracker lock. Drivers managing many nodes from
+a single nova-compute service, like the ironic driver, may not be able to
+update all of them within ``update_resources_interval``. Setting this option
+to a value greater than 1 updates up to that number of nodes in parallel and
+makes the resource tracker lock each compute node separately, so that a claim
+on a node only waits for the update of that node.
+
+The duration of each run of the periodic task is logged, with a warning when
+it takes longer than ``update_resources_interval``.
+
+This option should only be changed for drivers which do not track PCI devices,
+since the PCI tracker of a nova-compute service is shared by all its nodes.
+
+Possible values:
+
+* 1 (default): update the nodes serially.
+* Any positive integer: the maximum number of nodes updated concurrently.
+
+Related options:
+
+* update_resources_interval
+"""),
+    cfg.BoolOpt('bulk_provider_tree_updates',
+        default=False,
+        help="""
+Update the resource providers of a compute node in a single placement request.
+
+When enabled, the changes made by the virt driver to the inventories, traits
+and aggregates of the resource providers of a compute node are sent to the
+placement service in a single ``PUT /resource_providers/{uuid}/tree`` request
+per provider tree, instead of one request per provider and kind of change.
+This reduces the number of placement requests and generation conflicts for
+virt drivers reporting nested resource providers.
+
+Only enable this option once the placement service has been upgraded to a
+release supporting microversion 1.31.
 """),
 ]
 
@@ -559,10 +655,98 @@ instances, if asked to do so. This limit is enforced to avoid building
 unlimited instance concurrently on a compute node. This value can be set
 per compute node.
 
+When the phases of the builds are limited separately, this must be raised to
+at least the sum of the phase limits, or set to 0, for builds in different
+phases to overlap.
+
 Possible Values:
 
 * 0 : treated as unlimited.
 * Any positive integer representing maximum concurrent builds.
+
+Related options:
+
+* ``max_concurrent_network_allocations``
+* ``max_concurrent_block_device_setups``
+* ``max_concurrent_spawns``
+"""),
+    cfg.IntOpt('max_concurrent_network_allocations',
+        default=0,
+        min=0,
+        help="""
+Limits the maximum number of instance builds allocating their networks
+concurrently on this compute node.
+
+Builds are limited by ``max_concurrent_builds`` as a whole, and each phase of
+a build can be limited separately, so that builds waiting on different
+backends can overlap without overloading any of them.
+
+The phases only run within the builds allowed by ``max_concurrent_builds``,
+so the phase limits can only lower the concurrency of the builds unless
+``max_concurrent_builds`` is raised to at least the sum of the phase limits,
+or set to 0. A warning is logged when the service starts otherwise.
+
+The number of builds running and waiting for each phase, and the total number
+of builds which waited for it and the total time they waited, are reported in
+the stats of the compute nodes, as ``build_<phase>_running``,
+``build_<phase>_waiting``, ``build_<phase>_waited`` and
+``build_<phase>_wait_time``. They are updated every
+``update_resources_interval`` seconds.
+
+Possible Values:
+
+* 0 : treated as unlimited.
+* Any positive integer representing maximum concurrent network allocations.
+
+Related options:
+
+* ``max_concurrent_builds``
+* ``max_concurrent_block_device_setups``
+* ``max_concurrent_spawns``
+"""),
+    cfg.IntOpt('max_concurrent_block_device_setups',
+        default=0,
+        min=0,
+        help="""
+Limits the maximum number of instance builds creating and attaching their
+block devices concurrently on this compute node.
+
+See ``max_concurrent_network_allocations`` for how the phase limits relate to
+``max_concurrent_builds`` and how they are reported.
+
+Possible Values:
+
+* 0 : treated as unlimited.
+* Any positive integer representing maximum concurrent block device setups.
+
+Related options:
+
+* ``max_concurrent_builds``
+* ``max_concurrent_network_allocations``
+* ``max_concurrent_spawns``
+"""),
+    cfg.IntOpt('max_concurrent_spawns',
+        default=0,
+        min=0,
+        help="""
+Limits the maximum number of instance builds spawning their guest on the
+hypervisor concurrently on this compute node. Depending on the virt driver,
+spawning a guest includes downloading its image if it is not cached on the
+compute node yet.
+
+See ``max_concurrent_network_allocations`` for how the phase limits relate to
+``max_concurrent_builds`` and how they are reported.
+
+Possible Values:
+
+* 0 : treated as unlimited.
+* Any positive integer representing maximum concurrent spawns.
+
+Related options:
+
+* ``max_concurrent_builds``
+* ``max_concurrent_network_allocations``
+* ``max_concurrent_block_device_setups``
 """),
     # TODO(sfinucan): Add min parameter
     cfg.IntOpt('max_concurrent_live_migrations',
@@ -792,6 +976,30 @@ Possible values:
 
 * Any positive integer in seconds.
 * Any value <=0 will disable the sync. This is not recommended.
+
+Related options:
+
+* heal_instance_info_cache_bulk
+"""),
+    cfg.BoolOpt('heal_instance_info_cache_bulk',
+        default=False,
+        help="""
+Heal the network information cache of all the instances of the host at once.
+
+By default, each run of the periodic task healing the instance network
+information cache refreshes a single instance, so it takes as many runs as
+there are instances on the host to refresh all of them. When this option is
+enabled, each run lists the ports of all the instances of the host with a
+single request to Neutron, and only refreshes the caches which do not match
+those ports. When a run finds no stale cache, the following runs are skipped,
+doubling the number of skipped runs each time up to 8, until a stale cache is
+found again.
+
+This option is ignored when Neutron is not used.
+
+Related options:
+
+* heal_instance_info_cache_interval
 """),
     cfg.IntOpt('reclaim_instance_interval',
         default=0,
@@ -139,6 +139,47 @@ Related options:
 
 * The value of this option may be used if both verify_glance_signatures and
   enable_certificate_validation are enabled.
+"""),
+    cfg.BoolOpt('enable_peer_download',
+        default=False,
+        help="""
+Enable downloading images from peer compute hosts.
+
+When enabled, compute hosts advertise the images held in their image cache
+every time the image cache manager runs, and an image missing from the image
+cache of a host is first copied from a compute host of the same cell which
+advertised it. The copy is only used if its checksum matches the one recorded
+in the image service, otherwise the image is downloaded from the image
+service. This reduces the load on the image service when many hosts need the
+same new image at once.
+
+Only the libvirt driver advertises its image cache. The advertisements are
+stored in memcached, so the ``[cache]`` section must be configured with
+``enabled`` set to True and ``memcache_servers`` shared by the compute hosts,
+and the files are copied
+with the transport used to migrate instances, so the compute hosts must be
+able to reach each other with it.
+
+Related options:
+
+* ``[DEFAULT]/image_cache_manager_interval``: images are advertised when the
+  image cache manager runs, and advertisements expire after two intervals,
+  or after two minutes when it runs at the default rate.
+* ``[libvirt]/remote_filesystem_transport``
+* ``[DEFAULT]/force_raw_images``: base images converted to raw are only
+  copied from peers for images stored in raw format in the image service.
+* ``peer_download_attempts``
+"""),
+    cfg.IntOpt('peer_download_attempts',
+        default=2,
+        min=1,
+        help="""
+Number of peer compute hosts to try before downloading an image from the
+image service.
+
+Related options:
+
+* This option is only used if ``enable_peer_download`` is True.
 """),
     cfg.BoolOpt('debug',
          default=False,
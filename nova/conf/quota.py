@@ -327,6 +327,41 @@ impossible for a user to exceed their quota with the caveat that it will,
 however, be possible for a REST API user to be rejected with a 403 response in
 the event of a collision close to reaching their quota limit, even if the user
 has enough quota available when they made the request.
+"""),
+    cfg.BoolOpt('count_usage_from_placement',
+        default=False,
+        help="""
+Enable the counting of quota usage from the placement service.
+
+By default, the usage of the instances, cores and ram quotas is counted by
+querying the instances table of every cell database, which misses the
+resources of the instances in a cell which is down. When this is enabled,
+cores and ram usage is counted from the allocations of the project and user
+in placement, and instance usage from the instance mappings in the API
+database, regardless of the number of cells.
+
+Because placement counts allocations rather than instances, there are
+differences with the legacy counting:
+
+* The resources of SHELVED_OFFLOADED instances are not counted, as they have
+  no allocations.
+* The resources of instances being resized are counted for both the old and
+  the new flavor until the resize is confirmed or reverted.
+* The resources of instances which are not yet scheduled to a compute host
+  are not counted.
+
+This requires the ``nova-manage db online_data_migrations`` command to have
+completed, so that all instance mappings record the user of their instance.
+
+Possible values:
+
+* True: Count instances, cores and ram usage from the API database and
+  placement.
+* False: Count instances, cores and ram usage from the cell databases.
+
+Related options:
+
+* ``[quota]/driver``
 """),
 ]
 
@@ -130,6 +130,23 @@ and weighing process. Large deployments may need to set this lower than the
 total number of hosts available to limit memory consumption, network traffic,
 etc. of the scheduler.
 
+This option is only used by the FilterScheduler; if you use a different
+scheduler, this option has no effect.
+"""),
+    cfg.BoolOpt("compact_placement_results",
+                default=False,
+                help="""
+Request allocation candidates from the placement service in compact format.
+
+When enabled, the scheduler requests allocation candidates using placement
+API microversion 1.30 and its compact response format, in which resource
+provider UUIDs, resource classes and traits are only sent once and referred
+to by index. This reduces the size of the response and the time spent
+encoding and decoding it on large deployments.
+
+Only enable this option once the placement service has been upgraded to a
+release supporting microversion 1.30.
+
 This option is only used by the FilterScheduler; if you use a different
 scheduler, this option has no effect.
 """),
@@ -280,6 +297,70 @@ NOTE: In a multi-cell (v2) setup where the cell MQ is separated from the
 top-level, computes cannot directly communicate with the scheduler. Thus,
 this option cannot be enabled in that scenario. See also the
 [workarounds]/disable_group_policy_check_upcall option.
+"""),
+    cfg.IntOpt("host_state_cache_max_age",
+        default=0,
+        min=0,
+        help="""
+Maximum age, in seconds, of the compute node and service cache.
+
+By default, the scheduler loads the compute nodes and compute services from
+every cell on each scheduling request. When this option is set, they are
+loaded once and kept in a cache: the following requests only read the compute
+nodes and services created, updated or deleted since the previous request,
+which greatly reduces the load on the cell databases of large deployments.
+The cache of a cell is fully reloaded once it gets older than this value,
+which bounds how stale it may become.
+
+This option is only used by the FilterScheduler and its subclasses; if you use
+a different scheduler, this option has no effect.
+
+Possible values:
+
+* 0, the default, disables the cache.
+* A positive integer, where the integer corresponds to the maximum number of
+  seconds between two full reloads of the compute nodes of a cell.
+"""),
+    cfg.BoolOpt("batch_allocation_claims",
+        default=False,
+        help="""
+Claim the resources of a multi-create request in a single placement call.
+
+By default, the scheduler claims the resources of each instance of a
+multi-create request in the placement API one after the other, which costs one
+request to placement per instance. When this option is enabled, a host is first
+selected for every instance and the allocations of all the instances are then
+created with a single POST /allocations request. If placement rejects the
+batch, for example because a provider ran out of capacity in the meantime, the
+batch is split in halves which are claimed separately, and the instances which
+could still not be claimed fall back to the regular one-by-one claim.
+
+This option is only used by the FilterScheduler and its subclasses; if you use
+a different scheduler, this option has no effect.
+"""),
+    cfg.StrOpt("allocation_request_scorer",
+        default="nova.scheduler.scorers.PlacementOrderScorer",
+        help="""
+The class used to order the allocation requests of a host.
+
+The placement API may return several allocation requests for the same host,
+for example when the host can use more than one sharing resource provider or
+has several nested resource providers able to satisfy the request. When
+claiming resources against a host, the scheduler tries each of its allocation
+requests in the order given by this class before moving on to the next host.
+
+This option is only used by the FilterScheduler and its subclasses; if you use
+a different scheduler, this option has no effect.
+
+Possible values:
+
+* "nova.scheduler.scorers.PlacementOrderScorer", the default, keeps the order
+  returned by the placement API.
+* "nova.scheduler.scorers.LeastUsedScorer" tries first the allocation requests
+  whose most used resource provider is the least used one, based on the
+  provider summaries returned by the placement API.
+* The full class path of a subclass of
+  nova.scheduler.scorers.BaseAllocationRequestScorer.
 """),
     cfg.MultiStrOpt("available_filters",
         default=["nova.scheduler.filters.all_filters"],
@@ -339,6 +420,30 @@ Related options:
 * All of the filters in this option *must* be present in the
   'available_filters' option, or a SchedulerHostFilterNotFound
   exception will be raised.
+* reorder_filters
+"""),
+    cfg.BoolOpt("reorder_filters",
+        default=False,
+        help="""
+Reorder the enabled filters based on their observed cost and selectivity.
+
+The scheduler records, for each filter, the time it takes per host and the
+proportion of hosts it rejects. When this option is enabled, the filters are
+run by increasing time spent per rejected host instead of in the order of the
+'enabled_filters' option, so that cheap and selective filters run first and
+expensive filters such as NUMATopologyFilter or PciPassthroughFilter run
+against as few hosts as possible. Filters marked as order sensitive are never
+moved, the other filters are only reordered between them.
+
+The collected statistics can be retrieved with the scheduler get_diagnostics
+RPC method whether or not this option is enabled.
+
+This option is only used by the FilterScheduler and its subclasses; if you use
+a different scheduler, this option has no effect.
+
+Related options:
+
+* enabled_filters
 """),
     cfg.ListOpt("weight_classes",
         default=["nova.scheduler.weights.all_weighers"],
@@ -539,6 +644,27 @@ In such case enabling this option will reduce contention and chances for
 rescheduling events.
 At the same time it will make the instance packing (even in unweighed case)
 less dense.
+"""),
+    cfg.BoolOpt(
+        "columnar_host_states",
+        default=False,
+        help="""
+Enable the columnar host state engine for filtering and weighing.
+
+When enabled, the resources of all the candidate hosts (free RAM, disk and
+vCPUs, allocation ratios, number of instances and IO operations, service
+status and aggregate membership) are copied into NumPy arrays once per
+scheduling request. Filters and weighers providing an array based version
+(RamFilter, DiskFilter, CoreFilter, ComputeFilter, NumInstancesFilter,
+IoOpsFilter and the RAM, disk, CPU and IO ops weighers) then evaluate all the
+hosts at once, while the other ones are still run against each host. This
+reduces the scheduling time of large deployments.
+
+This requires the numpy library to be installed; if it is not, the option is
+ignored and a warning is logged.
+
+This option is only used by the FilterScheduler and its subclasses; if you use
+a different scheduler, this option has no effect.
 """),
     cfg.StrOpt(
         "image_properties_default_architecture",
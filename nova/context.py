@@ -17,11 +17,13 @@
 
 """RequestContext: context for requests that persist through all of nova."""
 
+import bisect
 from contextlib import contextmanager
 import copy
 import warnings
 
 import eventlet.queue
+import eventlet.semaphore
 import eventlet.timeout
 from keystoneauth1.access import service_catalog as ksa_service_catalog
 from keystoneauth1 import plugin
@@ -31,12 +33,14 @@ from oslo_log import log as logging
 from oslo_utils import timeutils
 import six
 
+import nova.conf
 from nova import exception
 from nova.i18n import _
 from nova import objects
 from nova import policy
 from nova import utils
 
+CONF = nova.conf.CONF
 LOG = logging.getLogger(__name__)
 # TODO(melwitt): This cache should be cleared whenever WSGIService receives a
 # SIGHUP and periodically based on an expiration time. Currently, none of the
@@ -48,6 +52,9 @@ did_not_respond_sentinel = object()
 # NOTE(melwitt): Used for the scatter-gather utility to indicate an exception
 # was raised gathering a result from a cell.
 raised_exception_sentinel = object()
+# The default time in seconds to wait for the results of all the cells in the
+# scatter-gather utility.
+CELL_TIMEOUT = 60
 # FIXME(danms): Keep a global cache of the cells we find the
 # first time we look. This needs to be refreshed on a timer or
 # trigger.
@@ -355,6 +362,13 @@ def set_target_cell(context, cell_mapping):
     """
     global CELL_CACHE
     if cell_mapping is not None:
+        # NOTE: the connections of a cell never change once they are cached,
+        # so avoid taking the lock when they already are.
+        cell_tuple = CELL_CACHE.get(cell_mapping.uuid)
+        if cell_tuple is not None:
+            context.db_connection, context.mq_connection = cell_tuple
+            return
+
         # avoid circular import
         from nova.db import api as db
         from nova import rpc
@@ -407,6 +421,162 @@ def target_cell(context, cell_mapping):
     yield cctxt
 
 
+class ScatterGatherExecutor(object):
+    """Targets cells in parallel and gathers their results.
+
+    A single executor is shared by all the scatter-gather calls of a process.
+    It bounds the number of concurrent calls to each cell and keeps a
+    histogram of the latency of the calls to each cell, which is logged when
+    a cell does not respond in time.
+    """
+
+    # The upper bounds, in seconds, of the buckets of the latency histograms.
+    # The last bucket holds the calls which took longer, or timed out.
+    LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 60)
+
+    def __init__(self, max_workers_per_cell=None):
+        """Create an executor.
+
+        :param max_workers_per_cell: The maximum number of concurrent calls to
+                                     each cell, which defaults to
+                                     [api]/max_concurrent_calls_per_cell
+        """
+        self.max_workers_per_cell = max_workers_per_cell
+        self._workers = {}
+        self._latencies = {}
+
+    def _get_workers(self, cell_uuid):
+        workers = self._workers.get(cell_uuid)
+        if workers is None:
+            # NOTE: The executor is created when this module is imported, so
+            # the configuration is only read when a cell is first called.
+            max_workers = (self.max_workers_per_cell or
+                           CONF.api.max_concurrent_calls_per_cell)
+            workers = self._workers.setdefault(
+                cell_uuid, eventlet.semaphore.Semaphore(max_workers))
+        return workers
+
+    def _record_latency(self, cell_uuid, elapsed):
+        histogram = self._latencies.get(cell_uuid)
+        if histogram is None:
+            histogram = self._latencies.setdefault(
+                cell_uuid, [0] * (len(self.LATENCY_BUCKETS) + 1))
+        histogram[bisect.bisect_left(self.LATENCY_BUCKETS, elapsed)] += 1
+
+    def get_latency_histograms(self):
+        """Returns the latency histograms of the calls to each cell.
+
+        :returns: A dict {cell_uuid: [(upper_bound, count), ...]} where the
+                  upper bound of the last bucket is None.
+        """
+        bounds = self.LATENCY_BUCKETS + (None,)
+        return {cell_uuid: list(zip(bounds, histogram))
+                for cell_uuid, histogram in self._latencies.items()}
+
+    def _format_latency_histogram(self, cell_uuid):
+        histogram = self.get_latency_histograms().get(cell_uuid, [])
+        return ', '.join('%s: %d' % ('<=%ss' % bound if bound is not None
+                                     else '>%ss' % self.LATENCY_BUCKETS[-1],
+                                     count)
+                         for bound, count in histogram)
+
+    def gather(self, context, cell_mappings, timeout, fn, args=(),
+               kwargs=None, min_results=None):
+        """Target cells in parallel and return their results.
+
+        See scatter_gather_cells() for the parameters.
+
+        :param min_results: If provided, stop waiting as soon as this number
+                            of cells returned a result which is not a
+                            sentinel. The cells which did not respond by then
+                            are left out of the returned results, and their
+                            calls complete in the background.
+        """
+        kwargs = kwargs or {}
+        greenthreads = []
+        queue = eventlet.queue.LightQueue()
+        results = {}
+
+        # NOTE: the context is sanitized once for all the cells, see
+        # target_cell() for why. The copies of this template do not share any
+        # private state with each other as the template itself is never used.
+        template = RequestContext.from_dict(context.to_dict())
+
+        def gather_result(cell_mapping, fn, context, *args, **kwargs):
+            cell_uuid = cell_mapping.uuid
+            timer = timeutils.StopWatch()
+            try:
+                with self._get_workers(cell_uuid):
+                    timer.start()
+                    cctxt = copy.copy(template)
+                    set_target_cell(cctxt, cell_mapping)
+                    result = fn(cctxt, *args, **kwargs)
+            except Exception:
+                LOG.exception('Error gathering result from cell %s',
+                              cell_uuid)
+                result = raised_exception_sentinel
+            if timer.has_started():
+                self._record_latency(cell_uuid, timer.elapsed())
+            # The queue is already synchronized.
+            queue.put((cell_uuid, result))
+
+        for cell_mapping in cell_mappings:
+            greenthreads.append((cell_mapping.uuid,
+                                 utils.spawn(gather_result, cell_mapping,
+                                             fn, context, *args, **kwargs)))
+
+        done = False
+        with eventlet.timeout.Timeout(timeout, exception.CellTimeout):
+            try:
+                found = 0
+                while len(results) != len(greenthreads):
+                    cell_uuid, result = queue.get()
+                    results[cell_uuid] = result
+                    if result not in (did_not_respond_sentinel,
+                                      raised_exception_sentinel):
+                        found += 1
+                        if min_results is not None and found >= min_results:
+                            done = True
+                            break
+            except exception.CellTimeout:
+                # NOTE(melwitt): We'll fill in did_not_respond_sentinels at
+                # the same time we kill/wait for the green threads.
+                pass
+
+        # Kill the green threads still pending and wait on those we know are
+        # done.
+        for cell_uuid, greenthread in greenthreads:
+            if cell_uuid not in results:
+                if done:
+                    # NOTE: Killing the green threads of the cells which did
+                    # not respond yet would interrupt their database queries
+                    # and could leave broken connections in the pools of
+                    # these cells, so let them complete in the background.
+                    # Their results are put in a queue nobody reads anymore.
+                    continue
+                greenthread.kill()
+                self._record_latency(cell_uuid, timeout)
+                results[cell_uuid] = did_not_respond_sentinel
+                LOG.warning('Timed out waiting for response from cell '
+                            '%(cell)s. Latency of the calls to this cell: '
+                            '%(latency)s',
+                            {'cell': cell_uuid,
+                             'latency': self._format_latency_histogram(
+                                 cell_uuid)})
+            else:
+                greenthread.wait()
+
+        return results
+
+
+_SCATTER_GATHER_EXECUTOR = ScatterGatherExecutor()
+
+
+def get_scatter_gather_executor():
+    """Returns the ScatterGatherExecutor shared by the process."""
+    return _SCATTER_GATHER_EXECUTOR
+
+
 def scatter_gather_cells(context, cell_mappings, timeout, fn, *args, **kwargs):
     """Target cells in parallel and return their results.
 
@@ -427,47 +597,34 @@ def scatter_gather_cells(context, cell_mappings, timeout, fn, *args, **kwargs):
               be returned if the call to a cell raised an exception. The
               exception will be logged.
     """
-    greenthreads = []
-    queue = eventlet.queue.LightQueue()
-    results = {}
+    return _SCATTER_GATHER_EXECUTOR.gather(context, cell_mappings, timeout,
+                                           fn, args, kwargs)
 
-    def gather_result(cell_mapping, fn, context, *args, **kwargs):
-        cell_uuid = cell_mapping.uuid
-        try:
-            with target_cell(context, cell_mapping) as cctxt:
-                result = fn(cctxt, *args, **kwargs)
-        except Exception:
-            LOG.exception('Error gathering result from cell %s', cell_uuid)
-            result = raised_exception_sentinel
-        # The queue is already synchronized.
-        queue.put((cell_uuid, result))
-
-    for cell_mapping in cell_mappings:
-        greenthreads.append((cell_mapping.uuid,
-                             utils.spawn(gather_result, cell_mapping,
-                                         fn, context, *args, **kwargs)))
-
-    with eventlet.timeout.Timeout(timeout, exception.CellTimeout):
-        try:
-            while len(results) != len(greenthreads):
-                cell_uuid, result = queue.get()
-                results[cell_uuid] = result
-        except exception.CellTimeout:
-            # NOTE(melwitt): We'll fill in did_not_respond_sentinels at the
-            # same time we kill/wait for the green threads.
-            pass
-
-    # Kill the green threads still pending and wait on those we know are done.
-    for cell_uuid, greenthread in greenthreads:
-        if cell_uuid not in results:
-            greenthread.kill()
-            results[cell_uuid] = did_not_respond_sentinel
-            LOG.warning('Timed out waiting for response from cell %s',
-                        cell_uuid)
-        else:
-            greenthread.wait()
 
-    return results
+def scatter_gather_first_cells(context, cell_mappings, timeout, count, fn,
+                               *args, **kwargs):
+    """Target cells in parallel and return the first results.
+
+    This is like scatter_gather_cells(), except that it returns as soon as
+    count cells returned a result which is not a sentinel, without waiting
+    for the other cells.
+
+    :param context: The RequestContext for querying cells
+    :param cell_mappings: The CellMappings to target in parallel
+    :param timeout: The total time in seconds to wait for the results to be
+                    gathered
+    :param count: The number of results to wait for
+    :param fn: The function to call for each cell
+    :param args: The args for the function to call for each cell, not including
+                 the RequestContext
+    :param kwargs: The kwargs for the function to call for each cell
+    :returns: A dict {cell_uuid: result} containing the joined results, which
+              only includes the cells which did not respond if fewer than
+              count results were gathered. See scatter_gather_cells().
+    """
+    return _SCATTER_GATHER_EXECUTOR.gather(context, cell_mappings, timeout,
+                                           fn, args, kwargs,
+                                           min_results=count)
 
 
 def load_cells():
@@ -486,8 +643,8 @@ def scatter_gather_skip_cell0(context, fn, *args, **kwargs):
     """Target all cells except cell0 in parallel and return their results.
 
     The first parameter in the signature of the function to call for each cell
-    should be of type RequestContext. There is a 60 second timeout for waiting
-    on all results to be gathered.
+    should be of type RequestContext. There is a CELL_TIMEOUT second timeout
+    for waiting on all results to be gathered.
 
     :param context: The RequestContext for querying cells
     :param fn: The function to call for each cell
@@ -502,16 +659,16 @@ def scatter_gather_skip_cell0(context, fn, *args, **kwargs):
     """
     load_cells()
     cell_mappings = [cell for cell in CELLS if not cell.is_cell0()]
-    return scatter_gather_cells(context, cell_mappings, 60, fn, *args,
-                                **kwargs)
+    return scatter_gather_cells(context, cell_mappings, CELL_TIMEOUT, fn,
+                                *args, **kwargs)
 
 
 def scatter_gather_all_cells(context, fn, *args, **kwargs):
     """Target all cells in parallel and return their results.
 
     The first parameter in the signature of the function to call for each cell
-    should be of type RequestContext. There is a 60 second timeout for waiting
-    on all results to be gathered.
+    should be of type RequestContext. There is a CELL_TIMEOUT second timeout
+    for waiting on all results to be gathered.
 
     :param context: The RequestContext for querying cells
     :param fn: The function to call for each cell
@@ -525,4 +682,5 @@ def scatter_gather_all_cells(context, fn, *args, **kwargs):
               exception will be logged.
     """
     load_cells()
-    return scatter_gather_cells(context, CELLS, 60, fn, *args, **kwargs)
+    return scatter_gather_cells(context, CELLS, CELL_TIMEOUT, fn, *args,
+                                **kwargs)
@@ -146,6 +146,16 @@ def service_get_all_by_binary(context, binary, include_disabled=False):
                                           include_disabled=include_disabled)
 
 
+def service_get_all_by_binary_changed_since(context, binary, changes_since):
+    """Get services for a given binary created, updated or deleted since the
+    given time.
+
+    Deleted services are included in the results.
+    """
+    return IMPL.service_get_all_by_binary_changed_since(context, binary,
+                                                        changes_since)
+
+
 def service_get_all_computes_by_hv_type(context, hv_type,
                                         include_disabled=False):
     """Get all compute services for a given hypervisor type.
@@ -267,6 +277,19 @@ def compute_node_get_all_mapped_less_than(context, mapped_less_than):
                                                       mapped_less_than)
 
 
+def compute_node_get_all_changed_since(context, changes_since):
+    """Get all compute nodes created, updated or deleted since the given time.
+
+    :param context: The security context
+    :param changes_since: Only return the compute nodes which have been
+                          created, updated or deleted at or after this time
+
+    :returns: List of dictionaries each containing compute node properties,
+              including the deleted compute nodes
+    """
+    return IMPL.compute_node_get_all_changed_since(context, changes_since)
+
+
 def compute_node_get_all_by_pagination(context, limit=None, marker=None):
     """Get compute nodes by pagination.
     :param context: The security context
@@ -1783,9 +1806,10 @@ def task_log_get(context, task_name, period_beginning,
 ####################
 
 
-def archive_deleted_rows(max_rows=None):
+def archive_deleted_rows(max_rows=None, workers=1):
     """Move up to max_rows rows from production tables to corresponding shadow
-    tables.
+    tables, archiving independent groups of tables with up to the given number
+    of concurrent workers.
 
     :returns: dict that maps table name to number of rows archived from that
               table, for example:
@@ -1799,7 +1823,7 @@ def archive_deleted_rows(max_rows=None):
         }
 
     """
-    return IMPL.archive_deleted_rows(max_rows=max_rows)
+    return IMPL.archive_deleted_rows(max_rows=max_rows, workers=workers)
 
 
 def pcidevice_online_data_migration(context, max_count):
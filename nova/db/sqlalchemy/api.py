@@ -24,6 +24,7 @@ import functools
 import inspect
 import sys
 
+import eventlet
 from oslo_db import api as oslo_db_api
 from oslo_db import exception as db_exc
 from oslo_db.sqlalchemy import enginefacade
@@ -477,6 +478,18 @@ def service_get_all_by_binary(context, binary, include_disabled=False):
     return query.all()
 
 
+@pick_context_manager_reader
+def service_get_all_by_binary_changed_since(context, binary, changes_since):
+    # NOTE: Deleted services are returned too so that callers keeping a copy
+    # of the services know which ones to forget about.
+    return model_query(context, models.Service, read_deleted="yes").\
+                    filter_by(binary=binary).\
+                    filter(or_(models.Service.created_at >= changes_since,
+                               models.Service.updated_at >= changes_since,
+                               models.Service.deleted_at >= changes_since)).\
+                    all()
+
+
 @pick_context_manager_reader
 def service_get_all_computes_by_hv_type(context, hv_type,
                                         include_disabled=False):
@@ -586,6 +599,11 @@ def _compute_node_select(context, filters=None, limit=None, marker=None):
         select = select.where(cn_tbl.c.hypervisor_hostname == hyp_hostname)
     if "mapped" in filters:
         select = select.where(cn_tbl.c.mapped < filters['mapped'])
+    if "changes_since" in filters:
+        changes_since = filters["changes_since"]
+        select = select.where(or_(cn_tbl.c.created_at >= changes_since,
+                                  cn_tbl.c.updated_at >= changes_since,
+                                  cn_tbl.c.deleted_at >= changes_since))
     if marker is not None:
         try:
             compute_node_get(context, marker)
@@ -669,6 +687,14 @@ def compute_node_get_all_mapped_less_than(context, mapped_less_than):
                                   {'mapped': mapped_less_than})
 
 
+@pick_context_manager_reader
+def compute_node_get_all_changed_since(context, changes_since):
+    # NOTE: Deleted compute nodes are returned too so that callers keeping a
+    # copy of the compute nodes know which ones to forget about.
+    return _compute_node_fetchall(context.elevated(read_deleted='yes'),
+                                  {'changes_since': changes_since})
+
+
 @pick_context_manager_reader
 def compute_node_get_all_by_pagination(context, limit=None, marker=None):
     return _compute_node_fetchall(context, limit=limit, marker=marker)
@@ -5434,28 +5460,152 @@ def _archive_if_instance_deleted(table, shadow_table, instances, conn,
         return 0
 
 
+# NOTE: the order in which tables are archived, the shadow tables and the
+# progress made soft deleting the records of deleted instances are kept per
+# database for the life of the process, so that archiving in a loop neither
+# reflects the whole schema nor rescans every deleted instance on each run.
+_ARCHIVE_GROUPS = {}
+_SHADOW_TABLES = {}
+_ARCHIVE_WATERMARKS = {}
+# Maximum number of rows moved to a shadow table in a single transaction.
+_ARCHIVE_BATCH_SIZE = 1000
+# Instances deleted up to this long before the previous run are considered
+# again, to allow for clock differences between the hosts deleting them.
+_ARCHIVE_WATERMARK_MARGIN = datetime.timedelta(hours=1)
+
+
+def reset_archive_caches():
+    """Forgets the archive groups, shadow tables and watermarks kept for
+    every database, so that they are looked up again on the next run.
+
+    This is meant for the tests, which recreate the database with the same
+    URL for every test.
+    """
+    _ARCHIVE_GROUPS.clear()
+    _SHADOW_TABLES.clear()
+    _ARCHIVE_WATERMARKS.clear()
+
+
+def _get_shadow_table(engine, tablename):
+    """Returns the shadow table of a table, or None if it has none."""
+    key = (str(engine.url), tablename)
+    if key not in _SHADOW_TABLES:
+        metadata = MetaData()
+        metadata.bind = engine
+        try:
+            _SHADOW_TABLES[key] = Table(_SHADOW_TABLE_PREFIX + tablename,
+                                        metadata, autoload=True)
+        except NoSuchTableError:
+            _SHADOW_TABLES[key] = None
+    return _SHADOW_TABLES[key]
+
+
+def _get_archive_groups(engine):
+    """Returns the names of the tables to archive, in groups of tables which
+    depend on each other. Groups can be archived independently, and tables
+    are listed leaf first in each group.
+
+    Tables are related by their foreign keys, and tables with an
+    instance_uuid column are also related to the instances table since the
+    rows of deleted instances are archived with them.
+    """
+    key = str(engine.url)
+    if key in _ARCHIVE_GROUPS:
+        return _ARCHIVE_GROUPS[key]
+
+    meta = MetaData(engine)
+    meta.reflect()
+    # Reverse sort the tables so we get the leaf nodes first for processing.
+    # Skip the special sqlalchemy-migrate migrate_version table and any
+    # shadow tables.
+    tables = [table for table in reversed(meta.sorted_tables)
+              if table.name != 'migrate_version' and
+              not table.name.startswith(_SHADOW_TABLE_PREFIX)]
+    parents = {table.name: table.name for table in tables}
+
+    def _find(name):
+        while parents[name] != name:
+            name = parents[name]
+        return name
+
+    def _join(name, other):
+        if other in parents:
+            parents[_find(name)] = _find(other)
+
+    for table in tables:
+        for fkey in table.foreign_keys:
+            _join(table.name, fkey.column.table.name)
+        if 'instance_uuid' in table.c:
+            _join(table.name, 'instances')
+
+    groups = collections.OrderedDict()
+    for table in tables:
+        groups.setdefault(_find(table.name), []).append(table.name)
+    _ARCHIVE_GROUPS[key] = list(groups.values())
+    return _ARCHIVE_GROUPS[key]
+
+
+def _soft_delete_instance_records(conn, table):
+    """Soft deletes the rows of the instance_actions, instance_actions_events
+    or migrations table which belong to deleted instances, so that they are
+    archived like any other deleted row.
+
+    Only the instances deleted since the previous call for the same table
+    and database are considered, rather than every deleted instance.
+    """
+    instances = models.BASE.metadata.tables["instances"]
+    deleted_instances = instances.c.deleted != instances.c.deleted.default.arg
+    key = (str(conn.engine.url), table.name)
+    watermark = _ARCHIVE_WATERMARKS.get(key)
+    started = timeutils.utcnow()
+    if watermark is not None:
+        deleted_instances = and_(
+            deleted_instances,
+            or_(instances.c.deleted_at == null(),
+                instances.c.deleted_at >=
+                    watermark - _ARCHIVE_WATERMARK_MARGIN))
+    deleted_uuids = sql.select([instances.c.uuid]).where(deleted_instances)
+
+    if table.name == "instance_actions_events":
+        # NOTE(clecomte): we have to grab all the relation from
+        # instances because instance_actions_events rely on
+        # action_id and not uuid
+        instance_actions = models.BASE.metadata.tables["instance_actions"]
+        deleted_actions = sql.select([instance_actions.c.id]).\
+            where(instance_actions.c.instance_uuid.in_(deleted_uuids))
+        condition = table.c.action_id.in_(deleted_actions)
+    else:
+        condition = table.c.instance_uuid.in_(deleted_uuids)
+
+    update_statement = table.update().values(deleted=table.c.id).\
+        where(and_(table.c.deleted == table.c.deleted.default.arg,
+                   condition))
+    conn.execute(update_statement)
+    _ARCHIVE_WATERMARKS[key] = started
+
+
 def _archive_deleted_rows_for_table(tablename, max_rows):
     """Move up to max_rows rows from one tables to the corresponding
     shadow table.
 
+    Rows are moved in batches of up to _ARCHIVE_BATCH_SIZE rows, each in its
+    own transaction, walking the primary key with keyset pagination. A batch
+    which cannot be archived because of a foreign key constraint is skipped.
+
     :returns: number of rows archived
     """
     engine = get_engine()
     conn = engine.connect()
-    metadata = MetaData()
-    metadata.bind = engine
     # NOTE(tdurakov): table metadata should be received
     # from models, not db tables. Default value specified by SoftDeleteMixin
     # is known only by models, not DB layer.
     # IMPORTANT: please do not change source of metadata information for table.
     table = models.BASE.metadata.tables[tablename]
 
-    shadow_tablename = _SHADOW_TABLE_PREFIX + tablename
     rows_archived = 0
     deleted_instance_uuids = []
-    try:
-        shadow_table = Table(shadow_tablename, metadata, autoload=True)
-    except NoSuchTableError:
+    shadow_table = _get_shadow_table(engine, tablename)
+    if shadow_table is None:
         # No corresponding shadow table; skip it.
         return rows_archived, deleted_instance_uuids
 
@@ -5465,8 +5615,6 @@ def _archive_deleted_rows_for_table(tablename, max_rows):
         column = table.c.domain
     else:
         column = table.c.id
-    # NOTE(guochbo): Use DeleteFromSelect to avoid
-    # database's limit of maximum parameter in one SQL statement.
     deleted_column = table.c.deleted
     columns = [c.name for c in table.c]
 
@@ -5476,38 +5624,25 @@ def _archive_deleted_rows_for_table(tablename, max_rows):
     # NOTE(takashin): The record in table migrations should be
     # soft deleted when the instance is deleted.
     # This is just for upgrading.
-    if tablename in ("instance_actions", "migrations"):
-        instances = models.BASE.metadata.tables["instances"]
-        deleted_instances = sql.select([instances.c.uuid]).\
-            where(instances.c.deleted != instances.c.deleted.default.arg)
-        update_statement = table.update().values(deleted=table.c.id).\
-            where(table.c.instance_uuid.in_(deleted_instances))
-
-        conn.execute(update_statement)
-
-    elif tablename == "instance_actions_events":
-        # NOTE(clecomte): we have to grab all the relation from
-        # instances because instance_actions_events rely on
-        # action_id and not uuid
-        instances = models.BASE.metadata.tables["instances"]
-        instance_actions = models.BASE.metadata.tables["instance_actions"]
-        deleted_instances = sql.select([instances.c.uuid]).\
-            where(instances.c.deleted != instances.c.deleted.default.arg)
-        deleted_actions = sql.select([instance_actions.c.id]).\
-            where(instance_actions.c.instance_uuid.in_(deleted_instances))
-
-        update_statement = table.update().values(deleted=table.c.id).\
-            where(table.c.action_id.in_(deleted_actions))
-
-        conn.execute(update_statement)
-
-    select = sql.select([column],
-                        deleted_column != deleted_column.default.arg).\
-                        order_by(column).limit(max_rows)
-    rows = conn.execute(select).fetchall()
-    records = [r[0] for r in rows]
+    if tablename in ("instance_actions", "instance_actions_events",
+                     "migrations"):
+        _soft_delete_instance_records(conn, table)
+
+    marker = None
+    while max_rows is None or rows_archived < max_rows:
+        limit = _ARCHIVE_BATCH_SIZE
+        if max_rows is not None:
+            limit = min(limit, max_rows - rows_archived)
+        select = sql.select([column],
+                            deleted_column != deleted_column.default.arg)
+        if marker is not None:
+            select = select.where(column > marker)
+        rows = conn.execute(select.order_by(column).limit(limit)).fetchall()
+        records = [r[0] for r in rows]
+        if not records:
+            break
+        marker = records[-1]
 
-    if records:
         insert = shadow_table.insert(inline=True).\
                 from_select(columns, sql.select([table], column.in_(records)))
         delete = table.delete().where(column.in_(records))
@@ -5516,24 +5651,27 @@ def _archive_deleted_rows_for_table(tablename, max_rows):
         # rows of deleted instances from the instances table are stored prior
         # to their deletion. Basically the uuids of the archived instances
         # are queried and returned.
+        uuids = []
         if tablename == "instances":
             query_select = sql.select([table.c.uuid], table.c.id.in_(records))
             rows = conn.execute(query_select).fetchall()
-            deleted_instance_uuids = [r[0] for r in rows]
+            uuids = [r[0] for r in rows]
 
         try:
             # Group the insert and delete in a transaction.
             with conn.begin():
                 conn.execute(insert)
                 result_delete = conn.execute(delete)
-            rows_archived = result_delete.rowcount
         except db_exc.DBReferenceError as ex:
             # A foreign key constraint keeps us from deleting some of
             # these rows until we clean up a dependent table.  Just
-            # skip this table for now; we'll come back to it later.
+            # skip these rows for now; we'll come back to them later.
             LOG.warning("IntegrityError detected when archiving table "
                         "%(tablename)s: %(error)s",
                         {'tablename': tablename, 'error': six.text_type(ex)})
+            continue
+        rows_archived += result_delete.rowcount
+        deleted_instance_uuids.extend(uuids)
 
     if ((max_rows is None or rows_archived < max_rows)
             and 'instance_uuid' in columns):
@@ -5546,10 +5684,64 @@ def _archive_deleted_rows_for_table(tablename, max_rows):
     return rows_archived, deleted_instance_uuids
 
 
-def archive_deleted_rows(max_rows=None):
+class _ArchiveBudget(object):
+    """Shares the maximum number of rows to archive between the workers
+    archiving groups of tables in parallel.
+
+    Each worker reserves up to an equal share of the rows left before
+    archiving a table and releases what it did not use, so that the total
+    never exceeds the maximum.
+    """
+
+    def __init__(self, max_rows, workers):
+        self.remaining = max_rows
+        self.share = None
+        if max_rows is not None:
+            self.share = max(1, -(-max_rows // workers))
+
+    def reserve(self):
+        if self.remaining is None:
+            return None
+        rows = min(self.remaining, self.share)
+        self.remaining -= rows
+        return rows
+
+    def release(self, rows):
+        if self.remaining is not None:
+            self.remaining += rows
+
+
+def _archive_deleted_rows_for_group(tablenames, budget):
+    table_to_rows_archived = {}
+    deleted_instance_uuids = []
+    for tablename in tablenames:
+        # Keep archiving the table while it fills the rows reserved for it.
+        while True:
+            limit = budget.reserve()
+            if limit == 0:
+                break
+            rows_archived, uuids = _archive_deleted_rows_for_table(
+                tablename, max_rows=limit)
+            if tablename == 'instances':
+                deleted_instance_uuids.extend(uuids)
+            # Only report results for tables that had updates.
+            if rows_archived:
+                table_to_rows_archived.setdefault(tablename, 0)
+                table_to_rows_archived[tablename] += rows_archived
+            if limit is None or rows_archived < limit:
+                if limit is not None:
+                    budget.release(limit - rows_archived)
+                break
+    return table_to_rows_archived, deleted_instance_uuids
+
+
+def archive_deleted_rows(max_rows=None, workers=1):
     """Move up to max_rows rows from production tables to the corresponding
     shadow tables.
 
+    Groups of tables which do not depend on each other are archived by up to
+    the given number of concurrent workers.
+
     :returns: dict that maps table name to number of rows archived from that
               table, for example:
 
@@ -5564,29 +5756,19 @@ def archive_deleted_rows(max_rows=None):
     """
     table_to_rows_archived = {}
     deleted_instance_uuids = []
-    total_rows_archived = 0
-    meta = MetaData(get_engine(use_slave=True))
-    meta.reflect()
-    # Reverse sort the tables so we get the leaf nodes first for processing.
-    for table in reversed(meta.sorted_tables):
-        tablename = table.name
-        rows_archived = 0
-        # skip the special sqlalchemy-migrate migrate_version table and any
-        # shadow tables
-        if (tablename == 'migrate_version' or
-                tablename.startswith(_SHADOW_TABLE_PREFIX)):
-            continue
-        rows_archived,\
-        deleted_instance_uuid = _archive_deleted_rows_for_table(
-                tablename, max_rows=max_rows - total_rows_archived)
-        total_rows_archived += rows_archived
-        if tablename == 'instances':
-            deleted_instance_uuids = deleted_instance_uuid
-        # Only report results for tables that had updates.
-        if rows_archived:
-            table_to_rows_archived[tablename] = rows_archived
-        if total_rows_archived >= max_rows:
-            break
+    budget = _ArchiveBudget(max_rows, workers)
+    groups = _get_archive_groups(get_engine(use_slave=True))
+    if workers > 1:
+        pool = eventlet.GreenPool(size=workers)
+        results = pool.imap(
+            functools.partial(_archive_deleted_rows_for_group,
+                              budget=budget), groups)
+    else:
+        results = (_archive_deleted_rows_for_group(tablenames, budget)
+                   for tablenames in groups)
+    for group_rows_archived, uuids in results:
+        table_to_rows_archived.update(group_rows_archived)
+        deleted_instance_uuids.extend(uuids)
     return table_to_rows_archived, deleted_instance_uuids
 
 
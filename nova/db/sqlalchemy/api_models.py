@@ -133,6 +133,8 @@ class InstanceMapping(API_BASE):
     __tablename__ = 'instance_mappings'
     __table_args__ = (Index('project_id_idx', 'project_id'),
                       Index('instance_uuid_idx', 'instance_uuid'),
+                      Index('instance_mappings_user_id_project_id_idx',
+                            'user_id', 'project_id'),
                       schema.UniqueConstraint('instance_uuid',
                           name='uniq_instance_mappings0instance_uuid'))
 
@@ -141,6 +143,7 @@ class InstanceMapping(API_BASE):
     cell_id = Column(Integer, ForeignKey('cell_mappings.id'),
             nullable=True)
     project_id = Column(String(255), nullable=False)
+    user_id = Column(String(255), nullable=True)
     queued_for_delete = Column(Boolean)
     cell_mapping = orm.relationship('CellMapping',
             backref=backref('instance_mapping', uselist=False),
@@ -1854,6 +1854,17 @@ class SelectionObjectsWithOldRPCVersionNotSupported(NovaException):
                 "version %(version)s requested.")
 
 
+class ImageCacheNotYetAvailable(NovaException):
+    msg_fmt = _("Image pre-caching is not supported until all nova-compute "
+                "services are upgraded.")
+    code = 409
+
+
+class SchedulerDiagnosticsNotYetAvailable(NovaException):
+    msg_fmt = _("Scheduler diagnostics are not supported until all "
+                "nova-scheduler services are upgraded.")
+
+
 class LiveMigrationURINotAvailable(NovaException):
     msg_fmt = _('No live migration URI configured and no default available '
                 'for "%(virt_type)s" hypervisor virtualization type.')
@@ -2149,6 +2160,11 @@ class ResourceProviderTraitRetrievalFailed(NovaException):
                 " %(uuid)s")
 
 
+class UsagesRetrievalFailed(NovaException):
+    msg_fmt = _("Failed to retrieve usages for project %(project_id)s and "
+                "user %(user_id)s.")
+
+
 class ResourceProviderCreationFailed(NovaException):
     msg_fmt = _("Failed to create resource provider %(name)s")
 
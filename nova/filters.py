@@ -18,6 +18,7 @@ Filter support
 """
 
 from oslo_log import log as logging
+from oslo_utils import timeutils
 
 from nova.i18n import _LI
 from nova import loadables
@@ -65,6 +66,14 @@ class BaseFilterHandler(loadables.BaseLoader):
     This class should be subclassed where one needs to use filters.
     """
 
+    def _filter_run(self, filter_, start_count, end_count, elapsed):
+        """Called each time a filter has been run against a list of objects,
+        with the number of objects before and after the filter was run and the
+        time it took in seconds. Override this in a subclass to collect
+        statistics about the filters.
+        """
+        pass
+
     def get_filtered_objects(self, filters, objs, spec_obj, index=0):
         list_objs = list(objs)
         LOG.debug("Starting with %d host(s)", len(list_objs))
@@ -82,12 +91,15 @@ class BaseFilterHandler(loadables.BaseLoader):
             if filter_.run_filter_for_index(index):
                 cls_name = filter_.__class__.__name__
                 start_count = len(list_objs)
+                started_at = timeutils.now()
                 objs = filter_.filter_all(list_objs, spec_obj)
                 if objs is None:
                     LOG.debug("Filter %s says to stop filtering", cls_name)
                     return
                 list_objs = list(objs)
                 end_count = len(list_objs)
+                self._filter_run(filter_, start_count, end_count,
+                                 timeutils.now() - started_at)
                 part_filter_results.append(log_msg % {"cls_name": cls_name,
                         "start": start_count, "end": end_count})
                 if list_objs:
@@ -0,0 +1,177 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Download of images from the image cache of peer compute hosts.
+
+Compute hosts advertise the base images held in their image cache in
+memcached every time the image cache manager runs, under one key per host.
+When an image is missing from the image cache of a host, the peer transfer
+copies it from hosts of the same cell which advertised it, and only keeps the
+copy if its checksum matches the one recorded in Glance.
+"""
+
+import hashlib
+import os
+import random
+
+from oslo_log import log as logging
+from oslo_service import periodic_task
+
+from nova import cache_utils
+import nova.conf
+from nova import objects
+from nova import utils
+
+LOG = logging.getLogger(__name__)
+
+CONF = nova.conf.CONF
+
+_KEY = 'image_cache_peer-%s'
+_CHUNK_SIZE = 64 * 1024
+
+
+def _get_client():
+    # NOTE: The advertisements expire after two runs of the image cache
+    # manager, so that the images of dead hosts or purged from their cache are
+    # forgotten. An interval of 0 runs the image cache manager at the default
+    # periodic task spacing, while an expiration time of 0 would keep them
+    # forever.
+    interval = CONF.image_cache_manager_interval
+    if interval <= 0:
+        interval = periodic_task.DEFAULT_INTERVAL
+    return cache_utils.get_memcached_client(expiration_time=int(2 * interval))
+
+
+def advertise(host, base_files):
+    """Advertises the base images held in the image cache of a host.
+
+    The previous advertisement of the host is replaced.
+
+    :param host: The name of the compute host
+    :param base_files: The paths of the base images of the host, named after
+                       the SHA1 hash of their image ID, as created by the
+                       libvirt driver.
+    """
+    client = _get_client()
+    if client is None:
+        LOG.warning('Unable to advertise the image cache to peer compute '
+                    'hosts because [cache]/enabled is False or '
+                    '[cache]/memcache_servers is not set.')
+        return
+    images = {}
+    for path in base_files:
+        images[os.path.basename(path)] = os.path.dirname(path)
+    client.set(_KEY % host, {'address': CONF.my_ip,
+                             'force_raw_images': CONF.force_raw_images,
+                             'images': images})
+    LOG.debug('Advertised %d cached images to peer compute hosts',
+              len(images))
+
+
+def _copy_file(src, dst):
+    # NOTE: this uses the same transport as the libvirt driver to copy disks
+    # between hosts, so that no new trust relationship is needed.
+    if CONF.libvirt.remote_filesystem_transport == 'rsync':
+        utils.execute('rsync', '--sparse', src, dst)
+    else:
+        utils.execute('scp', src, dst)
+
+
+def _md5sum(path):
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+class PeerTransfer(object):
+    """Copies images from the image cache of peer compute hosts."""
+
+    def __init__(self):
+        self._client = _get_client()
+        if self._client is None:
+            LOG.warning('Images will not be downloaded from peer compute '
+                        'hosts because [cache]/enabled is False or '
+                        '[cache]/memcache_servers is not set.')
+
+    def _find_peers(self, context, image):
+        """Returns the (address, path) of the image on the hosts of the cell,
+        other than this one, which hold it in their image cache, in random
+        order.
+        """
+        services = objects.ServiceList.get_by_binary(context.elevated(),
+                                                     'nova-compute')
+        hosts = [service.host for service in services
+                 if service.host != CONF.host and not service.forced_down]
+        if not hosts:
+            return []
+        fname = hashlib.sha1(image['id'].encode('utf-8')).hexdigest()
+        # NOTE: a host which converts images to raw caches a file which
+        # differs from the one in Glance unless the image is already raw.
+        raw = image.get('disk_format') == 'raw'
+        peers = []
+        adverts = self._client.get_multi([_KEY % host for host in hosts])
+        for advert in adverts:
+            if not advert or fname not in advert['images']:
+                continue
+            if advert['force_raw_images'] and not raw:
+                continue
+            peers.append((advert['address'],
+                          os.path.join(advert['images'][fname], fname)))
+        random.shuffle(peers)
+        return peers
+
+    def download(self, context, image, dst_path):
+        """Copies an image from the image cache of a peer compute host.
+
+        :param context: The RequestContext of the download
+        :param image: The image dict, as returned by
+                      GlanceImageServiceV2.show()
+        :param dst_path: The path the image is written to
+        :returns: True if the image was copied and its checksum matches,
+                  False if it should be downloaded from Glance instead.
+        """
+        if self._client is None or not image.get('checksum'):
+            return False
+        try:
+            peers = self._find_peers(context, image)
+        except Exception:
+            LOG.exception('Unable to find peer compute hosts holding image '
+                          '%s', image['id'])
+            return False
+
+        for address, path in peers[:CONF.glance.peer_download_attempts]:
+            src = '%s:%s' % (utils.safe_ip_format(address), path)
+            try:
+                _copy_file(src, dst_path)
+                checksum = _md5sum(dst_path)
+            except Exception as ex:
+                LOG.warning('Unable to copy image %(image)s from peer '
+                            '%(peer)s: %(error)s',
+                            {'image': image['id'], 'peer': address,
+                             'error': ex})
+            else:
+                if checksum == image['checksum']:
+                    LOG.info('Copied image %(image)s from peer %(peer)s',
+                             {'image': image['id'], 'peer': address})
+                    return True
+                LOG.warning('The checksum of image %(image)s copied from '
+                            'peer %(peer)s does not match the one in Glance',
+                            {'image': image['id'], 'peer': address})
+            if os.path.exists(dst_path):
+                os.unlink(dst_path)
+        return False
+
+
+def get_download_handler(**kwargs):
+    return PeerTransfer()
@@ -46,6 +46,7 @@ import six.moves.urllib.parse as urlparse
 import nova.conf
 from nova import exception
 import nova.image.download as image_xfers
+from nova.image.download import peer as peer_xfer
 from nova import objects
 from nova.objects import fields
 from nova import service_auth
@@ -223,6 +224,10 @@ class GlanceImageServiceV2(object):
                           'following error occurred: %(ex)s',
                           {'module_str': str(mod), 'ex': ex})
 
+        self._peer_transfer = None
+        if CONF.glance.enable_peer_download:
+            self._peer_transfer = peer_xfer.get_download_handler()
+
     def show(self, context, image_id, include_locations=False,
              show_deleted=True):
         """Returns a dict with image data for the given opaque image id.
@@ -319,6 +324,12 @@ class GlanceImageServiceV2(object):
                     except Exception:
                         LOG.exception("Download image error")
 
+        if (self._peer_transfer and dst_path is not None and data is None
+                and not self._verification_required(trusted_certs)):
+            image = self.show(context, image_id)
+            if self._peer_transfer.download(context, image, dst_path):
+                return
+
         try:
             image_chunks = self._client.call(context, 2, 'data', image_id)
         except Exception:
@@ -384,6 +395,15 @@ class GlanceImageServiceV2(object):
                     self._safe_fsync(data)
                     data.close()
 
+    @staticmethod
+    def _verification_required(trusted_certs):
+        """Returns True if the signature of images downloaded with the
+        supplied trusted certificates must be verified.
+        """
+        return bool(trusted_certs or CONF.glance.verify_glance_signatures or
+                    (CONF.glance.enable_certificate_validation and
+                     CONF.glance.default_trusted_certificate_ids))
+
     def _get_verifier(self, context, image_id, trusted_certs):
         verifier = None
 
@@ -261,6 +261,17 @@ class NetworkAPI(base.Base):
         """Template method, so a subclass can implement for neutron/network."""
         raise NotImplementedError()
 
+    def get_stale_info_cache_instances(self, context, instances):
+        """Returns the instances whose network info cache does not match the
+        ports attached to them in the networking service.
+
+        :param context: The request context.
+        :param instances: nova.objects.instance.Instance objects, with their
+                          info_cache loaded.
+        :returns: The list of instances whose info_cache needs a refresh.
+        """
+        raise NotImplementedError()
+
     def validate_networks(self, context, requested_networks, num_instances):
         """validate the networks passed at the time of creating
         the server.
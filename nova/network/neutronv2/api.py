@@ -55,6 +55,9 @@ _ADMIN_AUTH = None
 DEFAULT_SECGROUP = 'default'
 BINDING_PROFILE = 'binding:profile'
 BINDING_HOST_ID = 'binding:host_id'
+# Maximum number of device IDs passed to a single port list request, to keep
+# the request URI to a reasonable length.
+MAX_DEVICE_IDS_PER_REQUEST = 100
 MIGRATING_ATTR = 'migrating_to'
 L3_NETWORK_TYPES = ['vxlan', 'gre', 'geneve']
 
@@ -1622,6 +1625,50 @@ class API(base_api.NetworkAPI):
                    {'port_id': port_id, 'reason': exc})
             raise exception.NovaException(message=msg)
 
+    @staticmethod
+    def _get_vif_summary(address, ips, active):
+        return address, frozenset(ips), bool(active)
+
+    def get_stale_info_cache_instances(self, context, instances):
+        """Returns the instances whose network info cache does not match the
+        ports attached to them in neutron.
+
+        The ports of all the instances are listed with as few requests as
+        possible, and compared to the VIFs of the caches on their ID, MAC
+        address, fixed IP addresses and status.
+        """
+        instances_by_uuid = {instance.uuid: instance
+                             for instance in instances}
+        uuids = list(instances_by_uuid)
+        client = get_client(context, admin=True)
+        ports_by_instance = {uuid: {} for uuid in uuids}
+        for i in range(0, len(uuids), MAX_DEVICE_IDS_PER_REQUEST):
+            ports = client.list_ports(
+                device_id=uuids[i:i + MAX_DEVICE_IDS_PER_REQUEST],
+                fields=['id', 'device_id', 'mac_address', 'fixed_ips',
+                        'status']).get('ports', [])
+            for port in ports:
+                ports_by_instance[port['device_id']][port['id']] = (
+                    self._get_vif_summary(
+                        port['mac_address'],
+                        [ip['ip_address'] for ip in port['fixed_ips']],
+                        port['status'] == 'ACTIVE'))
+
+        stale = []
+        for uuid in uuids:
+            instance = instances_by_uuid[uuid]
+            info_cache = instance.info_cache
+            network_info = (info_cache.network_info if info_cache else
+                            None) or []
+            cached_vifs = {vif['id']: self._get_vif_summary(
+                               vif['address'],
+                               [ip['address'] for ip in vif.fixed_ips()],
+                               vif['active'])
+                           for vif in network_info}
+            if cached_vifs != ports_by_instance[uuid]:
+                stale.append(instance)
+        return stale
+
     def _get_instance_nw_info(self, context, instance, networks=None,
                               port_ids=None, admin_client=None,
                               preexisting_port_ids=None,
@@ -452,6 +452,16 @@ class ComputeNodeList(base.ObjectListBase, base.NovaObject):
         return base.obj_make_list(context, cls(context), objects.ComputeNode,
                                   db_computes)
 
+    @classmethod
+    def get_all_changed_since(cls, context, changes_since):
+        """Return the ComputeNode records created, updated or deleted since
+        the given time, deleted records included.
+        """
+        db_computes = db.compute_node_get_all_changed_since(context,
+                                                            changes_since)
+        return base.obj_make_list(context, cls(context), objects.ComputeNode,
+                                  db_computes)
+
     @staticmethod
     @db.select_db_reader_mode
     def _db_compute_node_get_by_hv_type(context, hv_type):
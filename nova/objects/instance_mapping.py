@@ -11,6 +11,9 @@
 #    under the License.
 
 from oslo_utils import versionutils
+from sqlalchemy import false
+from sqlalchemy import func
+from sqlalchemy import or_
 from sqlalchemy.orm import joinedload
 
 from nova import context as nova_context
@@ -27,13 +30,15 @@ from nova.objects import fields
 class InstanceMapping(base.NovaTimestampObject, base.NovaObject):
     # Version 1.0: Initial version
     # Version 1.1: Add queued_for_delete
-    VERSION = '1.1'
+    # Version 1.2: Add user_id
+    VERSION = '1.2'
 
     fields = {
         'id': fields.IntegerField(read_only=True),
         'instance_uuid': fields.UUIDField(),
         'cell_mapping': fields.ObjectField('CellMapping', nullable=True),
         'project_id': fields.StringField(),
+        'user_id': fields.StringField(nullable=True),
         'queued_for_delete': fields.BooleanField(default=False),
         }
 
@@ -41,6 +46,9 @@ class InstanceMapping(base.NovaTimestampObject, base.NovaObject):
         super(InstanceMapping, self).obj_make_compatible(primitive,
                                                          target_version)
         target_version = versionutils.convert_version_to_tuple(target_version)
+        if target_version < (1, 2):
+            if 'user_id' in primitive:
+                del primitive['user_id']
         if target_version < (1, 1):
             if 'queued_for_delete' in primitive:
                 del primitive['queued_for_delete']
@@ -186,12 +194,54 @@ def populate_queued_for_delete(context, max_count):
     return processed, processed
 
 
+@db_api.api_context_manager.writer
+def populate_user_id(context, max_count):
+    cells = objects.CellMappingList.get_all(context)
+    processed = 0
+    for cell in cells:
+        # Get the instance mappings of this cell which do not have a user_id
+        # yet. The user_id of the instances which are queued for deletion is
+        # not needed to count them in quota usage.
+        ims = (
+            context.session.query(api_models.InstanceMapping)
+            .filter(api_models.InstanceMapping.user_id == None)  # noqa
+            .filter(or_(
+                api_models.InstanceMapping.queued_for_delete == false(),
+                api_models.InstanceMapping.queued_for_delete == None))  # noqa
+            .filter(api_models.InstanceMapping.cell_id == cell.id)
+            .limit(max_count).all())
+        if not ims:
+            continue
+        ims_by_inst = {im.instance_uuid: im for im in ims}
+        with nova_context.target_cell(context, cell) as cctxt:
+            filters = {'uuid': list(ims_by_inst.keys())}
+            instances = objects.InstanceList.get_by_filters(
+                cctxt.elevated(read_deleted='yes'), filters,
+                expected_attrs=[])
+        for instance in instances:
+            im = ims_by_inst.pop(instance.uuid)
+            im.user_id = instance.user_id
+            context.session.add(im)
+        # The instances of the remaining mappings were purged from the cell
+        # database, so they are queued for deletion as far as we can tell.
+        for orphan_im in ims_by_inst.values():
+            orphan_im.queued_for_delete = True
+            context.session.add(orphan_im)
+        processed += len(ims)
+        max_count -= len(ims)
+        if max_count <= 0:
+            break
+
+    return processed, processed
+
+
 @base.NovaObjectRegistry.register
 class InstanceMappingList(base.ObjectListBase, base.NovaObject):
     # Version 1.0: Initial version
     # Version 1.1: Added get_by_cell_id method.
     # Version 1.2: Added get_by_instance_uuids method
-    VERSION = '1.2'
+    # Version 1.3: Added get_counts method
+    VERSION = '1.3'
 
     fields = {
         'objects': fields.ListOfObjectsField('InstanceMapping'),
@@ -249,3 +299,39 @@ class InstanceMappingList(base.ObjectListBase, base.NovaObject):
     @classmethod
     def destroy_bulk(cls, context, instance_uuids):
         return cls._destroy_bulk_in_db(context, instance_uuids)
+
+    @staticmethod
+    @db_api.api_context_manager.reader
+    def _get_counts_in_db(context, project_id, user_id=None):
+        # NOTE: queued_for_delete is NULL until an instance is deleted or
+        # restored, or until the populate_queued_for_delete online data
+        # migration ran.
+        not_queued_for_delete = or_(
+            api_models.InstanceMapping.queued_for_delete == false(),
+            api_models.InstanceMapping.queued_for_delete == None)  # noqa
+        project_query = context.session.query(
+            func.count(api_models.InstanceMapping.id)).\
+            filter(not_queued_for_delete).\
+            filter_by(project_id=project_id)
+        counts = {'project': {'instances': project_query.scalar()}}
+        if user_id:
+            user_count = project_query.filter_by(user_id=user_id).scalar()
+            counts['user'] = {'instances': user_count}
+        return counts
+
+    @base.remotable_classmethod
+    def get_counts(cls, context, project_id, user_id=None):
+        """Get the counts of InstanceMapping objects in the database.
+
+        Instances which are queued for deletion are not counted.
+
+        :param context: The request context for database access
+        :param project_id: The project_id to count across
+        :param user_id: The user_id to count across
+        :returns: A dict containing the project-scoped counts and user-scoped
+                  counts if user_id is specified. For example:
+
+                    {'project': {'instances': <count across project>},
+                     'user': {'instances': <count across user>}}
+        """
+        return cls._get_counts_in_db(context, project_id, user_id=user_id)
@@ -31,7 +31,7 @@ LOG = logging.getLogger(__name__)
 
 
 # NOTE(danms): This is the global service version counter
-SERVICE_VERSION = 35
+SERVICE_VERSION = 36
 
 
 # NOTE(danms): This is our SERVICE_VERSION history. The idea is that any
@@ -146,6 +146,8 @@ SERVICE_VERSION_HISTORY = (
     # Version 35: Indicates that nova-compute supports live migration with
     # ports bound early on the destination host using VIFMigrateData.
     {'compute_rpc': '5.0'},
+    # Version 36: Compute RPC version 5.1: Add cache_images()
+    {'compute_rpc': '5.1'},
 )
 
 
@@ -587,6 +589,16 @@ class ServiceList(base.ObjectListBase, base.NovaObject):
         return base.obj_make_list(context, cls(context), objects.Service,
                                   db_services)
 
+    @classmethod
+    def get_by_binary_changed_since(cls, context, binary, changes_since):
+        """Return the services of a binary created, updated or deleted since
+        the given time, deleted services included.
+        """
+        db_services = db.service_get_all_by_binary_changed_since(
+            context, binary, changes_since)
+        return base.obj_make_list(context, cls(context), objects.Service,
+                                  db_services)
+
     @base.remotable_classmethod
     def get_by_host(cls, context, host):
         db_services = db.service_get_all_by_host(context, host)
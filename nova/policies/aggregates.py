@@ -92,6 +92,16 @@ aggregates_policies = [
                 'method': 'DELETE'
             }
         ]),
+    policy.DocumentedRuleDefault(
+        POLICY_ROOT % 'cache_images',
+        base.RULE_ADMIN_API,
+        "Request that the hosts of an aggregate cache images",
+        [
+            {
+                'path': '/os-aggregates/{aggregate_id}/action (cache_images)',
+                'method': 'POST'
+            }
+        ]),
     policy.DocumentedRuleDefault(
         POLICY_ROOT % 'show',
         base.RULE_ADMIN_API,
@@ -26,12 +26,16 @@ from nova import context as nova_context
 from nova.db import api as db
 from nova import exception
 from nova import objects
+from nova.scheduler.client import report
 from nova import utils
 
 LOG = logging.getLogger(__name__)
 
 
 CONF = nova.conf.CONF
+# Lazily created by _get_placement_client() when usage is counted from
+# placement.
+PLACEMENT_CLIENT = None
 
 
 class DbQuotaDriver(object):
@@ -1311,26 +1315,38 @@ def _floating_ip_count(context, project_id):
     return {'project': {'floating_ips': count}}
 
 
-def _instances_cores_ram_count(context, project_id, user_id=None):
-    """Get the counts of instances, cores, and ram in the database.
+def _get_placement_client():
+    global PLACEMENT_CLIENT
+    if PLACEMENT_CLIENT is None:
+        PLACEMENT_CLIENT = report.SchedulerReportClient()
+    return PLACEMENT_CLIENT
 
-    :param context: The request context for database access
-    :param project_id: The project_id to count across
-    :param user_id: The user_id to count across
-    :returns: A dict containing the project-scoped counts and user-scoped
-              counts if user_id is specified. For example:
 
-                {'project': {'instances': <count across project>,
-                             'cores': <count across project>,
-                             'ram': <count across project>},
-                 'user': {'instances': <count across user>,
-                          'cores': <count across user>,
-                          'ram': <count across user>}}
+def _instances_cores_ram_count_api_db_placement(context, project_id,
+                                                user_id=None):
+    """Get the counts of instances from the API database, and of cores and
+    ram from placement.
+
+    See _instances_cores_ram_count() for the parameters and return value.
     """
-    # TODO(melwitt): Counting across cells for instances means we will miss
-    # counting resources if a cell is down. In the future, we should query
-    # placement for cores/ram and InstanceMappings for instances (once we are
-    # deleting InstanceMappings when we delete instances).
+    total_counts = objects.InstanceMappingList.get_counts(context,
+                                                          project_id,
+                                                          user_id=user_id)
+    cores_ram = _get_placement_client().get_usages_counts_for_quota(
+        context, project_id, user_id=user_id)
+    for scope, counts in cores_ram.items():
+        total_counts[scope].update(counts)
+    return total_counts
+
+
+def _instances_cores_ram_count_legacy(context, project_id, user_id=None):
+    """Get the counts of instances, cores, and ram in the cell databases.
+
+    See _instances_cores_ram_count() for the parameters and return value.
+    """
+    # NOTE(melwitt): Counting across cells for instances means we will miss
+    # counting resources if a cell is down. Counting from placement and the
+    # API database with [quota]count_usage_from_placement avoids this.
     results = nova_context.scatter_gather_all_cells(
         context, objects.InstanceList.get_counts, project_id, user_id=user_id)
     total_counts = {'project': {'instances': 0, 'cores': 0, 'ram': 0}}
@@ -1347,6 +1363,32 @@ def _instances_cores_ram_count(context, project_id, user_id=None):
     return total_counts
 
 
+def _instances_cores_ram_count(context, project_id, user_id=None):
+    """Get the counts of instances, cores, and ram.
+
+    They are counted from the cell databases, or from the API database and
+    placement if [quota]count_usage_from_placement is True.
+
+    :param context: The request context for database access
+    :param project_id: The project_id to count across
+    :param user_id: The user_id to count across
+    :returns: A dict containing the project-scoped counts and user-scoped
+              counts if user_id is specified. For example:
+
+                {'project': {'instances': <count across project>,
+                             'cores': <count across project>,
+                             'ram': <count across project>},
+                 'user': {'instances': <count across user>,
+                          'cores': <count across user>,
+                          'ram': <count across user>}}
+    """
+    if CONF.quota.count_usage_from_placement:
+        return _instances_cores_ram_count_api_db_placement(
+            context, project_id, user_id=user_id)
+    return _instances_cores_ram_count_legacy(context, project_id,
+                                             user_id=user_id)
+
+
 def _server_group_count(context, project_id, user_id=None):
     """Get the counts of server groups in the database.
 
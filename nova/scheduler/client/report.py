@@ -47,6 +47,8 @@ _RE_INV_IN_USE = re.compile("Inventory for (.+) on resource provider "
                             "(.+) in use")
 WARN_EVERY = 10
 PLACEMENT_CLIENT_SEMAPHORE = 'placement_client'
+PROVIDER_TREE_VERSION = '1.31'
+COMPACT_AC_VERSION = '1.30'
 CONSUMER_GENERATION_VERSION = '1.28'
 GRANULAR_AC_VERSION = '1.25'
 ALLOW_RESERVED_EQUAL_TOTAL_INVENTORY_VERSION = '1.26'
@@ -54,6 +56,7 @@ POST_RPS_RETURNS_PAYLOAD_API_VERSION = '1.20'
 AGGREGATE_GENERATION_VERSION = '1.19'
 NESTED_PROVIDER_API_VERSION = '1.14'
 POST_ALLOCATIONS_API_VERSION = '1.13'
+GET_USAGES_VERSION = '1.9'
 
 AggInfo = collections.namedtuple('AggInfo', ['aggregates', 'generation'])
 TraitInfo = collections.namedtuple('TraitInfo', ['traits', 'generation'])
@@ -265,9 +268,14 @@ class SchedulerReportClient(object):
         self._provider_tree = provider_tree.ProviderTree()
         # Track the last time we updated providers' aggregates and traits
         self._association_refresh_time = {}
+        # Allocations against resource providers, keyed by provider UUID, see
+        # get_allocations_for_resource_provider
+        self._allocation_cache = {}
         self._client = self._create_client()
         # NOTE(danms): Keep track of how naggy we've been
         self._warn_count = 0
+        # Number of placement API requests made, keyed by HTTP method
+        self._call_counts = collections.Counter()
 
     @utils.synchronized(PLACEMENT_CLIENT_SEMAPHORE)
     def _create_client(self):
@@ -275,18 +283,32 @@ class SchedulerReportClient(object):
         # Flush provider tree and associations so we start from a clean slate.
         self._provider_tree = provider_tree.ProviderTree()
         self._association_refresh_time = {}
+        self._allocation_cache = {}
         client = self._adapter or utils.get_ksa_adapter('placement')
         # Set accept header on every request to ensure we notify placement
         # service of our response body media type preferences.
         client.additional_headers = {'accept': 'application/json'}
         return client
 
+    def get_call_counts(self):
+        """Returns a dict, keyed by HTTP method ('GET', 'POST', 'PUT' and
+        'DELETE'), of the number of requests made to the placement API by
+        this client since it was created.
+        """
+        return dict(self._call_counts)
+
+    def _count_writes(self):
+        return sum(count for method, count in self._call_counts.items()
+                   if method != 'GET')
+
     def get(self, url, version=None, global_request_id=None):
+        self._call_counts['GET'] += 1
         headers = ({request_id.INBOUND_HEADER: global_request_id}
                    if global_request_id else {})
         return self._client.get(url, microversion=version, headers=headers)
 
     def post(self, url, data, version=None, global_request_id=None):
+        self._call_counts['POST'] += 1
         headers = ({request_id.INBOUND_HEADER: global_request_id}
                    if global_request_id else {})
         # NOTE(sdague): using json= instead of data= sets the
@@ -297,6 +319,7 @@ class SchedulerReportClient(object):
                                  headers=headers)
 
     def put(self, url, data, version=None, global_request_id=None):
+        self._call_counts['PUT'] += 1
         # NOTE(sdague): using json= instead of data= sets the
         # media type to application/json for us. Placement API is
         # more sensitive to this than other APIs in the OpenStack
@@ -309,6 +332,7 @@ class SchedulerReportClient(object):
         return self._client.put(url, **kwargs)
 
     def delete(self, url, version=None, global_request_id=None):
+        self._call_counts['DELETE'] += 1
         headers = ({request_id.INBOUND_HEADER: global_request_id}
                    if global_request_id else {})
         return self._client.delete(url, microversion=version, headers=headers)
@@ -348,11 +372,23 @@ class SchedulerReportClient(object):
         """
         version = GRANULAR_AC_VERSION
         qparams = resources.to_querystring()
+        compact = CONF.scheduler.compact_placement_results
+        if compact:
+            version = COMPACT_AC_VERSION
+            qparams += '&format=compact'
         url = "/allocation_candidates?%s" % qparams
         resp = self.get(url, version=version,
                         global_request_id=context.global_id)
         if resp.status_code == 200:
             data = resp.json()
+            if compact:
+                alloc_reqs, p_sums = (
+                    scheduler_utils.decode_compact_allocation_candidates(data))
+                # NOTE: the decoded allocation requests have the same shape
+                # as the ones of the full format at GRANULAR_AC_VERSION, and
+                # claiming them at COMPACT_AC_VERSION would require to send
+                # the generation of the consumer.
+                return alloc_reqs, p_sums, GRANULAR_AC_VERSION
             return (data['allocation_requests'], data['provider_summaries'],
                     version)
 
@@ -710,6 +746,7 @@ class SchedulerReportClient(object):
             except ValueError:
                 pass
             self._association_refresh_time.pop(rp_uuid, None)
+            self._allocation_cache.pop(rp_uuid, None)
             return
 
         msg = ("[%(placement_req_id)s] Failed to delete resource provider "
@@ -1007,8 +1044,11 @@ class SchedulerReportClient(object):
         # Ensure inventories are up to date (for *all* cached RPs)
         for uuid in self._provider_tree.get_provider_uuids():
             self._refresh_and_get_inventory(context, uuid)
-        # Return a *copy* of the tree.
-        return copy.deepcopy(self._provider_tree)
+        # Return a *copy* of the tree, marked clean so that
+        # update_from_provider_tree only flushes what the caller changes.
+        prov_tree = copy.deepcopy(self._provider_tree)
+        prov_tree.mark_clean()
+        return prov_tree
 
     def set_inventory_for_provider(self, context, rp_uuid, rp_name, inv_data,
                                    parent_provider_uuid=None):
@@ -1414,6 +1454,115 @@ class SchedulerReportClient(object):
         # when we invoke the DELETE.  See bug #1746374.
         self._update_inventory(context, compute_node.uuid, inv_data)
 
+    def _get_provider_state_changes(self, pd, dirty):
+        """Returns a dict with the 'inventories', 'traits' and/or
+        'aggregates' of the specified provider data which are among the dirty
+        fields and differ from the local cache, in the format expected by
+        PUT /resource_providers/{uuid}/tree.
+        """
+        state = {}
+        if not self._provider_tree.exists(pd.uuid):
+            # We failed to create the provider, there is nothing to update
+            return state
+        if ('inventory' in dirty and
+                self._provider_tree.has_inventory_changed(
+                    pd.uuid, pd.inventory)):
+            state['inventories'] = pd.inventory
+        if ('traits' in dirty and
+                self._provider_tree.have_traits_changed(pd.uuid, pd.traits)):
+            state['traits'] = list(pd.traits)
+        if ('aggregates' in dirty and
+                self._provider_tree.have_aggregates_changed(
+                    pd.uuid, pd.aggregates)):
+            state['aggregates'] = list(pd.aggregates)
+        return state
+
+    @safe_connect
+    def _set_provider_tree_state(self, context, root_uuid, states):
+        """Sets the inventories, traits and/or aggregates of several
+        providers of the same tree with a single request to placement.
+
+        :param context: The security context
+        :param root_uuid: The UUID of the root provider of the tree.
+        :param states: Dict, keyed by provider UUID, of dicts with the
+                       'inventories', 'traits' and/or 'aggregates' to set for
+                       the provider.
+        :raises: InventoryInUse if the states indicate removal of inventory in
+                 a resource class which has active allocations.
+        :raises: InvalidResourceClass if the states contain a resource class
+                 which cannot be created.
+        :raises: TraitCreationFailed or TraitRetrievalFailed if the traits in
+                 the states could not be ensured.
+        :raises: ResourceProviderUpdateConflict if the generation of any of the
+                 providers doesn't match the generation in the cache.
+        :raises: ResourceProviderUpdateFailed on any other placement API
+                 failure.
+        """
+        resource_classes = set()
+        traits = set()
+        for state in states.values():
+            resource_classes |= set(state.get('inventories', {}))
+            traits |= set(state.get('traits', []))
+        self._ensure_resource_classes(context, resource_classes)
+        self._ensure_traits(context, traits)
+
+        payload = {}
+        for rp_uuid, state in states.items():
+            payload[rp_uuid] = dict(
+                state, resource_provider_generation=self._provider_tree.data(
+                    rp_uuid).generation)
+        url = '/resource_providers/%s/tree' % root_uuid
+        resp = self.put(url, {'resource_providers': payload},
+                        version=PROVIDER_TREE_VERSION,
+                        global_request_id=context.global_id)
+
+        if resp.status_code == 200:
+            generations = resp.json()['resource_providers']
+            for rp_uuid, state in states.items():
+                generation = generations[rp_uuid][
+                    'resource_provider_generation']
+                if 'inventories' in state:
+                    self._provider_tree.update_inventory(
+                        rp_uuid, state['inventories'], generation=generation)
+                if 'traits' in state:
+                    self._provider_tree.update_traits(
+                        rp_uuid, state['traits'], generation=generation)
+                if 'aggregates' in state:
+                    self._provider_tree.update_aggregates(
+                        rp_uuid, state['aggregates'], generation=generation)
+            return
+
+        # Some error occurred; log it
+        msg = ("[%(placement_req_id)s] Failed to update the resource "
+               "providers %(uuids)s of the tree of resource provider "
+               "%(uuid)s.  Got %(status_code)d: %(err_text)s")
+        args = {
+            'placement_req_id': get_placement_request_id(resp),
+            'uuids': ','.join(states),
+            'uuid': root_uuid,
+            'status_code': resp.status_code,
+            'err_text': resp.text,
+        }
+        LOG.error(msg, args)
+
+        if resp.status_code == 409:
+            # If a conflict attempting to remove inventory in a resource class
+            # with active allocations, raise InventoryInUse
+            match = _RE_INV_IN_USE.search(resp.text)
+            if match:
+                raise exception.InventoryInUse(
+                    resource_classes=match.group(1),
+                    resource_provider=match.group(2),
+                )
+            # Other conflicts are generation mismatch: raise conflict exception
+            raise exception.ResourceProviderUpdateConflict(
+                uuid=root_uuid,
+                generation=self._provider_tree.data(root_uuid).generation,
+                error=resp.text)
+
+        # Otherwise, raise generic exception
+        raise exception.ResourceProviderUpdateFailed(url=url, error=resp.text)
+
     def update_from_provider_tree(self, context, new_tree):
         """Flush changes from a specified ProviderTree back to placement.
 
@@ -1421,6 +1570,16 @@ class SchedulerReportClient(object):
         changes are flushed back to the placement service.  Upon successful
         completion, the local cache should reflect the specified ProviderTree.
 
+        Only the inventory, traits and aggregates which are dirty in the
+        specified ProviderTree are flushed for providers which already exist
+        in the local cache. Trees returned by get_provider_tree_and_ensure_root
+        are marked clean, so that an unmodified tree results in no placement
+        writes at all.
+
+        If the bulk_provider_tree_updates option is enabled, the changes to the
+        inventories, traits and aggregates of the providers of each tree are
+        flushed with a single PUT /resource_providers/{uuid}/tree request.
+
         This method is best-effort and not atomic.  When exceptions are raised,
         it is possible that some of the changes have been flushed back, leaving
         the placement database in an inconsistent state.  This should be
@@ -1481,6 +1640,7 @@ class SchedulerReportClient(object):
         old_tree = self._provider_tree
         old_uuids = old_tree.get_provider_uuids()
         new_uuids = new_tree.get_provider_uuids()
+        writes_before = self._count_writes()
 
         # Do provider deletion first, since it has the best chance of failing
         # for non-generation-conflict reasons (i.e. allocations).
@@ -1517,16 +1677,55 @@ class SchedulerReportClient(object):
         # its descendants are also removed, and set_*_for_provider methods on
         # it wouldn't be able to get started. Walking the tree in bottom-up
         # order ensures we at least try to process all of the providers.
+        # Providers which were already in the cache only need the fields the
+        # caller changed to be flushed.
+        skipped = 0
+        bulk = CONF.bulk_provider_tree_updates
+        # Changes to flush in bulk, keyed by root provider UUID and then by
+        # provider UUID
+        states_by_root = collections.defaultdict(dict)
+        root_uuids = {}
+        for uuid in new_uuids:
+            parent_uuid = new_tree.data(uuid).parent_uuid
+            root_uuids[uuid] = root_uuids[parent_uuid] if parent_uuid else uuid
         for uuid in reversed(new_uuids):
             pd = new_tree.data(uuid)
+            if uuid in uuids_to_add:
+                dirty = set(['inventory', 'aggregates', 'traits'])
+            else:
+                dirty = new_tree.get_dirty_fields(uuid)
+            if not dirty:
+                skipped += 1
+                continue
+            if bulk:
+                state = self._get_provider_state_changes(pd, dirty)
+                if state:
+                    states_by_root[root_uuids[uuid]][uuid] = state
+                continue
             with catch_all(pd.uuid) as status:
-                self._set_inventory_for_provider(
-                    context, pd.uuid, pd.inventory)
-                self.set_aggregates_for_provider(
-                    context, pd.uuid, pd.aggregates)
-                self.set_traits_for_provider(context, pd.uuid, pd.traits)
+                if 'inventory' in dirty:
+                    self._set_inventory_for_provider(
+                        context, pd.uuid, pd.inventory)
+                if 'aggregates' in dirty:
+                    self.set_aggregates_for_provider(
+                        context, pd.uuid, pd.aggregates)
+                if 'traits' in dirty:
+                    self.set_traits_for_provider(context, pd.uuid, pd.traits)
+            success = success and status.success
+
+        for root_uuid, states in states_by_root.items():
+            # A failure invalidates the cache of the whole tree, since none
+            # of its changes were made.
+            with catch_all(root_uuid) as status:
+                self._set_provider_tree_state(context, root_uuid, states)
             success = success and status.success
 
+        LOG.debug("Flushed provider tree with %(total)d providers to "
+                  "placement, %(skipped)d of them were unchanged; "
+                  "%(writes)d placement writes were made.",
+                  {'total': len(new_uuids), 'skipped': skipped,
+                   'writes': self._count_writes() - writes_before})
+
         if not success:
             raise exception.ResourceProviderSyncFailed()
 
@@ -1684,6 +1883,71 @@ class SchedulerReportClient(object):
                      'text': r.text})
         return r.status_code == 204
 
+    @safe_connect
+    @retries
+    def claim_resources_batch(self, context, alloc_requests, project_id,
+                              user_id, allocation_request_version=None):
+        """Creates allocation records for several consumers in a single
+        POST /allocations call.
+
+        Placement writes the allocations of all the consumers in one
+        transaction, so either all of them or none of them are created.
+
+        Unlike claim_resources(), this does not look for existing allocations
+        of the consumers in order to double them up for a move operation, so
+        it must only be used for consumers which do not have any allocations
+        yet, like instances being created.
+
+        :param context: The security context
+        :param alloc_requests: Dict, keyed by consumer UUID, of the JSON body
+                               of the allocation request to make for that
+                               consumer, as returned by GET
+                               /allocation_candidates.
+        :param project_id: The project_id associated with the allocations.
+        :param user_id: The user_id associated with the allocations.
+        :param allocation_request_version: The microversion used to request the
+                                           allocations.
+        :returns: True if the allocations were created, False otherwise.
+        """
+        allocation_request_version = allocation_request_version or '1.10'
+        old_format = versionutils.convert_version_to_tuple(
+            allocation_request_version) < (1, 12)
+        payload = {}
+        for consumer_uuid, alloc_request in alloc_requests.items():
+            if old_format:
+                allocations = {
+                    alloc['resource_provider']['uuid']: {
+                        'resources': alloc['resources']
+                    } for alloc in alloc_request['allocations']
+                }
+            else:
+                allocations = copy.deepcopy(alloc_request['allocations'])
+            payload[consumer_uuid] = {
+                'allocations': allocations,
+                'project_id': project_id,
+                'user_id': user_id,
+            }
+
+        r = self.post('/allocations', payload,
+                      version=POST_ALLOCATIONS_API_VERSION,
+                      global_request_id=context.global_id)
+        if r.status_code != 204:
+            # NOTE(jaypipes): Yes, it sucks doing string comparison like this
+            # but we have no error codes, only error messages.
+            if 'concurrently updated' in r.text:
+                reason = ('another process changed the resource providers '
+                          'involved in our attempt to post allocations for '
+                          'consumers %s' % ', '.join(alloc_requests))
+                raise Retry('claim_resources_batch', reason)
+            else:
+                LOG.warning(
+                    'Unable to post allocations for instances '
+                    '%(uuids)s (%(code)i %(text)s)',
+                    {'uuids': ', '.join(alloc_requests),
+                     'code': r.status_code,
+                     'text': r.text})
+        return r.status_code == 204
+
     @safe_connect
     def remove_provider_from_instance_allocation(self, context, consumer_uuid,
                                                  rp_uuid, user_id, project_id,
@@ -1929,14 +2193,58 @@ class SchedulerReportClient(object):
         else:
             self.delete_allocation_for_instance(context, instance.uuid)
 
+    def _get_allocations_version(self, context, rp_uuid):
+        """Returns a hashable value which changes whenever the allocations
+        against the specified resource provider change, or None if it could
+        not be retrieved.
+
+        Placement increments the generation of a provider when allocations
+        against it are created or replaced, but not when they are deleted.
+        Deleting allocations always changes the usages of the provider, so
+        the pair of both is used.
+        """
+        url = '/resource_providers/%s/usages' % rp_uuid
+        resp = self.get(url, global_request_id=context.global_id)
+        if not resp:
+            return None
+        data = resp.json()
+        return (data['resource_provider_generation'],
+                frozenset(data['usages'].items()))
+
     @safe_connect
-    def get_allocations_for_resource_provider(self, context, rp_uuid):
+    def get_allocations_for_resource_provider(self, context, rp_uuid,
+                                              use_cache=False):
+        """Returns a dict, keyed by consumer UUID, of the allocations against
+        the specified resource provider.
+
+        :param context: The security context
+        :param rp_uuid: UUID of the resource provider
+        :param use_cache: If True, the allocations are cached and are only
+                          retrieved again when the generation or the usages of
+                          the provider changed since they were last retrieved,
+                          which is checked with a much cheaper request to
+                          placement.
+        """
+        version = None
+        if use_cache:
+            version = self._get_allocations_version(context, rp_uuid)
+            cached = self._allocation_cache.get(rp_uuid)
+            if version is not None and cached and cached[0] == version:
+                LOG.debug("Allocations against resource provider %s have not "
+                          "changed, using the cached ones.", rp_uuid)
+                return dict(cached[1])
+
         url = '/resource_providers/%s/allocations' % rp_uuid
         resp = self.get(url, global_request_id=context.global_id)
         if not resp:
+            self._allocation_cache.pop(rp_uuid, None)
             return {}
-        else:
-            return resp.json()['allocations']
+        allocations = resp.json()['allocations']
+        # NOTE: The version is read before the allocations, so any change
+        # made in between is detected by the next call.
+        if version is not None:
+            self._allocation_cache[rp_uuid] = (version, dict(allocations))
+        return allocations
 
     def delete_resource_provider(self, context, compute_node, cascade=False):
         """Deletes the ResourceProvider record for the compute_node.
@@ -2101,3 +2409,53 @@ class SchedulerReportClient(object):
         new_aggs = existing_aggs - set([agg_uuid])
         self.set_aggregates_for_provider(
             context, rp_uuid, new_aggs, use_cache=False, generation=gen)
+
+    def _get_usages(self, context, project_id, user_id=None):
+        url = '/usages?project_id=%s' % project_id
+        if user_id:
+            url += '&user_id=%s' % user_id
+        try:
+            resp = self.get(url, version=GET_USAGES_VERSION,
+                            global_request_id=context.global_id)
+        except ks_exc.ClientException as ex:
+            LOG.error('Failed to retrieve usages from placement: %s', ex)
+            resp = None
+        if not resp:
+            if resp is not None:
+                LOG.error('Failed to retrieve usages from placement. Got '
+                          '%(status)d: %(err)s',
+                          {'status': resp.status_code, 'err': resp.text})
+            raise exception.UsagesRetrievalFailed(project_id=project_id,
+                                                  user_id=user_id)
+        return resp.json()['usages']
+
+    def get_usages_counts_for_quota(self, context, project_id, user_id=None):
+        """Get the cores and ram usage of a project and user from placement.
+
+        Unlike most methods of this client, this raises instead of returning
+        None when placement can not be reached, as quota must not be
+        enforced against incomplete usage.
+
+        :param context: The nova.context.RequestContext auth context
+        :param project_id: The project_id to count across
+        :param user_id: The user_id to count across
+        :returns: A dict containing the project-scoped counts and user-scoped
+                  counts if user_id is specified. For example:
+
+                    {'project': {'cores': <count across project>,
+                                 'ram': <count across project>},
+                     'user': {'cores': <count across user>,
+                              'ram': <count across user>}}
+        :raises: UsagesRetrievalFailed if placement can not be reached or
+                 returns an error
+        """
+        def _to_counts(usages):
+            return {'cores': usages.get(VCPU, 0),
+                    'ram': usages.get(MEMORY_MB, 0)}
+
+        counts = {'project': _to_counts(
+            self._get_usages(context, project_id))}
+        if user_id:
+            counts['user'] = _to_counts(
+                self._get_usages(context, project_id, user_id=user_id))
+        return counts
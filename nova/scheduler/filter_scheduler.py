@@ -22,6 +22,7 @@ Weighing Functions.
 import random
 
 from oslo_log import log as logging
+from oslo_utils import importutils
 from six.moves import range
 
 import nova.conf
@@ -44,6 +45,8 @@ class FilterScheduler(driver.Scheduler):
         self.notifier = rpc.get_notifier('scheduler')
         scheduler_client = client.SchedulerClient()
         self.placement_client = scheduler_client.reportclient
+        self.alloc_req_scorer = importutils.import_object(
+            CONF.filter_scheduler.allocation_request_scorer)
 
     def select_destinations(self, context, spec_obj, instance_uuids,
             alloc_reqs_by_rp_uuid, provider_summaries,
@@ -177,6 +180,18 @@ class FilterScheduler(driver.Scheduler):
                                            hosts, num_alts,
                                            instance_uuids=instance_uuids)
 
+        # Order the allocation_requests of each host so that the most
+        # suitable one is tried first when claiming, and is the one returned
+        # for the alternates.
+        alloc_reqs_by_rp_uuid = self._sort_alloc_reqs(alloc_reqs_by_rp_uuid,
+                                                      provider_summaries)
+
+        if (CONF.filter_scheduler.batch_allocation_claims and
+                num_instances > 1 and not utils.request_is_rebuild(spec_obj)):
+            return self._schedule_batch(context, spec_obj, instance_uuids,
+                    hosts, alloc_reqs_by_rp_uuid, allocation_request_version,
+                    num_alts)
+
         # A list of the instance UUIDs that were successfully claimed against
         # in the placement API. If we are not able to successfully claim for
         # all involved instances, we use this list to remove those allocations
@@ -186,6 +201,10 @@ class FilterScheduler(driver.Scheduler):
         # The list of hosts that have been selected (and claimed).
         claimed_hosts = []
 
+        # The allocation_requests that were claimed for each of the
+        # claimed_hosts.
+        claimed_alloc_reqs = []
+
         for num, instance_uuid in enumerate(instance_uuids):
             # In a multi-create request, the first request spec from the list
             # is passed to the scheduler and that request spec's instance_uuid
@@ -206,33 +225,9 @@ class FilterScheduler(driver.Scheduler):
                 # _ensure_sufficient_hosts() call.
                 break
 
-            # Attempt to claim the resources against one or more resource
-            # providers, looping over the sorted list of possible hosts
-            # looking for an allocation_request that contains that host's
-            # resource provider UUID
-            claimed_host = None
-            for host in hosts:
-                cn_uuid = host.uuid
-                if cn_uuid not in alloc_reqs_by_rp_uuid:
-                    msg = ("A host state with uuid = '%s' that did not have a "
-                          "matching allocation_request was encountered while "
-                          "scheduling. This host was skipped.")
-                    LOG.debug(msg, cn_uuid)
-                    continue
-
-                alloc_reqs = alloc_reqs_by_rp_uuid[cn_uuid]
-                # TODO(jaypipes): Loop through all allocation_requests instead
-                # of just trying the first one. For now, since we'll likely
-                # want to order the allocation_requests in the future based on
-                # information in the provider summaries, we'll just try to
-                # claim resources using the first allocation_request
-                alloc_req = alloc_reqs[0]
-                if utils.claim_resources(elevated, self.placement_client,
-                        spec_obj, instance_uuid, alloc_req,
-                        allocation_request_version=allocation_request_version):
-                    claimed_host = host
-                    break
-
+            claimed_host, claimed_alloc_req = self._claim_host(elevated,
+                    spec_obj, instance_uuid, hosts, alloc_reqs_by_rp_uuid,
+                    allocation_request_version)
             if claimed_host is None:
                 # We weren't able to claim resources in the placement API
                 # for any of the sorted hosts identified. So, clean up any
@@ -244,6 +239,7 @@ class FilterScheduler(driver.Scheduler):
 
             claimed_instance_uuids.append(instance_uuid)
             claimed_hosts.append(claimed_host)
+            claimed_alloc_reqs.append(claimed_alloc_req)
 
             # Now consume the resources so the filter/weights will change for
             # the next instance.
@@ -259,9 +255,166 @@ class FilterScheduler(driver.Scheduler):
         # find alternates for each host.
         selections_to_return = self._get_alternate_hosts(
             claimed_hosts, spec_obj, hosts, num, num_alts,
-            alloc_reqs_by_rp_uuid, allocation_request_version)
+            alloc_reqs_by_rp_uuid, allocation_request_version,
+            selected_alloc_reqs=claimed_alloc_reqs)
         return selections_to_return
 
+    def _sort_alloc_reqs(self, alloc_reqs_by_rp_uuid, provider_summaries):
+        """Returns a copy of alloc_reqs_by_rp_uuid where the
+        allocation_requests of each resource provider are ordered by the
+        configured allocation request scorer.
+        """
+        sorted_alloc_reqs = {}
+        for rp_uuid, alloc_reqs in alloc_reqs_by_rp_uuid.items():
+            if len(alloc_reqs) > 1:
+                alloc_reqs = self.alloc_req_scorer.sort(alloc_reqs,
+                                                        provider_summaries)
+            sorted_alloc_reqs[rp_uuid] = alloc_reqs
+        return sorted_alloc_reqs
+
+    def _schedule_batch(self, context, spec_obj, instance_uuids, hosts,
+            alloc_reqs_by_rp_uuid, allocation_request_version, num_alts):
+        """Selects a host for each of the instances of a multi-create request
+        and then claims the resources of all of them in a single call to the
+        placement API.
+
+        If placement rejects the batch, it is split in halves which are
+        claimed separately, down to single instances. The instances which
+        could still not be claimed go through the regular serial claim
+        against the re-sorted list of hosts.
+        """
+        elevated = context.elevated()
+        num_instances = len(instance_uuids)
+
+        # First pick a host for every instance, consuming the resources
+        # locally so the filters and weighers spread the instances as they
+        # would when claiming serially. Each entry is a tuple of
+        # (instance_uuid, host, alloc_req).
+        picks = []
+        # The NUMA topology fitted to the picked host of each instance, which
+        # is needed to give the resources back if its claim is rejected.
+        picked_numa_topologies = {}
+        for num, instance_uuid in enumerate(instance_uuids):
+            spec_obj.instance_uuid = instance_uuid
+            spec_obj.obj_reset_changes(['instance_uuid'])
+            hosts = self._get_sorted_hosts(spec_obj, hosts, num)
+            host = None
+            for candidate in hosts:
+                if candidate.uuid in alloc_reqs_by_rp_uuid:
+                    host = candidate
+                    break
+            if host is None:
+                break
+            picks.append((instance_uuid, host,
+                          alloc_reqs_by_rp_uuid[host.uuid][0]))
+            self._consume_selected_host(host, spec_obj,
+                                        instance_uuid=instance_uuid)
+            picked_numa_topologies[instance_uuid] = (
+                spec_obj.numa_topology
+                if spec_obj.obj_attr_is_set('numa_topology') else None)
+
+        claimed_instance_uuids = self._claim_batch(elevated, spec_obj, picks,
+                allocation_request_version)
+        claimed_by_instance = {}
+        for instance_uuid, host, alloc_req in picks:
+            if instance_uuid in claimed_instance_uuids:
+                claimed_by_instance[instance_uuid] = (host, alloc_req)
+            else:
+                # Placement rejected the claim, so the host must not keep the
+                # resources of the instance, nor count it as a member of the
+                # server group, when picking hosts serially below.
+                self._release_selected_host(host, spec_obj, instance_uuid,
+                        picked_numa_topologies[instance_uuid])
+
+        for num, instance_uuid in enumerate(instance_uuids):
+            if instance_uuid in claimed_by_instance:
+                continue
+            spec_obj.instance_uuid = instance_uuid
+            spec_obj.obj_reset_changes(['instance_uuid'])
+            hosts = self._get_sorted_hosts(spec_obj, hosts, num)
+            claimed_host = None
+            if hosts:
+                claimed_host, claimed_alloc_req = self._claim_host(elevated,
+                        spec_obj, instance_uuid, hosts, alloc_reqs_by_rp_uuid,
+                        allocation_request_version)
+            if claimed_host is None:
+                LOG.debug("Unable to successfully claim against any host.")
+                break
+            claimed_instance_uuids.append(instance_uuid)
+            claimed_by_instance[instance_uuid] = (claimed_host,
+                                                  claimed_alloc_req)
+            self._consume_selected_host(claimed_host, spec_obj,
+                                        instance_uuid=instance_uuid)
+
+        # The selections must be returned in the order of instance_uuids.
+        claimed = [claimed_by_instance[instance_uuid]
+                   for instance_uuid in instance_uuids
+                   if instance_uuid in claimed_by_instance]
+        claimed_hosts = [host for host, _ in claimed]
+        self._ensure_sufficient_hosts(context, claimed_hosts, num_instances,
+                claimed_instance_uuids)
+
+        return self._get_alternate_hosts(
+            claimed_hosts, spec_obj, hosts, num_instances - 1, num_alts,
+            alloc_reqs_by_rp_uuid, allocation_request_version,
+            selected_alloc_reqs=[alloc_req for _, alloc_req in claimed])
+
+    def _claim_batch(self, context, spec_obj, picks,
+                     allocation_request_version):
+        """Claims the allocation requests of the picked hosts in as few calls
+        to the placement API as possible, bisecting the batch whenever it is
+        rejected. Returns the list of instance UUIDs which were claimed.
+        """
+        if not picks:
+            return []
+        alloc_reqs = {instance_uuid: alloc_req
+                      for instance_uuid, _, alloc_req in picks}
+        result = utils.claim_resources_batch(context, self.placement_client,
+                spec_obj, alloc_reqs,
+                allocation_request_version=allocation_request_version)
+        if result:
+            return [instance_uuid for instance_uuid, _, _ in picks]
+        if result is None or len(picks) == 1:
+            # Either the placement API could not be reached, in which case
+            # there is no point in retrying smaller batches, or this single
+            # instance does not fit on the picked host anymore.
+            return []
+        LOG.debug("Unable to claim resources for %d instances in one batch, "
+                  "splitting it.", len(picks))
+        middle = len(picks) // 2
+        return (self._claim_batch(context, spec_obj, picks[:middle],
+                                  allocation_request_version) +
+                self._claim_batch(context, spec_obj, picks[middle:],
+                                  allocation_request_version))
+
+    def _claim_host(self, context, spec_obj, instance_uuid, hosts,
+                    alloc_reqs_by_rp_uuid, allocation_request_version):
+        """Attempts to claim the resources of the instance against one or more
+        resource providers, looping over the sorted list of possible hosts
+        looking for an allocation_request that contains that host's resource
+        provider UUID. Returns a tuple of the claimed host and
+        allocation_request, or (None, None).
+        """
+        for host in hosts:
+            cn_uuid = host.uuid
+            if cn_uuid not in alloc_reqs_by_rp_uuid:
+                msg = ("A host state with uuid = '%s' that did not have a "
+                      "matching allocation_request was encountered while "
+                      "scheduling. This host was skipped.")
+                LOG.debug(msg, cn_uuid)
+                continue
+
+            # Try each of the allocation_requests of the host, in the order
+            # given by the scorer, before moving on to the next host: one of
+            # them may fail because a sharing or nested provider it involves
+            # was updated concurrently while the others still fit.
+            for alloc_req in alloc_reqs_by_rp_uuid[cn_uuid]:
+                if utils.claim_resources(context, self.placement_client,
+                        spec_obj, instance_uuid, alloc_req,
+                        allocation_request_version=allocation_request_version):
+                    return host, alloc_req
+        return None, None
+
     def _ensure_sufficient_hosts(self, context, hosts, required_count,
             claimed_uuids=None):
         """Checks that we have selected a host for each requested instance. If
@@ -360,9 +513,25 @@ class FilterScheduler(driver.Scheduler):
                 selected_host.instances[instance_uuid] = (
                     objects.Instance(uuid=instance_uuid))
 
+    @staticmethod
+    def _release_selected_host(selected_host, spec_obj, instance_uuid,
+                               instance_numa_topology=None):
+        """Undoes _consume_selected_host() for an instance whose claim
+        failed.
+        """
+        LOG.debug("Released host: %(host)s", {'host': selected_host},
+                  instance_uuid=instance_uuid)
+        selected_host.release_from_request(spec_obj, instance_numa_topology)
+        if spec_obj.instance_group is not None:
+            if selected_host.host in spec_obj.instance_group.hosts:
+                spec_obj.instance_group.hosts.remove(selected_host.host)
+                spec_obj.instance_group.obj_reset_changes(['hosts'])
+            selected_host.instances.pop(instance_uuid, None)
+
     def _get_alternate_hosts(self, selected_hosts, spec_obj, hosts, index,
                              num_alts, alloc_reqs_by_rp_uuid=None,
-                             allocation_request_version=None):
+                             allocation_request_version=None,
+                             selected_alloc_reqs=None):
         # We only need to filter/weigh the hosts again if we're dealing with
         # more than one instance and are going to be picking alternates.
         if index > 0 and num_alts > 0:
@@ -375,9 +544,11 @@ class FilterScheduler(driver.Scheduler):
         # representing the selected host along with alternates from the same
         # cell.
         selections_to_return = []
-        for selected_host in selected_hosts:
+        for i, selected_host in enumerate(selected_hosts):
             # This is the list of hosts for one particular instance.
-            if alloc_reqs_by_rp_uuid:
+            if selected_alloc_reqs:
+                selected_alloc_req = selected_alloc_reqs[i]
+            elif alloc_reqs_by_rp_uuid:
                 selected_alloc_req = alloc_reqs_by_rp_uuid.get(
                         selected_host.uuid)[0]
             else:
@@ -408,12 +579,8 @@ class FilterScheduler(driver.Scheduler):
                             LOG.debug(msg, alt_uuid)
                             continue
 
-                        # TODO(jaypipes): Loop through all allocation_requests
-                        # instead of just trying the first one. For now, since
-                        # we'll likely want to order the allocation_requests in
-                        # the future based on information in the provider
-                        # summaries, we'll just try to claim resources using
-                        # the first allocation_request
+                        # The allocation_requests are ordered by the scorer, so
+                        # the first one is the most suitable.
                         alloc_req = alloc_reqs_by_rp_uuid[alt_uuid][0]
                         alt_selection = (
                             objects.Selection.from_host_state(host, alloc_req,
@@ -16,8 +16,15 @@
 """
 Scheduler host filters
 """
+import collections
+
+from oslo_log import log as logging
+from oslo_utils import timeutils
+
 from nova import filters
 
+LOG = logging.getLogger(__name__)
+
 
 class BaseHostFilter(filters.BaseFilter):
     """Base class for host filters."""
@@ -30,6 +37,13 @@ class BaseHostFilter(filters.BaseFilter):
     # existing compute node, etc.
     RUN_ON_REBUILD = False
 
+    # This is set to True if this filter depends on the filters configured
+    # before it, or if the filters configured after it depend on it, in
+    # which case it is never moved when the filters are reordered based on
+    # their statistics. The other filters are only reordered between
+    # order sensitive filters.
+    ORDER_SENSITIVE = False
+
     def _filter_one(self, obj, spec):
         """Return True if the object passes the filter, otherwise False."""
         # Do this here so we don't get scheduler.filters.utils
@@ -49,10 +63,150 @@ class BaseHostFilter(filters.BaseFilter):
         """
         raise NotImplementedError()
 
+    def filter_columns(self, columns, spec_obj):
+        """Return a boolean array of the hosts passing the filter.
+
+        :param columns: nova.scheduler.host_manager.HostStateColumns
+        :param spec_obj: nova.objects.RequestSpec
+        :return: a boolean NumPy array with one entry per host in columns, or
+                 None if the filter can only be run against each HostState.
+
+        Override this in a subclass which is able to evaluate all the hosts at
+        once from the resource columns.
+        """
+        return None
+
+    def filter_all_columns(self, columns, spec_obj):
+        """Return the pass mask for all the hosts, handling rebuilds the same
+        way _filter_one() does. Returns None if the filter has no columnar
+        version.
+        """
+        # Do this here so we don't get scheduler.filters.utils
+        from nova.scheduler import utils
+        if not self.RUN_ON_REBUILD and utils.request_is_rebuild(spec_obj):
+            return columns.active.copy()
+        return self.filter_columns(columns, spec_obj)
+
+
+class FilterStatistics(object):
+    """Counters of how many times each filter was run, against how many hosts,
+    how many of those hosts passed it and the time it took.
+    """
+
+    # Filters which have been run fewer times than this are run first when
+    # reordering the filters, so that their statistics get collected.
+    MIN_RUNS = 10
+
+    def __init__(self):
+        self._stats = collections.defaultdict(
+            lambda: {'runs': 0, 'hosts': 0, 'passed': 0, 'time': 0.0})
+
+    def record(self, name, start_count, end_count, elapsed):
+        stats = self._stats[name]
+        stats['runs'] += 1
+        stats['hosts'] += start_count
+        stats['passed'] += end_count
+        stats['time'] += elapsed
+
+    def _rank(self, filter_):
+        stats = self._stats.get(filter_.__class__.__name__)
+        if not stats or stats['runs'] < self.MIN_RUNS:
+            return -1.0
+        # Running the filters by increasing cost per host divided by their
+        # rejection rate, which is the time it took them to reject each host,
+        # minimizes the expected time spent filtering.
+        rejected = stats['hosts'] - stats['passed']
+        if not rejected:
+            return float('inf')
+        return stats['time'] / rejected
+
+    def order(self, filters):
+        """Return the filters sorted so that the cheapest and most selective
+        ones are run first. Order sensitive filters are kept in place and the
+        filters having the same rank keep their configured order.
+        """
+        ordered = []
+        movable = []
+        for filter_ in filters:
+            if filter_.ORDER_SENSITIVE:
+                ordered.extend(sorted(movable, key=self._rank))
+                ordered.append(filter_)
+                movable = []
+            else:
+                movable.append(filter_)
+        ordered.extend(sorted(movable, key=self._rank))
+        return ordered
+
+    def to_dict(self):
+        """Return the statistics of each filter, keyed by filter name."""
+        result = {}
+        for name, stats in self._stats.items():
+            result[name] = dict(stats)
+            hosts = stats['hosts']
+            result[name]['time_per_host'] = (
+                stats['time'] / hosts if hosts else 0.0)
+            result[name]['rejection_rate'] = (
+                float(hosts - stats['passed']) / hosts if hosts else 0.0)
+        return result
+
 
 class HostFilterHandler(filters.BaseFilterHandler):
     def __init__(self):
         super(HostFilterHandler, self).__init__(BaseHostFilter)
+        self.stats = FilterStatistics()
+
+    def _filter_run(self, filter_, start_count, end_count, elapsed):
+        self.stats.record(filter_.__class__.__name__, start_count, end_count,
+                          elapsed)
+
+    def order_filters(self, filters):
+        """Return the filters reordered based on their statistics."""
+        return self.stats.order(filters)
+
+    def get_filtered_columns(self, filters, columns, spec_obj, index=0):
+        """Filter the hosts of a HostStateColumns.
+
+        Filters providing a columnar version are applied as array operations
+        on the whole set of hosts while the other ones are still run against
+        each remaining HostState. Returns the list of HostState objects
+        passing all the filters, or None if a filter asked to stop filtering.
+        """
+        LOG.debug("Starting with %d host(s)", len(columns))
+        part_filter_results = []
+        log_msg = "%(cls_name)s: (start: %(start)s, end: %(end)s)"
+        for filter_ in filters:
+            if not filter_.run_filter_for_index(index):
+                continue
+            cls_name = filter_.__class__.__name__
+            start_count = int(columns.active.sum())
+            started_at = timeutils.now()
+            mask = filter_.filter_all_columns(columns, spec_obj)
+            if mask is not None:
+                columns.active &= mask
+            else:
+                objs = filter_.filter_all(columns.select(), spec_obj)
+                if objs is None:
+                    LOG.debug("Filter %s says to stop filtering", cls_name)
+                    return
+                columns.set_active(list(objs))
+            end_count = int(columns.active.sum())
+            self._filter_run(filter_, start_count, end_count,
+                             timeutils.now() - started_at)
+            part_filter_results.append(log_msg % {"cls_name": cls_name,
+                    "start": start_count, "end": end_count})
+            if not end_count:
+                LOG.info("Filter %s returned 0 hosts", cls_name)
+                break
+            LOG.debug("Filter %(cls_name)s returned %(obj_len)d host(s)",
+                      {'cls_name': cls_name, 'obj_len': end_count})
+        list_objs = columns.select()
+        if not list_objs:
+            LOG.info("Filtering removed all hosts for the request with "
+                     "instance ID '%(inst_uuid)s'. Filter results: "
+                     "%(str_results)s",
+                     {"inst_uuid": spec_obj.instance_uuid,
+                      "str_results": str(part_filter_results)})
+        return list_objs
 
 
 def all_filters():
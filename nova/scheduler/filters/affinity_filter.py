@@ -97,12 +97,8 @@ class _GroupAntiAffinityFilter(filters.BaseHostFilter):
         # must not return the source as a non-possible destination.
         if spec_obj.instance_uuid in host_state.instances.keys():
             return True
-        # The list of instances UUIDs on the given host
-        instances = set(host_state.instances.keys())
-        # The list of instances UUIDs which are members of this group
-        members = set(spec_obj.instance_group.members)
-        # The set of instances on the host that are also members of this group
-        servers_on_host = instances.intersection(members)
+        # The number of instances on the host that are members of this group
+        servers_on_host = utils.group_members_on_host(host_state, spec_obj)
 
         rules = instance_group.rules
         if rules and 'max_server_per_host' in rules:
@@ -125,7 +121,7 @@ class _GroupAntiAffinityFilter(filters.BaseHostFilter):
         # given host. In the default case(max_server_per_host=1), this filter
         # will accept the given host if there are 0 servers from the group
         # already on this host.
-        return len(servers_on_host) < max_server_per_host
+        return servers_on_host < max_server_per_host
 
 
 class ServerGroupAntiAffinityFilter(_GroupAntiAffinityFilter):
@@ -46,3 +46,19 @@ class ComputeFilter(filters.BaseHostFilter):
                             "while", {'host_state': host_state})
                 return False
         return True
+
+    def filter_columns(self, columns, spec_obj):
+        """Returns the active compute nodes.
+
+        Disabled services are removed with a single array operation, the
+        liveness check still depends on the servicegroup driver and is only
+        done for the enabled hosts.
+        """
+        passes = ~columns.disabled
+        for idx in columns.indices(passes):
+            host_state = columns.host_states[idx]
+            if not self.servicegroup_api.service_is_up(host_state.service):
+                LOG.warning("%(host_state)s has not been heard from in a "
+                            "while", {'host_state': host_state})
+                passes[idx] = False
+        return passes
@@ -81,6 +81,25 @@ class CoreFilter(BaseCoreFilter):
     def _get_cpu_allocation_ratio(self, host_state, spec_obj):
         return host_state.cpu_allocation_ratio
 
+    def filter_columns(self, columns, spec_obj):
+        """Return the hosts having sufficient CPU cores."""
+        instance_vcpus = spec_obj.vcpus
+        host_vcpus = columns.vcpus_total
+        # Fail safe for the hosts not reporting their VCPUs.
+        unknown = host_vcpus == 0
+        if (unknown & columns.active).any():
+            LOG.warning("VCPUs not set; assuming CPU collection broken")
+        vcpus_total = host_vcpus * columns.cpu_allocation_ratio
+        # Only provide a VCPU limit to compute if the virt driver is reporting
+        # an accurate count of installed VCPUs. (XenServer driver does not)
+        limited = ~unknown & (vcpus_total > 0)
+        columns.set_limits('vcpu', vcpus_total, limited)
+        # Do not allow an instance to overcommit against itself, only against
+        # other instances.
+        overcommit_self = limited & (instance_vcpus > host_vcpus)
+        free_vcpus = vcpus_total - columns.vcpus_used
+        return unknown | (~overcommit_self & (free_vcpus >= instance_vcpus))
+
 
 class AggregateCoreFilter(BaseCoreFilter):
     """AggregateCoreFilter with per-aggregate CPU subscription flag.
@@ -70,6 +70,22 @@ class DiskFilter(filters.BaseHostFilter):
         host_state.limits['disk_gb'] = disk_gb_limit
         return True
 
+    def filter_columns(self, columns, spec_obj):
+        """Filter based on disk usage."""
+        requested_disk = (1024 * (spec_obj.root_gb +
+                                  spec_obj.ephemeral_gb) +
+                          spec_obj.swap)
+        total_usable_disk_mb = columns.total_usable_disk_gb * 1024
+        disk_mb_limit = total_usable_disk_mb * columns.disk_allocation_ratio
+        used_disk_mb = total_usable_disk_mb - columns.free_disk_mb
+        usable_disk_mb = disk_mb_limit - used_disk_mb
+        # Do not allow an instance to overcommit against itself, only against
+        # other instances.
+        passes = ((total_usable_disk_mb >= requested_disk) &
+                  (usable_disk_mb >= requested_disk))
+        columns.set_limits('disk_gb', disk_mb_limit / 1024, passes)
+        return passes
+
 
 class AggregateDiskFilter(DiskFilter):
     """AggregateDiskFilter with per-aggregate disk allocation ratio flag.
@@ -80,6 +96,9 @@ class AggregateDiskFilter(DiskFilter):
 
     RUN_ON_REBUILD = False
 
+    # The allocation ratio is looked up in the aggregates of each host.
+    filter_columns = filters.BaseHostFilter.filter_columns
+
     def _get_disk_allocation_ratio(self, host_state, spec_obj):
         aggregate_vals = utils.aggregate_values_from_key(
             host_state,
@@ -47,6 +47,10 @@ class IoOpsFilter(filters.BaseHostFilter):
                        'max_io_ops': max_io_ops})
         return passes
 
+    def filter_columns(self, columns, spec_obj):
+        max_io_ops = CONF.filter_scheduler.max_io_ops_per_host
+        return columns.num_io_ops < max_io_ops
+
 
 class AggregateIoOpsFilter(IoOpsFilter):
     """AggregateIoOpsFilter with per-aggregate the max io operations.
@@ -54,6 +58,9 @@ class AggregateIoOpsFilter(IoOpsFilter):
     Fall back to global max_io_ops_per_host if no per-aggregate setting found.
     """
 
+    # The maximum is looked up in the aggregates of each host.
+    filter_columns = filters.BaseHostFilter.filter_columns
+
     def _get_max_io_ops_per_host(self, host_state, spec_obj):
         max_io_ops_per_host = CONF.filter_scheduler.max_io_ops_per_host
         aggregate_vals = utils.aggregate_values_from_key(
@@ -44,6 +44,10 @@ class NumInstancesFilter(filters.BaseHostFilter):
                        'max_instances': max_instances})
         return passes
 
+    def filter_columns(self, columns, spec_obj):
+        max_instances = CONF.filter_scheduler.max_instances_per_host
+        return columns.num_instances < max_instances
+
 
 class AggregateNumInstancesFilter(NumInstancesFilter):
     """AggregateNumInstancesFilter with per-aggregate the max num instances.
@@ -52,6 +56,9 @@ class AggregateNumInstancesFilter(NumInstancesFilter):
     found.
     """
 
+    # The maximum is looked up in the aggregates of each host.
+    filter_columns = filters.BaseHostFilter.filter_columns
+
     def _get_max_instances_per_host(self, host_state, spec_obj):
         max_instances_per_host = CONF.filter_scheduler.max_instances_per_host
 
@@ -15,12 +15,19 @@
 """Bench of utility methods used by filters."""
 
 import collections
+import weakref
 
 from oslo_log import log as logging
 import six
 
 LOG = logging.getLogger(__name__)
 
+# The sets of members of the server groups, keyed by group UUID, built for
+# each RequestSpec being scheduled, along with the id and a copy of the list
+# of members they were built from. The entries go away with the RequestSpec
+# objects at the end of their request.
+_MEMBER_SETS_BY_REQUEST = weakref.WeakKeyDictionary()
+
 
 def aggregate_values_from_key(host_state, key_name):
     """Returns a set of values based on a metadata key for a specific host."""
@@ -81,3 +88,25 @@ def instance_uuids_overlap(host_state, uuids):
     # host_state.instances is a dict whose keys are the instance uuids
     host_uuids = set(host_state.instances.keys())
     return bool(host_uuids.intersection(set_uuids))
+
+
+def group_members_on_host(host_state, spec_obj):
+    """Returns the number of instances of the host which are members of the
+    server group of the request.
+
+    The set of members is built once per scheduling request, so checking each
+    host only costs a lookup per instance of the host instead of going
+    through all the members of the group for every host. It is built again
+    whenever the list of members is replaced or changed.
+    """
+    instance_group = spec_obj.instance_group
+    members = instance_group.members or []
+    group_uuid = (instance_group.uuid
+                  if instance_group.obj_attr_is_set('uuid') else None)
+    member_sets = _MEMBER_SETS_BY_REQUEST.setdefault(spec_obj, {})
+    cached = member_sets.get(group_uuid)
+    if cached is None or cached[0] != id(members) or cached[1] != members:
+        cached = (id(members), list(members), set(members))
+        member_sets[group_uuid] = cached
+    member_set = cached[2]
+    return sum(1 for uuid in host_state.instances if uuid in member_set)
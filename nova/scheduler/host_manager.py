@@ -18,6 +18,7 @@ Manage hosts in the current zone.
 """
 
 import collections
+import datetime
 import functools
 import time
 try:
@@ -27,6 +28,10 @@ except ImportError:
 
 
 import iso8601
+try:
+    import numpy
+except ImportError:
+    numpy = None
 from oslo_log import log as logging
 from oslo_utils import timeutils
 import six
@@ -46,6 +51,11 @@ CONF = nova.conf.CONF
 
 LOG = logging.getLogger(__name__)
 HOST_INSTANCE_SEMAPHORE = "host_instance"
+COMPUTE_CACHE_SEMAPHORE = "compute_cache"
+# NOTE: The timestamps of the compute node and service records are set by
+# the hosts writing them, so the changes are looked up with some overlap with
+# the previous query to cope with clock skew and long running transactions.
+COMPUTE_CACHE_WATERMARK_OVERLAP = 10
 
 
 class ReadOnlyDict(IterableUserDict):
@@ -324,6 +334,36 @@ class HostState(object):
         # is always an IO operation because we want to move the instance
         self.num_io_ops += 1
 
+    def release_from_request(self, spec_obj, instance_numa_topology=None):
+        """Gives back the resources consumed by consume_from_request() for a
+        request which is not going to land on this host after all.
+
+        :param spec_obj: the RequestSpec object which was consumed
+        :param instance_numa_topology: the InstanceNUMATopology fitted to
+                                       this host when consuming, if any
+        """
+
+        @utils.synchronized(self._lock_name)
+        def _locked(self, spec_obj, instance_numa_topology):
+            self.free_ram_mb += spec_obj.memory_mb
+            self.free_disk_mb += (spec_obj.root_gb +
+                                  spec_obj.ephemeral_gb) * 1024
+            self.vcpus_used -= spec_obj.vcpus
+            self.num_instances -= 1
+            self.num_io_ops -= 1
+            if instance_numa_topology and self.numa_topology:
+                instance = objects.Instance(
+                    numa_topology=instance_numa_topology)
+                self.numa_topology = (
+                    hardware.get_host_numa_usage_from_instance(
+                        self, instance, free=True))
+            # NOTE: the PCI devices taken from the pools can not be given
+            # back one by one, so make sure the host is refreshed from the
+            # database by the next request instead.
+            self.updated = None
+
+        return _locked(self, spec_obj, instance_numa_topology)
+
     def __repr__(self):
         return ("(%(host)s, %(node)s) ram: %(free_ram)sMB "
                 "disk: %(free_disk)sMB io_ops: %(num_io_ops)s "
@@ -334,6 +374,91 @@ class HostState(object):
                  'num_instances': self.num_instances})
 
 
+class HostStateColumns(object):
+    """Columnar view of a list of HostState objects.
+
+    The numeric resource fields of every host are kept in NumPy arrays, one
+    entry per host in the order of ``host_states``, so that filters and
+    weighers implementing ``filter_columns()`` and ``weigh_columns()`` can
+    evaluate all the hosts in a handful of array operations instead of one
+    Python call per host.
+
+    ``active`` is the boolean mask of the hosts which are still candidates,
+    it is maintained by the filter handler while filters are run.
+    """
+
+    # Numeric HostState attributes copied into arrays, in column order.
+    NUMERIC_FIELDS = ('free_ram_mb', 'total_usable_ram_mb',
+                      'ram_allocation_ratio', 'free_disk_mb',
+                      'total_usable_disk_gb', 'disk_allocation_ratio',
+                      'vcpus_total', 'vcpus_used', 'cpu_allocation_ratio',
+                      'num_instances', 'num_io_ops')
+
+    def __init__(self, host_states):
+        self.host_states = list(host_states)
+        rows = []
+        disabled = []
+        self._hosts_by_aggregate = collections.defaultdict(list)
+        # NOTE: Walk the HostState objects only once, every column is then
+        # sliced out of the resulting two dimensional array.
+        for idx, state in enumerate(self.host_states):
+            rows.append(tuple(getattr(state, field, None) or 0
+                              for field in self.NUMERIC_FIELDS))
+            service = getattr(state, 'service', None)
+            disabled.append(bool(service and service.get('disabled')))
+            for agg in state.aggregates:
+                self._hosts_by_aggregate[agg.id].append(idx)
+        data = numpy.array(rows, dtype=float).reshape(
+            len(rows), len(self.NUMERIC_FIELDS))
+        for col, field in enumerate(self.NUMERIC_FIELDS):
+            setattr(self, field, data[:, col])
+        self.disabled = numpy.array(disabled, dtype=bool)
+        self.active = numpy.ones(len(self.host_states), dtype=bool)
+
+    def __len__(self):
+        return len(self.host_states)
+
+    def array(self, values=None):
+        """Return a float array with one entry per host, zeroed by default."""
+        if values is None:
+            return numpy.zeros(len(self.host_states), dtype=float)
+        return numpy.array(list(values), dtype=float)
+
+    def aggregate_mask(self, aggregate_id):
+        """Return a boolean mask of the hosts member of an aggregate."""
+        mask = numpy.zeros(len(self.host_states), dtype=bool)
+        mask[self._hosts_by_aggregate.get(aggregate_id, [])] = True
+        return mask
+
+    def indices(self, mask=None):
+        """Return the indices of the active hosts also set in ``mask``."""
+        if mask is not None:
+            mask = mask & self.active
+        else:
+            mask = self.active
+        return numpy.flatnonzero(mask)
+
+    def select(self, mask=None):
+        """Return the HostState objects of the active hosts in ``mask``."""
+        return [self.host_states[idx] for idx in self.indices(mask)]
+
+    def set_active(self, host_states):
+        """Reset the active mask to the given subset of HostState objects."""
+        positions = {id(state): idx
+                     for idx, state in enumerate(self.host_states)}
+        self.active = numpy.zeros(len(self.host_states), dtype=bool)
+        self.active[[positions[id(state)] for state in host_states]] = True
+
+    def set_limits(self, key, values, mask):
+        """Record an oversubscription limit for the active hosts in ``mask``.
+
+        Filters use this to keep setting ``HostState.limits`` like their per
+        host counterpart does, which the compute claim relies on.
+        """
+        for idx in self.indices(mask):
+            self.host_states[idx].limits[key] = float(values[idx])
+
+
 class HostManager(object):
     """Base HostManager class."""
 
@@ -349,10 +474,18 @@ class HostManager(object):
         self.filter_cls_map = {cls.__name__: cls for cls in filter_classes}
         self.filter_obj_map = {}
         self.enabled_filters = self._choose_host_filters(self._load_filters())
+        self.reorder_filters = CONF.filter_scheduler.reorder_filters
         self.weight_handler = weights.HostWeightHandler()
         weigher_classes = self.weight_handler.get_matching_classes(
                 CONF.filter_scheduler.weight_classes)
         self.weighers = [cls() for cls in weigher_classes]
+        self.columnar_host_states = (
+                CONF.filter_scheduler.columnar_host_states)
+        if self.columnar_host_states and numpy is None:
+            LOG.warning("The columnar_host_states option is enabled but "
+                        "numpy is not installed, filtering and weighing will "
+                        "be done one host at a time.")
+            self.columnar_host_states = False
         # Dict of aggregates keyed by their ID
         self.aggs_by_id = {}
         # Dict of set of aggregate IDs keyed by the name of the host belonging
@@ -365,6 +498,15 @@ class HostManager(object):
         self._instance_info = {}
         if self.track_instance_changes:
             self._init_instance_info()
+        # Dicts of compute nodes (keyed by UUID) and services (keyed by host)
+        # for each cell, along with the time they have been fully loaded and
+        # the time from which changes have to be looked up. Only used when
+        # CONF.filter_scheduler.host_state_cache_max_age is set.
+        self._cell_computes = {}
+        self._cell_services = {}
+        self._cell_loaded_at = {}
+        self._cell_watermarks = {}
+        self.compute_cache_stats = collections.Counter()
 
     def _load_filters(self):
         return CONF.filter_scheduler.enabled_filters
@@ -590,11 +732,35 @@ class HostManager(object):
                     return []
             hosts = six.itervalues(name_to_cls_map)
 
-        return self.filter_handler.get_filtered_objects(self.enabled_filters,
+        enabled_filters = self.enabled_filters
+        if self.reorder_filters:
+            enabled_filters = self.filter_handler.order_filters(
+                enabled_filters)
+        if self.columnar_host_states:
+            return self.filter_handler.get_filtered_columns(
+                enabled_filters, HostStateColumns(hosts), spec_obj, index)
+        return self.filter_handler.get_filtered_objects(enabled_filters,
                 hosts, spec_obj, index)
 
+    def get_diagnostics(self):
+        """Return the statistics collected by the host manager, for the
+        scheduler diagnostics RPC.
+        """
+        enabled_filters = self.enabled_filters
+        if self.reorder_filters:
+            enabled_filters = self.filter_handler.order_filters(
+                enabled_filters)
+        return {
+            'filters': self.filter_handler.stats.to_dict(),
+            'filter_order': [f.__class__.__name__ for f in enabled_filters],
+            'compute_cache': dict(self.compute_cache_stats),
+        }
+
     def get_weighed_hosts(self, hosts, spec_obj):
         """Weigh the hosts."""
+        if self.columnar_host_states:
+            return self.weight_handler.get_weighed_columns(self.weighers,
+                HostStateColumns(hosts), spec_obj)
         return self.weight_handler.get_weighed_objects(self.weighers,
                 hosts, spec_obj)
 
@@ -613,6 +779,9 @@ class HostManager(object):
          - compute_nodes is cell-uuid keyed dict of compute node lists
          - services is a dict of services indexed by hostname
         """
+        if CONF.filter_scheduler.host_state_cache_max_age:
+            return self._get_cached_computes_for_cells(context, cells,
+                                                       compute_uuids)
 
         def targeted_operation(cctxt):
             services = objects.ServiceList.get_by_binary(
@@ -639,6 +808,132 @@ class HostManager(object):
                                  for service in _services})
         return compute_nodes, services
 
+    @utils.synchronized(COMPUTE_CACHE_SEMAPHORE)
+    def _get_cached_computes_for_cells(self, context, cells,
+                                       compute_uuids=None):
+        """Get a tuple of compute node and service information from the
+        compute cache, refreshing it from the cells first.
+
+        The cells whose cache is older than
+        CONF.filter_scheduler.host_state_cache_max_age are fully reloaded,
+        only the compute nodes and services which changed since the previous
+        query are read from the other ones.
+
+        Same parameters and return value as _get_computes_for_cells().
+        """
+        max_age = CONF.filter_scheduler.host_state_cache_max_age
+        to_load = [cell for cell in cells
+                   if cell.uuid not in self._cell_loaded_at or
+                   timeutils.is_older_than(self._cell_loaded_at[cell.uuid],
+                                           max_age)]
+        to_update = [cell for cell in cells if cell not in to_load]
+
+        if to_load:
+            self._load_compute_cache(context, to_load)
+        if to_update:
+            self._update_compute_cache(context, to_update)
+        self.compute_cache_stats['refresh'] += len(to_load)
+        self.compute_cache_stats['hit'] += len(to_update)
+        LOG.debug("Compute cache: %(refresh)d cell(s) reloaded, %(hit)d "
+                  "cell(s) updated from changes. Totals: %(stats)s",
+                  {'refresh': len(to_load), 'hit': len(to_update),
+                   'stats': dict(self.compute_cache_stats)})
+
+        compute_nodes = collections.defaultdict(list)
+        services = {}
+        for cell in cells:
+            if cell.uuid not in self._cell_computes:
+                # The cell failed to respond, it is reloaded next time.
+                continue
+            cell_computes = self._cell_computes[cell.uuid]
+            if compute_uuids is None:
+                compute_nodes[cell.uuid].extend(cell_computes.values())
+            else:
+                compute_nodes[cell.uuid].extend(
+                    cell_computes[uuid] for uuid in compute_uuids
+                    if uuid in cell_computes)
+            services.update(self._cell_services[cell.uuid])
+        return compute_nodes, services
+
+    def _forget_cell_computes(self, cell_uuid):
+        for cache in (self._cell_computes, self._cell_services,
+                      self._cell_loaded_at, self._cell_watermarks):
+            cache.pop(cell_uuid, None)
+
+    def _load_compute_cache(self, context, cells):
+        """Fully load the compute nodes and services of the given cells."""
+
+        def targeted_operation(cctxt):
+            services = objects.ServiceList.get_by_binary(
+                cctxt, 'nova-compute', include_disabled=True)
+            return services, objects.ComputeNodeList.get_all(cctxt)
+
+        started_at = timeutils.utcnow()
+        results = context_module.scatter_gather_cells(context, cells, 60,
+                                                      targeted_operation)
+        for cell_uuid, result in results.items():
+            if result is context_module.raised_exception_sentinel:
+                LOG.warning('Failed to get computes for cell %s', cell_uuid)
+                self._forget_cell_computes(cell_uuid)
+            elif result is context_module.did_not_respond_sentinel:
+                LOG.warning('Timeout getting computes for cell %s', cell_uuid)
+                self._forget_cell_computes(cell_uuid)
+            else:
+                _services, _compute_nodes = result
+                self._cell_services[cell_uuid] = {
+                    service.host: service for service in _services}
+                self._cell_computes[cell_uuid] = {
+                    compute.uuid: compute for compute in _compute_nodes}
+                self._cell_loaded_at[cell_uuid] = started_at
+                self._cell_watermarks[cell_uuid] = started_at
+
+    @staticmethod
+    def _apply_change(cache, key, record):
+        """Store a changed record, or remove it from the cache if deleted."""
+        if not record.deleted:
+            cache[key] = record
+        elif key in cache and cache[key].id == record.id:
+            # Only forget about the cached record if it has not been
+            # replaced by a new one, e.g. a service recreated on a host.
+            del cache[key]
+
+    def _update_compute_cache(self, context, cells):
+        """Apply the compute node and service changes of the given cells."""
+        # NOTE: Applying a change is idempotent, so use the oldest watermark
+        # for all the cells rather than targeting each cell with its own one.
+        changes_since = (min(self._cell_watermarks[cell.uuid]
+                             for cell in cells) -
+                         datetime.timedelta(
+                             seconds=COMPUTE_CACHE_WATERMARK_OVERLAP))
+
+        def targeted_operation(cctxt):
+            services = objects.ServiceList.get_by_binary_changed_since(
+                cctxt, 'nova-compute', changes_since)
+            return services, objects.ComputeNodeList.get_all_changed_since(
+                cctxt, changes_since)
+
+        started_at = timeutils.utcnow()
+        results = context_module.scatter_gather_cells(context, cells, 60,
+                                                      targeted_operation)
+        for cell_uuid, result in results.items():
+            if result is context_module.raised_exception_sentinel:
+                LOG.warning('Failed to get compute changes for cell %s',
+                            cell_uuid)
+                self._forget_cell_computes(cell_uuid)
+            elif result is context_module.did_not_respond_sentinel:
+                LOG.warning('Timeout getting compute changes for cell %s',
+                            cell_uuid)
+                self._forget_cell_computes(cell_uuid)
+            else:
+                _services, _compute_nodes = result
+                cell_services = self._cell_services[cell_uuid]
+                cell_computes = self._cell_computes[cell_uuid]
+                for service in _services:
+                    self._apply_change(cell_services, service.host, service)
+                for compute in _compute_nodes:
+                    self._apply_change(cell_computes, compute.uuid, compute)
+                self._cell_watermarks[cell_uuid] = started_at
+
     def refresh_cells_caches(self):
         # NOTE(tssurya): This function is called from the scheduler manager's
         # reset signal handler and also upon startup of the scheduler.
@@ -48,7 +48,7 @@ QUOTAS = quota.QUOTAS
 class SchedulerManager(manager.Manager):
     """Chooses a host to run instances on."""
 
-    target = messaging.Target(version='4.5')
+    target = messaging.Target(version='4.6')
 
     _sentinel = object()
 
@@ -213,3 +213,9 @@ class SchedulerManager(manager.Manager):
         """
         self.driver.host_manager.sync_instance_info(context, host_name,
                                                     instance_uuids)
+
+    def get_diagnostics(self, context):
+        """Returns the filter statistics and host cache counters collected by
+        the driver's HostManager.
+        """
+        return self.driver.host_manager.get_diagnostics()
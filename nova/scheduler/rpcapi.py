@@ -105,6 +105,7 @@ class SchedulerAPI(object):
 
         * 4.5 - Modify select_destinations() to optionally return a list of
                 lists of Selection objects, along with zero or more alternates.
+        * 4.6 - Add get_diagnostics()
     '''
 
     VERSION_ALIASES = {
@@ -181,3 +182,10 @@ class SchedulerAPI(object):
         cctxt = self.client.prepare(version='4.2', fanout=True)
         return cctxt.cast(ctxt, 'sync_instance_info', host_name=host_name,
                           instance_uuids=instance_uuids)
+
+    def get_diagnostics(self, ctxt):
+        version = '4.6'
+        if not self.client.can_send_version(version):
+            raise exc.SchedulerDiagnosticsNotYetAvailable()
+        cctxt = self.client.prepare(version=version)
+        return cctxt.call(ctxt, 'get_diagnostics')
@@ -0,0 +1,85 @@
+# Copyright (c) 2018 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Allocation request scorers.
+
+A host returned by the placement API may come with several
+allocation_requests, for example when its resources can be shared with more
+than one sharing provider or when it has several nested resource providers
+able to satisfy the request. The scheduler tries to claim them in the order
+returned by the configured scorer.
+"""
+
+
+class BaseAllocationRequestScorer(object):
+    """Base class for allocation request scorers."""
+
+    def sort(self, alloc_reqs, provider_summaries):
+        """Returns the list of allocation_requests in the order they should be
+        tried by the scheduler.
+
+        :param alloc_reqs: List of allocation_request dicts for one host, as
+                           returned by GET /allocation_candidates.
+        :param provider_summaries: Dict, keyed by resource provider UUID, of
+                                   the provider summaries returned by GET
+                                   /allocation_candidates.
+        """
+        raise NotImplementedError()
+
+
+class PlacementOrderScorer(BaseAllocationRequestScorer):
+    """Keeps the allocation_requests in the order returned by placement."""
+
+    def sort(self, alloc_reqs, provider_summaries):
+        return alloc_reqs
+
+
+class LeastUsedScorer(BaseAllocationRequestScorer):
+    """Tries first the allocation_requests whose most used resource provider
+    would be the least used one once the allocation is made.
+    """
+
+    @staticmethod
+    def _get_resources_by_rp(alloc_req):
+        allocations = alloc_req['allocations']
+        if isinstance(allocations, dict):
+            return {rp_uuid: alloc['resources']
+                    for rp_uuid, alloc in allocations.items()}
+        # Allocation requests older than microversion 1.12 are lists.
+        return {alloc['resource_provider']['uuid']: alloc['resources']
+                for alloc in allocations}
+
+    def _score(self, alloc_req, provider_summaries):
+        score = 0.0
+        resources_by_rp = self._get_resources_by_rp(alloc_req)
+        for rp_uuid, resources in resources_by_rp.items():
+            summary = provider_summaries.get(rp_uuid, {})
+            inventories = summary.get('resources', {})
+            for rc, amount in resources.items():
+                inventory = inventories.get(rc)
+                if not inventory or not inventory.get('capacity'):
+                    continue
+                usage = float(inventory.get('used', 0) + amount)
+                score = max(score, usage / inventory['capacity'])
+        return score
+
+    def sort(self, alloc_reqs, provider_summaries):
+        if not provider_summaries:
+            return alloc_reqs
+        # NOTE: sorted() is stable, so allocation_requests with the same
+        # score are still tried in the order returned by placement.
+        return sorted(alloc_reqs,
+                      key=lambda ar: self._score(ar, provider_summaries))
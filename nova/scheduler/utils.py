@@ -468,6 +468,48 @@ def resources_from_request_spec(spec_obj):
     return res_req
 
 
+def decode_compact_allocation_candidates(data):
+    """Decode the compact format of a GET /allocation_candidates response,
+    as returned by placement from microversion 1.30 with the format=compact
+    query parameter, into the allocation_requests and provider_summaries
+    returned by the full format of the same microversion.
+
+    :param data: The decoded JSON body of the response.
+    :returns: A tuple of the list of allocation_request dicts and of the dict,
+              keyed by resource provider UUID, of provider summaries.
+    """
+    providers = data['providers']
+    rcs = data['resource_classes']
+    traits = data['traits']
+
+    alloc_reqs = []
+    for compact_ar in data['allocation_requests']:
+        allocations = {}
+        for i in range(0, len(compact_ar), 3):
+            rp_uuid = providers[compact_ar[i]]
+            alloc = allocations.setdefault(rp_uuid, {'resources': {}})
+            alloc['resources'][rcs[compact_ar[i + 1]]] = compact_ar[i + 2]
+        alloc_reqs.append({'allocations': allocations})
+
+    p_sums = {}
+    for p_idx, resources, trait_idxs, parent_idx, root_idx in (
+            data['provider_summaries']):
+        p_sums[providers[p_idx]] = {
+            'resources': {
+                rcs[resources[i]]: {
+                    'capacity': resources[i + 1],
+                    'used': resources[i + 2],
+                } for i in range(0, len(resources), 3)
+            },
+            'traits': [traits[t_idx] for t_idx in trait_idxs],
+            'parent_provider_uuid': (
+                providers[parent_idx] if parent_idx is not None else None),
+            'root_provider_uuid': providers[root_idx],
+        }
+
+    return alloc_reqs, p_sums
+
+
 # TODO(mriedem): Remove this when select_destinations() in the scheduler takes
 # some sort of skip_filters flag.
 def claim_resources_on_destination(
@@ -927,6 +969,43 @@ def claim_resources(ctx, client, spec_obj, instance_uuid, alloc_req,
             user_id, allocation_request_version=allocation_request_version)
 
 
+def claim_resources_batch(ctx, client, spec_obj, alloc_reqs,
+        allocation_request_version=None):
+    """Given a dict, keyed by instance UUID, of the allocation_request JSON
+    objects returned from Placement, attempt to claim resources for all the
+    instances in a single call to the placement API. Returns True if the
+    claims of all the instances were successful, False if none of them were
+    and None if the placement API could not be reached.
+
+    :param ctx: The RequestContext object
+    :param client: The scheduler client to use for making the claim call
+    :param spec_obj: The RequestSpec object - needed to get the project_id
+    :param alloc_reqs: Dict, keyed by instance UUID, of the allocation_request
+                       received from placement for the resources we want to
+                       claim against the host chosen for that instance. The
+                       instances must not have any allocations yet.
+    :param allocation_request_version: The microversion used to request the
+                                       allocations.
+    """
+    if request_is_rebuild(spec_obj):
+        # NOTE(danms): This is a rebuild-only scheduling request, so we should
+        # not be doing any extra claiming
+        LOG.debug('Not claiming resources in the placement API for '
+                  'rebuild-only scheduling of instances %(uuids)s',
+                  {'uuids': ', '.join(alloc_reqs)})
+        return True
+
+    LOG.debug("Attempting to claim resources in the placement API for "
+              "instances %s", ', '.join(alloc_reqs))
+
+    # NOTE(jaypipes): So, the RequestSpec doesn't store the user_id,
+    # only the project_id, so we need to grab the user information from
+    # the context. Perhaps we should consider putting the user ID in
+    # the spec object?
+    return client.claim_resources_batch(ctx, alloc_reqs, spec_obj.project_id,
+            ctx.user_id, allocation_request_version=allocation_request_version)
+
+
 def remove_allocation_from_compute(context, instance, compute_node_uuid,
                                    reportclient, flavor=None):
     """Removes the instance allocation from the compute host.
@@ -33,7 +33,19 @@ class WeighedHost(weights.WeighedObject):
 
 class BaseHostWeigher(weights.BaseWeigher):
     """Base class for host weights."""
-    pass
+
+    def weigh_columns(self, columns, weight_properties):
+        """Return the raw weights of all the hosts as a NumPy array.
+
+        :param columns: nova.scheduler.host_manager.HostStateColumns
+        :param weight_properties: nova.objects.RequestSpec
+        :return: a NumPy array with one weight per host in columns, or None if
+                 the weigher can only weigh each HostState.
+
+        Override this in a subclass which is able to weigh all the hosts at
+        once from the resource columns.
+        """
+        return None
 
 
 class HostWeightHandler(weights.BaseWeightHandler):
@@ -42,6 +54,51 @@ class HostWeightHandler(weights.BaseWeightHandler):
     def __init__(self):
         super(HostWeightHandler, self).__init__(BaseHostWeigher)
 
+    def get_weighed_columns(self, weighers, columns, weighing_properties):
+        """Return a sorted (descending), normalized list of WeighedHosts.
+
+        This is the columnar counterpart of get_weighed_objects(): weighers
+        providing weigh_columns() are computed as array operations on all the
+        hosts, the other ones are run against each WeighedHost.
+        """
+        weighed_objs = [self.object_class(obj, 0.0)
+                        for obj in columns.host_states]
+
+        if len(weighed_objs) <= 1:
+            return weighed_objs
+
+        totals = columns.array()
+        for weigher in weighers:
+            weights_ = weigher.weigh_columns(columns, weighing_properties)
+            if weights_ is None:
+                weights_ = weigher.weigh_objects(weighed_objs,
+                                                 weighing_properties)
+                totals += weigher.weight_multiplier() * columns.array(
+                    weights.normalize(weights_, minval=weigher.minval,
+                                      maxval=weigher.maxval))
+                continue
+
+            # Record the min and max values the same way
+            # BaseWeigher.weigh_objects() does.
+            low, high = float(weights_.min()), float(weights_.max())
+            if weigher.minval is None or low < weigher.minval:
+                weigher.minval = low
+            if weigher.maxval is None or high > weigher.maxval:
+                weigher.maxval = high
+
+            minval = float(weigher.minval)
+            maxval = float(weigher.maxval)
+            if minval != maxval:
+                totals += (weigher.weight_multiplier() *
+                           (weights_ - minval) / (maxval - minval))
+
+        # NOTE: A stable sort on the negated weights keeps the same ordering
+        # as sorted(reverse=True) for hosts with equal weights.
+        order = (-totals).argsort(kind='mergesort')
+        for obj, weight in zip(weighed_objs, totals):
+            obj.weight = float(weight)
+        return [weighed_objs[idx] for idx in order]
+
 
 def all_weighers():
     """Return a list of weight plugin classes found in this directory."""
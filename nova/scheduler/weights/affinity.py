@@ -25,6 +25,7 @@ by preferring the hosts that has less instances from the given group.
 from oslo_config import cfg
 from oslo_log import log as logging
 
+from nova.scheduler.filters import utils as filter_utils
 from nova.scheduler import weights
 
 CONF = cfg.CONF
@@ -45,11 +46,7 @@ class _SoftAffinityWeigherBase(weights.BaseHostWeigher):
         if self.policy_name not in policies:
             return 0
 
-        instances = set(host_state.instances.keys())
-        members = set(request_spec.instance_group.members)
-        member_on_host = instances.intersection(members)
-
-        return len(member_on_host)
+        return filter_utils.group_members_on_host(host_state, request_spec)
 
 
 class ServerGroupSoftAffinityWeigher(_SoftAffinityWeigherBase):
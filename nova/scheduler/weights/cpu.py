@@ -39,3 +39,7 @@ class CPUWeigher(weights.BaseHostWeigher):
         vcpus_free = (host_state.vcpus_total * host_state.cpu_allocation_ratio
                       - host_state.vcpus_used)
         return vcpus_free
+
+    def weigh_columns(self, columns, weight_properties):
+        return (columns.vcpus_total * columns.cpu_allocation_ratio -
+                columns.vcpus_used)
@@ -36,3 +36,6 @@ class DiskWeigher(weights.BaseHostWeigher):
     def _weigh_object(self, host_state, weight_properties):
         """Higher weights win.  We want spreading to be the default."""
         return host_state.free_disk_mb
+
+    def weigh_columns(self, columns, weight_properties):
+        return columns.free_disk_mb
@@ -39,3 +39,6 @@ class IoOpsWeigher(weights.BaseHostWeigher):
         to be the default.
         """
         return host_state.num_io_ops
+
+    def weigh_columns(self, columns, weight_properties):
+        return columns.num_io_ops
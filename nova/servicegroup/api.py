@@ -79,6 +79,20 @@ class API(object):
 
         return self._driver.is_up(member)
 
+    def services_are_up(self, members):
+        """Check if each of the given members is up.
+
+        :param members: a list of members, as passed to service_is_up()
+        :returns: a list of booleans in the same order as the members
+        """
+        # NOTE: the drivers may be able to check all the members with a single
+        # round trip to their backend, e.g. when listing servers in detail.
+        checked = [member for member in members
+                   if not member.get('forced_down')]
+        alive = iter(self._driver.are_up(checked) if checked else [])
+        return [False if member.get('forced_down') else next(alive)
+                for member in members]
+
     def get_updated_time(self, member):
         """Get the updated time from drivers except db"""
         return self._driver.updated_time(member)
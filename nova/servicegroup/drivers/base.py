@@ -28,6 +28,13 @@ class Driver(object):
         """Check whether the given member is up."""
         raise NotImplementedError()
 
+    def are_up(self, members):
+        """Check whether each of the given members is up.
+
+        Drivers which can check several members at once should override this.
+        """
+        return [self.is_up(member) for member in members]
+
     def updated_time(self, service_ref):
         """Get the updated time"""
         raise NotImplementedError()
@@ -68,6 +68,18 @@ class MemcachedDriver(base.Driver):
 
         return is_up
 
+    def are_up(self, service_refs):
+        """Check whether each of the given services is up, with a single
+        memcached request.
+        """
+        keys = [str("%(topic)s:%(host)s" % service_ref)
+                for service_ref in service_refs]
+        alive = [value is not None for value in self.mc.get_multi(keys)]
+        for key, is_up in zip(keys, alive):
+            if not is_up:
+                LOG.debug('Seems service %s is down', key)
+        return alive
+
     def updated_time(self, service_ref):
         """Get the updated time from memcache"""
         key = "%(topic)s:%(host)s" % service_ref
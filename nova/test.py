@@ -317,6 +317,7 @@ class TestCase(testtools.TestCase):
         _reset_traits()
         self.addCleanup(_reset_traits)
         resource_provider._RC_CACHE = None
+        resource_provider._PROVIDER_CACHE.clear()
         # Reset the global QEMU version flag.
         images.QEMU_VERSION = None
 
@@ -619,6 +619,11 @@ class Database(fixtures.Fixture):
         engine.dispose()
         conn = engine.connect()
         conn.connection.executescript(DB_SCHEMA[self.database])
+        if self.database == 'main':
+            # NOTE: The archive caches are keyed by the database URL, which
+            # is the same for every test, so forget what the previous tests
+            # left in them.
+            session.reset_archive_caches()
 
     def setUp(self):
         super(Database, self).setUp()
@@ -65,3 +65,4 @@ class TestCase(testtools.TestCase):
         """Reset database sync flags to base state."""
         resource_provider._TRAITS_SYNCED = False
         resource_provider._RC_CACHE = None
+        resource_provider._PROVIDER_CACHE.clear()
@@ -9,6 +9,7 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
+import mock
 import os_traits
 from oslo_config import cfg
 import six
@@ -409,6 +410,35 @@ class AllocationCandidatesTestCase(tb.PlacementDbBaseTestCase):
         }
         self._validate_provider_summary_resources(expected, alloc_cands)
 
+    def test_provider_cache_trait_change(self):
+        """Tests that the traits of a provider are cached between requests
+        and refreshed once they change.
+        """
+        cn1 = self._create_provider('cn1')
+        tb.add_inventory(cn1, fields.ResourceClass.VCPU, 8)
+        tb.set_traits(cn1, 'HW_CPU_X86_AVX2')
+        requests = {'': placement_lib.RequestGroup(
+            use_same_provider=False,
+            resources={fields.ResourceClass.VCPU: 1})}
+
+        alloc_cands = self._get_allocation_candidates(requests)
+        self._validate_provider_summary_traits(
+            {'cn1': set(['HW_CPU_X86_AVX2'])}, alloc_cands)
+
+        # The provider is now in the cache, so its traits are not read again.
+        with mock.patch.object(rp_obj, '_load_provider_records') as mock_load:
+            alloc_cands = self._get_allocation_candidates(requests)
+        mock_load.assert_not_called()
+        self._validate_provider_summary_traits(
+            {'cn1': set(['HW_CPU_X86_AVX2'])}, alloc_cands)
+
+        # Changing the traits bumps the provider generation, so the cached
+        # record is not used anymore.
+        tb.set_traits(cn1, 'HW_CPU_X86_SSE2')
+        alloc_cands = self._get_allocation_candidates(requests)
+        self._validate_provider_summary_traits(
+            {'cn1': set(['HW_CPU_X86_SSE2'])}, alloc_cands)
+
     def test_all_local(self):
         """Create some resource providers that can satisfy the request for
         resources with local (non-shared) resources and verify that the
@@ -581,6 +611,79 @@ class AllocationCandidatesTestCase(tb.PlacementDbBaseTestCase):
         # provider summaries should have two rps
         self.assertEqual(expected_length, len(alloc_cands.provider_summaries))
 
+    def test_all_local_limit_pushed_down(self):
+        """Tests that with a single request group, the allocation requests and
+        provider summaries are only built for as many provider trees as the
+        limit.
+        """
+        for name in ('cn1', 'cn2', 'cn3'):
+            cn = self._create_provider(name)
+            tb.add_inventory(cn, fields.ResourceClass.VCPU, 24)
+
+        requests = {'': placement_lib.RequestGroup(
+            use_same_provider=False,
+            resources={fields.ResourceClass.VCPU: 1})}
+        with mock.patch.object(
+                rp_obj, '_get_usages_by_provider_tree',
+                wraps=rp_obj._get_usages_by_provider_tree) as mock_usages:
+            alloc_cands = self._get_allocation_candidates(requests, limit=2)
+        self.assertEqual(2, len(alloc_cands.allocation_requests))
+        self.assertEqual(2, len(alloc_cands.provider_summaries))
+        root_ids = mock_usages.call_args[0][1]
+        self.assertEqual(2, len(root_ids))
+
+        # Same with a granular request group, which goes through the
+        # single provider code path.
+        requests = {'1': placement_lib.RequestGroup(
+            use_same_provider=True,
+            resources={fields.ResourceClass.VCPU: 1})}
+        CONF.set_override('randomize_allocation_candidates', True,
+                          group='placement')
+        with mock.patch.object(
+                rp_obj, '_get_usages_by_provider_tree',
+                wraps=rp_obj._get_usages_by_provider_tree) as mock_usages:
+            alloc_cands = self._get_allocation_candidates(requests, limit=2)
+        self.assertEqual(2, len(alloc_cands.allocation_requests))
+        self.assertEqual(2, len(alloc_cands.provider_summaries))
+        root_ids = mock_usages.call_args[0][1]
+        self.assertEqual(2, len(root_ids))
+
+    def test_limit_nested_and_sharing(self):
+        """Tests that the limit is applied to the provider trees when there
+        are nested or sharing providers.
+        """
+        for name in ('cn1', 'cn2', 'cn3'):
+            cn = self._create_provider(name)
+            tb.add_inventory(cn, fields.ResourceClass.MEMORY_MB, 1024)
+            numa = self._create_provider(name + '_numa0', parent=cn.uuid)
+            tb.add_inventory(numa, fields.ResourceClass.VCPU, 24)
+
+        requests = {'': placement_lib.RequestGroup(
+            use_same_provider=False,
+            resources={fields.ResourceClass.VCPU: 1,
+                       fields.ResourceClass.MEMORY_MB: 64})}
+        alloc_cands = self._get_allocation_candidates(requests, limit=2)
+        self.assertEqual(2, len(alloc_cands.allocation_requests))
+        # The summaries cover both providers of the two trees.
+        self.assertEqual(4, len(alloc_cands.provider_summaries))
+
+        for name in ('cn4', 'cn5', 'cn6'):
+            cn = self._create_provider(name, uuids.agg)
+            tb.add_inventory(cn, fields.ResourceClass.VCPU, 24)
+        ss = self._create_provider('shared storage', uuids.agg)
+        tb.add_inventory(ss, fields.ResourceClass.DISK_GB, 2000)
+        tb.set_traits(ss, "MISC_SHARES_VIA_AGGREGATE")
+
+        requests = {'': placement_lib.RequestGroup(
+            use_same_provider=False,
+            resources={fields.ResourceClass.VCPU: 1,
+                       fields.ResourceClass.DISK_GB: 10})}
+        alloc_cands = self._get_allocation_candidates(requests, limit=2)
+        self.assertEqual(2, len(alloc_cands.allocation_requests))
+        for ar in alloc_cands.allocation_requests:
+            self.assertIn(ss.uuid, [rr.resource_provider.uuid
+                                    for rr in ar.resource_requests])
+
     def test_local_with_shared_disk(self):
         """Create some resource providers that can satisfy the request for
         resources with local VCPU and MEMORY_MB but rely on a shared storage
@@ -46,10 +46,6 @@ DISK_ALLOCATION = dict(
 class ResourceProviderTestCase(tb.PlacementDbBaseTestCase):
     """Test resource-provider objects' lifecycles."""
 
-    def test_provider_traits_empty_param(self):
-        self.assertRaises(ValueError, rp_obj._get_traits_by_provider_tree,
-                          self.ctx, [])
-
     def test_trait_ids_from_names_empty_param(self):
         self.assertRaises(ValueError, rp_obj._trait_ids_from_names,
                           self.ctx, [])
@@ -0,0 +1,7 @@
+{
+    "cache_images": {
+        "image_ids": [
+            "%(image_id)s"
+        ]
+    }
+}
@@ -15,7 +15,10 @@
 
 from oslo_serialization import jsonutils
 
+from nova import context
+from nova import objects
 from nova.tests.functional.api_sample_tests import api_sample_base
+from nova.tests.unit.image import fake as fake_image
 
 
 class AggregatesSampleJsonTest(api_sample_base.ApiSampleTestBaseV21):
@@ -117,3 +120,20 @@ class AggregatesV2_41_SampleJsonTest(AggregatesSampleJsonTest):
         self.extra_subs['uuid'] = subs['uuid']
         return self._verify_response('aggregate-post-resp',
                                      subs, response, 200)
+
+
+class AggregatesV2_66_SampleJsonTest(api_sample_base.ApiSampleTestBaseV21):
+    ADMIN_API = True
+    sample_dir = "os-aggregates"
+    microversion = '2.66'
+    scenarios = [('v2_66', {'api_major_version': 'v2.1'})]
+
+    def test_cache_images(self):
+        aggregate = objects.Aggregate(context.get_admin_context(),
+                                      name='images')
+        aggregate.create()
+        subs = {'image_id': fake_image.AUTO_DISK_CONFIG_ENABLED_IMAGE_UUID}
+        response = self._do_post('os-aggregates/%s/action' % aggregate.id,
+                                 'aggregate-cache-images-post-req', subs)
+        self.assertEqual(202, response.status_code)
+        self.assertEqual('', response.text)
@@ -146,6 +146,17 @@ class InstanceListTestCase(test.TestCase):
         self.assertEqual(sorted(uuids), uuids)
         self.assertEqual(len(self.instances), len(uuids))
 
+    def test_get_sorted_with_limit_small_batch(self):
+        # Fetch the records of each cell one at a time at first so that
+        # several windows are needed to fill the page.
+        self.flags(instance_list_cells_batch_size=1, group='api')
+        insts = instance_list.get_instances_sorted(self.context, {},
+                                                   5, None,
+                                                   [], ['uuid'], ['asc'])
+        uuids = [inst['uuid'] for inst in insts]
+        had_uuids = [inst.uuid for inst in self.instances]
+        self.assertEqual(sorted(had_uuids)[:5], uuids)
+
     def _test_get_sorted_with_limit_marker(self, sort_by, pages=2, pagesize=2,
                                            sort_dir='asc'):
         """Get multiple pages by a sort key and validate the results.
@@ -263,6 +274,12 @@ class InstanceListTestCase(test.TestCase):
         self._test_get_sorted_with_limit_marker(sort_by='uuid',
                                                 pages=3, pagesize=2)
 
+    def test_get_sorted_with_limit_marker_small_batch(self):
+        """Test sorted by hostname, fetching cells in small windows."""
+        self.flags(instance_list_cells_batch_size=1, group='api')
+        self._test_get_sorted_with_limit_marker(sort_by='hostname',
+                                                pages=2, pagesize=4)
+
     def test_get_sorted_with_limit_marker_datetime(self):
         """Test sorted by launched_at.
 
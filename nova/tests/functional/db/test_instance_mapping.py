@@ -14,6 +14,8 @@ from oslo_utils import uuidutils
 
 from nova.compute import vm_states
 from nova import context
+from nova.db.sqlalchemy import api as db_api
+from nova.db.sqlalchemy import models
 from nova import exception
 from nova.objects import cell_mapping
 from nova.objects import instance
@@ -196,6 +198,72 @@ class InstanceMappingTestCase(test.NoDBTestCase):
         self.assertEqual(4, len(
             [im for im in mappings if im.queued_for_delete is False]))
 
+    def test_populate_user_id(self):
+        cells = []
+        celldbs = fixtures.CellDatabases()
+
+        # Create two cell databases and map them
+        for uuid in (uuidsentinel.cell1, uuidsentinel.cell2):
+            cm = cell_mapping.CellMapping(context=self.context, uuid=uuid,
+                                          database_connection=uuid,
+                                          transport_url='fake://')
+            cm.create()
+            cells.append(cm)
+            celldbs.add_cell_database(uuid)
+        self.useFixture(celldbs)
+
+        # Create 4 instances per cell: one deleted, one purged from the
+        # cell database, and one queued for deletion.
+        for cell in cells:
+            for i in range(0, 4):
+                qfd = True if i == 3 else None
+                with context.target_cell(self.context, cell) as cctxt:
+                    inst = instance.Instance(
+                        cctxt,
+                        project_id=self.context.project_id,
+                        user_id='user%i' % i)
+                    inst.create()
+                    if i == 1:
+                        inst.destroy()
+                    elif i == 2:
+                        # Pretend the instance was archived and purged.
+                        self._purge_instance(cctxt, inst.uuid)
+
+                instance_mapping.InstanceMapping._create_in_db(
+                    self.context,
+                    {'project_id': self.context.project_id,
+                     'cell_id': cell.id,
+                     'queued_for_delete': qfd,
+                     'instance_uuid': inst.uuid})
+
+        done, total = instance_mapping.populate_user_id(self.context, 2)
+        # The first two mappings needed fixing, and honored the limit
+        self.assertEqual(2, done)
+        self.assertEqual(2, total)
+
+        done, total = instance_mapping.populate_user_id(self.context, 1000)
+        # The mappings queued for deletion are skipped
+        self.assertEqual(4, done)
+        self.assertEqual(4, total)
+
+        done, total = instance_mapping.populate_user_id(self.context, 1000)
+        self.assertEqual(0, done)
+
+        mappings = instance_mapping.InstanceMappingList.get_by_project_id(
+            self.context, self.context.project_id)
+        self.assertEqual(['user0', 'user0', 'user1', 'user1'],
+                         sorted(im.user_id for im in mappings if im.user_id))
+        # The mappings of the purged instances are now queued for deletion.
+        self.assertEqual(4, len(
+            [im for im in mappings
+             if im.user_id is None and im.queued_for_delete]))
+
+    @staticmethod
+    @db_api.pick_context_manager_writer
+    def _purge_instance(context, instance_uuid):
+        context.session.query(models.Instance).filter_by(
+            uuid=instance_uuid).delete()
+
 
 class InstanceMappingListTestCase(test.NoDBTestCase):
     USES_DB_SELF = True
@@ -244,6 +312,25 @@ class InstanceMappingListTestCase(test.NoDBTestCase):
         self.assertEqual(1, len(inst_mapping_list))
         self.assertEqual(db_inst_mapping1['id'], inst_mapping_list[0].id)
 
+    def test_get_counts(self):
+        create_mapping(project_id='fake-project', user_id='fake-user')
+        create_mapping(project_id='fake-project', user_id='fake-user',
+                       queued_for_delete=False)
+        create_mapping(project_id='fake-project', user_id='other-user')
+        # Not counted: queued for deletion or in another project.
+        create_mapping(project_id='fake-project', user_id='fake-user',
+                       queued_for_delete=True)
+        create_mapping(project_id='other-project', user_id='fake-user')
+
+        counts = instance_mapping.InstanceMappingList.get_counts(
+            self.context, 'fake-project', user_id='fake-user')
+        self.assertEqual({'project': {'instances': 3},
+                          'user': {'instances': 2}}, counts)
+
+        counts = instance_mapping.InstanceMappingList.get_counts(
+            self.context, 'fake-project')
+        self.assertEqual({'project': {'instances': 3}}, counts)
+
     def test_instance_mapping_get_by_instance_uuids(self):
         db_inst_mapping1 = create_mapping()
         db_inst_mapping2 = create_mapping(cell_id=None)
@@ -946,6 +946,101 @@ class SchedulerReportClientTests(SchedulerReportClientTestBase):
                 resp = self.client.get('/resource_providers/%s' % uuid)
                 self.assertEqual(404, resp.status_code)
 
+    def test_update_from_provider_tree_steady_state(self):
+        """Flushing an unmodified tree returned by
+        get_provider_tree_and_ensure_root makes no placement writes, and
+        flushing a modified one only writes what changed.
+        """
+        def count_writes():
+            counts = self.client.get_call_counts()
+            return sum(counts.get(method, 0)
+                       for method in ('POST', 'PUT', 'DELETE'))
+
+        inv = {
+            fields.ResourceClass.VCPU: {
+                'total': 10,
+                'reserved': 0,
+                'min_unit': 1,
+                'max_unit': 2,
+                'step_size': 1,
+                'allocation_ratio': 10.0,
+            },
+        }
+        with self._interceptor():
+            ptree = self.client.get_provider_tree_and_ensure_root(
+                self.context, self.compute_uuid, name=self.compute_name)
+            ptree.update_inventory(self.compute_uuid, inv)
+            ptree.new_child('numa0', self.compute_uuid, uuid=uuids.numa0)
+            ptree.update_traits(uuids.numa0, ['HW_CPU_X86_AVX'])
+            self.client.update_from_provider_tree(self.context, ptree)
+
+            # Nothing changed: no writes
+            writes = count_writes()
+            ptree = self.client.get_provider_tree_and_ensure_root(
+                self.context, self.compute_uuid, name=self.compute_name)
+            ptree.update_inventory(self.compute_uuid, inv)
+            self.client.update_from_provider_tree(self.context, ptree)
+            self.assertEqual(writes, count_writes())
+
+            # Only the traits of the child are flushed
+            ptree = self.client.get_provider_tree_and_ensure_root(
+                self.context, self.compute_uuid, name=self.compute_name)
+            ptree.update_traits(uuids.numa0, ['HW_CPU_X86_AVX',
+                                              'HW_CPU_X86_AVX2'])
+            self.client.update_from_provider_tree(self.context, ptree)
+            self.assertEqual(writes + 1, count_writes())
+            self.assertEqual(
+                set(['HW_CPU_X86_AVX', 'HW_CPU_X86_AVX2']),
+                self.client._get_provider_traits(
+                    self.context, uuids.numa0).traits)
+
+    def test_update_from_provider_tree_bulk(self):
+        """With bulk_provider_tree_updates, the changes to the providers of a
+        tree are flushed with a single placement request.
+        """
+        self.flags(bulk_provider_tree_updates=True)
+        inv = {
+            fields.ResourceClass.VCPU: {
+                'total': 10,
+                'reserved': 0,
+                'min_unit': 1,
+                'max_unit': 2,
+                'step_size': 1,
+                'allocation_ratio': 10.0,
+            },
+        }
+        with self._interceptor():
+            ptree = self.client.get_provider_tree_and_ensure_root(
+                self.context, self.compute_uuid, name=self.compute_name)
+            ptree.new_child('numa0', self.compute_uuid, uuid=uuids.numa0)
+            self.client.update_from_provider_tree(self.context, ptree)
+
+            puts = self.client.get_call_counts().get('PUT', 0)
+            ptree = self.client.get_provider_tree_and_ensure_root(
+                self.context, self.compute_uuid, name=self.compute_name)
+            ptree.update_inventory(self.compute_uuid, inv)
+            ptree.update_aggregates(self.compute_uuid, [uuids.agg])
+            ptree.update_traits(uuids.numa0, ['HW_CPU_X86_AVX'])
+            self.client.update_from_provider_tree(self.context, ptree)
+            self.assertEqual(puts + 1,
+                             self.client.get_call_counts().get('PUT', 0))
+
+            self.assertEqual(
+                10, self.client._get_inventory(
+                    self.context, self.compute_uuid)['inventories'][
+                        fields.ResourceClass.VCPU]['total'])
+            self.assertEqual(
+                set([uuids.agg]), self.client._get_provider_aggregates(
+                    self.context, self.compute_uuid).aggregates)
+            self.assertEqual(
+                set(['HW_CPU_X86_AVX']), self.client._get_provider_traits(
+                    self.context, uuids.numa0).traits)
+            # The cache is in sync with placement
+            ptree = self.client.get_provider_tree_and_ensure_root(
+                self.context, self.compute_uuid, name=self.compute_name)
+            self.assertEqual(set([uuids.agg]),
+                             ptree.data(self.compute_uuid).aggregates)
+
     def test_non_tree_aggregate_membership(self):
         """There are some methods of the reportclient that interact with the
         reportclient's provider_tree cache of information on a best-effort
@@ -728,3 +728,57 @@ class AggregateTestCaseV21(test.NoDBTestCase):
     def _assert_agg_data(self, expected, actual):
         self.assertTrue(obj_base.obj_equal_prims(expected, actual),
                         "The aggregate objects were not equal")
+
+
+class AggregateCacheImagesTestCaseV266(test.NoDBTestCase):
+    """Test Case for the cache_images action of the aggregates API."""
+
+    def setUp(self):
+        super(AggregateCacheImagesTestCaseV266, self).setUp()
+        self.controller = aggregates_v21.AggregateController()
+        self.req = fakes.HTTPRequest.blank('/v2/os-aggregates',
+                                           use_admin_context=True,
+                                           version='2.66')
+        self.context = self.req.environ['nova.context']
+        self.body = {'cache_images': {'image_ids': [uuidsentinel.image]}}
+
+    @mock.patch.object(compute_api.AggregateAPI, 'cache_images')
+    def test_cache_images(self, mock_cache):
+        self.controller._cache_images(self.req, '1', body=self.body)
+        mock_cache.assert_called_once_with(self.context, '1',
+                                           [uuidsentinel.image])
+        self.assertEqual(202, self.controller._cache_images.wsgi_code)
+
+    def test_cache_images_old_microversion(self):
+        req = fakes.HTTPRequest.blank('/v2/os-aggregates',
+                                      use_admin_context=True,
+                                      version='2.65')
+        self.assertRaises(exception.VersionNotFoundForAPIMethod,
+                          self.controller._cache_images, req, '1',
+                          body=self.body)
+
+    def test_cache_images_invalid_body(self):
+        for image_ids in ([], ['not-a-uuid'],
+                          [uuidsentinel.image, uuidsentinel.image]):
+            body = {'cache_images': {'image_ids': image_ids}}
+            self.assertRaises(exception.ValidationError,
+                              self.controller._cache_images, self.req, '1',
+                              body=body)
+
+    def test_cache_images_no_admin(self):
+        req = fakes.HTTPRequest.blank('/v2/os-aggregates', version='2.66')
+        self.assertRaises(exception.PolicyNotAuthorized,
+                          self.controller._cache_images, req, '1',
+                          body=self.body)
+
+    @mock.patch.object(compute_api.AggregateAPI, 'cache_images')
+    def test_cache_images_errors(self, mock_cache):
+        for error, http_error in (
+                (exception.AggregateNotFound(aggregate_id='1'),
+                 exc.HTTPNotFound),
+                (exception.ImageNotFound(image_id=uuidsentinel.image),
+                 exc.HTTPBadRequest),
+                (exception.ImageCacheNotYetAvailable(), exc.HTTPConflict)):
+            mock_cache.side_effect = error
+            self.assertRaises(http_error, self.controller._cache_images,
+                              self.req, '1', body=self.body)
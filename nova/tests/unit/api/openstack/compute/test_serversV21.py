@@ -1415,6 +1415,31 @@ class ServersControllerTest(ControllerTest):
                                       version=self.wsgi_api_version)
         self.assertIn('servers', self.controller.detail(req))
 
+    @mock.patch('nova.objects.InstanceMapping.get_by_instance_uuid')
+    def test_get_servers_detail_faults_loaded_with_list(self, mock_im):
+        def fake_get_all(context, search_opts=None,
+                         limit=None, marker=None,
+                         expected_attrs=None, sort_keys=None, sort_dirs=None):
+            self.assertIn('fault', expected_attrs)
+            faulty = fakes.stub_instance_obj(None, id=1,
+                                             uuid=fakes.get_fake_uuid(0),
+                                             vm_state=vm_states.ERROR)
+            faulty.fault = fake_instance.fake_fault_obj(context, faulty.uuid)
+            # An instance built from a build request has no fault loaded.
+            building = fakes.stub_instance_obj(None, id=2,
+                                               uuid=fakes.get_fake_uuid(1),
+                                               vm_state=vm_states.ERROR)
+            return objects.InstanceList(objects=[faulty, building])
+
+        self.mock_get_all.side_effect = fake_get_all
+
+        req = self.req('/fake/servers/detail')
+        servers = self.controller.detail(req)['servers']
+
+        self.assertEqual(404, servers[0]['fault']['code'])
+        self.assertNotIn('fault', servers[1])
+        mock_im.assert_not_called()
+
 
 class ServersControllerTestV29(ServersControllerTest):
     wsgi_api_version = '2.9'
@@ -0,0 +1,60 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Unit tests for the in-process resource provider cache."""
+
+import testtools
+
+from nova.api.openstack.placement import provider_cache
+from nova.tests import uuidsentinel as uuids
+
+
+class TestProviderCache(testtools.TestCase):
+
+    def setUp(self):
+        super(TestProviderCache, self).setUp()
+        self.cache = provider_cache.ProviderCache()
+        self.current = {
+            'uuid': uuids.cn1,
+            'generation': 3,
+            'root_provider_id': 1,
+            'parent_provider_id': None,
+        }
+        self.record = dict(self.current, id=1, traits=['HW_CPU_X86_AVX2'])
+
+    def test_get_missing(self):
+        self.assertIsNone(self.cache.get(1, self.current))
+
+    def test_get(self):
+        self.cache.set(self.record)
+        self.assertEqual(self.record, self.cache.get(1, self.current))
+
+    def test_get_stale(self):
+        self.cache.set(self.record)
+        for field, value in (('uuid', uuids.cn2),
+                             ('generation', 4),
+                             ('root_provider_id', 2),
+                             ('parent_provider_id', 2)):
+            current = dict(self.current)
+            current[field] = value
+            self.assertIsNone(self.cache.get(1, current))
+
+    def test_remove(self):
+        self.cache.set(self.record)
+        self.cache.remove(1)
+        self.assertIsNone(self.cache.get(1, self.current))
+        # Removing a missing record is fine.
+        self.cache.remove(1)
+
+    def test_clear(self):
+        self.cache.set(self.record)
+        self.cache.clear()
+        self.assertIsNone(self.cache.get(1, self.current))
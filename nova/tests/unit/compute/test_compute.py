@@ -12213,6 +12213,54 @@ class ComputeAPIAggrTestCase(BaseTestCase):
         hosts = aggregate.hosts if 'hosts' in aggregate else None
         self.assertIn(values[0][1][0], hosts)
 
+    @mock.patch('nova.objects.service.get_minimum_version_all_cells',
+                return_value=compute_api.MIN_COMPUTE_IMAGE_CACHE)
+    def test_cache_images(self, mock_min_version):
+        aggregate = self.api.create_aggregate(self.context, 'fake_aggregate',
+                                              None)
+        with test.nested(
+            mock.patch.object(self.api.image_api, 'get'),
+            mock.patch.object(self.api.compute_task_api, 'cache_images'),
+        ) as (mock_get_image, mock_cache_images):
+            self.api.cache_images(self.context, aggregate.id,
+                                  [uuids.image1, uuids.image2])
+        mock_get_image.assert_has_calls([
+            mock.call(self.context, uuids.image1),
+            mock.call(self.context, uuids.image2)])
+        mock_cache_images.assert_called_once_with(
+            self.context, test.MatchType(objects.Aggregate),
+            [uuids.image1, uuids.image2])
+        self.assertEqual(aggregate.id,
+                         mock_cache_images.call_args[0][1].id)
+
+    @mock.patch('nova.objects.service.get_minimum_version_all_cells',
+                return_value=compute_api.MIN_COMPUTE_IMAGE_CACHE)
+    def test_cache_images_image_not_found(self, mock_min_version):
+        aggregate = self.api.create_aggregate(self.context, 'fake_aggregate',
+                                              None)
+        with test.nested(
+            mock.patch.object(self.api.image_api, 'get',
+                              side_effect=exception.ImageNotFound(
+                                  image_id=uuids.image)),
+            mock.patch.object(self.api.compute_task_api, 'cache_images'),
+        ) as (mock_get_image, mock_cache_images):
+            self.assertRaises(exception.ImageNotFound,
+                              self.api.cache_images, self.context,
+                              aggregate.id, [uuids.image])
+        mock_cache_images.assert_not_called()
+
+    @mock.patch('nova.objects.service.get_minimum_version_all_cells',
+                return_value=compute_api.MIN_COMPUTE_IMAGE_CACHE - 1)
+    def test_cache_images_old_computes(self, mock_min_version):
+        aggregate = self.api.create_aggregate(self.context, 'fake_aggregate',
+                                              None)
+        with mock.patch.object(self.api.compute_task_api,
+                               'cache_images') as mock_cache_images:
+            self.assertRaises(exception.ImageCacheNotYetAvailable,
+                              self.api.cache_images, self.context,
+                              aggregate.id, [uuids.image])
+        mock_cache_images.assert_not_called()
+
 
 class ComputeAPIAggrCallsSchedulerTestCase(test.NoDBTestCase):
     """This is for making sure that all Aggregate API methods which are
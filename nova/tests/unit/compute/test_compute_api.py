@@ -5293,6 +5293,31 @@ class _ComputeAPIUnitTestMixIn(object):
             self.assertEqual(expect_statuses[instance.uuid],
                              host_statuses[instance.uuid])
 
+    @mock.patch('nova.servicegroup.api.API.services_are_up',
+                return_value=[True, False])
+    def test_host_statuses_single_servicegroup_call(self, mock_are_up):
+        def _instance(uuid, host):
+            service = objects.Service(id=0, host=host, disabled=False,
+                                      forced_down=False,
+                                      binary='nova-compute')
+            return objects.Instance(uuid=uuid, host=host,
+                                    services=self._obj_to_list_obj(
+                                        objects.ServiceList(self.context),
+                                        service))
+
+        instances = [_instance(uuids.instance_1, 'host1'),
+                     _instance(uuids.instance_2, 'host2'),
+                     _instance(uuids.instance_3, 'host1')]
+
+        host_statuses = self.compute_api.get_instances_host_statuses(
+                        instances)
+        self.assertEqual({uuids.instance_1: fields_obj.HostStatus.UP,
+                          uuids.instance_2: fields_obj.HostStatus.UNKNOWN,
+                          uuids.instance_3: fields_obj.HostStatus.UP},
+                         host_statuses)
+        mock_are_up.assert_called_once_with(
+            [instances[0].services[0], instances[1].services[0]])
+
     @mock.patch.object(objects.Migration, 'get_by_id_and_instance')
     @mock.patch.object(objects.InstanceAction, 'action_start')
     def test_live_migrate_force_complete_succeeded(
@@ -303,6 +303,9 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
         self.compute.update_available_resource(self.context)
         get_db_nodes.assert_called_once_with(self.context, use_slave=True,
                                              startup=False)
+        rt = self.compute._get_resource_tracker()
+        self.assertEqual(self.compute._get_build_phase_stats(),
+                         rt.build_phase_stats)
         update_mock.has_calls(
             [mock.call(self.context, node) for node in avail_nodes_l]
         )
@@ -316,6 +319,48 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
             else:
                 self.assertFalse(db_node.destroy.called)
 
+    @mock.patch.object(manager.ComputeManager,
+                       '_update_available_resource_for_node')
+    @mock.patch.object(fake_driver.FakeDriver, 'get_available_nodes')
+    @mock.patch.object(manager.ComputeManager, '_get_compute_nodes_in_db')
+    def test_update_available_resource_concurrent(self, get_db_nodes,
+                                                  get_avail_nodes,
+                                                  update_mock):
+        self.flags(update_resources_concurrency=2)
+        avail_nodes = set(['node1', 'node2', 'node3'])
+        get_db_nodes.return_value = []
+        get_avail_nodes.return_value = avail_nodes
+
+        with mock.patch('nova.utils.spawn',
+                        side_effect=utils.spawn) as mock_spawn:
+            self.compute.update_available_resource(self.context)
+
+        self.assertEqual(3, mock_spawn.call_count)
+        self.assertEqual(3, update_mock.call_count)
+        update_mock.assert_has_calls(
+            [mock.call(self.context, node) for node in avail_nodes],
+            any_order=True)
+
+    @mock.patch('nova.compute.manager.LOG.warning')
+    @mock.patch('oslo_utils.timeutils.StopWatch.elapsed', return_value=15)
+    @mock.patch.object(manager.ComputeManager,
+                       '_update_available_resource_for_node')
+    @mock.patch.object(fake_driver.FakeDriver, 'get_available_nodes')
+    @mock.patch.object(manager.ComputeManager, '_get_compute_nodes_in_db')
+    def test_update_available_resource_too_slow(self, get_db_nodes,
+                                                get_avail_nodes,
+                                                update_mock, mock_elapsed,
+                                                mock_warning):
+        self.flags(update_resources_interval=10)
+        get_db_nodes.return_value = []
+        get_avail_nodes.return_value = set(['node1'])
+
+        self.compute.update_available_resource(self.context)
+
+        update_mock.assert_called_once_with(self.context, 'node1')
+        mock_warning.assert_called_once_with(
+            mock.ANY, {'count': 1, 'elapsed': 15, 'interval': 10})
+
     @mock.patch('nova.scheduler.client.report.SchedulerReportClient.'
                 'delete_resource_provider')
     @mock.patch.object(manager.ComputeManager,
@@ -657,6 +702,38 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
         self.assertIsInstance(compute._build_semaphore,
                               compute_utils.UnlimitedSemaphore)
 
+    def test_build_phase_semaphores(self):
+        self.flags(max_concurrent_network_allocations=2,
+                   max_concurrent_spawns=3)
+        compute = manager.ComputeManager()
+        self.assertEqual(2, compute._network_semaphore.balance)
+        self.assertEqual(0, compute._block_device_semaphore.limit)
+        self.assertEqual(3, compute._spawn_semaphore.balance)
+
+    @mock.patch.object(manager.LOG, 'warning')
+    def test_build_phase_semaphores_builds_too_low(self, mock_warning):
+        self.flags(max_concurrent_builds=4,
+                   max_concurrent_network_allocations=2,
+                   max_concurrent_spawns=3)
+        manager.ComputeManager()
+        mock_warning.assert_called_once_with(mock.ANY, {'phases': 5,
+                                                        'builds': 4})
+
+        mock_warning.reset_mock()
+        self.flags(max_concurrent_builds=0)
+        manager.ComputeManager()
+        self.flags(max_concurrent_builds=5)
+        manager.ComputeManager()
+        mock_warning.assert_not_called()
+
+    def test_get_build_phase_stats(self):
+        self.compute._spawn_semaphore.running = 2
+        phase_stats = self.compute._get_build_phase_stats()
+        self.assertEqual(12, len(phase_stats))
+        self.assertEqual(2, phase_stats['build_spawn_running'])
+        self.assertEqual(0, phase_stats['build_network_allocation_waiting'])
+        self.assertEqual(0, phase_stats['build_block_device_setup_waited'])
+
     def test_nil_out_inst_obj_host_and_node_sets_nil(self):
         instance = fake_instance.fake_instance_obj(self.context,
                                                    uuid=uuids.instance,
@@ -1739,6 +1816,81 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
                                         use_slave=True)
             mock_spawn.assert_called_once_with(mock.ANY, instance)
 
+    @mock.patch.object(objects.InstanceList, 'get_by_host')
+    def test_heal_instance_info_cache_bulk(self, mock_get):
+        self.flags(heal_instance_info_cache_bulk=True)
+        instances = [
+            objects.Instance(uuid=uuids.inst1, vm_state=vm_states.ACTIVE,
+                             task_state=None),
+            objects.Instance(uuid=uuids.inst2, vm_state=vm_states.BUILDING,
+                             task_state=None),
+            objects.Instance(uuid=uuids.inst3, vm_state=vm_states.ACTIVE,
+                             task_state=task_states.DELETING)]
+        mock_get.return_value = instances
+        with test.nested(
+            mock.patch.object(self.compute.network_api,
+                              'get_stale_info_cache_instances',
+                              return_value=[instances[0]]),
+            mock.patch.object(self.compute.network_api,
+                              'get_instance_nw_info'),
+        ) as (mock_stale, mock_nw_info):
+            self.compute._heal_instance_info_cache(self.context)
+
+        mock_get.assert_called_once_with(
+            self.context, self.compute.host,
+            expected_attrs=['system_metadata', 'info_cache', 'flavor'],
+            use_slave=True)
+        mock_stale.assert_called_once_with(self.context, [instances[0]])
+        mock_nw_info.assert_called_once_with(self.context, instances[0])
+        self.assertEqual(0, self.compute._heal_info_cache_skips)
+
+    @mock.patch.object(objects.InstanceList, 'get_by_host', return_value=[])
+    def test_heal_instance_info_cache_bulk_backoff(self, mock_get):
+        self.flags(heal_instance_info_cache_bulk=True)
+        with mock.patch.object(self.compute.network_api,
+                               'get_stale_info_cache_instances',
+                               return_value=[]) as mock_stale:
+            # The caches are checked on calls 1, 3, 6, 11 and 20: 1, 2, 4
+            # then 8 runs are skipped, and never more than 8.
+            for i in range(28):
+                self.compute._heal_instance_info_cache(self.context)
+
+        self.assertEqual(5, mock_stale.call_count)
+        self.assertEqual(8, self.compute._heal_info_cache_backoff)
+
+    @mock.patch.object(objects.InstanceList, 'get_by_host', return_value=[])
+    def test_heal_instance_info_cache_bulk_not_implemented(self, mock_get):
+        self.flags(heal_instance_info_cache_bulk=True)
+        with mock.patch.object(self.compute.network_api,
+                               'get_stale_info_cache_instances',
+                               side_effect=NotImplementedError):
+            self.compute._heal_instance_info_cache(self.context)
+
+        # The list of instances to heal one by one was built instead.
+        self.assertEqual(2, mock_get.call_count)
+        mock_get.assert_called_with(self.context, self.compute.host,
+                                    expected_attrs=[], use_slave=True)
+
+    @mock.patch.object(objects.InstanceList, 'get_by_host')
+    def test_sync_power_states_bulk(self, mock_get):
+        instance = mock.Mock()
+        mock_get.return_value = [instance]
+        with test.nested(
+            mock.patch.object(self.compute.driver, 'get_power_states',
+                              return_value={uuids.instance: 1}),
+            mock.patch.object(self.compute.driver, 'get_num_instances'),
+            mock.patch.object(self.compute,
+                              '_query_driver_power_state_and_sync'),
+            mock.patch.object(self.compute._sync_power_pool, 'spawn_n',
+                              side_effect=lambda f, *a: f(*a)),
+        ) as (mock_states, mock_num, mock_query, mock_spawn):
+            self.compute._sync_power_states(mock.sentinel.context)
+            mock_states.assert_called_once_with()
+            mock_num.assert_not_called()
+            mock_query.assert_called_once_with(
+                mock.sentinel.context, instance,
+                vm_power_states={uuids.instance: 1})
+
     def _get_sync_instance(self, power_state, vm_state, task_state=None,
                            shutdown_terminate=False):
         instance = objects.Instance()
@@ -1850,6 +2002,44 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
                                                           power_state.NOSTATE,
                                                           use_slave=True)
 
+    @mock.patch('nova.compute.manager.ComputeManager.'
+                '_sync_instance_power_state')
+    def test_query_driver_power_state_and_sync_bulk_state(
+            self, mock_sync_power_state):
+        with mock.patch.object(self.compute.driver,
+                               'get_info') as mock_get_info:
+            db_instance = objects.Instance(uuid=uuids.db_instance,
+                                           power_state=power_state.RUNNING,
+                                           task_state=None)
+            self.compute._query_driver_power_state_and_sync(
+                self.context, db_instance,
+                vm_power_states={uuids.db_instance: power_state.RUNNING})
+            mock_get_info.assert_not_called()
+            mock_sync_power_state.assert_called_once_with(self.context,
+                                                          db_instance,
+                                                          power_state.RUNNING,
+                                                          use_slave=True)
+
+    @mock.patch('nova.compute.manager.ComputeManager.'
+                '_sync_instance_power_state')
+    def test_query_driver_power_state_and_sync_bulk_state_changed(
+            self, mock_sync_power_state):
+        info = hardware.InstanceInfo(state=power_state.SHUTDOWN)
+        with mock.patch.object(self.compute.driver, 'get_info',
+                               return_value=info) as mock_get_info:
+            db_instance = objects.Instance(uuid=uuids.db_instance,
+                                           power_state=power_state.RUNNING,
+                                           task_state=None)
+            # The instance is missing from the bulk states, so the driver is
+            # asked again before syncing.
+            self.compute._query_driver_power_state_and_sync(
+                self.context, db_instance, vm_power_states={})
+            mock_get_info.assert_called_once_with(db_instance)
+            mock_sync_power_state.assert_called_once_with(self.context,
+                                                          db_instance,
+                                                          power_state.SHUTDOWN,
+                                                          use_slave=True)
+
     @mock.patch.object(virt_driver.ComputeDriver, 'delete_instance_files')
     @mock.patch.object(objects.InstanceList, 'get_by_filters')
     def test_run_pending_deletes(self, mock_get, mock_delete):
@@ -5499,6 +5689,29 @@ class ComputeManagerBuildInstanceTestCase(test.NoDBTestCase):
         self.assertEqual(10, mock_failed.call_count)
         mock_succeeded.assert_not_called()
 
+    @mock.patch.object(manager.ComputeManager, '_do_build_and_run_instance')
+    @mock.patch.object(manager.ComputeManager, '_build_failed')
+    @mock.patch.object(manager.ComputeManager, '_build_succeeded')
+    def test_build_results_reported_for_default_node(self, mock_succeeded,
+                                                     mock_failed,
+                                                     mock_dbari):
+        mock_dbari.side_effect = [build_results.ACTIVE,
+                                  build_results.FAILED,
+                                  build_results.ACTIVE]
+        instance = objects.Instance(uuid=uuids.instance)
+        with mock.patch.object(self.compute.driver, 'get_available_nodes',
+                               return_value=['fake-node']):
+            self.compute.build_and_run_instance(self.context, instance, None,
+                                                None, None)
+            self.compute.build_and_run_instance(self.context, instance, None,
+                                                None, None)
+        self.compute.build_and_run_instance(self.context, instance, None,
+                                            None, None, node='other-node')
+
+        mock_failed.assert_called_once_with('fake-node')
+        mock_succeeded.assert_has_calls([mock.call('fake-node'),
+                                         mock.call('other-node')])
+
     @mock.patch.object(manager.ComputeManager, '_do_build_and_run_instance')
     @mock.patch('nova.exception_wrapper._emit_exception_notification')
     @mock.patch('nova.compute.utils.add_instance_fault_from_exc')
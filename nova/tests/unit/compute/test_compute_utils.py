@@ -20,6 +20,7 @@ import copy
 import string
 import traceback
 
+import eventlet
 import mock
 from oslo_serialization import jsonutils
 from oslo_utils import uuidutils
@@ -1163,6 +1164,52 @@ class ComputeUtilsTestCase(test.NoDBTestCase):
         mock_save.assert_called_once_with()
 
 
+class BuildPhaseSemaphoreTestCase(test.NoDBTestCase):
+
+    def test_limited(self):
+        sem = compute_utils.BuildPhaseSemaphore('spawn', 1)
+        counts = []
+
+        def build():
+            with sem:
+                # Let the other builds try to run the phase.
+                eventlet.sleep(0)
+                counts.append((sem.running, sem.waiting))
+
+        pool = eventlet.GreenPool()
+        for i in range(3):
+            pool.spawn(build)
+        pool.waitall()
+
+        # The builds run the phase one at a time, the first one while the
+        # two others are waiting for it.
+        self.assertEqual([(1, 2), (1, 1), (1, 0)], counts)
+        self.assertEqual(0, sem.running)
+        self.assertEqual(0, sem.waiting)
+        self.assertEqual(2, sem.waited)
+        self.assertEqual(1, sem.balance)
+
+    def test_get_stats(self):
+        sem = compute_utils.BuildPhaseSemaphore('network allocation', 1)
+        sem.running = 1
+        sem.waiting = 2
+        sem.waited = 3
+        sem.wait_time = 4.567
+        self.assertEqual({'build_network_allocation_running': 1,
+                          'build_network_allocation_waiting': 2,
+                          'build_network_allocation_waited': 3,
+                          'build_network_allocation_wait_time': '4.57'},
+                         sem.get_stats())
+
+    def test_unlimited(self):
+        sem = compute_utils.BuildPhaseSemaphore('spawn', 0)
+        with sem:
+            with sem:
+                self.assertEqual(2, sem.running)
+                self.assertEqual(0, sem.waiting)
+        self.assertEqual(0, sem.running)
+
+
 class ServerGroupTestCase(test.TestCase):
     def setUp(self):
         super(ServerGroupTestCase, self).setUp()
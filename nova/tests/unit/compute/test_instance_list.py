@@ -18,6 +18,7 @@ from nova import context as nova_context
 from nova import objects
 from nova import test
 from nova.tests import fixtures
+from nova.tests.unit import fake_instance
 from nova.tests import uuidsentinel as uuids
 
 
@@ -139,6 +140,29 @@ class TestInstanceList(test.NoDBTestCase):
                                         cell_mappings=None)
         mock_cm.assert_not_called()
 
+    @mock.patch('nova.objects.InstanceFaultList.get_by_instance_uuids')
+    @mock.patch('nova.compute.instance_list.get_instances_sorted')
+    def test_get_instance_objects_sorted_keeps_faults(self, mock_gi,
+                                                      mock_faults):
+        ctxt = nova_context.RequestContext('fake', 'fake')
+        fault = {'id': 1, 'instance_uuid': uuids.inst1, 'code': 500,
+                 'message': 'boom', 'details': 'details', 'host': 'host',
+                 'deleted': False, 'created_at': None, 'updated_at': None,
+                 'deleted_at': None}
+        mock_gi.return_value = [
+            fake_instance.fake_db_instance(uuid=uuids.inst1, fault=fault),
+            fake_instance.fake_db_instance(uuid=uuids.inst2, fault=None)]
+
+        insts = instance_list.get_instance_objects_sorted(
+            ctxt, {}, None, None, ['fault'], None, None)
+
+        self.assertEqual('boom', insts[0].fault.message)
+        self.assertIsNone(insts[1].fault)
+        self.assertFalse(insts[0].obj_what_changed())
+        # The faults joined in the cells are used, not looked up again.
+        mock_faults.assert_not_called()
+        self.assertEqual(['fault'], mock_gi.call_args[0][4])
+
     @mock.patch('nova.context.scatter_gather_cells')
     def test_get_instances_with_down_cells(self, mock_sg):
         inst_cell0 = self.insts[uuids.cell0]
@@ -12,7 +12,11 @@
 
 import datetime
 
+import mock
+
 from nova.compute import multi_cell_list
+from nova import context
+from nova import exception
 from nova import test
 
 
@@ -95,3 +99,118 @@ class TestUtils(test.NoDBTestCase):
         # and not just nonzero return from cmp()
         self.assertTrue(iw1 > iw2)
         self.assertFalse(iw2 > iw1)
+
+
+class FakeLister(multi_cell_list.CrossCellLister):
+    """A lister of records held in memory, keyed by cell."""
+
+    def __init__(self, data, batch_size=None):
+        self.data = data
+        self.queries = []
+        super(FakeLister, self).__init__(
+            multi_cell_list.RecordSortContext(['key'], ['asc']),
+            cells=sorted(data), batch_size=batch_size)
+
+    @property
+    def marker_identifier(self):
+        return 'id'
+
+    def get_marker_record(self, ctx, marker_id):
+        for records in self.data.values():
+            for record in records:
+                if record['id'] == marker_id:
+                    return record
+        raise exception.MarkerNotFound(marker=marker_id)
+
+    def get_marker_by_values(self, ctx, values):
+        self.queries.append((ctx, 'marker'))
+        for record in self.data[ctx]:
+            if record['key'] >= values[0]:
+                return record['id']
+
+    def get_by_filters(self, ctx, filters, limit, marker, **kwargs):
+        self.queries.append((ctx, limit))
+        records = self.data[ctx]
+        if 'id' in filters:
+            records = [r for r in records if r['id'] in filters['id']]
+        if marker is not None:
+            ids = [r['id'] for r in records]
+            records = records[ids.index(marker) + 1:]
+        return records[:limit] if limit else records
+
+
+def fake_scatter_gather_cells(ctx, cells, timeout, fn):
+    # The fake lister uses the cell itself as the targeted context.
+    return {cell: fn(cell) for cell in cells}
+
+
+@mock.patch.object(context, 'scatter_gather_cells',
+                   side_effect=fake_scatter_gather_cells)
+class TestCrossCellLister(test.NoDBTestCase):
+    def setUp(self):
+        super(TestCrossCellLister, self).setUp()
+        # cell1 holds the lowest keys, cell2 the highest ones.
+        self.data = {
+            'cell1': [{'id': 'a%i' % i, 'key': i} for i in range(0, 20)],
+            'cell2': [{'id': 'b%i' % i, 'key': 100 + i} for i in range(0, 20)],
+        }
+
+    def _list(self, lister, limit, marker=None):
+        return [r['id'] for r in
+                lister.get_records_sorted(None, {}, limit, marker)]
+
+    def test_get_records_sorted_no_batch(self, mock_sg):
+        lister = FakeLister(self.data)
+        self.assertEqual(['a%i' % i for i in range(0, 10)],
+                         self._list(lister, 10))
+        self.assertEqual([('cell1', 10), ('cell2', 10)], lister.queries)
+
+    def test_get_records_sorted_batch(self, mock_sg):
+        lister = FakeLister(self.data, batch_size=2)
+        self.assertEqual(['a%i' % i for i in range(0, 10)],
+                         self._list(lister, 10))
+        # Only the first window is fetched from the losing cell, and the
+        # windows of the winning one double in size up to the limit.
+        self.assertEqual([('cell1', 2), ('cell2', 2), ('cell1', 4),
+                          ('cell1', 4)], lister.queries)
+
+    def test_get_records_sorted_batch_exhausted(self, mock_sg):
+        self.data['cell1'] = self.data['cell1'][:3]
+        lister = FakeLister(self.data, batch_size=2)
+        self.assertEqual(['a0', 'a1', 'a2', 'b0', 'b1', 'b2'],
+                         self._list(lister, 6))
+        self.assertEqual([('cell1', 2), ('cell2', 2), ('cell1', 4),
+                          ('cell2', 4)], lister.queries)
+
+    def test_get_records_sorted_batch_no_limit(self, mock_sg):
+        lister = FakeLister(self.data, batch_size=2)
+        self.assertEqual(40, len(self._list(lister, None)))
+        self.assertEqual([('cell1', None), ('cell2', None)], lister.queries)
+
+    def test_get_records_sorted_batch_marker(self, mock_sg):
+        # Interleave the keys of both cells.
+        self.data['cell2'] = [{'id': 'b%i' % i, 'key': i + 0.5}
+                              for i in range(0, 20)]
+        lister = FakeLister(self.data, batch_size=1)
+        self.assertEqual(['b3', 'a4', 'b4', 'a5', 'b5'],
+                         self._list(lister, 5, marker='a3'))
+        # The local marker is looked up once per cell, and cell2 prefixes
+        # its local marker to its results.
+        self.assertEqual(1, lister.queries.count(('cell1', 'marker')))
+        self.assertEqual(1, lister.queries.count(('cell2', 'marker')))
+
+    def test_get_records_sorted_batch_error(self, mock_sg):
+        lister = FakeLister(self.data, batch_size=2)
+        orig_get_by_filters = lister.get_by_filters
+
+        def fake_get_by_filters(ctx, filters, limit, marker, **kwargs):
+            if ctx == 'cell1' and marker is not None:
+                raise test.TestingException()
+            return orig_get_by_filters(ctx, filters, limit, marker, **kwargs)
+
+        with mock.patch.object(lister, 'get_by_filters',
+                               side_effect=fake_get_by_filters):
+            # cell1 fails after its first window, so the merge continues
+            # with the records of cell2.
+            self.assertEqual(['a0', 'a1', 'b0', 'b1', 'b2'],
+                             self._list(lister, 5))
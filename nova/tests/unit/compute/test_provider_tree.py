@@ -680,3 +680,39 @@ class TestProviderTree(test.NoDBTestCase):
         # Remove the last aggregate, and an unrelated one
         pt.remove_aggregates(cn.uuid, uuids.agg4, uuids.agg1)
         self.assertEqual(set([]), pt.data(cn.uuid).aggregates)
+
+    def test_dirty_fields(self):
+        cn = self.compute_node1
+        pt = self._pt_with_cns()
+        # New providers are entirely dirty
+        self.assertEqual(set(['inventory', 'traits', 'aggregates']),
+                         pt.get_dirty_fields(cn.uuid))
+        pt.mark_clean()
+        self.assertEqual(set(), pt.get_dirty_fields(cn.uuid))
+        self.assertEqual(set(), pt.get_dirty_fields(uuids.cn2))
+
+        # Setting the same values doesn't make the provider dirty
+        pt.update_inventory(cn.uuid, {}, generation=1)
+        pt.update_traits(cn.uuid, [])
+        pt.update_aggregates(cn.uuid, [])
+        self.assertEqual(set(), pt.get_dirty_fields(cn.uuid))
+
+        pt.add_traits(cn.uuid, 'HW_CPU_X86_AVX')
+        self.assertEqual(set(['traits']), pt.get_dirty_fields(cn.uuid))
+        pt.update_aggregates(cn.uuid, [uuids.agg1])
+        self.assertEqual(set(['traits', 'aggregates']),
+                         pt.get_dirty_fields(cn.uuid))
+        # Other providers are unaffected
+        self.assertEqual(set(), pt.get_dirty_fields(uuids.cn2))
+
+        # A new child is dirty but its parent doesn't become dirty
+        pt.mark_clean()
+        pt.new_child('numa1', cn.uuid, uuid=uuids.numa1)
+        self.assertEqual(set(['inventory', 'traits', 'aggregates']),
+                         pt.get_dirty_fields(uuids.numa1))
+        self.assertEqual(set(), pt.get_dirty_fields(cn.uuid))
+
+        # mark_clean() handles descendants too
+        pt.mark_clean()
+        self.assertEqual(set(), pt.get_dirty_fields(uuids.numa1))
+        self.assertRaises(ValueError, pt.get_dirty_fields, uuids.non_existing)
@@ -974,6 +974,56 @@ class TestUpdateAvailableResources(BaseTestCase):
         self.assertTrue(obj_base.obj_equal_prims(expected_resources,
                                                  actual_resources))
 
+    @mock.patch('nova.compute.utils.is_volume_backed_instance',
+                return_value=False)
+    @mock.patch('nova.objects.InstancePCIRequests.get_by_instance',
+                return_value=objects.InstancePCIRequests(requests=[]))
+    @mock.patch('nova.objects.PciDeviceList.get_by_compute_node',
+                return_value=objects.PciDeviceList())
+    @mock.patch('nova.objects.ComputeNode.get_by_host_and_nodename')
+    @mock.patch('nova.objects.MigrationList.get_in_progress_by_host_and_node')
+    @mock.patch('nova.objects.InstanceList.get_by_filters')
+    @mock.patch('nova.objects.InstanceList.get_by_host_and_node')
+    def test_claim_during_audit(self, get_mock, get_filters_mock, migr_mock,
+                                get_cn_mock, pci_mock, instance_pci_mock,
+                                bfv_check_mock):
+        self._setup_rt()
+        get_mock.return_value = []
+        migr_mock.return_value = []
+        get_cn_mock.return_value = _COMPUTE_NODE_FIXTURES[0]
+        # The first audit creates the compute node and reads its state while
+        # holding the lock.
+        self._update_available_resources()
+
+        instance = _INSTANCE_FIXTURES[0]
+
+        def fake_get_per_instance_usage():
+            # The instance is claimed while the state of the node is read
+            # without holding the lock.
+            self.rt._record_change(_NODENAME, instance.uuid)
+            return {}
+
+        vd = self.driver_mock
+        vd.get_per_instance_usage.side_effect = fake_get_per_instance_usage
+        get_filters_mock.return_value = [instance]
+        get_mock.reset_mock()
+        migr_mock.reset_mock()
+
+        self._update_available_resources()
+
+        get_mock.assert_called_once_with(
+            mock.ANY, _HOSTNAME, _NODENAME,
+            expected_attrs=['system_metadata', 'numa_topology', 'flavor',
+                            'migration_context'])
+        get_filters_mock.assert_called_once_with(
+            mock.ANY, {'uuid': [instance.uuid], 'deleted': False},
+            expected_attrs=['system_metadata', 'numa_topology', 'flavor',
+                            'migration_context'])
+        # The migrations are not read again since there was no move claim.
+        migr_mock.assert_called_once_with(mock.ANY, _HOSTNAME, _NODENAME)
+        self.assertIn(instance.uuid, self.rt.tracked_instances)
+        self.assertEqual({}, self.rt._audits)
+
 
 class TestInitComputeNode(BaseTestCase):
 
@@ -3053,6 +3103,78 @@ class TestSetInstanceHostAndNode(BaseTestCase):
         self.assertEqual(self.rt.host, inst.launched_on)
 
 
+class TestLockPerNode(BaseTestCase):
+
+    @mock.patch('nova.utils.synchronized')
+    def test_global_lock(self, mock_sync):
+        self._setup_rt()
+        self.assertFalse(self.rt.lock_per_node)
+        self.rt.update_usage(mock.sentinel.ctx, mock.sentinel.instance,
+                             _NODENAME)
+        self.rt._update_available_resource(
+            mock.sentinel.ctx, {'hypervisor_hostname': 'othernode'})
+        lock_names = [c[0][0] for c in mock_sync.call_args_list]
+        self.assertEqual([resource_tracker.COMPUTE_RESOURCE_SEMAPHORE] * 2,
+                         lock_names)
+
+    @mock.patch('nova.utils.synchronized')
+    def test_lock_per_node(self, mock_sync):
+        self.flags(update_resources_concurrency=4)
+        self._setup_rt()
+        self.assertTrue(self.rt.lock_per_node)
+        self.rt.update_usage(mock.sentinel.ctx, mock.sentinel.instance,
+                             nodename=_NODENAME)
+        self.rt._update_available_resource(
+            mock.sentinel.ctx, {'hypervisor_hostname': 'othernode'})
+        lock_names = [c[0][0] for c in mock_sync.call_args_list]
+        self.assertEqual(['compute_resources-' + _NODENAME,
+                          'compute_resources-othernode'], lock_names)
+
+    def test_stats_per_node(self):
+        self._setup_rt()
+        self.rt.build_failed(_NODENAME)
+        self.rt.build_failed(_NODENAME)
+        self.rt.build_failed('othernode')
+        self.rt.build_succeeded('othernode')
+        self.assertEqual(2, self.rt.stats[_NODENAME]['failed_builds'])
+        self.assertEqual(0, self.rt.stats['othernode']['failed_builds'])
+
+    def test_build_phase_stats(self):
+        self._setup_rt()
+        self.rt.build_failed(_NODENAME)
+        self.rt.set_build_phase_stats({'build_spawn_running': 2,
+                                       'build_spawn_waiting': 1})
+        compute_node = mock.Mock()
+        self.rt._copy_resources(compute_node,
+                                {'hypervisor_hostname': _NODENAME,
+                                 'stats': {'driver_stat': 'foo'}})
+        self.assertEqual({'failed_builds': 1,
+                          'build_spawn_running': 2,
+                          'build_spawn_waiting': 1,
+                          'driver_stat': 'foo'}, compute_node.stats)
+
+    def test_forget_tracked_of_node_only(self):
+        self.flags(update_resources_concurrency=4)
+        self._setup_rt()
+        self.rt.compute_nodes[_NODENAME] = (
+            _COMPUTE_NODE_FIXTURES[0].obj_clone())
+        self.rt.tracked_instances = {
+            uuids.inst1: {'uuid': uuids.inst1, 'node': _NODENAME},
+            uuids.inst2: {'uuid': uuids.inst2, 'node': 'othernode'}}
+        self.rt.tracked_migrations = {
+            uuids.inst3: objects.Migration(source_node='othernode',
+                                           dest_node=_NODENAME),
+            uuids.inst4: objects.Migration(source_node='othernode',
+                                           dest_node='othernode')}
+
+        self.rt._update_usage_from_instances(mock.sentinel.ctx, [], _NODENAME)
+        self.rt._update_usage_from_migrations(mock.sentinel.ctx, [],
+                                              _NODENAME)
+
+        self.assertEqual([uuids.inst2], list(self.rt.tracked_instances))
+        self.assertEqual([uuids.inst4], list(self.rt.tracked_migrations))
+
+
 def _update_compute_node(node, **kwargs):
     for key, value in kwargs.items():
         setattr(node, key, value)
@@ -474,6 +474,25 @@ class ComputeRpcAPITestCase(test.NoDBTestCase):
     def test_get_host_uptime(self):
         self._test_compute_api('get_host_uptime', 'call', host='host')
 
+    def test_cache_images(self):
+        self.flags(long_rpc_timeout=1234)
+        self._test_compute_api('cache_images', 'call',
+                               host='host', image_ids=['image'],
+                               version='5.1', call_monitor_timeout=60,
+                               timeout=1234)
+
+    def test_cache_images_old_compute(self):
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        rpcapi = compute_rpcapi.ComputeAPI()
+        rpcapi.router.client = mock.Mock()
+        mock_client = mock.MagicMock()
+        rpcapi.router.client.return_value = mock_client
+        mock_client.can_send_version.return_value = False
+        self.assertRaises(exception.ImageCacheNotYetAvailable,
+                          rpcapi.cache_images, ctxt, 'host', ['image'])
+        mock_client.can_send_version.assert_called_once_with('5.1')
+        mock_client.prepare.assert_not_called()
+
     def test_backup_instance(self):
         self._test_compute_api('backup_instance', 'cast',
                 instance=self.fake_instance_obj, image_id='id',
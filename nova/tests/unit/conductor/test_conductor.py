@@ -28,6 +28,7 @@ from nova import block_device
 from nova.compute import flavors
 from nova.compute import rpcapi as compute_rpcapi
 from nova.compute import task_states
+from nova.compute import utils as compute_utils
 from nova.compute import vm_states
 from nova.conductor import api as conductor_api
 from nova.conductor import manager as conductor_manager
@@ -2785,6 +2786,21 @@ class ConductorTaskTestCase(_BaseTaskTestCase, test_compute.BaseTestCase):
             self.ctxt, instance.uuid, 'rebuild_server',
             {'vm_state': instance.vm_state, 'task_state': None}, ex, reqspec)
 
+    @mock.patch('nova.compute.utils.cache_images_on_hosts')
+    def test_cache_images(self, mock_cache):
+        aggregate = objects.Aggregate(uuid=uuids.aggregate,
+                                      hosts=['host1', 'host2'])
+        mock_cache.return_value = {
+            'host1': {'image': compute_utils.IMAGE_CACHE_DOWNLOADED},
+            'host2': {'image': compute_utils.IMAGE_CACHE_ERROR}}
+        with mock.patch.object(conductor_manager.LOG, 'warning') as warn:
+            self.conductor.cache_images(self.ctxt, aggregate, ['image'])
+        mock_cache.assert_called_once_with(
+            self.ctxt, self.conductor.compute_rpcapi, ['host1', 'host2'],
+            ['image'])
+        warn.assert_called_once_with(mock.ANY, {'hosts': 'host2',
+                                                'aggregate': uuids.aggregate})
+
     @mock.patch('nova.conductor.tasks.live_migrate.LiveMigrationTask.execute')
     def test_live_migrate_instance(self, mock_execute):
         """Tests that asynchronous live migration targets the cell that the
@@ -2856,6 +2872,20 @@ class ConductorTaskRPCAPITestCase(_BaseTaskTestCase,
                 self.context, 'live_migrate_instance', **kw)
         _test()
 
+    def test_cache_images(self):
+        aggregate = objects.Aggregate(hosts=['host1'])
+        cctxt_mock = mock.MagicMock()
+
+        @mock.patch.object(self.conductor.client, 'prepare',
+                          return_value=cctxt_mock)
+        def _test(prepare_mock):
+            self.conductor.cache_images(self.context, aggregate, ['image'])
+            prepare_mock.assert_called_once_with(version='1.21')
+            cctxt_mock.cast.assert_called_once_with(
+                self.context, 'cache_images', aggregate=aggregate,
+                image_ids=['image'])
+        _test()
+
     @mock.patch.object(objects.InstanceMapping, 'get_by_instance_uuid')
     def test_targets_cell_no_instance_mapping(self, mock_im):
 
@@ -3232,6 +3232,24 @@ class ServiceTestCase(test.TestCase, ModelsObjectComparatorMixin):
                                             include_disabled=True)
         self._assertEqualListsOfObjects(expected, real)
 
+    def test_service_get_all_by_binary_changed_since(self):
+        before = timeutils.utcnow() - datetime.timedelta(seconds=10)
+        after = timeutils.utcnow() + datetime.timedelta(seconds=10)
+        values = [
+            {'host': 'host1', 'binary': 'b1'},
+            {'host': 'host2', 'binary': 'b1', 'disabled': True},
+            {'host': 'host3', 'binary': 'b2'}
+        ]
+        services = [self._create_service(vals) for vals in values]
+        db.service_destroy(self.ctxt, services[0]['id'])
+        real = db.service_get_all_by_binary_changed_since(self.ctxt, 'b1',
+                                                          before)
+        self.assertEqual([services[0]['id'], services[1]['id']],
+                         sorted(service['id'] for service in real))
+        self.assertEqual(
+            [], db.service_get_all_by_binary_changed_since(self.ctxt, 'b1',
+                                                           after))
+
     def test_service_get_all_computes_by_hv_type(self):
         values = [
             {'host': 'host1', 'binary': 'nova-compute'},
@@ -6899,6 +6917,19 @@ class ComputeNodeTestCase(test.TestCase, ModelsObjectComparatorMixin):
         cns = db.compute_node_get_all_mapped_less_than(self.ctxt, 1)
         self.assertEqual(2, len(cns))
 
+    def test_compute_node_get_all_changed_since(self):
+        before = timeutils.utcnow() - datetime.timedelta(seconds=10)
+        after = timeutils.utcnow() + datetime.timedelta(seconds=10)
+        nodes = db.compute_node_get_all_changed_since(self.ctxt, before)
+        self.assertEqual([self.item['id']], [node['id'] for node in nodes])
+        self.assertEqual(
+            [], db.compute_node_get_all_changed_since(self.ctxt, after))
+
+        db.compute_node_delete(self.ctxt, self.item['id'])
+        nodes = db.compute_node_get_all_changed_since(self.ctxt, before)
+        self.assertEqual([self.item['id']], [node['id'] for node in nodes])
+        self.assertTrue(nodes[0]['deleted'])
+
     def test_compute_node_get_all_by_pagination(self):
         service_dict = dict(host='host2', binary='nova-compute',
                             topic=compute_rpcapi.RPC_TOPIC,
@@ -8508,6 +8539,135 @@ class ArchiveTestCase(test.TestCase, ModelsObjectComparatorMixin):
             'shadow_instance_id_mappings'
         )
 
+    def test_archive_deleted_rows_in_batches(self):
+        for uuidstr in self.uuidstrs:
+            ins_stmt = self.instance_id_mappings.insert().values(uuid=uuidstr,
+                                                                 deleted=1)
+            self.conn.execute(ins_stmt)
+        qsiim = sql.select([self.shadow_instance_id_mappings])
+        with mock.patch.object(sqlalchemy_api, '_ARCHIVE_BATCH_SIZE', 4):
+            num = sqlalchemy_api._archive_deleted_rows_for_table(
+                'instance_id_mappings', max_rows=None)
+        self.assertEqual(6, num[0])
+        self.assertEqual(6, len(self.conn.execute(qsiim).fetchall()))
+
+    def test_archive_deleted_rows_skips_failed_batch(self):
+        # The first batch of console_pools cannot be archived because of
+        # consoles.pool_id, the second one can.
+        self._check_sqlite_version_less_than_3_7()
+        pool_ids = []
+        for i in range(2):
+            ins_stmt = self.console_pools.insert().values(deleted=1)
+            pool_ids.append(
+                self.conn.execute(ins_stmt).inserted_primary_key[0])
+        ins_stmt = self.consoles.insert().values(pool_id=pool_ids[0])
+        self.conn.execute(ins_stmt)
+        with mock.patch.object(sqlalchemy_api, '_ARCHIVE_BATCH_SIZE', 1):
+            num = sqlalchemy_api._archive_deleted_rows_for_table(
+                'console_pools', max_rows=None)
+        self.assertEqual(1, num[0])
+        rows = self.conn.execute(
+            sql.select([self.shadow_console_pools.c.id])).fetchall()
+        self.assertEqual([(pool_ids[1],)], rows)
+
+    def test_archive_groups(self):
+        groups = sqlalchemy_api._get_archive_groups(self.engine)
+        tablenames = [name for group in groups for name in group]
+        self.assertEqual(len(tablenames), len(set(tablenames)))
+        self.assertNotIn('migrate_version', tablenames)
+        self.assertFalse([name for name in tablenames
+                          if name.startswith('shadow_')])
+
+        def _group_of(tablename):
+            return [group for group in groups if tablename in group][0]
+
+        instances_group = _group_of('instances')
+        for tablename in ('instance_actions', 'instance_actions_events',
+                          'migrations', 'block_device_mapping',
+                          'instance_id_mappings'):
+            self.assertIn(tablename, instances_group)
+        # Children are archived before their parents.
+        self.assertLess(instances_group.index('instance_actions_events'),
+                        instances_group.index('instance_actions'))
+        self.assertLess(instances_group.index('instance_actions'),
+                        instances_group.index('instances'))
+        consoles_group = _group_of('consoles')
+        self.assertIn('console_pools', consoles_group)
+        self.assertNotIn('instances', consoles_group)
+
+    def test_reset_archive_caches(self):
+        sqlalchemy_api._get_archive_groups(self.engine)
+        sqlalchemy_api._get_shadow_table(self.engine, 'instances')
+        sqlalchemy_api._soft_delete_instance_records(
+            self.conn, models.InstanceAction.__table__)
+        self.assertTrue(sqlalchemy_api._ARCHIVE_GROUPS)
+        self.assertTrue(sqlalchemy_api._SHADOW_TABLES)
+        self.assertTrue(sqlalchemy_api._ARCHIVE_WATERMARKS)
+
+        sqlalchemy_api.reset_archive_caches()
+        self.assertEqual({}, sqlalchemy_api._ARCHIVE_GROUPS)
+        self.assertEqual({}, sqlalchemy_api._SHADOW_TABLES)
+        self.assertEqual({}, sqlalchemy_api._ARCHIVE_WATERMARKS)
+
+    def test_archive_deleted_rows_workers(self):
+        for uuidstr in self.uuidstrs:
+            ins_stmt = self.instance_id_mappings.insert().values(uuid=uuidstr,
+                                                                 deleted=1)
+            self.conn.execute(ins_stmt)
+            ins_stmt = self.dns_domains.insert().values(domain=uuidstr,
+                                                        deleted=True)
+            self.conn.execute(ins_stmt)
+        # The maximum number of rows is shared between the workers.
+        results, _ = db.archive_deleted_rows(max_rows=8, workers=4)
+        self.assertEqual(8, sum(results.values()))
+        results, _ = db.archive_deleted_rows(max_rows=8, workers=4)
+        self.assertEqual(4, sum(results.values()))
+        for table in (self.shadow_dns_domains,
+                      self.shadow_instance_id_mappings):
+            rows = self.conn.execute(sql.select([table])).fetchall()
+            self.assertEqual(6, len(rows))
+        self._assert_shadow_tables_empty_except(
+            'shadow_dns_domains',
+            'shadow_instance_id_mappings'
+        )
+
+    @mock.patch.object(sqlalchemy_api, '_ARCHIVE_WATERMARKS',
+                       new_callable=dict)
+    def test_soft_delete_instance_records_watermark(self, mock_watermarks):
+        instance_actions = models.InstanceAction.__table__
+        now = timeutils.utcnow()
+        old = now - datetime.timedelta(days=1)
+        for uuidstr, deleted_at in zip(self.uuidstrs, (now, old)):
+            ins_stmt = self.instances.insert().values(
+                uuid=uuidstr, deleted=1, deleted_at=deleted_at)
+            self.conn.execute(ins_stmt)
+
+        def _add_action(uuidstr):
+            ins_stmt = instance_actions.insert().values(
+                instance_uuid=uuidstr, deleted=0)
+            return self.conn.execute(ins_stmt).inserted_primary_key[0]
+
+        def _deleted(action_id):
+            return self.conn.execute(
+                sql.select([instance_actions.c.deleted]).where(
+                    instance_actions.c.id == action_id)).scalar()
+
+        action1 = _add_action(self.uuidstrs[0])
+        action2 = _add_action(self.uuidstrs[1])
+        sqlalchemy_api._soft_delete_instance_records(self.conn,
+                                                     instance_actions)
+        # All the deleted instances are considered on the first run.
+        self.assertEqual(action1, _deleted(action1))
+        self.assertEqual(action2, _deleted(action2))
+
+        # Then only the instances deleted since the previous run.
+        action1 = _add_action(self.uuidstrs[0])
+        action2 = _add_action(self.uuidstrs[1])
+        sqlalchemy_api._soft_delete_instance_records(self.conn,
+                                                     instance_actions)
+        self.assertEqual(action1, _deleted(action1))
+        self.assertEqual(0, _deleted(action2))
+
 
 class PciDeviceDBApiTestCase(test.TestCase, ModelsObjectComparatorMixin):
     def setUp(self):
@@ -0,0 +1,149 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import hashlib
+import os
+
+import fixtures
+import mock
+
+from nova import cache_utils
+from nova import context
+from nova.image.download import peer
+from nova import objects
+from nova import test
+from nova.tests import uuidsentinel as uuids
+
+
+class PeerTransferTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(PeerTransferTestCase, self).setUp()
+        self.flags(host='host1', my_ip='10.0.0.1')
+        self.client = cache_utils.CacheClient(
+            cache_utils._get_custom_cache_region(backend='oslo_cache.dict'))
+        self.useFixture(fixtures.MockPatch(
+            'nova.cache_utils.get_memcached_client',
+            return_value=self.client))
+        self.useFixture(fixtures.MockPatch(
+            'nova.objects.ServiceList.get_by_binary',
+            return_value=objects.ServiceList(objects=[
+                objects.Service(host=host, forced_down=False)
+                for host in ('host1', 'host2', 'host3')])))
+        self.copy_file = self.useFixture(fixtures.MockPatch(
+            'nova.image.download.peer._copy_file')).mock
+        self.ctxt = context.get_admin_context()
+        self.tmpdir = self.useFixture(fixtures.TempDir()).path
+        self.dst_path = os.path.join(self.tmpdir, 'image.part')
+        self.fname = hashlib.sha1(
+            uuids.image.encode('utf-8')).hexdigest()
+        self.image = {'id': uuids.image, 'disk_format': 'raw',
+                      'checksum': hashlib.md5(b'image').hexdigest()}
+
+    def _advertise(self, host, ip, force_raw_images=True):
+        self.flags(host=host, my_ip=ip, force_raw_images=force_raw_images)
+        peer.advertise(host, ['/var/lib/nova/instances/_base/' + self.fname])
+        self.flags(host='host1', my_ip='10.0.0.1')
+
+    def _fake_copy(self, *contents):
+        contents = list(contents)
+
+        def fake_copy(src, dst):
+            with open(dst, 'wb') as f:
+                f.write(contents.pop(0))
+        self.copy_file.side_effect = fake_copy
+
+    def test_download(self):
+        self._advertise('host2', '10.0.0.2')
+        self._fake_copy(b'image')
+
+        self.assertTrue(peer.PeerTransfer().download(self.ctxt, self.image,
+                                                     self.dst_path))
+        self.copy_file.assert_called_once_with(
+            '10.0.0.2:/var/lib/nova/instances/_base/' + self.fname,
+            self.dst_path)
+
+    def test_download_not_advertised(self):
+        # Only host1 itself advertised the image.
+        self._advertise('host1', '10.0.0.1')
+
+        self.assertFalse(peer.PeerTransfer().download(self.ctxt, self.image,
+                                                      self.dst_path))
+        self.assertFalse(self.copy_file.called)
+
+    def test_download_checksum_mismatch(self):
+        self.flags(peer_download_attempts=3, group='glance')
+        self._advertise('host2', '10.0.0.2')
+        self._advertise('host3', '10.0.0.3')
+        self._fake_copy(b'corrupted', b'corrupted')
+
+        self.assertFalse(peer.PeerTransfer().download(self.ctxt, self.image,
+                                                      self.dst_path))
+        self.assertEqual(2, self.copy_file.call_count)
+        self.assertFalse(os.path.exists(self.dst_path))
+
+    def test_download_attempts(self):
+        self.flags(peer_download_attempts=1, group='glance')
+        self._advertise('host2', '10.0.0.2')
+        self._advertise('host3', '10.0.0.3')
+        self.copy_file.side_effect = Exception('ssh failed')
+
+        self.assertFalse(peer.PeerTransfer().download(self.ctxt, self.image,
+                                                      self.dst_path))
+        self.assertEqual(1, self.copy_file.call_count)
+
+    def test_download_converted_to_raw(self):
+        # host2 converted the image to raw, so its copy does not match the
+        # qcow2 image in glance.
+        self._advertise('host2', '10.0.0.2', force_raw_images=True)
+        self._advertise('host3', '10.0.0.3', force_raw_images=False)
+        self.image['disk_format'] = 'qcow2'
+        self._fake_copy(b'image')
+
+        self.assertTrue(peer.PeerTransfer().download(self.ctxt, self.image,
+                                                     self.dst_path))
+        self.copy_file.assert_called_once_with(
+            '10.0.0.3:/var/lib/nova/instances/_base/' + self.fname,
+            self.dst_path)
+
+    @mock.patch('nova.cache_utils.get_memcached_client', return_value=None)
+    def test_download_no_memcache(self, mock_client):
+        self.assertFalse(peer.PeerTransfer().download(self.ctxt, self.image,
+                                                      self.dst_path))
+        self.assertFalse(self.copy_file.called)
+
+    @mock.patch('nova.cache_utils.get_memcached_client')
+    def test_get_client_expiration_time(self, mock_client):
+        self.flags(image_cache_manager_interval=600)
+        peer._get_client()
+        mock_client.assert_called_once_with(expiration_time=1200)
+
+        # The image cache manager runs at the default periodic task spacing
+        # when the interval is 0, and advertisements never expire with an
+        # expiration time of 0.
+        for interval in (0, -1):
+            mock_client.reset_mock()
+            self.flags(image_cache_manager_interval=interval)
+            peer._get_client()
+            mock_client.assert_called_once_with(expiration_time=120)
+
+    @mock.patch('nova.utils.execute')
+    def test_copy_file(self, mock_execute):
+        peer._copy_file('10.0.0.2:/base/image', '/base/image.part')
+        mock_execute.assert_called_once_with(
+            'scp', '10.0.0.2:/base/image', '/base/image.part')
+
+        mock_execute.reset_mock()
+        self.flags(remote_filesystem_transport='rsync', group='libvirt')
+        peer._copy_file('10.0.0.2:/base/image', '/base/image.part')
+        mock_execute.assert_called_once_with(
+            'rsync', '--sparse', '10.0.0.2:/base/image', '/base/image.part')
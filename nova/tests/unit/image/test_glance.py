@@ -787,6 +787,74 @@ class TestDownloadNoDirectUri(test.NoDBTestCase):
         )
         writer.close.assert_called_once_with()
 
+    @mock.patch('nova.image.download.peer.get_download_handler')
+    @mock.patch('nova.image.glance.GlanceImageServiceV2.show')
+    def test_download_peer(self, show_mock, get_handler_mock):
+        self.flags(enable_peer_download=True, group='glance')
+        peer_mod = get_handler_mock.return_value
+        peer_mod.download.return_value = True
+        client = mock.MagicMock()
+        ctx = mock.sentinel.ctx
+        service = glance.GlanceImageServiceV2(client)
+        res = service.download(ctx, mock.sentinel.image_id,
+                               dst_path=mock.sentinel.dst_path)
+
+        self.assertIsNone(res)
+        self.assertFalse(client.call.called)
+        show_mock.assert_called_once_with(ctx, mock.sentinel.image_id)
+        peer_mod.download.assert_called_once_with(
+            ctx, show_mock.return_value, mock.sentinel.dst_path)
+
+    @mock.patch('nova.image.download.peer.get_download_handler')
+    @mock.patch('nova.image.glance.GlanceImageServiceV2.show')
+    @mock.patch('nova.image.glance.GlanceImageServiceV2._safe_fsync')
+    def test_download_peer_fallback(self, fsync_mock, show_mock,
+                                    get_handler_mock):
+        # Test that we fall back to downloading from glance if the image
+        # could not be copied from a peer.
+        self.flags(enable_peer_download=True, group='glance')
+        peer_mod = get_handler_mock.return_value
+        peer_mod.download.return_value = False
+        client = mock.MagicMock()
+        client.call.return_value = fake_glance_response([1, 2, 3])
+        ctx = mock.sentinel.ctx
+        writer = mock.MagicMock()
+
+        with mock.patch.object(six.moves.builtins, 'open') as open_mock:
+            open_mock.return_value = writer
+            service = glance.GlanceImageServiceV2(client)
+            service.download(ctx, mock.sentinel.image_id,
+                             dst_path=mock.sentinel.dst_path)
+
+        peer_mod.download.assert_called_once_with(
+            ctx, show_mock.return_value, mock.sentinel.dst_path)
+        client.call.assert_called_once_with(ctx, 2, 'data',
+                                            mock.sentinel.image_id)
+        writer.write.assert_has_calls(
+            [mock.call(1), mock.call(2), mock.call(3)])
+
+    @mock.patch('nova.image.download.peer.get_download_handler')
+    @mock.patch('nova.image.glance.GlanceImageServiceV2._get_verifier',
+                return_value=None)
+    @mock.patch('nova.image.glance.GlanceImageServiceV2._safe_fsync')
+    def test_download_peer_skipped_with_trusted_certs(
+            self, fsync_mock, verifier_mock, get_handler_mock):
+        # Images copied from peers cannot have their signature verified.
+        self.flags(enable_peer_download=True, group='glance')
+        client = mock.MagicMock()
+        client.call.return_value = fake_glance_response([1, 2, 3])
+        ctx = mock.sentinel.ctx
+
+        with mock.patch.object(six.moves.builtins, 'open'):
+            service = glance.GlanceImageServiceV2(client)
+            service.download(ctx, mock.sentinel.image_id,
+                             dst_path=mock.sentinel.dst_path,
+                             trusted_certs=mock.sentinel.trusted_certs)
+
+        self.assertFalse(get_handler_mock.return_value.download.called)
+        client.call.assert_called_once_with(ctx, 2, 'data',
+                                            mock.sentinel.image_id)
+
 
 class TestDownloadSignatureVerification(test.NoDBTestCase):
 
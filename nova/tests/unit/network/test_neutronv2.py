@@ -3383,6 +3383,67 @@ class TestNeutronv2WithMock(_TestNeutronv2Common):
         self.assertEqual(len(expected_list_ports_calls),
                          mocked_client.list_ports.call_count)
 
+    @mock.patch.object(neutronapi, 'get_client')
+    def test_get_stale_info_cache_instances(self, mock_get_client):
+        def _instance(uuid, vifs):
+            return objects.Instance(
+                uuid=uuid, info_cache=objects.InstanceInfoCache(
+                    network_info=model.NetworkInfo(vifs)))
+
+        def _vif(port_id, address, ip, active=True):
+            subnet = model.Subnet(ips=[model.FixedIP(address=ip)])
+            return model.VIF(id=port_id, address=address, active=active,
+                             network=model.Network(subnets=[subnet]))
+
+        def _port(port_id, device_id, address, ip, status='ACTIVE'):
+            return {'id': port_id, 'device_id': device_id,
+                    'mac_address': address, 'status': status,
+                    'fixed_ips': [{'ip_address': ip}]}
+
+        instances = [
+            _instance(uuids.inst1, [_vif(uuids.port1, 'fa:01', '10.0.0.1')]),
+            _instance(uuids.inst2, [_vif(uuids.port2, 'fa:02', '10.0.0.2')]),
+            _instance(uuids.inst3, [_vif(uuids.port3, 'fa:03', '10.0.0.3')]),
+            _instance(uuids.inst4, []),
+            _instance(uuids.inst5, [])]
+        mocked_client = mock_get_client.return_value
+        mocked_client.list_ports.return_value = {'ports': [
+            _port(uuids.port1, uuids.inst1, 'fa:01', '10.0.0.1'),
+            # The port is down
+            _port(uuids.port2, uuids.inst2, 'fa:02', '10.0.0.2', 'DOWN'),
+            # The fixed IP address changed
+            _port(uuids.port3, uuids.inst3, 'fa:03', '10.0.0.30'),
+            # A port was attached
+            _port(uuids.port4, uuids.inst4, 'fa:04', '10.0.0.4')]}
+
+        stale = self.api.get_stale_info_cache_instances(self.context,
+                                                        instances)
+
+        self.assertEqual([uuids.inst2, uuids.inst3, uuids.inst4],
+                         [instance.uuid for instance in stale])
+        mock_get_client.assert_called_once_with(self.context, admin=True)
+        mocked_client.list_ports.assert_called_once_with(
+            device_id=[uuids.inst1, uuids.inst2, uuids.inst3, uuids.inst4,
+                       uuids.inst5],
+            fields=['id', 'device_id', 'mac_address', 'fixed_ips', 'status'])
+
+    @mock.patch.object(neutronapi, 'MAX_DEVICE_IDS_PER_REQUEST', 2)
+    @mock.patch.object(neutronapi, 'get_client')
+    def test_get_stale_info_cache_instances_chunked(self, mock_get_client):
+        instances = [objects.Instance(uuid=uuid, info_cache=None)
+                     for uuid in (uuids.inst1, uuids.inst2, uuids.inst3)]
+        mocked_client = mock_get_client.return_value
+        mocked_client.list_ports.return_value = {'ports': []}
+
+        stale = self.api.get_stale_info_cache_instances(self.context,
+                                                        instances)
+
+        self.assertEqual([], stale)
+        self.assertEqual(
+            [[uuids.inst1, uuids.inst2], [uuids.inst3]],
+            [c[1]['device_id']
+             for c in mocked_client.list_ports.call_args_list])
+
     @mock.patch.object(neutronapi, 'get_client', return_value=mock.Mock())
     def test_get_port_vnic_info_trusted(self, mock_get_client):
         test_port = {
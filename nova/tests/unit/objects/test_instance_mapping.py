@@ -25,6 +25,7 @@ def get_db_mapping(**updates):
             'instance_uuid': uuidutils.generate_uuid(),
             'cell_id': None,
             'project_id': 'fake-project',
+            'user_id': 'fake-user',
             'created_at': None,
             'updated_at': None,
             'queued_for_delete': False,
@@ -151,6 +152,15 @@ class _TestInstanceMappingObject(object):
         self.assertEqual(uuid, obj.instance_uuid)
         self.assertNotIn('queued_for_delete', obj)
 
+    def test_obj_make_compatible_user_id(self):
+        im_obj = instance_mapping.InstanceMapping(context=self.context,
+                                                  user_id='fake-user',
+                                                  queued_for_delete=False)
+        primitive = im_obj.obj_to_primitive('1.1')
+        obj = instance_mapping.InstanceMapping.obj_from_primitive(primitive)
+        self.assertNotIn('user_id', obj)
+        self.assertIn('queued_for_delete', obj)
+
 
 class TestInstanceMappingObject(test_objects._LocalTest,
                                 _TestInstanceMappingObject):
@@ -195,6 +205,17 @@ class _TestInstanceMappingListObject(object):
                                             uuids_to_be_deleted)
         self.assertEqual(5, result)
 
+    @mock.patch.object(instance_mapping.InstanceMappingList,
+                       '_get_counts_in_db')
+    def test_get_counts(self, get_counts_in_db):
+        get_counts_in_db.return_value = {'project': {'instances': 2},
+                                         'user': {'instances': 1}}
+        counts = objects.InstanceMappingList.get_counts(
+            self.context, 'fake-project', user_id='fake-user')
+        get_counts_in_db.assert_called_once_with(
+            self.context, 'fake-project', user_id='fake-user')
+        self.assertEqual(get_counts_in_db.return_value, counts)
+
 
 class TestInstanceMappingListObject(test_objects._LocalTest,
                                     _TestInstanceMappingListObject):
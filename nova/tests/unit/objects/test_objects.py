@@ -1107,8 +1107,8 @@ object_data = {
     'InstanceGroupList': '1.8-90f8f1a445552bb3bbc9fa1ae7da27d4',
     'InstanceInfoCache': '1.5-cd8b96fefe0fc8d4d337243ba0bf0e1e',
     'InstanceList': '2.4-d2c5723da8c1d08e07cb00160edfd292',
-    'InstanceMapping': '1.1-808df83f25987578ed3b187e16b47405',
-    'InstanceMappingList': '1.2-ee638619aa3d8a82a59c0c83bfa64d78',
+    'InstanceMapping': '1.2-bc82537ca278eb17e11f7a89ad170984',
+    'InstanceMappingList': '1.3-d34b6ebb076d542ae0f8b440534118da',
     'InstanceNUMACell': '1.4-7c1eb9a198dee076b4de0840e45f4f55',
     'InstanceNUMATopology': '1.3-ec0030cb0402a49c96da7051c037082a',
     'InstancePCIRequest': '1.2-6344dd8bd1bf873e7325c07afe47f774',
@@ -844,6 +844,113 @@ class TestPutAllocations(SchedulerReportClientTestCase):
         self.assertFalse(res)
         self.assertTrue(mock_log.called)
 
+    def test_claim_resources_batch_success(self):
+        resp_mock = mock.Mock(status_code=204)
+        self.ks_adap_mock.post.return_value = resp_mock
+        alloc_reqs = {
+            uuids.consumer1: {
+                'allocations': {
+                    uuids.cn1: {'resources': {'VCPU': 1, 'MEMORY_MB': 1024}},
+                },
+            },
+            uuids.consumer2: {
+                'allocations': {
+                    uuids.cn2: {'resources': {'VCPU': 1, 'MEMORY_MB': 1024}},
+                },
+            },
+        }
+        project_id = uuids.project_id
+        user_id = uuids.user_id
+        res = self.client.claim_resources_batch(
+            self.context, alloc_reqs, project_id, user_id,
+            allocation_request_version='1.12')
+
+        expected_payload = {
+            consumer_uuid: {
+                'allocations': alloc_req['allocations'],
+                'project_id': project_id,
+                'user_id': user_id,
+            } for consumer_uuid, alloc_req in alloc_reqs.items()
+        }
+        self.ks_adap_mock.post.assert_called_once_with(
+            '/allocations', microversion='1.13', json=expected_payload,
+            headers={'X-Openstack-Request-Id': self.context.global_id})
+        # The existing allocations of the consumers are not looked up.
+        self.ks_adap_mock.get.assert_not_called()
+        self.assertTrue(res)
+
+    def test_claim_resources_batch_success_with_old_version(self):
+        resp_mock = mock.Mock(status_code=204)
+        self.ks_adap_mock.post.return_value = resp_mock
+        alloc_reqs = {
+            uuids.consumer1: {
+                'allocations': [
+                    {
+                        'resource_provider': {'uuid': uuids.cn1},
+                        'resources': {'VCPU': 1, 'MEMORY_MB': 1024},
+                    },
+                ],
+            },
+        }
+        res = self.client.claim_resources_batch(
+            self.context, alloc_reqs, uuids.project_id, uuids.user_id)
+
+        expected_payload = {
+            uuids.consumer1: {
+                'allocations': {
+                    uuids.cn1: {'resources': {'VCPU': 1, 'MEMORY_MB': 1024}},
+                },
+                'project_id': uuids.project_id,
+                'user_id': uuids.user_id,
+            },
+        }
+        self.ks_adap_mock.post.assert_called_once_with(
+            '/allocations', microversion='1.13', json=expected_payload,
+            headers={'X-Openstack-Request-Id': self.context.global_id})
+        self.assertTrue(res)
+
+    def test_claim_resources_batch_fail_retry_success(self):
+        self.ks_adap_mock.post.side_effect = [
+            mock.Mock(
+                status_code=409,
+                text='Inventory changed while attempting to allocate: '
+                     'Another thread concurrently updated the data. '
+                     'Please retry your update'),
+            mock.Mock(status_code=204),
+        ]
+        alloc_reqs = {
+            uuids.consumer1: {
+                'allocations': {
+                    uuids.cn1: {'resources': {'VCPU': 1}},
+                },
+            },
+        }
+        res = self.client.claim_resources_batch(
+            self.context, alloc_reqs, uuids.project_id, uuids.user_id,
+            allocation_request_version='1.12')
+
+        self.assertEqual(2, self.ks_adap_mock.post.call_count)
+        self.assertTrue(res)
+
+    @mock.patch.object(report.LOG, 'warning')
+    def test_claim_resources_batch_failure(self, mock_log):
+        self.ks_adap_mock.post.return_value = mock.Mock(status_code=409,
+                                                        text='not cool')
+        alloc_reqs = {
+            uuids.consumer1: {
+                'allocations': {
+                    uuids.cn1: {'resources': {'VCPU': 1}},
+                },
+            },
+        }
+        res = self.client.claim_resources_batch(
+            self.context, alloc_reqs, uuids.project_id, uuids.user_id,
+            allocation_request_version='1.12')
+
+        self.ks_adap_mock.post.assert_called_once()
+        self.assertFalse(res)
+        self.assertTrue(mock_log.called)
+
     def test_remove_provider_from_inst_alloc_no_shared(self):
         """Tests that the method which manipulates an existing doubled-up
         allocation for a move operation to remove the source host results in
@@ -1545,6 +1652,73 @@ class TestProviderOperations(SchedulerReportClientTestCase):
             headers={'X-Openstack-Request-Id': self.context.global_id})
         self.assertEqual(mock.sentinel.p_sums, p_sums)
 
+    @mock.patch('nova.scheduler.utils.decode_compact_allocation_candidates')
+    def test_get_allocation_candidates_compact(self, mock_decode):
+        self.flags(compact_placement_results=True, group='scheduler')
+        resp_mock = mock.Mock(status_code=200)
+        self.ks_adap_mock.get.return_value = resp_mock
+        mock_decode.return_value = (mock.sentinel.alloc_reqs,
+                                    mock.sentinel.p_sums)
+        resources = scheduler_utils.ResourceRequest.from_extra_specs({
+            'resources:VCPU': '1',
+        })
+        expected_query = [
+            ('limit', '1000'),
+            ('resources', 'VCPU:1'),
+            ('format', 'compact'),
+        ]
+
+        alloc_reqs, p_sums, allocation_request_version = (
+            self.client.get_allocation_candidates(self.context, resources))
+
+        expected_url = '/allocation_candidates?%s' % parse.urlencode(
+            expected_query)
+        self.ks_adap_mock.get.assert_called_once_with(
+            expected_url, microversion='1.30',
+            headers={'X-Openstack-Request-Id': self.context.global_id})
+        mock_decode.assert_called_once_with(resp_mock.json.return_value)
+        self.assertEqual(mock.sentinel.alloc_reqs, alloc_reqs)
+        self.assertEqual(mock.sentinel.p_sums, p_sums)
+        # The decoded allocation requests are claimed with the microversion
+        # of the full format.
+        self.assertEqual('1.25', allocation_request_version)
+
+    def test_claim_resources_from_compact_allocation_candidates(self):
+        self.flags(compact_placement_results=True, group='scheduler')
+        ac_resp = mock.Mock(status_code=200)
+        ac_resp.json.return_value = {
+            'providers': [uuids.cn1],
+            'resource_classes': ['VCPU'],
+            'traits': [],
+            'allocation_requests': [[0, 0, 1]],
+            'provider_summaries': [[0, [0, 8, 0], [], None, 0]],
+        }
+        allocs_resp = mock.Mock(status_code=200)
+        allocs_resp.json.return_value = {'allocations': {}}
+        self.ks_adap_mock.get.side_effect = [ac_resp, allocs_resp]
+        self.ks_adap_mock.put.return_value = mock.Mock(status_code=204)
+        resources = scheduler_utils.ResourceRequest.from_extra_specs({
+            'resources:VCPU': '1',
+        })
+
+        alloc_reqs, p_sums, allocation_request_version = (
+            self.client.get_allocation_candidates(self.context, resources))
+        res = self.client.claim_resources(
+            self.context, uuids.consumer, alloc_reqs[0], uuids.project_id,
+            uuids.user_id,
+            allocation_request_version=allocation_request_version)
+
+        self.assertTrue(res)
+        expected_payload = {
+            'allocations': {uuids.cn1: {'resources': {'VCPU': 1}}},
+            'project_id': uuids.project_id,
+            'user_id': uuids.user_id,
+        }
+        self.ks_adap_mock.put.assert_called_once_with(
+            '/allocations/%s' % uuids.consumer, microversion='1.25',
+            json=expected_payload,
+            headers={'X-Openstack-Request-Id': self.context.global_id})
+
     def test_get_allocation_candidates_not_found(self):
         # Ensure _get_resource_provider() just returns None when the placement
         # API doesn't find a resource provider matching a UUID
@@ -2268,6 +2442,84 @@ class TestTraits(SchedulerReportClientTestCase):
             self.context, uuids.rp, traits)
 
 
+class TestProviderTreeState(SchedulerReportClientTestCase):
+    def setUp(self):
+        super(TestProviderTreeState, self).setUp()
+        self.client._provider_tree.new_root('root', uuids.root, generation=3)
+        self.client._provider_tree.new_child('child', uuids.root,
+                                             uuid=uuids.child, generation=1)
+        self.inv = {'VCPU': {'total': 8}}
+        self.states = {
+            uuids.root: {'inventories': self.inv,
+                         'aggregates': [uuids.agg]},
+            uuids.child: {'traits': ['HW_CPU_X86_AVX']},
+        }
+        # Make _ensure_traits succeed without PUTting
+        get_mock = mock.Mock(status_code=200)
+        get_mock.json.return_value = {'traits': ['HW_CPU_X86_AVX']}
+        self.ks_adap_mock.get.return_value = get_mock
+
+    def test_set_provider_tree_state(self):
+        put_mock = mock.Mock(status_code=200)
+        put_mock.json.return_value = {
+            'resource_providers': {
+                uuids.root: {'resource_provider_generation': 5},
+                uuids.child: {'resource_provider_generation': 2},
+            }
+        }
+        self.ks_adap_mock.put.return_value = put_mock
+
+        self.client._set_provider_tree_state(
+            self.context, uuids.root, self.states)
+
+        self.ks_adap_mock.put.assert_called_once_with(
+            '/resource_providers/%s/tree' % uuids.root,
+            json={'resource_providers': {
+                uuids.root: {'resource_provider_generation': 3,
+                             'inventories': self.inv,
+                             'aggregates': [uuids.agg]},
+                uuids.child: {'resource_provider_generation': 1,
+                              'traits': ['HW_CPU_X86_AVX']},
+            }},
+            microversion='1.31',
+            headers={'X-Openstack-Request-Id': self.context.global_id})
+        # The cache was updated
+        self._validate_provider(uuids.root, generation=5, inventory=self.inv,
+                                aggregates=set([uuids.agg]))
+        self._validate_provider(uuids.child, generation=2,
+                                traits=set(['HW_CPU_X86_AVX']))
+
+    def test_set_provider_tree_state_fail(self):
+        # Generation conflict
+        self.ks_adap_mock.put.return_value = mock.Mock(
+            status_code=409, text='generation conflict')
+        self.assertRaises(
+            exception.ResourceProviderUpdateConflict,
+            self.client._set_provider_tree_state,
+            self.context, uuids.root, self.states)
+
+        # Inventory in use
+        self.ks_adap_mock.put.return_value = mock.Mock(
+            status_code=409,
+            text="update conflict: Inventory for 'VGPU' on resource provider "
+                 "'%s' in use." % uuids.root)
+        self.assertRaises(
+            exception.InventoryInUse,
+            self.client._set_provider_tree_state,
+            self.context, uuids.root, self.states)
+
+        # Other error
+        self.ks_adap_mock.put.return_value = mock.Mock(status_code=503)
+        self.assertRaises(
+            exception.ResourceProviderUpdateFailed,
+            self.client._set_provider_tree_state,
+            self.context, uuids.root, self.states)
+
+        # The cache was not updated
+        self._validate_provider(uuids.root, generation=3, inventory={})
+        self._validate_provider(uuids.child, generation=1, traits=set())
+
+
 class TestAssociations(SchedulerReportClientTestCase):
     @mock.patch('nova.scheduler.client.report.SchedulerReportClient.'
                 '_get_provider_aggregates')
@@ -3406,6 +3658,66 @@ class TestAllocations(SchedulerReportClientTestCase):
         self.assertEqual(0, mock_log.info.call_count)
         self.assertEqual(1, mock_log.error.call_count)
 
+    @mock.patch("nova.scheduler.client.report.SchedulerReportClient.get")
+    def test_get_allocations_for_resource_provider_cached(self, mock_get):
+        allocs = {uuids.inst: {'resources': {'VCPU': 1}}}
+        usages = {'resource_provider_generation': 3, 'usages': {'VCPU': 1}}
+
+        def fake_get(url, **kwargs):
+            if url.endswith('/usages'):
+                body = usages
+            else:
+                body = {'allocations': allocs,
+                        'resource_provider_generation': 3}
+            return fake_requests.FakeResponse(
+                200, content=jsonutils.dumps(body))
+
+        mock_get.side_effect = fake_get
+        alloc_url = '/resource_providers/%s/allocations' % uuids.cn
+        usage_url = '/resource_providers/%s/usages' % uuids.cn
+        gri = {'global_request_id': self.context.global_id}
+
+        def get_allocs(**kwargs):
+            return self.client.get_allocations_for_resource_provider(
+                self.context, uuids.cn, **kwargs)
+
+        # Nothing is cached yet
+        self.assertEqual(allocs, get_allocs(use_cache=True))
+        self.assertEqual([mock.call(usage_url, **gri),
+                          mock.call(alloc_url, **gri)],
+                         mock_get.call_args_list)
+
+        # Nothing changed, only the usages are retrieved
+        mock_get.reset_mock()
+        self.assertEqual(allocs, get_allocs(use_cache=True))
+        mock_get.assert_called_once_with(usage_url, **gri)
+
+        # An allocation was deleted: the generation didn't change but the
+        # usages did.
+        mock_get.reset_mock()
+        allocs = {}
+        usages = {'resource_provider_generation': 3, 'usages': {'VCPU': 0}}
+        self.assertEqual({}, get_allocs(use_cache=True))
+        self.assertEqual(2, mock_get.call_count)
+
+        # An allocation was created
+        mock_get.reset_mock()
+        allocs = {uuids.inst2: {'resources': {'VCPU': 1}}}
+        usages = {'resource_provider_generation': 4, 'usages': {'VCPU': 1}}
+        self.assertEqual(allocs, get_allocs(use_cache=True))
+        self.assertEqual(2, mock_get.call_count)
+
+        # Without use_cache, allocations are always retrieved
+        mock_get.reset_mock()
+        self.assertEqual(allocs, get_allocs())
+        mock_get.assert_called_once_with(alloc_url, **gri)
+
+        # The cache is cleared when the provider is deleted
+        with mock.patch.object(self.client, 'delete') as mock_delete:
+            mock_delete.return_value = fake_requests.FakeResponse(204)
+            self.client._delete_provider(uuids.cn)
+        self.assertNotIn(uuids.cn, self.client._allocation_cache)
+
 
 class TestResourceClass(SchedulerReportClientTestCase):
     def setUp(self):
@@ -3752,3 +4064,51 @@ class TestAggregateAddRemoveHost(SchedulerReportClientTestCase):
         mock_set_aggs.assert_has_calls([mock.call(
             self.context, uuids.cn1, set([]), use_cache=False,
             generation=gen) for gen in gens])
+
+
+class TestUsages(SchedulerReportClientTestCase):
+
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient.get')
+    def test_get_usages_counts_for_quota(self, mock_get):
+        mock_get.side_effect = [
+            fake_requests.FakeResponse(200, content=jsonutils.dumps(
+                {'usages': {'VCPU': 6, 'MEMORY_MB': 3072, 'DISK_GB': 20}})),
+            fake_requests.FakeResponse(200, content=jsonutils.dumps(
+                {'usages': {'VCPU': 2, 'MEMORY_MB': 1024}})),
+        ]
+        counts = self.client.get_usages_counts_for_quota(
+            self.context, 'fake-project', user_id='fake-user')
+        self.assertEqual({'project': {'cores': 6, 'ram': 3072},
+                          'user': {'cores': 2, 'ram': 1024}}, counts)
+        mock_get.assert_has_calls([
+            mock.call('/usages?project_id=fake-project', version='1.9',
+                      global_request_id=self.context.global_id),
+            mock.call('/usages?project_id=fake-project&user_id=fake-user',
+                      version='1.9',
+                      global_request_id=self.context.global_id)])
+
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient.get')
+    def test_get_usages_counts_for_quota_no_usages(self, mock_get):
+        mock_get.return_value = fake_requests.FakeResponse(
+            200, content=jsonutils.dumps({'usages': {}}))
+        counts = self.client.get_usages_counts_for_quota(
+            self.context, 'fake-project')
+        self.assertEqual({'project': {'cores': 0, 'ram': 0}}, counts)
+        mock_get.assert_called_once_with(
+            '/usages?project_id=fake-project', version='1.9',
+            global_request_id=self.context.global_id)
+
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient.get')
+    def test_get_usages_counts_for_quota_fail(self, mock_get):
+        mock_get.return_value = fake_requests.FakeResponse(500,
+                                                           content='error')
+        self.assertRaises(exception.UsagesRetrievalFailed,
+                          self.client.get_usages_counts_for_quota,
+                          self.context, 'fake-project')
+
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient.get')
+    def test_get_usages_counts_for_quota_connect_fail(self, mock_get):
+        mock_get.side_effect = ks_exc.EndpointNotFound()
+        self.assertRaises(exception.UsagesRetrievalFailed,
+                          self.client.get_usages_counts_for_quota,
+                          self.context, 'fake-project')
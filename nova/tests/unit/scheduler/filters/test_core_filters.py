@@ -11,9 +11,11 @@
 #    under the License.
 
 import mock
+import testtools
 
 from nova import objects
 from nova.scheduler.filters import core_filter
+from nova.scheduler import host_manager
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -50,6 +52,30 @@ class TestCoreFilter(test.NoDBTestCase):
                  'cpu_allocation_ratio': 2})
         self.assertFalse(self.filt_cls.host_passes(host, spec_obj))
 
+    @testtools.skipIf(host_manager.numpy is None, 'numpy is not installed')
+    def test_core_filter_columns(self):
+        self.filt_cls = core_filter.CoreFilter()
+        spec_obj = objects.RequestSpec(flavor=objects.Flavor(vcpus=2))
+        hosts = [
+            fakes.FakeHostState('host1', 'node1',
+                {'vcpus_total': 4, 'vcpus_used': 6,
+                 'cpu_allocation_ratio': 2}),
+            fakes.FakeHostState('host2', 'node2',
+                {'vcpus_total': 4, 'vcpus_used': 7,
+                 'cpu_allocation_ratio': 2}),
+            fakes.FakeHostState('host3', 'node3', {}),
+            fakes.FakeHostState('host4', 'node4',
+                {'vcpus_total': 1, 'vcpus_used': 0,
+                 'cpu_allocation_ratio': 2}),
+        ]
+        columns = host_manager.HostStateColumns(hosts)
+        passes = self.filt_cls.filter_columns(columns, spec_obj)
+        self.assertEqual([self.filt_cls.host_passes(host, spec_obj)
+                          for host in hosts], list(passes))
+        self.assertEqual([True, False, True, False], list(passes))
+        self.assertEqual(8.0, hosts[0].limits['vcpu'])
+        self.assertNotIn('vcpu', hosts[2].limits)
+
     @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
     def test_aggregate_core_filter_value_error(self, agg_mock):
         self.filt_cls = core_filter.AggregateCoreFilter()
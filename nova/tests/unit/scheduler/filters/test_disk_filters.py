@@ -11,9 +11,11 @@
 #    under the License.
 
 import mock
+import testtools
 
 from nova import objects
 from nova.scheduler.filters import disk_filter
+from nova.scheduler import host_manager
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -39,6 +41,29 @@ class TestDiskFilter(test.NoDBTestCase):
                  'disk_allocation_ratio': 1.0})
         self.assertFalse(filt_cls.host_passes(host, spec_obj))
 
+    @testtools.skipIf(host_manager.numpy is None, 'numpy is not installed')
+    def test_disk_filter_columns(self):
+        filt_cls = disk_filter.DiskFilter()
+        spec_obj = objects.RequestSpec(
+            flavor=objects.Flavor(root_gb=3, ephemeral_gb=3, swap=1024))
+        hosts = [
+            fakes.FakeHostState('host1', 'node1',
+                {'free_disk_mb': 11 * 1024, 'total_usable_disk_gb': 13,
+                 'disk_allocation_ratio': 1.0}),
+            fakes.FakeHostState('host2', 'node2',
+                {'free_disk_mb': 1 * 1024, 'total_usable_disk_gb': 12,
+                 'disk_allocation_ratio': 10.0}),
+            fakes.FakeHostState('host3', 'node3',
+                {'free_disk_mb': 1 * 1024, 'total_usable_disk_gb': 6,
+                 'disk_allocation_ratio': 10.0}),
+        ]
+        columns = host_manager.HostStateColumns(hosts)
+        passes = filt_cls.filter_columns(columns, spec_obj)
+        self.assertEqual([True, True, False], list(passes))
+        self.assertEqual(13.0, hosts[0].limits['disk_gb'])
+        self.assertEqual(120.0, hosts[1].limits['disk_gb'])
+        self.assertNotIn('disk_gb', hosts[2].limits)
+
     def test_disk_filter_oversubscribe(self):
         filt_cls = disk_filter.DiskFilter()
         spec_obj = objects.RequestSpec(
@@ -106,3 +106,39 @@ class TestUtils(test.NoDBTestCase):
         self.assertTrue(utils.instance_uuids_overlap(host_state,
                                                      [uuids.instance_1]))
         self.assertFalse(utils.instance_uuids_overlap(host_state, ['zz']))
+
+    def test_group_members_on_host(self):
+        host_state = fakes.FakeHostState('host1', 'node1', {})
+        host_state.instances = {uuids.instance_1: None,
+                                uuids.instance_2: None,
+                                uuids.instance_3: None}
+        group = objects.InstanceGroup(
+            uuid=uuids.group,
+            members=[uuids.instance_1, uuids.instance_3, uuids.instance_4])
+        spec_obj = objects.RequestSpec(instance_group=group)
+        self.assertEqual(2, utils.group_members_on_host(host_state, spec_obj))
+
+        # The set of members is only built once per request, even if the
+        # members include duplicates...
+        group.members.append(uuids.instance_4)
+        self.assertEqual(2, utils.group_members_on_host(host_state, spec_obj))
+        cached = utils._MEMBER_SETS_BY_REQUEST[spec_obj][uuids.group]
+        self.assertEqual(2, utils.group_members_on_host(host_state, spec_obj))
+        self.assertIs(cached,
+                      utils._MEMBER_SETS_BY_REQUEST[spec_obj][uuids.group])
+
+        # ...unless the members change, even to as many members...
+        group.members[-1] = uuids.instance_2
+        self.assertEqual(3, utils.group_members_on_host(host_state, spec_obj))
+
+        # ...or are replaced by another list.
+        group.members = [uuids.instance_1, uuids.instance_5,
+                         uuids.instance_6, uuids.instance_7]
+        self.assertEqual(1, utils.group_members_on_host(host_state, spec_obj))
+
+        # The set is not shared with other requests.
+        other_spec_obj = objects.RequestSpec(
+            instance_group=objects.InstanceGroup(uuid=uuids.group,
+                                                 members=[uuids.instance_1]))
+        self.assertEqual(1, utils.group_members_on_host(host_state,
+                                                        other_spec_obj))
@@ -353,6 +353,235 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         # Ensure we cleaned up the first successfully-claimed instance
         mock_cleanup.assert_called_once_with(ctx, [uuids.instance1])
 
+    @mock.patch('nova.scheduler.utils.claim_resources')
+    @mock.patch('nova.scheduler.filter_scheduler.FilterScheduler.'
+                '_get_all_host_states')
+    @mock.patch('nova.scheduler.filter_scheduler.FilterScheduler.'
+                '_get_sorted_hosts')
+    def test_schedule_claim_next_alloc_req(self, mock_get_hosts,
+            mock_get_all_states, mock_claim):
+        """Tests that the other allocation_requests of a host are tried, in
+        the order given by the scorer, before moving on to the next host.
+        """
+        spec_obj = objects.RequestSpec(
+            num_instances=1,
+            flavor=objects.Flavor(memory_mb=512,
+                                  root_gb=512,
+                                  ephemeral_gb=0,
+                                  swap=0,
+                                  vcpus=1),
+            project_id=uuids.project_id,
+            instance_group=None)
+
+        host_state = mock.Mock(spec=host_manager.HostState,
+                host="fake_host", nodename="fake_node", uuid=uuids.cn1,
+                cell_uuid=uuids.cell1, limits={})
+        all_host_states = [host_state]
+        mock_get_all_states.return_value = all_host_states
+        mock_get_hosts.return_value = all_host_states
+        # The first allocation_request tried fails, the second one works.
+        mock_claim.side_effect = [False, True]
+
+        alloc_req1 = {"allocations": {uuids.cn1: {}, uuids.ss1: {}}}
+        alloc_req2 = {"allocations": {uuids.cn1: {}, uuids.ss2: {}}}
+        alloc_reqs_by_rp_uuid = {
+            uuids.cn1: [alloc_req1, alloc_req2],
+            uuids.ss1: [alloc_req1],
+            uuids.ss2: [alloc_req2],
+        }
+        ctx = mock.Mock()
+        with mock.patch.object(self.driver, 'alloc_req_scorer') as scorer:
+            # Have the scorer reverse the order returned by placement.
+            scorer.sort.side_effect = lambda reqs, summaries: reqs[::-1]
+            selected_hosts = self.driver._schedule(ctx, spec_obj,
+                    [uuids.instance], alloc_reqs_by_rp_uuid,
+                    mock.sentinel.provider_summaries)
+
+        scorer.sort.assert_called_once_with([alloc_req1, alloc_req2],
+                                            mock.sentinel.provider_summaries)
+        mock_claim.assert_has_calls([
+            mock.call(ctx.elevated.return_value, self.placement_client,
+                      spec_obj, uuids.instance, alloc_req2,
+                      allocation_request_version=None),
+            mock.call(ctx.elevated.return_value, self.placement_client,
+                      spec_obj, uuids.instance, alloc_req1,
+                      allocation_request_version=None)])
+        # The selection carries the allocation_request actually claimed.
+        self.assertEqual(jsonutils.dumps(alloc_req1),
+                         selected_hosts[0][0].allocation_request)
+
+    @mock.patch('nova.scheduler.utils.claim_resources')
+    @mock.patch('nova.scheduler.utils.claim_resources_batch')
+    @mock.patch('nova.scheduler.filter_scheduler.FilterScheduler.'
+                '_get_all_host_states')
+    @mock.patch('nova.scheduler.filter_scheduler.FilterScheduler.'
+                '_get_sorted_hosts')
+    def test_schedule_batch_claim(self, mock_get_hosts, mock_get_all_states,
+            mock_claim_batch, mock_claim):
+        """Tests that the resources of all the instances are claimed with a
+        single call to placement when batch_allocation_claims is enabled.
+        """
+        self.flags(batch_allocation_claims=True, group='filter_scheduler')
+        spec_obj = objects.RequestSpec(
+            num_instances=3,
+            flavor=objects.Flavor(memory_mb=512,
+                                  root_gb=512,
+                                  ephemeral_gb=0,
+                                  swap=0,
+                                  vcpus=1),
+            project_id=uuids.project_id,
+            instance_group=None)
+
+        host_state = mock.Mock(spec=host_manager.HostState,
+                host="fake_host", nodename="fake_node", uuid=uuids.cn1,
+                cell_uuid=uuids.cell1, limits={})
+        all_host_states = [host_state]
+        mock_get_all_states.return_value = all_host_states
+        mock_get_hosts.return_value = all_host_states
+        mock_claim_batch.return_value = True
+
+        instance_uuids = [uuids.instance1, uuids.instance2, uuids.instance3]
+        alloc_reqs_by_rp_uuid = {
+            uuids.cn1: [{"allocations": mock.sentinel.alloc_req}],
+        }
+        ctx = mock.Mock()
+        fake_version = "1.99"
+        selected_hosts = self.driver._schedule(ctx, spec_obj,
+                instance_uuids, alloc_reqs_by_rp_uuid,
+                mock.sentinel.provider_summaries,
+                allocation_request_version=fake_version)
+
+        self.assertEqual(3, len(selected_hosts))
+        expected_alloc_reqs = {
+            instance_uuid: alloc_reqs_by_rp_uuid[uuids.cn1][0]
+            for instance_uuid in instance_uuids
+        }
+        mock_claim_batch.assert_called_once_with(ctx.elevated.return_value,
+                self.placement_client, spec_obj, expected_alloc_reqs,
+                allocation_request_version=fake_version)
+        mock_claim.assert_not_called()
+        self.assertEqual(3, host_state.consume_from_request.call_count)
+
+    @mock.patch('nova.scheduler.utils.claim_resources')
+    @mock.patch('nova.scheduler.utils.claim_resources_batch')
+    @mock.patch('nova.scheduler.filter_scheduler.FilterScheduler.'
+                '_get_all_host_states')
+    @mock.patch('nova.scheduler.filter_scheduler.FilterScheduler.'
+                '_get_sorted_hosts')
+    def test_schedule_batch_claim_bisect(self, mock_get_hosts,
+            mock_get_all_states, mock_claim_batch, mock_claim):
+        """Tests that a rejected batch is split in halves and that the
+        instances which could still not be claimed fall back to the serial
+        claim.
+        """
+        self.flags(batch_allocation_claims=True, group='filter_scheduler')
+        spec_obj = objects.RequestSpec(
+            num_instances=2,
+            flavor=objects.Flavor(memory_mb=512,
+                                  root_gb=512,
+                                  ephemeral_gb=0,
+                                  swap=0,
+                                  vcpus=1),
+            project_id=uuids.project_id,
+            instance_group=None)
+
+        host_state1 = mock.Mock(spec=host_manager.HostState,
+                host="fake_host1", nodename="fake_node1", uuid=uuids.cn1,
+                cell_uuid=uuids.cell1, limits={})
+        host_state2 = mock.Mock(spec=host_manager.HostState,
+                host="fake_host2", nodename="fake_node2", uuid=uuids.cn2,
+                cell_uuid=uuids.cell1, limits={})
+        mock_get_all_states.return_value = [host_state1, host_state2]
+        mock_get_hosts.side_effect = [
+            [host_state1, host_state2],  # batch pick for instance1
+            [host_state1, host_state2],  # batch pick for instance2
+            [host_state2],  # serial claim for instance2
+        ]
+        # The whole batch fails, then the first half is claimed and the
+        # second one fails again.
+        mock_claim_batch.side_effect = [False, True, False]
+        mock_claim.return_value = True
+
+        instance_uuids = [uuids.instance1, uuids.instance2]
+        alloc_reqs_by_rp_uuid = {
+            uuids.cn1: [{"allocations": mock.sentinel.alloc_req1}],
+            uuids.cn2: [{"allocations": mock.sentinel.alloc_req2}],
+        }
+        ctx = mock.Mock()
+        selected_hosts = self.driver._schedule(ctx, spec_obj,
+                instance_uuids, alloc_reqs_by_rp_uuid,
+                mock.sentinel.provider_summaries)
+
+        self.assertEqual(3, mock_claim_batch.call_count)
+        mock_claim.assert_called_once_with(ctx.elevated.return_value,
+                self.placement_client, spec_obj, uuids.instance2,
+                alloc_reqs_by_rp_uuid[uuids.cn2][0],
+                allocation_request_version=None)
+        self.assertEqual(["fake_host1", "fake_host2"],
+                         [sel[0].service_host for sel in selected_hosts])
+
+    @mock.patch('nova.scheduler.utils.claim_resources')
+    @mock.patch('nova.scheduler.utils.claim_resources_batch')
+    @mock.patch('nova.scheduler.filter_scheduler.FilterScheduler.'
+                '_get_all_host_states')
+    @mock.patch('nova.scheduler.filter_scheduler.FilterScheduler.'
+                '_get_sorted_hosts')
+    def test_schedule_batch_claim_releases_rejected_picks(self,
+            mock_get_hosts, mock_get_all_states, mock_claim_batch,
+            mock_claim):
+        """Tests that the host of an instance whose batch claim is rejected
+        gets its resources back and is no longer counted as a member of the
+        server group before the instance is claimed serially.
+        """
+        self.flags(batch_allocation_claims=True, group='filter_scheduler')
+        group = objects.InstanceGroup(hosts=[], policy='anti-affinity')
+        spec_obj = objects.RequestSpec(
+            num_instances=2,
+            flavor=objects.Flavor(memory_mb=512,
+                                  root_gb=512,
+                                  ephemeral_gb=0,
+                                  swap=0,
+                                  vcpus=1),
+            project_id=uuids.project_id,
+            instance_group=group)
+
+        host_state1 = mock.Mock(spec=host_manager.HostState,
+                host="fake_host1", nodename="fake_node1", uuid=uuids.cn1,
+                cell_uuid=uuids.cell1, limits={}, instances={})
+        host_state2 = mock.Mock(spec=host_manager.HostState,
+                host="fake_host2", nodename="fake_node2", uuid=uuids.cn2,
+                cell_uuid=uuids.cell1, limits={}, instances={})
+        mock_get_all_states.return_value = [host_state1, host_state2]
+
+        def fake_get_sorted_hosts(spec_obj, hosts, num):
+            # Behave like the anti-affinity filter.
+            return [host for host in (host_state1, host_state2)
+                    if host.host not in group.hosts]
+
+        mock_get_hosts.side_effect = fake_get_sorted_hosts
+        # The whole batch fails, then the first instance is claimed and the
+        # second one fails again.
+        mock_claim_batch.side_effect = [False, True, False]
+        mock_claim.return_value = True
+
+        instance_uuids = [uuids.instance1, uuids.instance2]
+        alloc_reqs_by_rp_uuid = {
+            uuids.cn1: [{"allocations": mock.sentinel.alloc_req1}],
+            uuids.cn2: [{"allocations": mock.sentinel.alloc_req2}],
+        }
+        ctx = mock.Mock()
+        selected_hosts = self.driver._schedule(ctx, spec_obj,
+                instance_uuids, alloc_reqs_by_rp_uuid,
+                mock.sentinel.provider_summaries)
+
+        host_state2.release_from_request.assert_called_once_with(spec_obj,
+                                                                 None)
+        host_state1.release_from_request.assert_not_called()
+        # host2 was released and then picked again by the serial claim.
+        self.assertEqual(["fake_host1", "fake_host2"], group.hosts)
+        self.assertEqual(["fake_host1", "fake_host2"],
+                         [sel[0].service_host for sel in selected_hosts])
+
     @mock.patch('nova.scheduler.utils.claim_resources')
     @mock.patch('nova.scheduler.filter_scheduler.FilterScheduler.'
                 '_get_all_host_states')
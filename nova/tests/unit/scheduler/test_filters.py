@@ -120,6 +120,20 @@ class FiltersTestCase(test.NoDBTestCase):
         filt2_mock.filter_all.assert_called_once_with(filter_objs_second,
                                                       spec_obj)
 
+    @mock.patch.object(filters.BaseFilterHandler, '_filter_run')
+    def test_get_filtered_objects_filter_run(self, mock_filter_run):
+        filter_objs_initial = ['initial', 'filter1', 'objects1']
+        spec_obj = objects.RequestSpec()
+        filt1_mock = mock.Mock(Filter1)
+        filt1_mock.run_filter_for_index.return_value = True
+        filt1_mock.filter_all.return_value = ['filter1']
+
+        result = self.filter_handler.get_filtered_objects(
+            [filt1_mock], filter_objs_initial, spec_obj)
+
+        self.assertEqual(['filter1'], result)
+        mock_filter_run.assert_called_once_with(filt1_mock, 3, 1, mock.ANY)
+
     def test_get_filtered_objects_for_index(self):
         """Test that we don't call a filter when its
         run_filter_for_index() method returns false
@@ -14,6 +14,8 @@
 """
 Tests For Scheduler Host Filters.
 """
+import mock
+
 from nova.scheduler import filters
 from nova.scheduler.filters import all_hosts_filter
 from nova.scheduler.filters import compute_filter
@@ -35,3 +37,84 @@ class HostFiltersTestCase(test.NoDBTestCase):
         filt_cls = all_hosts_filter.AllHostsFilter()
         host = fakes.FakeHostState('host1', 'node1', {})
         self.assertTrue(filt_cls.host_passes(host, {}))
+
+
+class FakeCheapFilter(filters.BaseHostFilter):
+    pass
+
+
+class FakeExpensiveFilter(filters.BaseHostFilter):
+    pass
+
+
+class FakeOrderSensitiveFilter(filters.BaseHostFilter):
+    ORDER_SENSITIVE = True
+
+
+class FilterStatisticsTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(FilterStatisticsTestCase, self).setUp()
+        self.stats = filters.FilterStatistics()
+        self.cheap = FakeCheapFilter()
+        self.expensive = FakeExpensiveFilter()
+        self.sensitive = FakeOrderSensitiveFilter()
+
+    def _record(self, filter_, start_count, end_count, elapsed, runs=None):
+        for _ in range(runs or self.stats.MIN_RUNS):
+            self.stats.record(filter_.__class__.__name__, start_count,
+                              end_count, elapsed)
+
+    def test_order_cheap_and_selective_first(self):
+        # 1s per host but rejects half of them.
+        self._record(self.expensive, 10, 5, 10.0)
+        # 0.01s per host, rejects a tenth of them.
+        self._record(self.cheap, 10, 9, 0.1)
+        self.assertEqual([self.cheap, self.expensive],
+                         self.stats.order([self.expensive, self.cheap]))
+
+    def test_order_not_selective_last(self):
+        self._record(self.cheap, 10, 10, 0.1)
+        self._record(self.expensive, 10, 5, 10.0)
+        self.assertEqual([self.expensive, self.cheap],
+                         self.stats.order([self.cheap, self.expensive]))
+
+    def test_order_unmeasured_first(self):
+        self._record(self.cheap, 10, 1, 0.1)
+        self._record(self.expensive, 10, 5, 10.0, runs=1)
+        self.assertEqual([self.expensive, self.cheap],
+                         self.stats.order([self.cheap, self.expensive]))
+
+    def test_order_sensitive_filter_not_moved(self):
+        self._record(self.cheap, 10, 1, 0.1)
+        self._record(self.expensive, 10, 5, 10.0)
+        self._record(self.sensitive, 10, 10, 0.1)
+        self.assertEqual(
+            [self.expensive, self.sensitive, self.cheap],
+            self.stats.order([self.expensive, self.sensitive, self.cheap]))
+
+    def test_to_dict(self):
+        self.stats.record('FakeCheapFilter', 10, 6, 0.5)
+        self.stats.record('FakeCheapFilter', 10, 10, 1.5)
+        self.assertEqual(
+            {'FakeCheapFilter': {'runs': 2, 'hosts': 20, 'passed': 16,
+                                 'time': 2.0, 'time_per_host': 0.1,
+                                 'rejection_rate': 0.2}},
+            self.stats.to_dict())
+
+    @mock.patch.object(FakeCheapFilter, 'host_passes',
+                       side_effect=[True, False])
+    def test_handler_records_runs(self, mock_passes):
+        handler = filters.HostFilterHandler()
+        hosts = [fakes.FakeHostState('host1', 'node1', {}),
+                 fakes.FakeHostState('host2', 'node2', {})]
+        spec_obj = mock.Mock(instance_uuid='fake-uuid')
+        with mock.patch('nova.scheduler.utils.request_is_rebuild',
+                        return_value=False):
+            result = handler.get_filtered_objects([self.cheap], hosts,
+                                                  spec_obj)
+        self.assertEqual([hosts[0]], result)
+        stats = handler.stats.to_dict()['FakeCheapFilter']
+        self.assertEqual(1, stats['runs'])
+        self.assertEqual(2, stats['hosts'])
+        self.assertEqual(1, stats['passed'])
@@ -24,6 +24,7 @@ import mock
 from oslo_serialization import jsonutils
 from oslo_utils import versionutils
 import six
+import testtools
 
 import nova
 from nova.compute import task_states
@@ -277,6 +278,32 @@ class HostManagerTestCase(test.NoDBTestCase):
         self.assertEqual(1, len(host_filters))
         self.assertIsInstance(host_filters[0], FakeFilterClass2)
 
+    @mock.patch.object(filters.HostFilterHandler, 'get_filtered_objects')
+    @mock.patch.object(filters.HostFilterHandler, 'order_filters')
+    def test_get_filtered_hosts_reorder_filters(self, mock_order,
+                                                mock_filtered):
+        self.host_manager.reorder_filters = True
+        spec_obj = objects.RequestSpec(ignore_hosts=[], force_hosts=[],
+                                       force_nodes=[])
+        result = self.host_manager.get_filtered_hosts(self.fake_hosts,
+                                                      spec_obj)
+        self.assertEqual(mock_filtered.return_value, result)
+        mock_order.assert_called_once_with(self.host_manager.enabled_filters)
+        mock_filtered.assert_called_once_with(mock_order.return_value,
+                                              mock.ANY, spec_obj, 0)
+
+    def test_get_diagnostics(self):
+        self.host_manager.filter_handler.stats.record(
+            'FakeFilterClass1', 4, 2, 0.4)
+        self.host_manager.compute_cache_stats['hit'] = 3
+        diagnostics = self.host_manager.get_diagnostics()
+        self.assertEqual(['FakeFilterClass1'], diagnostics['filter_order'])
+        self.assertEqual({'hit': 3}, diagnostics['compute_cache'])
+        self.assertEqual(
+            {'runs': 1, 'hosts': 4, 'passed': 2, 'time': 0.4,
+             'time_per_host': 0.1, 'rejection_rate': 0.5},
+            diagnostics['filters']['FakeFilterClass1'])
+
     def _mock_get_filtered_hosts(self, info):
         info['got_objs'] = []
         info['got_fprops'] = []
@@ -1059,6 +1086,76 @@ class HostManagerTestCase(test.NoDBTestCase):
                                         mock.sentinel.c1n2]}, cns)
         self.assertEqual(['a', 'b'], sorted(srv.keys()))
 
+    @mock.patch('nova.objects.ComputeNodeList.get_all_changed_since')
+    @mock.patch('nova.objects.ServiceList.get_by_binary_changed_since')
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    def test_get_computes_for_cells_cached(self, mock_sl, mock_cn,
+                                           mock_sl_changes, mock_cn_changes):
+        self.flags(host_state_cache_max_age=300, group='filter_scheduler')
+        cells = [objects.CellMapping(uuid=uuids.cell1,
+                                     database_connection='none://1',
+                                     transport_url='none://')]
+        mock_sl.return_value = [
+            objects.Service(id=1, host='foo', deleted=False),
+            objects.Service(id=2, host='bar', deleted=False)]
+        mock_cn.return_value = [
+            objects.ComputeNode(id=1, uuid=uuids.cn1, host='foo',
+                                deleted=False),
+            objects.ComputeNode(id=2, uuid=uuids.cn2, host='bar',
+                                deleted=False)]
+        context = nova_context.RequestContext('fake', 'fake')
+        cns, srv = self.host_manager._get_computes_for_cells(context, cells)
+        self.assertEqual([uuids.cn1, uuids.cn2],
+                         sorted(cn.uuid for cn in cns[uuids.cell1]))
+        self.assertEqual(['bar', 'foo'], sorted(srv.keys()))
+        self.assertFalse(mock_sl_changes.called)
+
+        # The bar host is removed and a new baz host is added.
+        mock_sl_changes.return_value = [
+            objects.Service(id=2, host='bar', deleted=True),
+            objects.Service(id=3, host='baz', deleted=False)]
+        mock_cn_changes.return_value = [
+            objects.ComputeNode(id=2, uuid=uuids.cn2, host='bar',
+                                deleted=True),
+            objects.ComputeNode(id=3, uuid=uuids.cn3, host='baz',
+                                deleted=False)]
+        cns, srv = self.host_manager._get_computes_for_cells(
+            context, cells, compute_uuids=[uuids.cn2, uuids.cn3])
+        self.assertEqual([uuids.cn3], [cn.uuid for cn in cns[uuids.cell1]])
+        self.assertEqual(['baz', 'foo'], sorted(srv.keys()))
+        mock_sl.assert_called_once_with(mock.ANY, 'nova-compute',
+                                        include_disabled=True)
+        mock_cn.assert_called_once_with(mock.ANY)
+        changes_since = mock_cn_changes.call_args[0][1]
+        self.assertLess(changes_since,
+                        self.host_manager._cell_watermarks[uuids.cell1])
+        mock_sl_changes.assert_called_once_with(mock.ANY, 'nova-compute',
+                                                changes_since)
+        self.assertEqual({'refresh': 1, 'hit': 1},
+                         dict(self.host_manager.compute_cache_stats))
+
+    @mock.patch('oslo_utils.timeutils.is_older_than', return_value=True)
+    @mock.patch('nova.context.scatter_gather_cells')
+    def test_get_computes_for_cells_cache_expired(self, mock_sg,
+                                                  mock_older):
+        self.flags(host_state_cache_max_age=300, group='filter_scheduler')
+        cells = [objects.CellMapping(uuid=uuids.cell1)]
+        mock_sg.return_value = {
+            uuids.cell1: ([objects.Service(id=1, host='foo')],
+                          [objects.ComputeNode(id=1, uuid=uuids.cn1,
+                                               host='foo')])}
+        context = nova_context.RequestContext('fake', 'fake')
+        self.host_manager._get_computes_for_cells(context, cells)
+        mock_sg.return_value = {
+            uuids.cell1: nova_context.did_not_respond_sentinel}
+        cns, srv = self.host_manager._get_computes_for_cells(context, cells)
+        self.assertEqual({}, cns)
+        self.assertEqual({}, srv)
+        self.assertNotIn(uuids.cell1, self.host_manager._cell_loaded_at)
+        self.assertEqual(2, self.host_manager.compute_cache_stats['refresh'])
+        self.assertEqual(0, self.host_manager.compute_cache_stats['hit'])
+
 
 class HostManagerChangedNodesTestCase(test.NoDBTestCase):
     """Test case for HostManager class."""
@@ -1357,6 +1454,41 @@ class HostStateTestCase(test.NoDBTestCase):
         self.assertEqual(second_host_numa_topology, host.numa_topology)
         self.assertIsNotNone(host.updated)
 
+    @mock.patch('nova.utils.synchronized',
+                side_effect=lambda a: lambda f: lambda *args: f(*args))
+    @mock.patch('nova.virt.hardware.get_host_numa_usage_from_instance')
+    def test_stat_release_from_request(self, numa_usage_mock, sync_mock):
+        fake_numa_topology = objects.InstanceNUMATopology(
+            cells=[objects.InstanceNUMACell()])
+        released_host_numa_topology = mock.Mock()
+        numa_usage_mock.return_value = released_host_numa_topology
+        spec_obj = objects.RequestSpec(
+            flavor=objects.Flavor(root_gb=1, ephemeral_gb=1, memory_mb=512,
+                                  vcpus=2))
+        host = host_manager.HostState("fakehost", "fakenode", uuids.cell)
+        host.free_ram_mb = 1024
+        host.free_disk_mb = 2048
+        host.vcpus_used = 4
+        host.num_instances = 2
+        host.num_io_ops = 2
+        host.numa_topology = mock.sentinel.numa_topology
+        host.updated = mock.sentinel.updated
+
+        host.release_from_request(spec_obj, fake_numa_topology)
+
+        self.assertEqual(1536, host.free_ram_mb)
+        self.assertEqual(4096, host.free_disk_mb)
+        self.assertEqual(2, host.vcpus_used)
+        self.assertEqual(1, host.num_instances)
+        self.assertEqual(1, host.num_io_ops)
+        numa_usage_mock.assert_called_once_with(host, mock.ANY, free=True)
+        self.assertEqual(fake_numa_topology,
+                         numa_usage_mock.call_args[0][1].numa_topology)
+        self.assertEqual(released_host_numa_topology, host.numa_topology)
+        # The host is refreshed from the database by the next request.
+        self.assertIsNone(host.updated)
+        sync_mock.assert_called_once_with(("fakehost", "fakenode"))
+
     def test_stat_consumption_from_instance_pci(self):
 
         inst_topology = objects.InstanceNUMATopology(
@@ -1472,3 +1604,84 @@ class HostStateTestCase(test.NoDBTestCase):
         # Because compute record not ready, the update of free ram
         # will not happen and the value will still be 0
         self.assertEqual(0, host.free_ram_mb)
+
+
+@testtools.skipIf(host_manager.numpy is None, 'numpy is not installed')
+class HostStateColumnsTestCase(test.NoDBTestCase):
+    """Test case for the columnar HostState engine."""
+
+    @mock.patch.object(host_manager.HostManager, '_init_instance_info')
+    @mock.patch.object(host_manager.HostManager, '_init_aggregates')
+    def setUp(self, mock_init_agg, mock_init_inst):
+        super(HostStateColumnsTestCase, self).setUp()
+        self.flags(enabled_filters=['RamFilter', 'NumInstancesFilter',
+                                    'AvailabilityZoneFilter'],
+                   weight_classes=[
+                       'nova.scheduler.weights.ram.RAMWeigher',
+                       'nova.scheduler.weights.io_ops.IoOpsWeigher',
+                       'nova.scheduler.weights.affinity.'
+                       'ServerGroupSoftAffinityWeigher'],
+                   max_instances_per_host=10,
+                   group='filter_scheduler')
+        self.host_manager = host_manager.HostManager()
+        agg = objects.Aggregate(id=1, hosts=['host1', 'host3'],
+                                metadata={})
+        self.hosts = [
+            fakes.FakeHostState('host%s' % x, 'node%s' % x,
+                {'free_ram_mb': 512 * x, 'total_usable_ram_mb': 2048,
+                 'ram_allocation_ratio': 1.0, 'num_instances': 4 * x,
+                 'num_io_ops': 4 - x,
+                 'aggregates': [agg] if x % 2 else []})
+            for x in range(1, 5)]
+        self.spec_obj = objects.RequestSpec(
+            instance_uuid=uuids.instance,
+            flavor=objects.Flavor(memory_mb=1024, root_gb=0, ephemeral_gb=0,
+                                  swap=0, vcpus=1),
+            availability_zone=None, scheduler_hints={},
+            instance_group=None)
+
+    def test_columns(self):
+        columns = host_manager.HostStateColumns(self.hosts)
+        self.assertEqual(4, len(columns))
+        self.assertEqual([512, 1024, 1536, 2048], list(columns.free_ram_mb))
+        self.assertEqual([4, 8, 12, 16], list(columns.num_instances))
+        self.assertEqual([False] * 4, list(columns.disabled))
+        self.assertEqual([True, False, True, False],
+                         list(columns.aggregate_mask(1)))
+        self.assertEqual([False] * 4, list(columns.aggregate_mask(2)))
+
+    def test_set_active_and_select(self):
+        columns = host_manager.HostStateColumns(self.hosts)
+        columns.set_active([self.hosts[3], self.hosts[1]])
+        self.assertEqual([self.hosts[1], self.hosts[3]], columns.select())
+        self.assertEqual([self.hosts[3]],
+                         columns.select(columns.free_ram_mb > 1024))
+
+    def test_empty_columns(self):
+        columns = host_manager.HostStateColumns([])
+        self.assertEqual(0, len(columns))
+        self.assertEqual([], columns.select())
+
+    def _filter_and_weigh(self, columnar):
+        self.host_manager.columnar_host_states = columnar
+        filtered = self.host_manager.get_filtered_hosts(
+            self.hosts, self.spec_obj)
+        return [(w.obj.host, w.weight) for w in
+                self.host_manager.get_weighed_hosts(filtered, self.spec_obj)]
+
+    def test_columnar_matches_per_object(self):
+        expected = self._filter_and_weigh(False)
+        for host in self.hosts:
+            host.limits = {}
+        self.assertEqual(expected, self._filter_and_weigh(True))
+        # host3 gets filtered out by NumInstancesFilter
+        self.assertEqual(['host2'], [host for host, _w in expected])
+        self.assertEqual(2048.0, self.hosts[1].limits['memory_mb'])
+        self.assertNotIn('memory_mb', self.hosts[0].limits)
+
+    def test_columnar_weighing_order(self):
+        self.host_manager.columnar_host_states = True
+        weighed = self.host_manager.get_weighed_hosts(self.hosts,
+                                                      self.spec_obj)
+        self.assertEqual(['host4', 'host3', 'host2', 'host1'],
+                         [w.obj.host for w in weighed])
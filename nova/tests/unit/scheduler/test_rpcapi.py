@@ -137,6 +137,17 @@ class SchedulerRpcAPITestCase(test.NoDBTestCase):
                 version='4.1',
                 fanout=True)
 
+    def test_get_diagnostics(self):
+        self._test_scheduler_api('get_diagnostics', rpc_method='call',
+                version='4.6')
+
+    def test_get_diagnostics_old_version(self):
+        self.flags(scheduler='4.5', group='upgrade_levels')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        rpcapi = scheduler_rpcapi.SchedulerAPI()
+        self.assertRaises(exc.SchedulerDiagnosticsNotYetAvailable,
+                          rpcapi.get_diagnostics, ctxt)
+
     def test_update_instance_info(self):
         self._test_scheduler_api('update_instance_info', rpc_method='cast',
                 host_name='fake_host',
@@ -339,6 +339,13 @@ class SchedulerManagerTestCase(test.NoDBTestCase):
                                               mock.sentinel.host_name,
                                               mock.sentinel.instance_uuids)
 
+    def test_get_diagnostics(self):
+        with mock.patch.object(self.manager.driver.host_manager,
+                               'get_diagnostics') as mock_diagnostics:
+            result = self.manager.get_diagnostics(mock.sentinel.context)
+            mock_diagnostics.assert_called_once_with()
+            self.assertEqual(mock_diagnostics.return_value, result)
+
     def test_reset(self):
         with mock.patch.object(self.manager.driver.host_manager,
                                'refresh_cells_caches') as mock_refresh:
@@ -0,0 +1,105 @@
+# Copyright (c) 2018 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For Scheduler allocation request scorers.
+"""
+
+from nova.scheduler import scorers
+from nova import test
+from nova.tests import uuidsentinel as uuids
+
+
+class AllocationRequestScorerTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(AllocationRequestScorerTestCase, self).setUp()
+        self.provider_summaries = {
+            uuids.cn1: {
+                'resources': {
+                    'VCPU': {'capacity': 16, 'used': 0},
+                    'MEMORY_MB': {'capacity': 4096, 'used': 0},
+                },
+            },
+            uuids.ss1: {
+                'resources': {'DISK_GB': {'capacity': 1000, 'used': 900}},
+            },
+            uuids.ss2: {
+                'resources': {'DISK_GB': {'capacity': 1000, 'used': 100}},
+            },
+        }
+        self.alloc_req1 = {
+            'allocations': {
+                uuids.cn1: {'resources': {'VCPU': 1, 'MEMORY_MB': 512}},
+                uuids.ss1: {'resources': {'DISK_GB': 10}},
+            },
+        }
+        self.alloc_req2 = {
+            'allocations': {
+                uuids.cn1: {'resources': {'VCPU': 1, 'MEMORY_MB': 512}},
+                uuids.ss2: {'resources': {'DISK_GB': 10}},
+            },
+        }
+
+    def test_placement_order(self):
+        scorer = scorers.PlacementOrderScorer()
+        alloc_reqs = [self.alloc_req1, self.alloc_req2]
+        self.assertEqual(alloc_reqs,
+                         scorer.sort(alloc_reqs, self.provider_summaries))
+
+    def test_least_used(self):
+        scorer = scorers.LeastUsedScorer()
+        self.assertEqual(
+            [self.alloc_req2, self.alloc_req1],
+            scorer.sort([self.alloc_req1, self.alloc_req2],
+                        self.provider_summaries))
+
+    def test_least_used_old_format(self):
+        scorer = scorers.LeastUsedScorer()
+        alloc_req1 = {
+            'allocations': [
+                {'resource_provider': {'uuid': uuids.ss1},
+                 'resources': {'DISK_GB': 10}},
+            ],
+        }
+        alloc_req2 = {
+            'allocations': [
+                {'resource_provider': {'uuid': uuids.ss2},
+                 'resources': {'DISK_GB': 10}},
+            ],
+        }
+        self.assertEqual(
+            [alloc_req2, alloc_req1],
+            scorer.sort([alloc_req1, alloc_req2], self.provider_summaries))
+
+    def test_least_used_ties_keep_order(self):
+        scorer = scorers.LeastUsedScorer()
+        alloc_req3 = {
+            'allocations': {
+                uuids.unknown: {'resources': {'DISK_GB': 10}},
+            },
+        }
+        alloc_req4 = {
+            'allocations': {
+                uuids.unknown: {'resources': {'DISK_GB': 20}},
+            },
+        }
+        self.assertEqual(
+            [alloc_req3, alloc_req4],
+            scorer.sort([alloc_req3, alloc_req4], self.provider_summaries))
+
+    def test_least_used_no_provider_summaries(self):
+        scorer = scorers.LeastUsedScorer()
+        alloc_reqs = [self.alloc_req1, self.alloc_req2]
+        self.assertEqual(alloc_reqs, scorer.sort(alloc_reqs, None))
@@ -745,6 +745,57 @@ class TestUtils(test.NoDBTestCase):
         utils.merge_resources(resources, new_resources, -1)
         self.assertEqual(merged, resources)
 
+    def test_decode_compact_allocation_candidates(self):
+        data = {
+            'providers': [uuids.cn, uuids.ss, uuids.pf],
+            'resource_classes': ['VCPU', 'DISK_GB', 'SRIOV_NET_VF'],
+            'traits': ['HW_CPU_X86_SSE', 'MISC_SHARES_VIA_AGGREGATE'],
+            'allocation_requests': [
+                [0, 0, 1, 1, 1, 10],
+                [0, 0, 1, 2, 2, 1],
+            ],
+            'provider_summaries': [
+                [0, [0, 8, 2], [0], None, 0],
+                [1, [1, 100, 10], [1], None, 1],
+                [2, [2, 4, 0], [], 0, 0],
+            ],
+        }
+        expected_alloc_reqs = [
+            {'allocations': {
+                uuids.cn: {'resources': {'VCPU': 1}},
+                uuids.ss: {'resources': {'DISK_GB': 10}},
+            }},
+            {'allocations': {
+                uuids.cn: {'resources': {'VCPU': 1}},
+                uuids.pf: {'resources': {'SRIOV_NET_VF': 1}},
+            }},
+        ]
+        expected_p_sums = {
+            uuids.cn: {
+                'resources': {'VCPU': {'capacity': 8, 'used': 2}},
+                'traits': ['HW_CPU_X86_SSE'],
+                'parent_provider_uuid': None,
+                'root_provider_uuid': uuids.cn,
+            },
+            uuids.ss: {
+                'resources': {'DISK_GB': {'capacity': 100, 'used': 10}},
+                'traits': ['MISC_SHARES_VIA_AGGREGATE'],
+                'parent_provider_uuid': None,
+                'root_provider_uuid': uuids.ss,
+            },
+            uuids.pf: {
+                'resources': {'SRIOV_NET_VF': {'capacity': 4, 'used': 0}},
+                'traits': [],
+                'parent_provider_uuid': uuids.cn,
+                'root_provider_uuid': uuids.cn,
+            },
+        }
+
+        alloc_reqs, p_sums = utils.decode_compact_allocation_candidates(data)
+
+        self.assertEqual(expected_alloc_reqs, alloc_reqs)
+        self.assertEqual(expected_p_sums, p_sums)
+
     def test_claim_resources_on_destination_no_source_allocations(self):
         """Tests the negative scenario where the instance does not have
         allocations in Placement on the source compute node so no claim is
@@ -61,6 +61,31 @@ class ServiceGroupApiTestCase(test.NoDBTestCase):
         self.assertIs(result, False)
         driver.is_up.assert_not_called()
 
+    def test_services_are_up(self):
+        members = [{"host": "fake-host1", "topic": "compute",
+                    "forced_down": False},
+                   {"host": "fake-host2", "topic": "compute",
+                    "forced_down": True},
+                   {"host": "fake-host3", "topic": "compute",
+                    "forced_down": False}]
+        driver = self.servicegroup_api._driver
+        driver.are_up = mock.MagicMock(return_value=[False, True])
+
+        result = self.servicegroup_api.services_are_up(members)
+
+        self.assertEqual([False, False, True], result)
+        driver.are_up.assert_called_once_with([members[0], members[2]])
+
+    def test_services_are_up_all_forced_down(self):
+        member = {"host": "fake-host", "topic": "compute",
+                  "forced_down": True}
+        driver = self.servicegroup_api._driver
+        driver.are_up = mock.MagicMock()
+
+        self.assertEqual([False],
+                         self.servicegroup_api.services_are_up([member]))
+        driver.are_up.assert_not_called()
+
     def test_get_updated_time(self):
         member = {"host": "fake-host",
                   "topic": "compute",
@@ -12,6 +12,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import eventlet.event
 import mock
 from oslo_context import context as o_context
 from oslo_context import fixture as o_fixture
@@ -328,38 +329,99 @@ class ContextTestCase(test.NoDBTestCase):
         mock_create_cm.assert_not_called()
         mock_create_tport.assert_not_called()
 
-    @mock.patch('nova.context.target_cell')
+    @mock.patch('nova.context.set_target_cell')
     @mock.patch('nova.objects.InstanceList.get_by_filters')
-    def test_scatter_gather_cells(self, mock_get_inst, mock_target_cell):
+    def test_scatter_gather_cells(self, mock_get_inst, mock_set_target_cell):
         ctxt = context.get_context()
         mapping = objects.CellMapping(database_connection='fake://db',
                                       transport_url='fake://mq',
                                       uuid=uuids.cell)
         mappings = objects.CellMappingList(objects=[mapping])
 
-        # Use a mock manager to assert call order across mocks.
-        manager = mock.Mock()
-        manager.attach_mock(mock_get_inst, 'get_inst')
-        manager.attach_mock(mock_target_cell, 'target_cell')
-
         filters = {'deleted': False}
-        context.scatter_gather_cells(
+        results = context.scatter_gather_cells(
             ctxt, mappings, 60, objects.InstanceList.get_by_filters, filters,
             sort_dir='foo')
 
-        # NOTE(melwitt): This only works without the SpawnIsSynchronous fixture
-        # because when the spawn is treated as synchronous and the thread
-        # function is called immediately, it will occur inside the target_cell
-        # context manager scope when it wouldn't with a real spawn.
+        # InstanceList.get_by_filters was called with a copy of the context
+        # targeted at the cell.
+        mock_set_target_cell.assert_called_once_with(mock.ANY, mapping)
+        cctxt = mock_set_target_cell.call_args[0][0]
+        self.assertIsNot(ctxt, cctxt)
+        self.assertEqual(ctxt.request_id, cctxt.request_id)
+        mock_get_inst.assert_called_once_with(cctxt, filters, sort_dir='foo')
+        self.assertEqual({uuids.cell: mock_get_inst.return_value}, results)
 
-        # Assert that InstanceList.get_by_filters was called before the
-        # target_cell context manager exited.
-        get_inst_call = mock.call.get_inst(
-            mock_target_cell.return_value.__enter__.return_value, filters,
-            sort_dir='foo')
-        expected_calls = [get_inst_call,
-                          mock.call.target_cell().__exit__(None, None, None)]
-        manager.assert_has_calls(expected_calls)
+    @mock.patch('nova.objects.InstanceList.get_by_filters')
+    def test_scatter_gather_cells_latency(self, mock_get_inst):
+        self.useFixture(nova_fixtures.SpawnIsSynchronousFixture())
+        executor = context.ScatterGatherExecutor()
+        ctxt = context.get_context()
+        mapping = objects.CellMapping(database_connection='fake://db',
+                                      transport_url='fake://mq',
+                                      uuid=uuids.cell)
+
+        with mock.patch('oslo_utils.timeutils.StopWatch.elapsed',
+                        side_effect=[0.02, 0.3]):
+            executor.gather(ctxt, [mapping], 60,
+                            objects.InstanceList.get_by_filters)
+            executor.gather(ctxt, [mapping], 60,
+                            objects.InstanceList.get_by_filters)
+
+        histogram = executor.get_latency_histograms()[uuids.cell]
+        self.assertEqual([(0.01, 0), (0.05, 1), (0.1, 0), (0.5, 1), (1, 0),
+                          (5, 0), (10, 0), (60, 0), (None, 0)], histogram)
+        self.assertEqual('<=0.01s: 0, <=0.05s: 1, <=0.1s: 0, <=0.5s: 1, '
+                         '<=1s: 0, <=5s: 0, <=10s: 0, <=60s: 0, >60s: 0',
+                         executor._format_latency_histogram(uuids.cell))
+
+    def test_scatter_gather_executor_max_workers(self):
+        self.flags(max_concurrent_calls_per_cell=2, group='api')
+        executor = context.ScatterGatherExecutor()
+        self.assertEqual(2, executor._get_workers(uuids.cell1).balance)
+        # The same workers are used for every call to a cell.
+        self.assertIs(executor._get_workers(uuids.cell1),
+                      executor._get_workers(uuids.cell1))
+
+        executor = context.ScatterGatherExecutor(max_workers_per_cell=5)
+        self.assertEqual(5, executor._get_workers(uuids.cell1).balance)
+
+    @mock.patch('nova.context.set_target_cell')
+    def test_scatter_gather_first_cells(self, mock_set_target_cell):
+        ctxt = context.get_context()
+        mappings = [objects.CellMapping(database_connection='fake://db',
+                                        transport_url='fake://mq',
+                                        uuid=cell_uuid)
+                    for cell_uuid in (uuids.cell0, uuids.cell1, uuids.cell2)]
+        slow = eventlet.event.Event()
+        completed = []
+
+        def fake_set_target_cell(cctxt, cell_mapping):
+            cctxt.fake_cell_uuid = cell_mapping.uuid
+
+        def fake_get(cctxt):
+            if cctxt.fake_cell_uuid == uuids.cell0:
+                raise test.TestingException()
+            elif cctxt.fake_cell_uuid == uuids.cell2:
+                # This cell does not respond before the others.
+                slow.wait()
+            completed.append(cctxt.fake_cell_uuid)
+            return mock.sentinel.migration
+
+        mock_set_target_cell.side_effect = fake_set_target_cell
+        results = context.scatter_gather_first_cells(ctxt, mappings, 60, 1,
+                                                     fake_get)
+
+        # The failed cell does not count as a result, and the cell which did
+        # not respond is not waited for.
+        self.assertEqual({uuids.cell0: context.raised_exception_sentinel,
+                          uuids.cell1: mock.sentinel.migration}, results)
+
+        # The call to the cell which did not respond in time is not killed,
+        # it completes in the background.
+        slow.send()
+        eventlet.sleep(0)
+        self.assertEqual([uuids.cell1, uuids.cell2], completed)
 
     @mock.patch('nova.context.LOG.warning')
     @mock.patch('eventlet.timeout.Timeout')
@@ -391,6 +453,13 @@ class ContextTestCase(test.NoDBTestCase):
         self.assertIn(context.did_not_respond_sentinel, results.values())
         mock_timeout.assert_called_once_with(30, exception.CellTimeout)
         self.assertTrue(mock_log_warning.called)
+        # The latency histogram of the cell is logged with the timeout.
+        log_args = mock_log_warning.call_args[0][1]
+        self.assertEqual(uuids.cell1, log_args['cell'])
+        self.assertEqual(
+            context.get_scatter_gather_executor()._format_latency_histogram(
+                uuids.cell1),
+            log_args['latency'])
 
     @mock.patch('nova.context.LOG.exception')
     @mock.patch('nova.objects.InstanceList.get_by_filters')
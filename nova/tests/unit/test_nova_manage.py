@@ -384,10 +384,15 @@ class DBCommandsTestCase(test.NoDBTestCase):
         self.output = StringIO()
         self.useFixture(fixtures.MonkeyPatch('sys.stdout', self.output))
         self.commands = manage.DbCommands()
+        self.useFixture(fixtures.MockPatch(
+            'oslo_utils.timeutils.StopWatch.elapsed', return_value=2.0))
 
     def test_archive_deleted_rows_negative(self):
         self.assertEqual(2, self.commands.archive_deleted_rows(-1))
 
+    def test_archive_deleted_rows_invalid_workers(self):
+        self.assertEqual(2, self.commands.archive_deleted_rows(workers=0))
+
     def test_archive_deleted_rows_large_number(self):
         large_number = '1' * 100
         self.assertEqual(2, self.commands.archive_deleted_rows(large_number))
@@ -398,7 +403,7 @@ class DBCommandsTestCase(test.NoDBTestCase):
     def _test_archive_deleted_rows(self, mock_get_all, mock_db_archive,
                                    verbose=False):
         result = self.commands.archive_deleted_rows(20, verbose=verbose)
-        mock_db_archive.assert_called_once_with(20)
+        mock_db_archive.assert_called_once_with(20, workers=1)
         output = self.output.getvalue()
         if verbose:
             expected = '''\
@@ -408,6 +413,7 @@ class DBCommandsTestCase(test.NoDBTestCase):
 | consoles  | 5                       |
 | instances | 10                      |
 +-----------+-------------------------+
+Archived 15 rows in 2.00 seconds (7.50 rows/second)
 '''
             self.assertEqual(expected, output)
         else:
@@ -444,14 +450,15 @@ Archiving.....complete
 | instance_faults | 1                       |
 | instances       | 15                      |
 +-----------------+-------------------------+
+Archived 21 rows in 2.00 seconds (10.50 rows/second)
 """
         else:
             expected = ''
 
         self.assertEqual(expected, self.output.getvalue())
-        mock_db_archive.assert_has_calls([mock.call(20),
-                                          mock.call(20),
-                                          mock.call(20)])
+        mock_db_archive.assert_has_calls([mock.call(20, workers=1),
+                                          mock.call(20, workers=1),
+                                          mock.call(20, workers=1)])
 
     def test_archive_deleted_rows_until_complete_quiet(self):
         self.test_archive_deleted_rows_until_complete(verbose=False)
@@ -481,15 +488,16 @@ Archiving.....stopped
 | instance_faults | 1                       |
 | instances       | 15                      |
 +-----------------+-------------------------+
+Archived 21 rows in 2.00 seconds (10.50 rows/second)
 Rows were archived, running purge...
 """
         else:
             expected = ''
 
         self.assertEqual(expected, self.output.getvalue())
-        mock_db_archive.assert_has_calls([mock.call(20),
-                                          mock.call(20),
-                                          mock.call(20)])
+        mock_db_archive.assert_has_calls([mock.call(20, workers=1),
+                                          mock.call(20, workers=1),
+                                          mock.call(20, workers=1)])
         mock_db_purge.assert_called_once_with(mock.ANY, None,
                                               status_fn=mock.ANY)
 
@@ -502,7 +510,7 @@ Rows were archived, running purge...
                                                      mock_db_archive):
         result = self.commands.archive_deleted_rows(20, verbose=True,
                                                     purge=True)
-        mock_db_archive.assert_called_once_with(20)
+        mock_db_archive.assert_called_once_with(20, workers=1)
         output = self.output.getvalue()
         # If nothing was archived, there should be no purge messages
         self.assertIn('Nothing was archived.', output)
@@ -537,7 +545,7 @@ Rows were archived, running purge...
         result = self.commands.archive_deleted_rows(20, verbose=verbose)
 
         self.assertEqual(1, result)
-        mock_db_archive.assert_called_once_with(20)
+        mock_db_archive.assert_called_once_with(20, workers=1)
         self.assertEqual(1, mock_destroy.call_count)
 
         output = self.output.getvalue()
@@ -551,6 +559,7 @@ Rows were archived, running purge...
 | instances         | 2                       |
 | request_specs     | 2                       |
 +-------------------+-------------------------+
+Archived 11 rows in 2.00 seconds (5.50 rows/second)
 '''
             self.assertEqual(expected, output)
         else:
@@ -2807,6 +2816,64 @@ class TestNovaManagePlacement(test.NoDBTestCase):
                       self.output.getvalue())
 
 
+class TestNovaManageImageCache(test.NoDBTestCase):
+    """Unit tests for the nova-manage image_cache commands."""
+
+    def setUp(self):
+        super(TestNovaManageImageCache, self).setUp()
+        self.output = StringIO()
+        self.useFixture(fixtures.MonkeyPatch('sys.stdout', self.output))
+        self.cli = manage.ImageCacheCommands()
+
+    def test_precache_no_hosts(self):
+        self.assertEqual(2, self.cli.precache([uuidsentinel.image]))
+        self.assertIn('At least one host', self.output.getvalue())
+
+    @mock.patch('nova.compute.api.AggregateAPI.get_aggregate_list',
+                return_value=objects.AggregateList(objects=[
+                    objects.Aggregate(id=1, name='foo', hosts=['host1'],
+                                      uuid=uuidsentinel.aggregate)]))
+    def test_precache_aggregate_not_found(self, mock_get_aggs):
+        self.assertEqual(2, self.cli.precache([uuidsentinel.image],
+                                              aggregate='bar'))
+        self.assertIn('Aggregate bar not found', self.output.getvalue())
+
+    @mock.patch('nova.compute.utils.cache_images_on_hosts')
+    @mock.patch('nova.compute.api.AggregateAPI.get_aggregate_list',
+                return_value=objects.AggregateList(objects=[
+                    objects.Aggregate(id=1, name='foo',
+                                      hosts=['host1', 'host2'],
+                                      uuid=uuidsentinel.aggregate)]))
+    def test_precache(self, mock_get_aggs, mock_cache):
+        def fake_cache(ctxt, compute_rpcapi, hosts, image_ids, host_done):
+            for host in hosts:
+                host_done(host, {uuidsentinel.image: 'downloaded'})
+
+        mock_cache.side_effect = fake_cache
+        self.assertEqual(0, self.cli.precache([uuidsentinel.image],
+                                              aggregate='foo',
+                                              hosts=['host3', 'host1']))
+        self.assertEqual(['host3', 'host1', 'host2'],
+                         mock_cache.call_args[0][2])
+        self.assertIn('host2: %s: downloaded' % uuidsentinel.image,
+                      self.output.getvalue())
+
+    @mock.patch('nova.compute.utils.cache_images_on_hosts')
+    def test_precache_errors(self, mock_cache):
+        def fake_cache(ctxt, compute_rpcapi, hosts, image_ids, host_done):
+            host_done('host1', {uuidsentinel.image1: 'existing',
+                                uuidsentinel.image2: 'downloaded'})
+            host_done('host2', {uuidsentinel.image1: 'error',
+                                uuidsentinel.image2: 'unsupported'})
+
+        mock_cache.side_effect = fake_cache
+        self.assertEqual(1, self.cli.precache(
+            [uuidsentinel.image1, uuidsentinel.image2],
+            hosts=['host1', 'host2']))
+        self.assertIn('Failed to cache images on: host2',
+                      self.output.getvalue())
+
+
 class TestNovaManageMain(test.NoDBTestCase):
     """Tests the nova-manage:main() setup code."""
 
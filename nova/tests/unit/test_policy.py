@@ -288,6 +288,7 @@ class RealRolePolicyTestCase(test.NoDBTestCase):
 "os_compute_api:os-aggregates:index",
 "os_compute_api:os-aggregates:create",
 "os_compute_api:os-aggregates:show",
+"os_compute_api:os-aggregates:cache_images",
 "os_compute_api:os-aggregates:update",
 "os_compute_api:os-aggregates:delete",
 "os_compute_api:os-aggregates:add_host",
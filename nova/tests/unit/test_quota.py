@@ -29,6 +29,7 @@ from nova import objects
 from nova import quota
 from nova import test
 import nova.tests.unit.image.fake
+from nova.tests import uuidsentinel as uuids
 
 CONF = nova.conf.CONF
 
@@ -2255,3 +2256,76 @@ class NoopQuotaDriverTestCase(test.TestCase):
                                                  quota.QUOTAS._resources,
                                                  'test_project')
         self.assertEqual(self.expected_settable_quotas, result)
+
+
+@mock.patch('nova.quota.PLACEMENT_CLIENT', new=None)
+class InstancesCoresRamCountTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(InstancesCoresRamCountTestCase, self).setUp()
+        self.context = context.RequestContext('fake_user', 'fake_project')
+
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient')
+    @mock.patch('nova.objects.InstanceMappingList.get_counts')
+    @mock.patch('nova.context.scatter_gather_all_cells')
+    def test_count_from_placement(self, mock_sg, mock_get_counts,
+                                  mock_client):
+        self.flags(count_usage_from_placement=True, group='quota')
+        mock_get_counts.return_value = {'project': {'instances': 3},
+                                        'user': {'instances': 1}}
+        get_usages = mock_client.return_value.get_usages_counts_for_quota
+        get_usages.return_value = {'project': {'cores': 6, 'ram': 3072},
+                                   'user': {'cores': 2, 'ram': 1024}}
+
+        counts = quota._instances_cores_ram_count(self.context,
+                                                  'fake_project',
+                                                  user_id='fake_user')
+
+        self.assertEqual({'project': {'instances': 3, 'cores': 6,
+                                      'ram': 3072},
+                          'user': {'instances': 1, 'cores': 2, 'ram': 1024}},
+                         counts)
+        mock_get_counts.assert_called_once_with(
+            self.context, 'fake_project', user_id='fake_user')
+        get_usages.assert_called_once_with(
+            self.context, 'fake_project', user_id='fake_user')
+        # The cell databases are not queried.
+        mock_sg.assert_not_called()
+
+        # The placement client is reused.
+        quota._instances_cores_ram_count(self.context, 'fake_project')
+        mock_client.assert_called_once_with()
+
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient')
+    @mock.patch('nova.objects.InstanceMappingList.get_counts')
+    def test_count_from_placement_fails(self, mock_get_counts, mock_client):
+        self.flags(count_usage_from_placement=True, group='quota')
+        mock_get_counts.return_value = {'project': {'instances': 3}}
+        get_usages = mock_client.return_value.get_usages_counts_for_quota
+        get_usages.side_effect = exception.UsagesRetrievalFailed(
+            project_id='fake_project', user_id=None)
+
+        self.assertRaises(exception.UsagesRetrievalFailed,
+                          quota._instances_cores_ram_count, self.context,
+                          'fake_project')
+
+    @mock.patch('nova.objects.InstanceMappingList.get_counts')
+    @mock.patch('nova.context.scatter_gather_all_cells')
+    def test_count_from_cells(self, mock_sg, mock_get_counts):
+        mock_sg.return_value = {
+            uuids.cell1: {'project': {'instances': 2, 'cores': 4, 'ram': 8},
+                          'user': {'instances': 1, 'cores': 2, 'ram': 4}},
+            uuids.cell2: context.did_not_respond_sentinel,
+        }
+
+        counts = quota._instances_cores_ram_count(self.context,
+                                                  'fake_project',
+                                                  user_id='fake_user')
+
+        self.assertEqual({'project': {'instances': 2, 'cores': 4, 'ram': 8},
+                          'user': {'instances': 1, 'cores': 2, 'ram': 4}},
+                         counts)
+        mock_sg.assert_called_once_with(
+            self.context, objects.InstanceList.get_counts, 'fake_project',
+            user_id='fake_user')
+        mock_get_counts.assert_not_called()
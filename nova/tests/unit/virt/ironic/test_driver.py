@@ -560,6 +560,24 @@ class IronicDriverTestCase(test.NoDBTestCase):
         expected = [n.instance_uuid for n in nodes]
         self.assertEqual(sorted(expected), sorted(uuids))
 
+    @mock.patch.object(cw.IronicClientWrapper, 'call')
+    def test_get_power_states(self, mock_call):
+        nodes = [ironic_utils.get_test_node(
+                     instance_uuid=uuidutils.generate_uuid(),
+                     power_state=state,
+                     fields=['instance_uuid', 'power_state'])
+                 for state in (ironic_states.POWER_ON,
+                               ironic_states.POWER_OFF)]
+
+        mock_call.return_value = nodes
+        states = self.driver.get_power_states()
+        mock_call.assert_called_once_with(
+            'node.list', associated=True,
+            fields=['instance_uuid', 'power_state'], limit=0)
+        self.assertEqual({nodes[0].instance_uuid: nova_states.RUNNING,
+                          nodes[1].instance_uuid: nova_states.SHUTDOWN},
+                         states)
+
     @mock.patch.object(FAKE_CLIENT.node, 'list')
     @mock.patch.object(FAKE_CLIENT.node, 'get')
     @mock.patch.object(objects.InstanceList, 'get_uuids_by_host')
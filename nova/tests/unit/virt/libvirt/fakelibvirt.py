@@ -151,6 +151,8 @@ VIR_DOMAIN_BLOCK_REBASE_RELATIVE = 8
 VIR_CONNECT_LIST_DOMAINS_ACTIVE = 1
 VIR_CONNECT_LIST_DOMAINS_INACTIVE = 2
 
+VIR_DOMAIN_STATS_STATE = 1
+
 # secret type
 VIR_SECRET_USAGE_TYPE_NONE = 0
 VIR_SECRET_USAGE_TYPE_VOLUME = 1
@@ -1113,6 +1115,10 @@ class Connection(object):
                     vms.append(vm)
         return vms
 
+    def getAllDomainStats(self, stats=0, flags=0):
+        return [(vm, {'state.state': vm._state, 'state.reason': 0})
+                for vm in self._vms.values()]
+
     def _emit_lifecycle(self, dom, event, detail):
         if VIR_DOMAIN_EVENT_ID_LIFECYCLE not in self._event_callbacks:
             return
@@ -13632,6 +13632,44 @@ class LibvirtConnTestCase(test.NoDBTestCase,
         ip = drvr.get_host_ip_addr()
         self.assertEqual(ip, CONF.my_ip)
 
+    @mock.patch.object(libvirt_driver.libvirt_utils, 'fetch_image')
+    def test_cache_image(self, mock_fetch):
+        self.flags(instances_path=self.useFixture(fixtures.TempDir()).path)
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        base = os.path.join(CONF.instances_path,
+                            CONF.image_cache_subdirectory_name,
+                            imagecache.get_cache_fname(uuids.image))
+
+        self.assertTrue(drvr.cache_image(self.context, uuids.image))
+        mock_fetch.assert_called_once_with(self.context, base, uuids.image)
+
+        # The image is not downloaded again once it is in the cache, but its
+        # timestamp is updated so that the image cache manager keeps it.
+        open(base, 'w').close()
+        mock_fetch.reset_mock()
+        with mock.patch('nova.privsep.path.utime') as mock_utime:
+            self.assertFalse(drvr.cache_image(self.context, uuids.image))
+        mock_fetch.assert_not_called()
+        mock_utime.assert_called_once_with(base)
+
+    @mock.patch('nova.image.download.peer.advertise')
+    @mock.patch('os.path.exists', side_effect=lambda path: path != '/b/2')
+    def test_manage_image_cache_advertises(self, mock_exists,
+                                           mock_advertise):
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        with mock.patch.object(drvr.image_cache_manager, 'update') as update:
+            drvr.image_cache_manager.originals = ['/b/1', '/b/2']
+            drvr.manage_image_cache(self.context, mock.sentinel.instances)
+            update.assert_called_once_with(self.context,
+                                           mock.sentinel.instances)
+            mock_advertise.assert_not_called()
+
+            self.flags(enable_peer_download=True, group='glance')
+            drvr.manage_image_cache(self.context, mock.sentinel.instances)
+            # Base files removed by the image cache manager are not
+            # advertised.
+            mock_advertise.assert_called_once_with(CONF.host, ['/b/1'])
+
     @mock.patch.object(libvirt_driver.LOG, 'warning')
     @mock.patch('nova.compute.utils.get_machine_ips')
     def test_get_host_ip_addr_failure(self, mock_ips, mock_log):
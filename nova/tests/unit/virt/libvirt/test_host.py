@@ -21,6 +21,7 @@ from oslo_utils import uuidutils
 import six
 import testtools
 
+from nova.compute import power_state
 from nova.compute import vm_states
 from nova import exception
 from nova import objects
@@ -555,6 +556,23 @@ class HostTestCase(test.NoDBTestCase):
         self.assertEqual(doms[1].name(), vm1.name())
         self.assertEqual(doms[2].name(), vm2.name())
 
+    @mock.patch.object(fakelibvirt.Connection, "getAllDomainStats")
+    def test_get_instance_power_states(self, mock_stats):
+        vm0 = FakeVirtDomain(id=0, name="Domain-0")  # Xen dom-0
+        vm1 = FakeVirtDomain(id=3, name="instance00000001")
+        vm2 = FakeVirtDomain(name="instance00000002")
+        mock_stats.return_value = [
+            (vm0, {'state.state': fakelibvirt.VIR_DOMAIN_RUNNING}),
+            (vm1, {'state.state': fakelibvirt.VIR_DOMAIN_RUNNING}),
+            (vm2, {'state.state': fakelibvirt.VIR_DOMAIN_SHUTOFF})]
+
+        states = self.host.get_instance_power_states()
+
+        mock_stats.assert_called_once_with(
+            fakelibvirt.VIR_DOMAIN_STATS_STATE)
+        self.assertEqual({vm1.UUIDString(): power_state.RUNNING,
+                          vm2.UUIDString(): power_state.SHUTDOWN}, states)
+
     @mock.patch.object(host.Host, "list_instance_domains")
     def test_list_guests(self, mock_list_domains):
         dom0 = mock.Mock(spec=fakelibvirt.virDomain)
@@ -238,6 +238,32 @@ class VMwareVMOpsTestCase(test.NoDBTestCase):
         vms = ops._get_valid_vms_from_retrieve_result(fake_objects)
         self.assertEqual(1, len(vms))
 
+    def test_get_power_states(self):
+        ops = vmops.VMwareVMOps(self._session, mock.Mock(), mock.Mock())
+        fake_objects = vmwareapi_fake.FakeRetrieveResult()
+        vm_uuids = [uuidutils.generate_uuid() for x in range(2)]
+        for vm_uuid, state in zip(vm_uuids, ['poweredOn', 'poweredOff']):
+            vm = vmwareapi_fake.VirtualMachine(powerstate=state)
+            vm.set('config.extraConfig["nvp.vm-uuid"]',
+                   vmwareapi_fake.OptionValue(value=vm_uuid))
+            fake_objects.add_object(vm)
+
+        def fake_call_method(module, method, *args, **kwargs):
+            if method == 'get_inner_objects':
+                return fake_objects
+
+        with mock.patch.object(self._session, '_call_method',
+                               side_effect=fake_call_method) as mock_call:
+            states = ops.get_power_states()
+
+        self.assertEqual({vm_uuids[0]: power_state.RUNNING,
+                          vm_uuids[1]: power_state.SHUTDOWN}, states)
+        mock_call.assert_any_call(
+            vim_util, 'get_inner_objects', ops._root_resource_pool, 'vm',
+            'VirtualMachine', ['runtime.connectionState',
+                               'runtime.powerState',
+                               'config.extraConfig["nvp.vm-uuid"]'])
+
     def test_delete_vm_snapshot(self):
         def fake_call_method(module, method, *args, **kwargs):
             self.assertEqual('RemoveSnapshot_Task', method)
@@ -167,6 +167,21 @@ class ComputeDriver(object):
         # TODO(Vek): Need to pass context in for access to auth_token
         raise NotImplementedError()
 
+    def get_power_states(self):
+        """Get the power state of all the instances known to the
+        virtualization layer.
+
+        Drivers able to read the power state of all their instances with a
+        single call to the hypervisor should implement this method, which
+        the compute manager uses instead of calling get_info() for each
+        instance when synchronizing the power states.
+
+        :returns: A dict of nova.compute.power_state values, keyed by
+                  instance UUID. Instances unknown to the virtualization
+                  layer are not included.
+        """
+        raise NotImplementedError()
+
     def get_num_instances(self):
         """Return the total number of virtual machines.
 
@@ -1422,6 +1437,20 @@ class ComputeDriver(object):
         """
         pass
 
+    def cache_image(self, context, image_id):
+        """Download an image into the driver's local image cache.
+
+        Instances using the image can then be spawned without downloading it
+        from the image service first.
+
+        :param context: security context
+        :param image_id: The ID of the image to cache
+        :returns: True if the image was downloaded, False if it was already
+                  in the cache.
+        :raises: NotImplementedError if the driver has no local image cache
+        """
+        raise NotImplementedError()
+
     def add_to_aggregate(self, context, aggregate, host, **kwargs):
         """Add a compute host to an aggregate.
 
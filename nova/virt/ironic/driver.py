@@ -915,6 +915,21 @@ class IronicDriver(virt_driver.ComputeDriver):
 
         return hardware.InstanceInfo(state=map_power_state(node.power_state))
 
+    def get_power_states(self):
+        """Get the power state of all the instances provisioned, with a
+        single request to the Ironic API.
+
+        :returns: a dict of power states keyed by instance UUID.
+        :raises: VirtDriverNotReady
+
+        """
+        node_list = self._get_node_list(associated=True,
+                                        fields=['instance_uuid',
+                                                'power_state'],
+                                        limit=0)
+        return {n.instance_uuid: map_power_state(n.power_state)
+                for n in node_list}
+
     def deallocate_networks_on_reschedule(self, instance):
         """Does the driver want networks deallocated on reschedule?
 
@@ -82,6 +82,7 @@ from nova import crypto
 from nova import exception
 from nova.i18n import _
 from nova import image
+from nova.image.download import peer as peer_xfer
 from nova.network import model as network_model
 from nova import objects
 from nova.objects import diagnostics as diagnostics_obj
@@ -5447,6 +5448,9 @@ class LibvirtDriver(driver.ComputeDriver):
         # workaround, see libvirt/compat.py
         return guest.get_info(self._host)
 
+    def get_power_states(self):
+        return self._host.get_instance_power_states()
+
     def _create_domain_setup_lxc(self, context, instance, image_meta,
                                  block_device_info):
         inst_path = libvirt_utils.get_instance_path(instance)
@@ -8247,6 +8251,43 @@ class LibvirtDriver(driver.ComputeDriver):
     def manage_image_cache(self, context, all_instances):
         """Manage the local cache of images."""
         self.image_cache_manager.update(context, all_instances)
+        if CONF.glance.enable_peer_download:
+            base_files = [path for path in self.image_cache_manager.originals
+                          if os.path.exists(path)]
+            peer_xfer.advertise(CONF.host, base_files)
+
+    def cache_image(self, context, image_id):
+        """Fetch an image into the image cache, as Image.cache would do when
+        spawning an instance from it.
+        """
+        base_dir = os.path.join(CONF.instances_path,
+                                CONF.image_cache_subdirectory_name)
+        filename = imagecache.get_cache_fname(image_id)
+        base = os.path.join(base_dir, filename)
+        lock_path = os.path.join(CONF.instances_path, 'locks')
+
+        # NOTE: This is the lock used by Image.cache, so that the image is not
+        # fetched at the same time by a build.
+        @utils.synchronized(filename, external=True, lock_path=lock_path)
+        def _cache_image():
+            if os.path.exists(base):
+                # NOTE: Update the mtime of the base file so that the image
+                # cache manager considers it as recently used and keeps it
+                # for another remove_unused_original_minimum_age_seconds.
+                nova.privsep.path.utime(base)
+                return False
+            fileutils.ensure_tree(base_dir)
+            libvirt_utils.fetch_image(context, base, image_id)
+            return True
+
+        downloaded = _cache_image()
+        if downloaded:
+            LOG.info('Image %(image_id)s downloaded to the image cache',
+                     {'image_id': image_id})
+        else:
+            LOG.debug('Image %(image_id)s is already in the image cache, '
+                      'updated its timestamp', {'image_id': image_id})
+        return downloaded
 
     def _cleanup_remote_migration(self, dest, inst_base, inst_base_resize,
                                   shared_storage=False):
@@ -606,6 +606,26 @@ class Host(object):
 
         return doms
 
+    def get_instance_power_states(self):
+        """Get the power state of the domains of all nova instances
+
+        The states of all the domains are read with a single call to
+        libvirt, rather than one call per domain.
+
+        :returns: dict of nova power states keyed by instance UUID
+        """
+        domain_stats = self.get_connection().getAllDomainStats(
+            libvirt.VIR_DOMAIN_STATS_STATE)
+
+        states = {}
+        for dom, stats in domain_stats:
+            # Filter out the Xen Domain-0
+            if dom.ID() == 0:
+                continue
+            states[dom.UUIDString()] = (
+                libvirt_guest.LIBVIRT_POWER_STATE[stats['state.state']])
+        return states
+
     def get_online_cpus(self):
         """Get the set of CPUs that are online on the host
 
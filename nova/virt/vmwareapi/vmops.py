@@ -1762,29 +1762,35 @@ class VMwareVMOps(object):
             datastores_info.append((ds, dc_info))
         self._imagecache.update(context, instances, datastores_info)
 
-    def _get_valid_vms_from_retrieve_result(self, retrieve_result):
-        """Returns list of valid vms from RetrieveResult object."""
-        lst_vm_names = []
-
+    def _iter_valid_vms_from_retrieve_result(self, retrieve_result):
+        """Yields the UUID and the properties of the valid vms from a
+        RetrieveResult object.
+        """
         while retrieve_result:
             for vm in retrieve_result.objects:
                 vm_uuid = None
                 conn_state = None
+                props = {}
                 for prop in vm.propSet:
                     if prop.name == "runtime.connectionState":
                         conn_state = prop.val
                     elif prop.name == 'config.extraConfig["nvp.vm-uuid"]':
                         vm_uuid = prop.val.value
+                    props[prop.name] = prop.val
                 # Ignore VM's that do not have nvp.vm-uuid defined
                 if not vm_uuid:
                     continue
                 # Ignoring the orphaned or inaccessible VMs
                 if conn_state not in ["orphaned", "inaccessible"]:
-                    lst_vm_names.append(vm_uuid)
+                    yield vm_uuid, props
             retrieve_result = self._session._call_method(vutil,
                                                          'continue_retrieval',
                                                          retrieve_result)
-        return lst_vm_names
+
+    def _get_valid_vms_from_retrieve_result(self, retrieve_result):
+        """Returns list of valid vms from RetrieveResult object."""
+        return [vm_uuid for vm_uuid, props in
+                self._iter_valid_vms_from_retrieve_result(retrieve_result)]
 
     def instance_exists(self, instance):
         try:
@@ -2019,6 +2025,22 @@ class VMwareVMOps(object):
         LOG.debug("Got total of %s instances", str(len(lst_vm_names)))
         return lst_vm_names
 
+    def get_power_states(self):
+        """Returns the power state of the VM instances registered with the
+        vCenter cluster, read with a single property collector query.
+        """
+        properties = ['runtime.connectionState',
+                      'runtime.powerState',
+                      'config.extraConfig["nvp.vm-uuid"]']
+        vms = []
+        if self._root_resource_pool:
+            vms = self._session._call_method(
+                vim_util, 'get_inner_objects', self._root_resource_pool, 'vm',
+                'VirtualMachine', properties)
+        return {vm_uuid: constants.POWER_STATES[props['runtime.powerState']]
+                for vm_uuid, props in
+                self._iter_valid_vms_from_retrieve_result(vms)}
+
     def get_vnc_console(self, instance):
         """Return connection info for a vnc console using vCenter logic."""
 